@@ -0,0 +1,152 @@
+"""
+Benchmark of the NumPy analytics against loops over the entities
+
+A year of seeded reservations (see data_generator) and one order per reserved table are written to an
+in-memory SQLite database. For one restaurant the utilization heatmap, the peak-hour curve, the table
+occupancy and the revenue per table are computed with the AnalyticsRepository and, as reference, with
+Python loops over the loaded entities. The time of the analytics is split into fetching the columns and
+the vectorized computation.
+
+usage: python -m restaurant_app.benchmark.analytics [--days 365] [--tables 40] [--repeat 5]
+"""
+
+import argparse
+import datetime
+import random
+from collections import defaultdict
+
+from sqlalchemy import insert, select
+
+from ..store.analytics import (
+    AnalyticsRepository,
+    peak_hours,
+    revenue_per_table,
+    table_occupancy,
+    utilization_heatmap,
+)
+from ..store.database import SqlAlchemyDatabase
+from ..store.entities import OrderEntity, ReservationEntity, TableEntity, relation_table_reservation
+from ..store.reservation_repo import restaurant_reservations_statement
+from .data_generator import DatasetSpec, generate
+from .timing import measure, summary
+
+BUCKET = 60
+
+
+def populate_orders(db: SqlAlchemyDatabase, seed: int = 42) -> int:
+    """one order per reserved table, created at the start of the reservation"""
+    rng = random.Random(seed)
+    with db.managed_session() as session:
+        rows = [
+            {
+                "created": datetime.datetime.combine(date.date(), time_from),
+                "total": round(rng.uniform(10.0, 200.0), 2),
+                "waiter": rng.choice(["Anna", "Ben", "Clara", "David"]),
+                "table_id": table_id,
+            }
+            for table_id, date, time_from in session.execute(
+                select(
+                    relation_table_reservation.c.table_id,
+                    ReservationEntity.reservation_date,
+                    ReservationEntity.time_from,
+                ).join(ReservationEntity, ReservationEntity.id == relation_table_reservation.c.reservation_id)
+            )
+        ]
+        session.execute(insert(OrderEntity), rows)
+        session.commit()
+    return len(rows)
+
+
+def naive_reservation_metrics(db: SqlAlchemyDatabase, restaurant_id: int, date_from, date_until) -> dict:
+    """the reference: heatmap, peak hours and table occupancy with loops over the reservation entities"""
+    buckets = 24 * 60 // BUCKET
+    seat_minutes = [[0] * buckets for _ in range(7)]
+    guests = [0] * buckets
+    arrivals = [0] * buckets
+    occupancy = defaultdict(lambda: [0] * buckets)
+    start, end = (
+        datetime.datetime.combine(date_from, datetime.time.min),
+        datetime.datetime.combine(date_until, datetime.time.max),
+    )
+    with db.managed_session() as session:
+        reservations = session.scalars(
+            restaurant_reservations_statement(restaurant_id)
+            .where(ReservationEntity.reservation_date >= start)
+            .where(ReservationEntity.reservation_date <= end)
+        ).all()
+        for reservation in reservations:
+            first = reservation.time_from.hour * 60 + reservation.time_from.minute
+            last = reservation.time_until.hour * 60 + reservation.time_until.minute
+            weekday = reservation.reservation_date.weekday()
+            arrivals[first // BUCKET] += 1
+            for bucket in range(first // BUCKET, (last - 1) // BUCKET + 1):
+                minutes = min(last, (bucket + 1) * BUCKET) - max(first, bucket * BUCKET)
+                seat_minutes[weekday][bucket] += reservation.people * minutes
+                guests[bucket] += reservation.people * minutes
+                for table in reservation.tables:
+                    if table.restaurant_id == restaurant_id:
+                        occupancy[reservation.reservation_date.date()][bucket] += minutes
+    return {"seat_minutes": seat_minutes, "guests": guests, "arrivals": arrivals, "occupancy": occupancy}
+
+
+def numpy_reservation_metrics(repo: AnalyticsRepository, restaurant_id: int, date_from, date_until) -> tuple:
+    """the metrics of naive_reservation_metrics from one fetch of the columns"""
+    columns = repo.get_reservation_columns(restaurant_id, date_from, date_until)
+    return (
+        utilization_heatmap(columns, repo.get_capacity(restaurant_id), date_from, date_until, BUCKET),
+        peak_hours(columns, date_from, date_until, BUCKET),
+        table_occupancy(columns, date_from, date_until, BUCKET),
+    )
+
+
+def naive_revenue(db: SqlAlchemyDatabase, restaurant_id: int) -> dict:
+    revenue = defaultdict(float)
+    with db.managed_session() as session:
+        orders = session.scalars(
+            select(OrderEntity).join(TableEntity).where(TableEntity.restaurant_id == restaurant_id)
+        ).all()
+        for order in orders:
+            revenue[order.table.id] += order.total
+    return revenue
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--tables", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    db = SqlAlchemyDatabase("sqlite://")
+    db.create_database()
+    spec = DatasetSpec(restaurants=2, menus_per_restaurant=10, tables_per_restaurant=args.tables, days=args.days)
+    dataset = generate(db, spec)
+    orders = populate_orders(db)
+    date_from, date_until = dataset.dates[0], dataset.dates[-1]
+    restaurant_id = dataset.restaurant_ids[0]
+    print("%d reservations, %d orders, %d days" % (dataset.reservations, orders, args.days))
+
+    repo = AnalyticsRepository(db.managed_session)
+    columns = repo.get_reservation_columns(restaurant_id, date_from, date_until)
+    order_columns = repo.get_order_columns(restaurant_id, date_from, date_until)
+    capacity = repo.get_capacity(restaurant_id)
+    print("restaurant %d: %d reservations, %d orders" % (restaurant_id, len(columns), len(order_columns.total)))
+
+    scenarios = {
+        "fetch reservation columns": lambda: repo.get_reservation_columns(restaurant_id, date_from, date_until),
+        "fetch order columns": lambda: repo.get_order_columns(restaurant_id, date_from, date_until),
+        "numpy heatmap": lambda: utilization_heatmap(columns, capacity, date_from, date_until, BUCKET),
+        "numpy peak hours": lambda: peak_hours(columns, date_from, date_until, BUCKET),
+        "numpy table occupancy": lambda: table_occupancy(columns, date_from, date_until, BUCKET),
+        "numpy revenue per table": lambda: revenue_per_table(order_columns),
+        "numpy reservation metrics": lambda: numpy_reservation_metrics(repo, restaurant_id, date_from, date_until),
+        "numpy revenue (incl. fetch)": lambda: repo.get_revenue_per_table(restaurant_id, date_from, date_until),
+        "loop reservation metrics": lambda: naive_reservation_metrics(db, restaurant_id, date_from, date_until),
+        "loop revenue per table": lambda: naive_revenue(db, restaurant_id),
+    }
+    for name, scenario in scenarios.items():
+        print("%-28s %s" % (name, summary(measure(scenario, repeat=args.repeat, warmup=1))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Latency/throughput comparison of the sync and async store
+
+A number of concurrent clients issue availability requests (table
+reservations of a day plus the free tables of the restaurant) against a
+file-based SQLite database. The sync path uses one thread per client, the
+async path one asyncio task per client on a single thread.
+
+usage: python -m restaurant_app.benchmark.async_vs_sync [--clients 1 8 32] [--requests 50]
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from ..store.aio.database import AsyncSqlAlchemyDatabase
+from ..store.aio.reservation_repo import AsyncReservationRepository
+from ..store.aio.table_repository import AsyncTableRepository
+from ..store.database import SqlAlchemyDatabase
+from ..store.entities import ReservationEntity, TableEntity
+from ..store.repository_test_helpers import create_restaurant_data
+from ..store.reservation_repo import ReservationRepository
+from ..store.table_repository import TableRepository
+
+DATE = datetime.date(2024, 9, 10)
+SLOT = (datetime.time(19, 0), datetime.time(21, 0))
+
+
+def populate(db_url: str, tables: int = 20) -> Tuple[int, List[int]]:
+    db = SqlAlchemyDatabase(db_url)
+    db.create_database()
+    with db.managed_session() as session:
+        restaurant = create_restaurant_data()
+        session.add(restaurant)
+        entities = [TableEntity(table_number="T%d" % i, seats=2 + i % 6, restaurant=restaurant) for i in range(tables)]
+        session.add_all(entities)
+        for i, table in enumerate(entities):
+            reservation = ReservationEntity(
+                reservation_date=DATE,
+                time_from=datetime.time(12 + i % 8, 0),
+                time_until=datetime.time(13 + i % 8, 30),
+                people=2,
+                reservation_name="Guest",
+                reservation_number="%d" % i,
+            )
+            reservation.tables.append(table)
+            session.add(reservation)
+        session.commit()
+        ids = (restaurant.id, [t.id for t in entities])
+    db.engine.dispose()
+    return ids
+
+
+def report(name: str, clients: int, latencies: List[float], elapsed: float) -> None:
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        "%-5s clients: %3d | %8.1f req/s | median: %7.3f ms | p95: %7.3f ms"
+        % (name, clients, len(latencies) / elapsed, statistics.median(ordered), p95)
+    )
+
+
+def run_sync(db_url: str, restaurant_id: int, table_ids: List[int], clients: int, requests: int) -> None:
+    db = SqlAlchemyDatabase(db_url)
+    reservations = ReservationRepository(db.managed_session)
+    tables = TableRepository(db.managed_session)
+
+    def client(number: int) -> List[float]:
+        latencies = []
+        for i in range(requests):
+            start = time.perf_counter()
+            reservations.get_table_reservations_for_date(DATE, table_ids[(number + i) % len(table_ids)])
+            tables.get_free_tables(restaurant_id, DATE, SLOT[0], SLOT[1], 2)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = list(executor.map(client, range(clients)))
+    elapsed = time.perf_counter() - start
+    db.engine.dispose()
+    report("sync", clients, [latency for result in results for latency in result], elapsed)
+
+
+async def run_async(db_url: str, restaurant_id: int, table_ids: List[int], clients: int, requests: int) -> None:
+    db = AsyncSqlAlchemyDatabase(db_url.replace("sqlite://", "sqlite+aiosqlite://"))
+    reservations = AsyncReservationRepository(db.managed_session)
+    tables = AsyncTableRepository(db.managed_session)
+
+    async def client(number: int) -> List[float]:
+        latencies = []
+        for i in range(requests):
+            start = time.perf_counter()
+            await reservations.get_table_reservations_for_date(DATE, table_ids[(number + i) % len(table_ids)])
+            await tables.get_free_tables(restaurant_id, DATE, SLOT[0], SLOT[1], 2)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+        return latencies
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[client(number) for number in range(clients)])
+    elapsed = time.perf_counter() - start
+    await db.dispose()
+    report("async", clients, [latency for result in results for latency in result], elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_url = "sqlite:///%s" % os.path.join(directory, "benchmark.db")
+        restaurant_id, table_ids = populate(db_url)
+        for clients in args.clients:
+            run_sync(db_url, restaurant_id, table_ids, clients, args.requests)
+            asyncio.run(run_async(db_url, restaurant_id, table_ids, clients, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark of the streaming bulk import
+
+A JSON-lines file with restaurants and their menus and tables is generated and imported with the
+BulkImporter into an empty in-memory SQLite database, a second import of the same file updates every
+entry. Reported are the rows per second and, in a separate run as tracing slows down the import, the peak
+of the memory allocated by Python (tracemalloc) for two sizes of the file: with a constant chunk size the
+peak should not grow with the number of rows.
+As reference the first rows are imported entity by entity with the save methods of the repositories.
+
+usage: python -m restaurant_app.benchmark.bulk_import [--restaurants 2000] [--chunk-size 1000]
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from itertools import islice
+from typing import Any, Dict, Iterator
+
+from ..store.bulk_import import (
+    BulkImporter,
+    ImportConfig,
+    ImportReport,
+    MenuRecord,
+    RestaurantRecord,
+    parse_record,
+    read_jsonl,
+)
+from ..store.database import SqlAlchemyDatabase
+from ..store.entities import AddressEntity, MenuEntity, RestaurantEntity, TableEntity
+from ..store.menu_repository import MenuRepository
+from ..store.restaurant_repository import RestaurantRepository
+from ..store.table_repository import TableRepository
+from .data_generator import CATEGORIES
+
+MENUS = 20
+TABLES = 10
+
+
+def source_rows(restaurants: int, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    """a restaurant row followed by the rows of its menus and tables"""
+    rng = random.Random(seed)
+    for r in range(restaurants):
+        restaurant = {
+            "restaurant": "Restaurant %d" % r,
+            "street": "Street %d" % (r // 4),
+            "city": "City %d" % (r % 50),
+            "zip": "%04d" % (1000 + r // 4),
+            "country": "AT",
+        }
+        yield {"kind": "restaurant", **restaurant, "open_from": "10:00", "open_until": "22:00", "open_days": "MONDAY"}
+        for m in range(MENUS):
+            category = rng.choice(CATEGORIES)
+            price = round(rng.uniform(4.0, 40.0), 2)
+            yield {"kind": "menu", **restaurant, "name": "Menu %d" % m, "category": category, "price": price}
+        for t in range(TABLES):
+            yield {"kind": "table", **restaurant, "table_number": "T%d" % t, "seats": rng.choice([2, 4, 6])}
+
+
+def write_file(path: str, restaurants: int) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8") as file:
+        for row in source_rows(restaurants):
+            file.write(json.dumps(row) + "\n")
+            count += 1
+    return count
+
+
+def traced(action) -> tuple:
+    """the result of the action and the peak of the allocated memory in MB"""
+    tracemalloc.start()
+    try:
+        result = action()
+        return result, tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def import_per_entity(db: SqlAlchemyDatabase, path: str, rows: int) -> float:
+    """the reference: every row is written with the save method of its repository, rows per second"""
+    restaurants = RestaurantRepository(db.managed_session)
+    menus = MenuRepository(db.managed_session)
+    tables = TableRepository(db.managed_session)
+    records = [parse_record(row, values) for row, values in enumerate(islice(read_jsonl(path), rows), start=1)]
+    start = time.perf_counter()
+
+    def action(session):
+        current = None
+        for record in records:
+            if isinstance(record, RestaurantRecord):
+                zip, street, city, country = record.address
+                current = restaurants.new_session(session).save(
+                    RestaurantEntity(
+                        name=record.name,
+                        open_from=record.open_from,
+                        open_until=record.open_until,
+                        open_days=record.open_days,
+                        address=AddressEntity(zip=zip, street=street, city=city, country=country),
+                    )
+                )
+            elif isinstance(record, MenuRecord):
+                menus.new_session(session).save(
+                    MenuEntity(name=record.name, category=record.category, price=record.price, restaurant=current)
+                )
+            else:
+                tables.new_session(session).save(
+                    TableEntity(table_number=record.table_number, seats=record.seats, restaurant=current)
+                )
+        return []
+
+    restaurants.unit_of_work(action)
+    return len(records) / (time.perf_counter() - start)
+
+
+def describe(name: str, report: ImportReport) -> str:
+    return "%-28s %8d rows %7.1f s %9.0f rows/s, inserted %d, updated %d" % (
+        name,
+        report.rows,
+        report.duration_s,
+        report.rows_per_second,
+        sum(report.inserted.values()),
+        sum(report.updated.values()),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--restaurants", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=ImportConfig.chunk_size)
+    parser.add_argument("--reference-rows", type=int, default=3100)
+    args = parser.parse_args()
+
+    config = ImportConfig(chunk_size=args.chunk_size)
+    with tempfile.TemporaryDirectory() as directory:
+        for restaurants in (args.restaurants // 10, args.restaurants):
+            path = os.path.join(directory, "import-%d.jsonl" % restaurants)
+            rows = write_file(path, restaurants)
+            db = SqlAlchemyDatabase("sqlite://")
+            db.create_database()
+            importer = BulkImporter(db.managed_session, config)
+            print("%d rows, %d restaurants" % (rows, restaurants))
+            print(describe("bulk insert", importer.import_file(path)))
+            print(describe("bulk update", importer.import_file(path)))
+            report, peak = traced(lambda: importer.import_file(path))
+            print("%-28s %8d rows, peak %.1f MB" % ("memory (traced update)", report.rows, peak))
+
+        db = SqlAlchemyDatabase("sqlite://")
+        db.create_database()
+        rate = import_per_entity(db, path, args.reference_rows)
+        print("%-28s %8d rows %17.0f rows/s" % ("per entity (repositories)", args.reference_rows, rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark of the engine configuration under threaded load
+
+Several threads book reservations (one transaction each) and look up the
+reservations of a table/day on a file-based SQLite database. The SQLite
+defaults (rollback journal, synchronous=FULL) are compared with the tuned
+EngineConfig (WAL, synchronous=NORMAL, mmap and cache size).
+
+usage: python -m restaurant_app.benchmark.concurrent_throughput [--threads 8] [--operations 200]
+"""
+
+import argparse
+import datetime
+import os
+import tempfile
+import threading
+import time
+from typing import List
+
+from ..store.database import EngineConfig, SqlAlchemyDatabase
+from ..store.entities import ReservationEntity, TableEntity
+from ..store.repository_test_helpers import create_restaurant_data
+from ..store.reservation_repo import ReservationRepository
+
+CONFIGS = {
+    "sqlite-defaults": EngineConfig(
+        sqlite_journal_mode=None,
+        sqlite_synchronous=None,
+        sqlite_mmap_size=None,
+        sqlite_cache_size=None,
+    ),
+    "tuned": EngineConfig(),
+}
+
+DATE = datetime.date(2024, 9, 10)
+
+
+def worker(db: SqlAlchemyDatabase, table_id: int, thread: int, operations: int, write_ratio: float, errors: List):
+    repo = ReservationRepository(db.managed_session)
+    writes = int(operations * write_ratio)
+    for i in range(operations):
+        try:
+            if i < writes:
+
+                def book(session):
+                    reservation = ReservationEntity(
+                        reservation_date=DATE,
+                        time_from=datetime.time(12, 0),
+                        time_until=datetime.time(13, 0),
+                        people=2,
+                        reservation_name="Guest",
+                        reservation_number="%d-%d" % (thread, i),
+                    )
+                    reservation.tables.append(session.get(TableEntity, table_id))
+                    repo.new_session(session).save(reservation)
+
+                repo.unit_of_work(book)
+            else:
+                repo.get_table_reservations_for_date(DATE, table_id)
+        except Exception as error:
+            errors.append(error)
+
+
+def run(name: str, config: EngineConfig, threads: int, operations: int, write_ratio: float) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        db = SqlAlchemyDatabase("sqlite:///%s" % os.path.join(directory, "benchmark.db"), engine_config=config)
+        db.create_database()
+        with db.managed_session() as session:
+            table = TableEntity(table_number="T1", seats=4, restaurant=create_restaurant_data())
+            session.add(table)
+            session.commit()
+            table_id = table.id
+
+        errors: List[Exception] = []
+        workers = [
+            threading.Thread(target=worker, args=(db, table_id, t, operations, write_ratio, errors))
+            for t in range(threads)
+        ]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+        db.engine.dispose()
+
+    total = threads * operations
+    print(
+        "%-16s threads: %2d | operations: %6d | %8.1f ops/s | errors: %d"
+        % (name, threads, total, total / elapsed, len(errors))
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--operations", type=int, default=200, help="operations per thread")
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+    for threads in args.threads:
+        for name, config in CONFIGS.items():
+            run(name, config, threads, args.operations, args.write_ratio)
+
+
+if __name__ == "__main__":
+    main()
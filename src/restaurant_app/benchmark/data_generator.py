@@ -0,0 +1,151 @@
+"""
+Seeded generator of synthetic restaurant data for the benchmarks
+
+The same DatasetSpec (including the seed) always produces the same rows, so results of
+different runs and machines are comparable. The rows are written with bulk INSERTs.
+"""
+
+import datetime
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from sqlalchemy import insert
+
+from ..store.database import SqlAlchemyDatabase
+from ..store.entities import (
+    AddressEntity,
+    MenuEntity,
+    ReservationEntity,
+    RestaurantEntity,
+    TableEntity,
+    relation_table_reservation,
+)
+
+CITIES = ["Salzburg", "Wien", "Graz", "Linz", "Innsbruck", "Klagenfurt"]
+CATEGORIES = ["Starter", "Soup", "Main", "Vegetarian", "Dessert", "Drinks"]
+# reservations start at one of these hours and last between 1 and 3 hours
+SLOT_HOURS = [11, 12, 13, 17, 18, 19, 20]
+# a fixed timestamp for the created column, the data does not depend on the time of the run
+CREATED = datetime.datetime(2024, 1, 1)
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    restaurants: int = 50
+    menus_per_restaurant: int = 100
+    tables_per_restaurant: int = 20
+    days: int = 60
+    # upper bound, the generator books up to this many non-overlapping reservations per table and day
+    reservations_per_table_and_day: int = 3
+    start_date: datetime.date = datetime.date(2024, 1, 1)
+    seed: int = 42
+
+
+@dataclass
+class Dataset:
+    """the ids of the generated data, used by the scenarios to pick their parameters"""
+
+    spec: DatasetSpec
+    restaurant_ids: List[int] = field(default_factory=list)
+    table_ids: Dict[int, List[int]] = field(default_factory=dict)
+    reservations: int = 0
+
+    @property
+    def dates(self) -> List[datetime.date]:
+        return [self.spec.start_date + datetime.timedelta(days=day) for day in range(self.spec.days)]
+
+
+def generate(db: SqlAlchemyDatabase, spec: DatasetSpec) -> Dataset:
+    rng = random.Random(spec.seed)
+    dataset = Dataset(spec=spec)
+    addresses, restaurants, menus, tables = [], [], [], []
+    table_id = 0
+    for r in range(1, spec.restaurants + 1):
+        addresses.append(
+            {
+                "id": r,
+                "created": CREATED,
+                "street": "Street %d" % rng.randint(1, 200),
+                "city": rng.choice(CITIES),
+                "zip": "%04d" % rng.randint(1000, 9999),
+                "country": "AT",
+            }
+        )
+        restaurants.append(
+            {
+                "id": r,
+                "created": CREATED,
+                "name": "Restaurant %d" % r,
+                "open_from": datetime.time(rng.choice([10, 11]), 0),
+                "open_until": datetime.time(rng.choice([22, 23]), 0),
+                "open_days": "MONDAY;TUESDAY;WEDNESDAY;THURSDAY;FRIDAY;SATURDAY",
+                "address_id": r,
+            }
+        )
+        menus.extend(
+            {
+                "created": CREATED,
+                "name": "Menu %d" % m,
+                "category": rng.choice(CATEGORIES),
+                "price": round(rng.uniform(4.0, 40.0), 2),
+                "restaurant_id": r,
+            }
+            for m in range(spec.menus_per_restaurant)
+        )
+        dataset.restaurant_ids.append(r)
+        dataset.table_ids[r] = []
+        for t in range(spec.tables_per_restaurant):
+            table_id += 1
+            tables.append(
+                {
+                    "id": table_id,
+                    "created": CREATED,
+                    "table_number": "T%d" % t,
+                    "seats": rng.choice([2, 2, 4, 4, 4, 6, 8]),
+                    "restaurant_id": r,
+                }
+            )
+            dataset.table_ids[r].append(table_id)
+
+    reservations, relations = [], []
+    for date in dataset.dates:
+        day = datetime.datetime.combine(date, datetime.time.min)
+        for table_ids in dataset.table_ids.values():
+            for table_id in table_ids:
+                busy_until = 0
+                for _ in range(rng.randint(0, spec.reservations_per_table_and_day)):
+                    hour = rng.choice([h for h in SLOT_HOURS if h >= busy_until] or [0])
+                    if hour == 0:
+                        break
+                    busy_until = hour + rng.randint(1, 3)
+                    number = len(reservations) + 1
+                    reservations.append(
+                        {
+                            "id": number,
+                            "created": CREATED,
+                            "reservation_date": day,
+                            "time_from": datetime.time(hour, 0),
+                            "time_until": datetime.time(min(busy_until, 23), 0),
+                            "people": rng.randint(1, 6),
+                            "reservation_name": "Guest %d" % rng.randint(1, 10000),
+                            "reservation_number": "G%09d" % number,
+                        }
+                    )
+                    relations.append({"table_id": table_id, "reservation_id": number})
+    dataset.reservations = len(reservations)
+
+    with db.managed_session() as session:
+        for entity, rows in (
+            (AddressEntity, addresses),
+            (RestaurantEntity, restaurants),
+            (MenuEntity, menus),
+            (TableEntity, tables),
+            (ReservationEntity, reservations),
+        ):
+            if rows:
+                session.execute(insert(entity), rows)
+        if relations:
+            session.execute(insert(relation_table_reservation), relations)
+        session.commit()
+    return dataset
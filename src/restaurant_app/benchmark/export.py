@@ -0,0 +1,100 @@
+"""
+Benchmark of the streaming export
+
+The reservations (one restaurant, one table per reservation) and the menus are exported to CSV,
+JSON-lines and the columnar format. Measured are the rows per second, the size of the file and,
+in a separate run as tracing slows down the execution, the peak of the memory allocated by Python
+(tracemalloc). Two sizes are exported: with a constant chunk size the peak should not grow with
+the number of rows. As reference the reservations are loaded with get_reservation_for_restaurant
+(all entities in one list) and written as CSV.
+
+usage: python -m restaurant_app.benchmark.export [--rows 100000] [--chunk-size 5000]
+"""
+
+import argparse
+import csv
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Tuple
+
+from ..store.database import SqlAlchemyDatabase
+from ..store.export import DEFAULT_EXPORT_CHUNK_SIZE, ExportRepository
+from ..store.reservation_repo import ReservationRepository
+from .read_models import populate_reservations
+from .restaurant_loading import populate
+
+
+def export_entities(db: SqlAlchemyDatabase, path: str, restaurant_id: int) -> int:
+    """the reference: the entities of the reservations loaded into a list and written as CSV"""
+    reservations = ReservationRepository(db.managed_session).get_reservation_for_restaurant(restaurant_id)
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        for r in reservations:
+            writer.writerow(
+                [
+                    r.id,
+                    r.reservation_number,
+                    r.reservation_date.isoformat(),
+                    r.time_from.isoformat(),
+                    r.time_until.isoformat(),
+                    r.people,
+                    r.reservation_name,
+                    ";".join(table.table_number for table in r.tables),
+                ]
+            )
+    return len(reservations)
+
+
+def run(action: Callable[[], int]) -> Tuple[int, float, float]:
+    """returns the number of rows, the rows per second and the peak of allocated memory in MiB"""
+    gc.collect()
+    start = time.perf_counter()
+    rows = action()
+    duration = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    action()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rows, rows / duration, peak / (1024 * 1024)
+
+
+def report(name: str, path: str, action: Callable[[], int]) -> None:
+    rows, rate, peak = run(action)
+    print("%-24s %8d rows | %9.0f rows/s | %8.1f MiB file | %6.1f MiB peak" % (name, rows, rate, _mib(path), peak))
+
+
+def _mib(path: str) -> float:
+    return os.path.getsize(path) / (1024 * 1024)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_EXPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in (args.rows // 10, args.rows):
+            db = SqlAlchemyDatabase("sqlite://")
+            db.create_database()
+            populate(db, 1, rows, 100)
+            populate_reservations(db, rows)
+            repo = ExportRepository(db.managed_session, chunk_size=args.chunk_size)
+            print("rows: %d" % rows)
+            for format in ("csv", "jsonl", "rcol"):
+                path = os.path.join(directory, "reservations.%s" % format)
+                report("reservations " + format, path, lambda: repo.export_reservations(path, 1).rows)
+            for format in ("csv", "rcol"):
+                path = os.path.join(directory, "menus.%s" % format)
+                report("menus " + format, path, lambda: repo.export_menus(path, 1).rows)
+            path = os.path.join(directory, "entities.csv")
+            report("reservations entities", path, lambda: export_entities(db, path, 1))
+
+
+if __name__ == "__main__":
+    main()
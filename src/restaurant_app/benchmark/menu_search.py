@@ -0,0 +1,99 @@
+"""
+Benchmark of the menu search
+
+The menus get names combined from a small vocabulary, so the search terms match a realistic share
+of the rows. Measured are the FTS5 search of MenuRepository.search_menus (prefix, several words,
+filtered by restaurant) and, as reference, the substring search without the full-text index
+(LIKE '%term%', a full scan) and the indexed exact lookup get_menu_by_name.
+
+usage: python -m restaurant_app.benchmark.menu_search [--menus 1000000] [--restaurants 1000]
+"""
+
+import argparse
+import random
+import time
+
+from sqlalchemy import insert
+
+from ..store.database import SqlAlchemyDatabase
+from ..store.entities import MenuEntity
+from ..store.menu_repository import MenuRepository
+from ..store.menu_search import menu_like_statement, search_tokens
+from .data_generator import CATEGORIES, CREATED, DatasetSpec, generate
+from .timing import measure, summary
+
+ADJECTIVES = ["Crispy", "Spicy", "Grilled", "Roasted", "Homemade", "Smoked", "Fresh", "Baked", "Creamy", "Wild"]
+DISHES = [
+    "Pizza",
+    "Pasta",
+    "Burger",
+    "Schnitzel",
+    "Salad",
+    "Risotto",
+    "Curry",
+    "Goulash",
+    "Strudel",
+    "Dumplings",
+    "Soup",
+    "Steak",
+]
+SIDES = ["Margherita", "Funghi", "Potatoes", "Rice", "Vegetables", "Cheese", "Mushrooms", "Chicken", "Tomato"]
+CHUNK = 50_000
+
+
+def populate(db: SqlAlchemyDatabase, restaurants: int, menus: int, seed: int = 42) -> None:
+    generate(db, DatasetSpec(restaurants=restaurants, menus_per_restaurant=0, tables_per_restaurant=0, days=0))
+    rng = random.Random(seed)
+    with db.managed_session() as session:
+        for start in range(0, menus, CHUNK):
+            rows = [
+                {
+                    "created": CREATED,
+                    "name": "%s %s with %s %d"
+                    % (rng.choice(ADJECTIVES), rng.choice(DISHES), rng.choice(SIDES), rng.randint(1, 1000)),
+                    "category": rng.choice(CATEGORIES),
+                    "price": round(rng.uniform(4.0, 40.0), 2),
+                    "restaurant_id": 1 + m % restaurants,
+                }
+                for m in range(start, min(start + CHUNK, menus))
+            ]
+            session.execute(insert(MenuEntity), rows)
+        session.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--menus", type=int, default=1_000_000)
+    parser.add_argument("--restaurants", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    db = SqlAlchemyDatabase("sqlite://")
+    db.create_database()
+    start = time.perf_counter()
+    populate(db, args.restaurants, args.menus)
+    print("%d menus written (incl. full-text index) in %.1f s" % (args.menus, time.perf_counter() - start))
+
+    menus = MenuRepository(db.managed_session)
+    rng = random.Random(7)
+
+    def like(query: str, restaurant_id: int = None):
+        with db.managed_session() as session:
+            return session.execute(menu_like_statement(search_tokens(query), restaurant_id, 20)).all()
+
+    scenarios = {
+        "fts prefix 'schn'": lambda: menus.search_menus("schn"),
+        "fts prefix 'gri pot'": lambda: menus.search_menus("gri pot"),
+        "fts rare 'strudel 999'": lambda: menus.search_menus("strudel 999", prefix=False),
+        "fts restaurant 'pizza'": lambda: menus.search_menus("pizza", restaurant_id=rng.randint(1, args.restaurants)),
+        "like substring 'schn'": lambda: like("schn"),
+        "like rare 'strudel 999'": lambda: like("strudel with 999"),
+        "like restaurant 'pizza'": lambda: like("pizza", rng.randint(1, args.restaurants)),
+        "exact get_menu_by_name": lambda: menus.get_menu_by_name("Fresh Pizza with Rice 1", 1),
+    }
+    for name, scenario in scenarios.items():
+        print("%-26s %s" % (name, summary(measure(scenario, repeat=args.repeat))))
+
+
+if __name__ == "__main__":
+    main()
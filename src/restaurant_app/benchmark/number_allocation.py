@@ -0,0 +1,137 @@
+"""
+Contention benchmark of the reservation-number allocation
+
+Several workers (threads or processes) book reservations on a file-based SQLite database.
+The check-then-insert approach draws a random number, checks it with is_reservation_number_in_use
+and saves the reservation; two workers can pick the same number between check and insert, the
+unique constraint then rejects the booking and it is retried; if the other booking is already
+committed, save finds it by its number and overwrites it (counted as overwritten). The ReservationNumberAllocator
+reserves blocks of numbers from the NUMBER_SEQUENCE table and needs no lookup per number.
+
+usage: python -m restaurant_app.benchmark.number_allocation [--workers 8] [--bookings 200] [--space 2000]
+"""
+
+import argparse
+import datetime
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from ..infrastructure.logger import LOG
+from ..store.database import SqlAlchemyDatabase
+from ..store.entities import ReservationEntity
+from ..store.reservation_numbers import ReservationNumberAllocator
+from ..store.reservation_repo import ReservationRepository
+
+
+def reservation(number: Optional[str]) -> ReservationEntity:
+    return ReservationEntity(
+        reservation_date=datetime.datetime(2024, 9, 10),
+        time_from=datetime.time(12, 0),
+        time_until=datetime.time(13, 0),
+        people=2,
+        reservation_name="Guest",
+        reservation_number=number,
+    )
+
+
+def book(
+    db: SqlAlchemyDatabase, allocator: Optional[ReservationNumberAllocator], bookings: int, space: int
+) -> Tuple[List[str], int]:
+    """book the reservations, returns the booked numbers and the number of rejected bookings"""
+    repo = ReservationRepository(db.managed_session, number_allocator=allocator)
+    numbers: List[str] = []
+    rejected = 0
+    while len(numbers) < bookings:
+        if allocator is None:
+            number = str(random.randrange(space))
+            if repo.is_reservation_number_in_use(number):
+                continue
+        else:
+            number = None
+        try:
+            saved = repo.unit_of_work(
+                lambda session: [repo.new_session(session).save(reservation(number)).reservation_number]
+            )
+            numbers.append(saved[0])
+        except IntegrityError:
+            rejected += 1
+    return numbers, rejected
+
+
+def process_worker(args: Tuple[str, int, int, int]) -> Tuple[List[str], int]:
+    url, block_size, bookings, space = args
+    db = SqlAlchemyDatabase(url)
+    allocator = ReservationNumberAllocator(db.engine, block_size=block_size) if block_size > 0 else None
+    return book(db, allocator, bookings, space)
+
+
+def run_threads(url: str, block_size: int, workers: int, bookings: int, space: int) -> List[Tuple[List[str], int]]:
+    db = SqlAlchemyDatabase(url)
+    # one allocator shared by all threads of the process
+    allocator = ReservationNumberAllocator(db.engine, block_size=block_size) if block_size > 0 else None
+    results: List[Tuple[List[str], int]] = []
+
+    def thread_worker():
+        result = book(db, allocator, bookings, space)
+        results.append(result)
+
+    threads = [threading.Thread(target=thread_worker) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def run_processes(url: str, block_size: int, workers: int, bookings: int, space: int) -> List[Tuple[List[str], int]]:
+    with multiprocessing.Pool(workers) as pool:
+        return pool.map(process_worker, [(url, block_size, bookings, space)] * workers)
+
+
+def run(name: str, mode: str, block_size: int, workers: int, bookings: int, space: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        url = "sqlite:///%s" % os.path.join(directory, "benchmark.db")
+        SqlAlchemyDatabase(url).create_database()
+        start = time.perf_counter()
+        if mode == "threads":
+            results = run_threads(url, block_size, workers, bookings, space)
+        else:
+            results = run_processes(url, block_size, workers, bookings, space)
+        duration = time.perf_counter() - start
+
+    numbers = [number for booked, _ in results for number in booked]
+    rejected = sum(rejected for _, rejected in results)
+    overwritten = len(numbers) - len(set(numbers))
+    print(
+        "%-22s %-9s %7.0f bookings/s | %6d bookings | %5d rejected | %5d overwritten"
+        % (name, mode, len(numbers) / duration, len(numbers), rejected, overwritten)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--bookings", type=int, default=200, help="bookings per worker")
+    parser.add_argument(
+        "--space", type=int, default=2000, help="the range of the random numbers of the check-then-insert approach"
+    )
+    args = parser.parse_args()
+    # the rejected bookings of check-then-insert are expected, the rollbacks are not logged
+    LOG.disabled = True
+
+    print("workers: %d, bookings per worker: %d" % (args.workers, args.bookings))
+    for mode in ("threads", "processes"):
+        run("check-then-insert", mode, 0, args.workers, args.bookings, args.space)
+        for block_size in (1, 10, 100):
+            run("allocator block=%d" % block_size, mode, block_size, args.workers, args.bookings, args.space)
+
+
+if __name__ == "__main__":
+    main()
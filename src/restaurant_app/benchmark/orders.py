@@ -0,0 +1,147 @@
+"""
+Benchmark of the OrderRepository at the order volume of a restaurant service
+
+A restaurant with its menus and tables (see data_generator) is written to an in-memory SQLite database
+and orders with 3 to 6 lines are created for every day of the range. The creation of the orders of one
+day is measured with OrderRepository.create_orders (one INSERT for the orders, one for the lines, the
+totals computed by the database) and, as reference, order by order with the entities (the menus loaded
+for the total, a flush per order). Both are rolled back after every run. The revenue per table, waiter
+and day is measured with the GROUP BY queries and with a loop over the loaded order entities.
+
+usage: python -m restaurant_app.benchmark.orders [--days 30] [--orders-per-day 400] [--tables 50] [--repeat 5]
+"""
+
+import argparse
+import datetime
+import random
+from collections import defaultdict
+from typing import List
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import joinedload
+
+from ..store.database import SqlAlchemyDatabase
+from ..store.entities import MenuEntity, OrderEntity, TableEntity, relation_menu_order
+from ..store.order_repository import NewOrder, OrderLine, OrderRepository
+from .data_generator import DatasetSpec, generate
+from .timing import measure, summary
+
+WAITERS = ["Anna", "Ben", "Clara", "David", "Eva"]
+
+
+def generate_orders(
+    table_ids: List[int], menu_ids: List[int], day: datetime.date, count: int, rng: random.Random
+) -> List[NewOrder]:
+    return [
+        NewOrder(
+            table_id=rng.choice(table_ids),
+            waiter=rng.choice(WAITERS),
+            lines=[OrderLine(menu_id, rng.randint(1, 3)) for menu_id in rng.sample(menu_ids, rng.randint(3, 6))],
+            created=datetime.datetime.combine(day, datetime.time(rng.randint(11, 22), rng.randint(0, 59))),
+        )
+        for _ in range(count)
+    ]
+
+
+def create_with_repository(db: SqlAlchemyDatabase, orders: List[NewOrder]) -> None:
+    with db.managed_session() as session:
+        OrderRepository(None).new_session(session).create_orders(orders)
+        session.rollback()
+
+
+def create_with_entities(db: SqlAlchemyDatabase, orders: List[NewOrder]) -> None:
+    """
+    the reference: an order entity per order, the total computed from the loaded menus and the lines
+    inserted per order (OrderEntity.menus is read-only)
+    """
+    with db.managed_session() as session:
+        for order in orders:
+            menus = [session.get(MenuEntity, line.menu_id) for line in order.lines]
+            entity = OrderEntity(
+                total=sum(menu.price * line.quantity for menu, line in zip(menus, order.lines)),
+                waiter=order.waiter,
+                table=session.get(TableEntity, order.table_id),
+            )
+            entity.created = order.created
+            session.add(entity)
+            session.flush()
+            session.execute(
+                insert(relation_menu_order),
+                [
+                    {"order_id": entity.id, "menu_id": menu.id, "quantity": line.quantity, "unit_price": menu.price}
+                    for menu, line in zip(menus, order.lines)
+                ],
+            )
+        session.rollback()
+
+
+def revenue_with_entities(db: SqlAlchemyDatabase, restaurant_id: int) -> tuple:
+    """the reference: revenue per table, waiter and day from the loaded order entities"""
+    per_table, per_waiter, per_day = defaultdict(float), defaultdict(float), defaultdict(float)
+    with db.managed_session() as session:
+        orders = session.scalars(
+            select(OrderEntity)
+            .join(TableEntity)
+            .where(TableEntity.restaurant_id == restaurant_id)
+            .options(joinedload(OrderEntity.table))
+        ).all()
+        for order in orders:
+            per_table[order.table.id] += order.total
+            per_waiter[order.waiter] += order.total
+            per_day[order.created.date()] += order.total
+    return per_table, per_waiter, per_day
+
+
+def revenue_with_repository(repo: OrderRepository, restaurant_id: int, date_from, date_until) -> tuple:
+    return (
+        repo.get_revenue_per_table(restaurant_id, date_from, date_until),
+        repo.get_revenue_per_waiter(restaurant_id, date_from, date_until),
+        repo.get_revenue_per_day(restaurant_id, date_from, date_until),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--orders-per-day", type=int, default=400)
+    parser.add_argument("--tables", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    db = SqlAlchemyDatabase("sqlite://")
+    db.create_database()
+    spec = DatasetSpec(
+        restaurants=1,
+        menus_per_restaurant=40,
+        tables_per_restaurant=args.tables,
+        days=1,
+        reservations_per_table_and_day=0,
+    )
+    dataset = generate(db, spec)
+    restaurant_id = dataset.restaurant_ids[0]
+    table_ids = dataset.table_ids[restaurant_id]
+    with db.managed_session() as session:
+        menu_ids = list(session.scalars(select(MenuEntity.id).where(MenuEntity.restaurant_id == restaurant_id)))
+
+    rng = random.Random(spec.seed)
+    dates = [spec.start_date + datetime.timedelta(days=day) for day in range(args.days)]
+    repo = OrderRepository(db.managed_session)
+    orders = [
+        order for date in dates for order in generate_orders(table_ids, menu_ids, date, args.orders_per_day, rng)
+    ]
+    repo.unit_of_work(lambda session: repo.new_session(session).create_orders(orders))
+    print("%d tables, %d menus, %d orders in %d days" % (len(table_ids), len(menu_ids), len(orders), args.days))
+
+    day = generate_orders(table_ids, menu_ids, dates[-1], args.orders_per_day, rng)
+    scenarios = {
+        "create day, repository": lambda: create_with_repository(db, day),
+        "create day, entities": lambda: create_with_entities(db, day),
+        "revenue, group by": lambda: revenue_with_repository(repo, restaurant_id, dates[0], dates[-1]),
+        "revenue, entities": lambda: revenue_with_entities(db, restaurant_id),
+    }
+    for name, scenario in scenarios.items():
+        print("%-24s %s" % (name, summary(measure(scenario, repeat=args.repeat, warmup=1))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark of the read-only views against the entity read paths
+
+The dataset consists of one restaurant with N menus, N tables and N reservations (one table each).
+For every read path the time and the memory allocated while reading are measured; the memory
+is traced with tracemalloc in a separate run, as tracing slows down the execution.
+The numbers are scaled to 100k rows.
+
+usage: python -m restaurant_app.benchmark.read_models [--rows 100000]
+"""
+
+import argparse
+import datetime
+import gc
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+from sqlalchemy import insert, select
+
+from ..store.database import SqlAlchemyDatabase
+from ..store.entities import ReservationEntity, TableEntity, relation_table_reservation
+from ..store.menu_repository import MenuRepository
+from ..store.reservation_repo import ReservationRepository
+from ..store.table_repository import TableRepository
+from .restaurant_loading import populate
+
+
+def populate_reservations(db: SqlAlchemyDatabase, rows: int) -> None:
+    now = datetime.datetime.now()
+    with db.managed_session() as session:
+        session.execute(
+            insert(ReservationEntity),
+            [
+                {
+                    "id": r + 1,
+                    "created": now,
+                    "reservation_date": datetime.datetime(2024, 1, 1) + datetime.timedelta(days=r // 10),
+                    "time_from": datetime.time(12 + r % 10, 0),
+                    "time_until": datetime.time(13 + r % 10, 0),
+                    "people": 2,
+                    "reservation_name": "Guest %d" % r,
+                    "reservation_number": "R%d" % r,
+                }
+                for r in range(rows)
+            ],
+        )
+        table_ids = list(session.scalars(select(TableEntity.id)))
+        session.execute(
+            insert(relation_table_reservation),
+            [{"reservation_id": r + 1, "table_id": table_ids[r % len(table_ids)]} for r in range(rows)],
+        )
+        session.commit()
+
+
+def run(action: Callable[[], List[object]]) -> Tuple[int, float, float]:
+    """returns the number of rows, the duration in ms and the peak of allocated memory in MiB"""
+    gc.collect()
+    start = time.perf_counter()
+    count = len(action())
+    duration = (time.perf_counter() - start) * 1000.0
+
+    gc.collect()
+    tracemalloc.start()
+    action()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, duration, peak / (1024 * 1024)
+
+
+def report(name: str, action: Callable[[], List[object]]) -> None:
+    count, duration, peak = run(action)
+    scale = 100_000 / max(1, count)
+    print(
+        "%-22s %8d rows | %9.1f ms | %8.1f MiB | per 100k rows: %9.1f ms %8.1f MiB"
+        % (name, count, duration, peak, duration * scale, peak * scale)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    db = SqlAlchemyDatabase("sqlite://")
+    db.create_database()
+    populate(db, 1, args.rows, args.rows)
+    populate_reservations(db, args.rows)
+    restaurant_id = 1
+
+    menus = MenuRepository(db.managed_session)
+    tables = TableRepository(db.managed_session)
+    reservations = ReservationRepository(db.managed_session)
+    print("rows: %d" % args.rows)
+    report("menus entities", lambda: menus.get_menu_list(restaurant_id))
+    report("menus views", lambda: menus.get_menu_views(restaurant_id))
+    report("tables entities", lambda: tables.get_tables_for_restaurant(restaurant_id))
+    report("tables views", lambda: tables.get_table_views(restaurant_id))
+    report(
+        "reservations entities",
+        lambda: list(reservations.stream_reservations_for_restaurant(restaurant_id)),
+    )
+    report("reservations views", lambda: reservations.get_reservation_views_for_restaurant(restaurant_id))
+
+
+if __name__ == "__main__":
+    main()
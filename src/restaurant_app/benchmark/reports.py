@@ -0,0 +1,95 @@
+"""
+Benchmark of the parallel report of the restaurants
+
+A seeded dataset (see data_generator) is written to a SQLite file. The report of all restaurants is
+computed serially through the repositories (one restaurant after the other, the reference) and with the
+ReportEngine with an increasing number of worker processes. The speedup is relative to the engine with
+one worker; it depends on the cores of the machine, more workers than cores do not help.
+
+usage: python -m restaurant_app.benchmark.reports [--restaurants 200] [--days 60] [--workers 1,2,4,8]
+"""
+
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+from ..store.database import SqlAlchemyDatabase
+from ..store.menu_repository import MenuRepository
+from ..store.reports import ReportAggregate, ReportEngine, open_days_in_range
+from ..store.reservation_repo import ReservationRepository
+from ..store.restaurant_repository import RestaurantLoad, RestaurantRepository
+from ..store.table_repository import TableRepository
+from .data_generator import DatasetSpec, generate
+
+
+def report_with_repositories(db: SqlAlchemyDatabase, date_from: datetime.date, date_until: datetime.date) -> int:
+    """the reference: the statistics of every restaurant computed from the read methods of the repositories"""
+    restaurants = RestaurantRepository(db.managed_session)
+    menus = MenuRepository(db.managed_session)
+    tables = TableRepository(db.managed_session)
+    reservations = ReservationRepository(db.managed_session)
+    total = ReportAggregate()
+    for restaurant in restaurants.get_all_restaurants(RestaurantLoad.RESTAURANT_ONLY):
+        statistics = ReportAggregate(restaurants=1)
+        days = open_days_in_range(restaurant.open_days, date_from, date_until)
+        open_minutes = _minutes(restaurant.open_from, restaurant.open_until) * days
+        statistics.capacity_seat_minutes = sum(t.seats for t in tables.get_table_views(restaurant.id)) * open_minutes
+        for view in reservations.get_reservation_views_for_restaurant(restaurant.id):
+            if date_from <= view.reservation_date.date() <= date_until:
+                statistics.reservations += 1
+                statistics.people += view.people
+                statistics.reserved_seat_minutes += view.people * _minutes(view.time_from, view.time_until)
+                statistics.reservations_per_day[view.reservation_date.date()] += 1
+        for menu in menus.get_menu_views(restaurant.id):
+            statistics.menus += 1
+            statistics.price_sum += menu.price
+        total.merge(statistics)
+    return total.reservations
+
+
+def _minutes(time_from: datetime.time, time_until: datetime.time) -> int:
+    return (time_until.hour * 60 + time_until.minute) - (time_from.hour * 60 + time_from.minute)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--restaurants", type=int, default=200)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--workers", default="1,2,4,8", help="comma separated list of the worker counts")
+    args = parser.parse_args()
+
+    spec = DatasetSpec(restaurants=args.restaurants, menus_per_restaurant=50, tables_per_restaurant=20, days=args.days)
+    date_from = spec.start_date
+    date_until = date_from + datetime.timedelta(days=args.days - 1)
+    with tempfile.TemporaryDirectory() as directory:
+        db_url = "sqlite:///%s" % os.path.join(directory, "report.db")
+        db = SqlAlchemyDatabase(db_url)
+        db.create_database()
+        dataset = generate(db, spec)
+        print("%d restaurants, %d reservations, %d cpus" % (args.restaurants, dataset.reservations, os.cpu_count()))
+
+        start = time.perf_counter()
+        report_with_repositories(db, date_from, date_until)
+        print("%-24s %8.2f s" % ("serial repositories", time.perf_counter() - start))
+        db.engine.dispose()
+
+        baseline = None
+        for workers in [int(w) for w in args.workers.split(",")]:
+            report = ReportEngine(db_url, workers=workers).run(date_from, date_until)
+            baseline = baseline or report.duration_s
+            print(
+                "%-24s %8.2f s, speedup %.2fx, %d reservations, utilization %.1f%%"
+                % (
+                    "engine %d worker(s)" % workers,
+                    report.duration_s,
+                    baseline / report.duration_s,
+                    report.total.reservations,
+                    report.total.utilization * 100,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Microbenchmark of session-bound repositories for request-shaped workloads
+
+A request opens one transaction, reads the restaurant, its menu, its tables and the reservations
+of a table and books a reservation. The repositories are bound to the session
+  - per call:        new_session for every repository call
+  - per transaction: new_session once per repository and transaction (the pattern of the tests)
+  - registry:        RepositoryRegistry / RepositorySession, bound lazily and cached for the transaction
+The transactions are rolled back, so every request works on the same data; the modes are measured
+in alternating rounds. The binding alone (without SQL) is measured as well, to show the overhead per
+repository access.
+
+usage: python -m restaurant_app.benchmark.repository_session [--requests 2000]
+"""
+
+import argparse
+import datetime
+import time
+import timeit
+from typing import Callable
+
+from ..store.database import SqlAlchemyDatabase
+from ..store.entities import ReservationEntity, TableEntity
+from ..store.repository_session import RepositoryRegistry, RepositorySession
+from .data_generator import DatasetSpec, generate
+
+DATE = datetime.date(2024, 1, 10)
+
+
+def request(repositories: Callable[[str], object], session, restaurant_id: int, table_id: int, number: int) -> None:
+    repositories("restaurants").get_restaurant_by_id(restaurant_id)
+    repositories("menus").get_menu_list(restaurant_id)
+    repositories("tables").get_tables_for_restaurant(restaurant_id)
+    repositories("reservations").get_table_reservations_for_date(DATE, table_id)
+    reservation = ReservationEntity(
+        reservation_date=datetime.datetime.combine(DATE, datetime.time.min),
+        time_from=datetime.time(15, 0),
+        time_until=datetime.time(16, 0),
+        people=2,
+        reservation_name="Benchmark",
+        reservation_number="S%09d" % number,
+    )
+    reservation.tables.append(session.get(TableEntity, table_id))
+    repositories("reservations").save(reservation)
+
+
+def run(db: SqlAlchemyDatabase, registry: RepositoryRegistry, mode: str, requests: int) -> float:
+    """execute the requests and return the duration in seconds"""
+    start = time.perf_counter()
+    for number in range(requests):
+        with db.managed_session() as session:
+            bound = registry.bind(session)
+            if mode == "per call":
+
+                def repositories(attribute: str):
+                    return getattr(registry, attribute).new_session(session)
+
+            elif mode == "per transaction":
+                per_transaction = {}
+
+                def repositories(attribute: str):
+                    if attribute not in per_transaction:
+                        per_transaction[attribute] = getattr(registry, attribute).new_session(session)
+                    return per_transaction[attribute]
+
+            else:
+
+                def repositories(attribute: str):
+                    return getattr(bound, attribute)
+
+            request(repositories, session, 1 + number % 10, 1 + number % 100, number)
+            session.rollback()
+    return time.perf_counter() - start
+
+
+def binding_overhead(registry: RepositoryRegistry) -> None:
+    with registry.transaction() as bound:
+        session = bound.session
+        cached = RepositorySession(session, registry)
+        cached.reservations
+        count = 200_000
+        new_session = timeit.timeit(lambda: registry.reservations.new_session(session).get_session(), number=count)
+        bound_access = timeit.timeit(lambda: cached.reservations.get_session(), number=count)
+        repository = cached.reservations
+        context_manager = timeit.timeit(lambda: _enter_session(repository), number=count)
+        fast_path = timeit.timeit(lambda: repository.with_session(_no_work), number=count)
+    print(
+        "binding only:    new_session %.0f ns | RepositorySession %.0f ns"
+        % (new_session / count * 1e9, bound_access / count * 1e9)
+    )
+    print(
+        "session access:  with get_session() %.0f ns | with_session %.0f ns"
+        % (context_manager / count * 1e9, fast_path / count * 1e9)
+    )
+
+
+def _enter_session(repository) -> None:
+    with repository.get_session() as session:
+        _no_work(session)
+
+
+def _no_work(session) -> None:
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="requests per mode and round")
+    parser.add_argument("--rounds", type=int, default=4)
+    args = parser.parse_args()
+
+    db = SqlAlchemyDatabase("sqlite://")
+    db.create_database()
+    generate(db, DatasetSpec(restaurants=10, menus_per_restaurant=50, tables_per_restaurant=10, days=30))
+    registry = RepositoryRegistry(db.managed_session)
+
+    modes = ("per call", "per transaction", "registry")
+    durations = {mode: 0.0 for mode in modes}
+    for _ in range(args.rounds):
+        for mode in modes:
+            durations[mode] += run(db, registry, mode, args.requests)
+    for mode in modes:
+        count = args.requests * args.rounds
+        print(
+            "%-16s %8.1f requests/s | %.3f ms per request"
+            % (mode, count / durations[mode], durations[mode] * 1000 / count)
+        )
+    binding_overhead(registry)
+
+
+if __name__ == "__main__":
+    main()
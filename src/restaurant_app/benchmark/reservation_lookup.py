@@ -0,0 +1,134 @@
+"""
+Benchmark of ReservationRepository.get_table_reservations_for_date
+
+The lookup latency should stay flat when the reservation history grows,
+because the half-open date range can be served by IX_RESERVATION_DATE_TIME.
+
+usage: python -m restaurant_app.benchmark.reservation_lookup [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import datetime
+from typing import Callable, List
+
+from sqlalchemy import event, extract, insert
+from sqlalchemy.orm import Session, aliased
+
+from ..store.database import SqlAlchemyDatabase
+from ..store.entities import ReservationEntity, TableEntity, relation_table_reservation
+from ..store.repository_test_helpers import create_restaurant_data
+from ..store.reservation_repo import ReservationRepository
+from .timing import measure, summary
+
+TABLES = 50
+RESERVATIONS_PER_TABLE_AND_DAY = 4
+START_DATE = datetime.date(2020, 1, 1)
+
+
+def populate(db: SqlAlchemyDatabase, size: int) -> List[int]:
+    """create the given number of reservations spread over tables and days"""
+    with db.managed_session() as session:
+        restaurant = create_restaurant_data()
+        session.add(restaurant)
+        tables = [TableEntity(table_number="T%d" % i, seats=4, restaurant=restaurant) for i in range(TABLES)]
+        session.add_all(tables)
+        session.flush()
+        table_ids = [t.id for t in tables]
+
+        now = datetime.datetime.now()
+        reservations = []
+        relations = []
+        for number in range(size):
+            slot = number % RESERVATIONS_PER_TABLE_AND_DAY
+            table_index = (number // RESERVATIONS_PER_TABLE_AND_DAY) % TABLES
+            day = number // (RESERVATIONS_PER_TABLE_AND_DAY * TABLES)
+            reservations.append(
+                {
+                    "id": number + 1,
+                    "created": now,
+                    "reservation_date": datetime.datetime.combine(
+                        START_DATE + datetime.timedelta(days=day), datetime.time.min
+                    ),
+                    "time_from": datetime.time(12 + slot * 2, 0),
+                    "time_until": datetime.time(13 + slot * 2, 30),
+                    "people": 2,
+                    "reservation_name": "Guest %d" % number,
+                    "reservation_number": "%010d" % number,
+                }
+            )
+            relations.append({"table_id": table_ids[table_index], "reservation_id": number + 1})
+        session.execute(insert(ReservationEntity), reservations)
+        session.execute(insert(relation_table_reservation), relations)
+        session.commit()
+    return table_ids
+
+
+def legacy_lookup(session: Session, date: datetime.date, table_id: int) -> List[ReservationEntity]:
+    """the previous implementation, filtering on the extracted date parts"""
+    table_alias = aliased(TableEntity)
+    return (
+        session.query(ReservationEntity)
+        .join(table_alias, ReservationEntity.tables)
+        .where(table_alias.id == table_id)
+        .where(
+            (extract("year", ReservationEntity.reservation_date) == date.year)
+            & (extract("month", ReservationEntity.reservation_date) == date.month)
+            & (extract("day", ReservationEntity.reservation_date) == date.day)
+        )
+        .order_by(ReservationEntity.time_from.asc())
+    ).all()
+
+
+def print_query_plan(db: SqlAlchemyDatabase, action: Callable[[], object]) -> None:
+    """capture the statements issued by the action and print their query-plan"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        action()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+    with db.engine.connect() as conn:
+        for statement, parameters in statements:
+            for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters):
+                print("    plan: %s" % row[-1])
+
+
+def run(size: int, legacy: bool) -> None:
+    db = SqlAlchemyDatabase("sqlite://")
+    db.create_database()
+    table_ids = populate(db, size)
+    repo = ReservationRepository(db.managed_session)
+
+    days = max(1, size // (RESERVATIONS_PER_TABLE_AND_DAY * TABLES))
+    lookup_date = START_DATE + datetime.timedelta(days=days // 2)
+    table_id = table_ids[len(table_ids) // 2]
+
+    found = repo.get_table_reservations_for_date(lookup_date, table_id)
+    print("%9d reservations | found: %d" % (size, len(found)))
+    durations = measure(lambda: repo.get_table_reservations_for_date(lookup_date, table_id))
+    print("    range-query:   %s" % summary(durations))
+
+    if legacy:
+        with db.managed_session() as session:
+            durations = measure(lambda: legacy_lookup(session, lookup_date, table_id), repeat=10)
+            print("    extract-query: %s" % summary(durations))
+
+    print_query_plan(db, lambda: repo.get_table_reservations_for_date(lookup_date, table_id))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy", action="store_true", help="compare with the extract(year/month/day) query")
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.legacy)
+
+
+if __name__ == "__main__":
+    main()
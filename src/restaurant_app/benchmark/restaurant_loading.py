@@ -0,0 +1,114 @@
+"""
+Benchmark of the loading strategies of RestaurantRepository.get_all_restaurants
+
+The dataset consists of N restaurants with M menus and T tables each.
+The joined strategy returns N x M x T rows, selectin N + N x M + N x T rows,
+the restaurant-only strategy and the summary projection N rows.
+
+usage: python -m restaurant_app.benchmark.restaurant_loading [--restaurants 1000 --menus 200 --tables 50]
+"""
+
+import argparse
+import datetime
+import time
+
+from sqlalchemy import insert
+
+from ..store.database import SqlAlchemyDatabase
+from ..store.entities import AddressEntity, MenuEntity, RestaurantEntity, TableEntity
+from ..store.restaurant_repository import RestaurantLoad, RestaurantRepository
+
+
+def populate(db: SqlAlchemyDatabase, restaurants: int, menus: int, tables: int) -> None:
+    now = datetime.datetime.now()
+    with db.managed_session() as session:
+        session.execute(
+            insert(AddressEntity),
+            [
+                {
+                    "id": r + 1,
+                    "created": now,
+                    "street": "Street %d" % r,
+                    "city": "City",
+                    "zip": "5020",
+                    "country": "AT",
+                }
+                for r in range(restaurants)
+            ],
+        )
+        session.execute(
+            insert(RestaurantEntity),
+            [
+                {
+                    "id": r + 1,
+                    "created": now,
+                    "name": "Restaurant %d" % r,
+                    "open_from": datetime.time(10, 0),
+                    "open_until": datetime.time(22, 0),
+                    "open_days": "MONDAY;TUESDAY",
+                    "address_id": r + 1,
+                }
+                for r in range(restaurants)
+            ],
+        )
+        for r in range(restaurants):
+            session.execute(
+                insert(MenuEntity),
+                [
+                    {
+                        "created": now,
+                        "name": "Menu %d" % m,
+                        "category": "C%d" % (m % 10),
+                        "price": 10.0,
+                        "restaurant_id": r + 1,
+                    }
+                    for m in range(menus)
+                ],
+            )
+            session.execute(
+                insert(TableEntity),
+                [
+                    {"created": now, "table_number": "T%d" % t, "seats": 4, "restaurant_id": r + 1}
+                    for t in range(tables)
+                ],
+            )
+        session.commit()
+
+
+def timed(name: str, action) -> None:
+    start = time.perf_counter()
+    result = action()
+    print("%-16s %8.1f ms | %d restaurants" % (name, (time.perf_counter() - start) * 1000.0, len(result)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--restaurants", type=int, default=1000)
+    parser.add_argument("--menus", type=int, default=200)
+    parser.add_argument("--tables", type=int, default=50)
+    parser.add_argument(
+        "--joined-limit",
+        type=int,
+        default=2_000_000,
+        help="skip the joined strategy if it would return more rows than this",
+    )
+    args = parser.parse_args()
+
+    db = SqlAlchemyDatabase("sqlite://")
+    db.create_database()
+    populate(db, args.restaurants, args.menus, args.tables)
+    repo = RestaurantRepository(db.managed_session)
+    print("restaurants: %d, menus: %d, tables: %d" % (args.restaurants, args.menus, args.tables))
+
+    joined_rows = args.restaurants * max(1, args.menus) * max(1, args.tables)
+    if joined_rows <= args.joined_limit:
+        timed("joined", lambda: repo.get_all_restaurants(RestaurantLoad.JOINED))
+    else:
+        print("%-16s skipped, %d rows" % ("joined", joined_rows))
+    timed("selectin", lambda: repo.get_all_restaurants(RestaurantLoad.SELECTIN))
+    timed("restaurant-only", lambda: repo.get_all_restaurants(RestaurantLoad.RESTAURANT_ONLY))
+    timed("summaries", repo.get_restaurant_summaries)
+
+
+if __name__ == "__main__":
+    main()
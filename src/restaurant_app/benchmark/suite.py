@@ -0,0 +1,203 @@
+"""
+Benchmark suite of the repository hot paths
+
+A seeded synthetic dataset (see data_generator) is written to an in-memory SQLite database and every
+scenario is measured with the same sequence of random parameters. The results are written as JSON
+and can be compared with a stored baseline, a scenario whose median is slower than the baseline by
+more than the tolerance is reported as regression (exit code 1). Every scenario is measured in several
+rounds, the comparison uses the best median of the rounds to reduce the noise of other load.
+The stored baseline.json was recorded on a development machine, timings are only comparable on the
+same machine; record a local baseline with --save-baseline first.
+
+usage:
+  python -m restaurant_app.benchmark.suite [--output results.json]
+  python -m restaurant_app.benchmark.suite --baseline restaurant_app/benchmark/baseline.json [--tolerance 0.5]
+  python -m restaurant_app.benchmark.suite --save-baseline restaurant_app/benchmark/baseline.json
+"""
+
+import argparse
+import dataclasses
+import datetime
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+from typing import Any, Callable, Dict, List
+
+import sqlalchemy
+
+from ..store.database import SqlAlchemyDatabase
+from ..store.entities import ReservationEntity, TableEntity
+from ..store.menu_repository import MenuRepository
+from ..store.reservation_repo import ReservationRepository
+from ..store.restaurant_repository import RestaurantRepository
+from ..store.table_repository import TableRepository
+from .data_generator import Dataset, DatasetSpec, generate
+from .timing import measure
+
+Scenario = Callable[[], object]
+
+
+def scenarios(db: SqlAlchemyDatabase, dataset: Dataset, seed: int) -> Dict[str, Scenario]:
+    """the hot paths of the repositories, each scenario draws its parameters from its own seeded sequence"""
+    restaurants = RestaurantRepository(db.managed_session)
+    menus = MenuRepository(db.managed_session)
+    tables = TableRepository(db.managed_session)
+    reservations = ReservationRepository(db.managed_session)
+    rng = random.Random(seed)
+    booked = [0]
+
+    def restaurant_id() -> int:
+        return rng.choice(dataset.restaurant_ids)
+
+    def save_reservation():
+        booked[0] += 1
+
+        def book(session):
+            reservation = ReservationEntity(
+                reservation_date=datetime.datetime.combine(rng.choice(dataset.dates), datetime.time.min),
+                time_from=datetime.time(15, 0),
+                time_until=datetime.time(16, 0),
+                people=2,
+                reservation_name="Benchmark",
+                reservation_number="B%09d" % booked[0],
+            )
+            reservation.tables.append(session.get(TableEntity, rng.choice(dataset.table_ids[restaurant_id()])))
+            return [reservations.new_session(session).save(reservation)]
+
+        return reservations.unit_of_work(book)
+
+    def table_reservations_for_date():
+        table_id = rng.choice(dataset.table_ids[restaurant_id()])
+        return reservations.get_table_reservations_for_date(rng.choice(dataset.dates), table_id)
+
+    return {
+        "reservation_save": save_reservation,
+        "restaurant_by_id": lambda: restaurants.get_restaurant_by_id(restaurant_id()),
+        "menu_list": lambda: menus.get_menu_list(restaurant_id()),
+        "free_tables": lambda: tables.get_free_tables(
+            restaurant_id(), rng.choice(dataset.dates), datetime.time(19, 0), datetime.time(21, 0), 4
+        ),
+        "table_reservations_for_date": table_reservations_for_date,
+        "restaurant_reservations_page": lambda: reservations.get_reservation_page(restaurant_id(), limit=100),
+    }
+
+
+def run(spec: DatasetSpec, repeat: int, rounds: int, selected: List[str]) -> Dict[str, Any]:
+    db = SqlAlchemyDatabase("sqlite://")
+    db.create_database()
+    dataset = generate(db, spec)
+
+    results: Dict[str, Any] = {}
+    for name, scenario in scenarios(db, dataset, spec.seed).items():
+        if selected and name not in selected:
+            continue
+        round_medians = []
+        durations: List[float] = []
+        for _ in range(rounds):
+            round_durations = measure(scenario, repeat=repeat)
+            round_medians.append(statistics.median(round_durations))
+            durations.extend(round_durations)
+        durations.sort()
+        results[name] = {
+            "repeat": repeat,
+            "rounds": rounds,
+            # the best median of the rounds is the least disturbed by other load of the machine
+            "best_median_ms": min(round_medians),
+            "median_ms": statistics.median(durations),
+            "mean_ms": statistics.fmean(durations),
+            "p95_ms": durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+            "min_ms": durations[0],
+            "max_ms": durations[-1],
+        }
+        print(
+            "%-30s best median: %8.3f ms, median: %8.3f ms, p95: %8.3f ms"
+            % (name, results[name]["best_median_ms"], results[name]["median_ms"], results[name]["p95_ms"])
+        )
+
+    spec_dict = dataclasses.asdict(spec)
+    spec_dict["start_date"] = spec.start_date.isoformat()
+    return {
+        "meta": {
+            "spec": spec_dict,
+            "reservations": dataset.reservations,
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "sqlite": sqlite3.sqlite_version,
+            "machine": platform.machine(),
+        },
+        "scenarios": results,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """print the change of the best median per scenario and return the names of the regressed scenarios"""
+    if results["meta"]["spec"] != baseline["meta"]["spec"]:
+        print("warning: the dataset of the baseline differs, the results are not comparable")
+    regressions = []
+    for name, result in results["scenarios"].items():
+        reference = baseline["scenarios"].get(name)
+        if reference is None:
+            print("%-30s no baseline" % name)
+            continue
+        ratio = result["best_median_ms"] / reference["best_median_ms"] if reference["best_median_ms"] > 0 else 1.0
+        regressed = ratio > 1.0 + tolerance
+        if regressed:
+            regressions.append(name)
+        print(
+            "%-30s %8.3f ms -> %8.3f ms (%+.0f%%)%s"
+            % (
+                name,
+                reference["best_median_ms"],
+                result["best_median_ms"],
+                (ratio - 1.0) * 100,
+                " REGRESSION" if regressed else "",
+            )
+        )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    defaults = DatasetSpec()
+    parser.add_argument("--restaurants", type=int, default=defaults.restaurants)
+    parser.add_argument("--menus", type=int, default=defaults.menus_per_restaurant)
+    parser.add_argument("--tables", type=int, default=defaults.tables_per_restaurant)
+    parser.add_argument("--days", type=int, default=defaults.days)
+    parser.add_argument("--reservations", type=int, default=defaults.reservations_per_table_and_day)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--repeat", type=int, default=50, help="executions of a scenario per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--scenario", action="append", default=[], help="run only the given scenario(s)")
+    parser.add_argument("--output", help="write the results as JSON to the file")
+    parser.add_argument("--baseline", help="compare the results with the JSON results in the file")
+    parser.add_argument("--save-baseline", help="write the results as new baseline to the file")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.5, help="allowed slowdown of the best median (0.5 = 50%%)"
+    )
+    args = parser.parse_args()
+
+    spec = DatasetSpec(
+        restaurants=args.restaurants,
+        menus_per_restaurant=args.menus,
+        tables_per_restaurant=args.tables,
+        days=args.days,
+        reservations_per_table_and_day=args.reservations,
+        seed=args.seed,
+    )
+    results = run(spec, args.repeat, args.rounds, args.scenario)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as file:
+                json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
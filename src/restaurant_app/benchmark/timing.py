@@ -0,0 +1,21 @@
+import statistics
+import time
+from typing import Callable, List
+
+
+def measure(action: Callable[[], object], repeat: int = 50, warmup: int = 3) -> List[float]:
+    """execute the action several times and return the single durations in milliseconds"""
+    for _ in range(warmup):
+        action()
+    durations: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        durations.append((time.perf_counter() - start) * 1000.0)
+    return durations
+
+
+def summary(durations: List[float]) -> str:
+    ordered = sorted(durations)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return "median: %.3f ms, p95: %.3f ms" % (statistics.median(ordered), p95)
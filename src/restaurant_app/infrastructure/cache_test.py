@@ -0,0 +1,53 @@
+from .cache import LruTtlCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_ttl_cache_hits_and_misses():
+    cache = LruTtlCache(max_entries=10, ttl_seconds=60)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("a") == 1
+
+    stats = cache.stats()
+    assert stats.hits == 2
+    assert stats.misses == 1
+    assert stats.size == 1
+    assert round(stats.hit_ratio, 2) == 0.67
+
+
+def test_lru_ttl_cache_evicts_least_recently_used():
+    cache = LruTtlCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # "a" is used, so "b" is the least recently used entry
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats().evictions == 1
+
+
+def test_lru_ttl_cache_expires_and_invalidates():
+    clock = FakeClock()
+    cache = LruTtlCache(max_entries=10, ttl_seconds=5, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+    assert cache.stats().expirations == 1
+
+    cache.invalidate(["b", "unknown"])
+    assert cache.get("b") is None
+    assert cache.stats().invalidations == 1
+    assert cache.stats().size == 0
@@ -0,0 +1,62 @@
+from abc import ABC, abstractmethod
+from contextlib import AbstractAsyncContextManager
+from typing import Any, Awaitable, Callable, List, Self
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...infrastructure.logger import LOG
+
+
+class AsyncSessionContextManager(AbstractAsyncContextManager):
+    """async counterpart of SessionContextManager: wraps a provided AsyncSession without releasing it"""
+
+    def __init__(self, session: AsyncSession):
+        self._session = session
+
+    async def __aenter__(self) -> AsyncSession:
+        return self._session
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            info = (exc_type, exc_val, exc_tb)
+            LOG.error("Exception occurred", exc_info=info)
+        return False
+
+
+class AsyncBaseRepository(ABC):
+    """
+    async counterpart of BaseRepository, all methods of the derived repositories are coroutines.
+    relations have to be loaded eagerly, lazy-loading is not possible with an AsyncSession
+    """
+
+    def __init__(
+        self, session_factory: Callable[..., AbstractAsyncContextManager[AsyncSession]], session: AsyncSession = None
+    ):
+        """
+        provide a factory to create sessions or pass in an existing session
+        """
+        self._session_factory = session_factory
+        self._session = None
+        if session is not None:
+            self._session = AsyncSessionContextManager(session)
+
+    def get_session(self) -> AbstractAsyncContextManager[AsyncSession]:
+        if self._session is not None:
+            return self._session
+        return self._session_factory()
+
+    async def unit_of_work(self, action: Callable[[AsyncSession], Awaitable[List[Any]]]) -> List[Any]:
+        result = None
+        async with self._session_factory() as session:
+            result = await action(session)
+            await session.commit()
+        return result
+
+    async def sync(self):
+        async with self.get_session() as session:
+            await session.flush()
+
+    @abstractmethod
+    def new_session(self, session: AsyncSession) -> Self:
+        """create a new repository with a given session"""
+        pass
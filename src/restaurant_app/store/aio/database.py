@@ -0,0 +1,69 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from ...infrastructure.logger import LOG
+from ..database import Base, EngineConfig, register_sqlite_pragmas
+
+
+class AsyncSqlAlchemyDatabase:
+    """
+    Setup SQLAlchemy with asyncio sessions, e.g. sqlite+aiosqlite:// or postgresql+asyncpg://
+    https://docs.sqlalchemy.org/en/20/orm/extensions/asyncio.html
+    """
+
+    def __init__(
+        self, db_url: str, echo: bool = False, auto_commit: bool = False, engine_config: EngineConfig = None
+    ) -> None:
+        url = make_url(db_url)
+        self._engine_config = engine_config or EngineConfig()
+        self._engine = create_async_engine(url, **self._engine_config.engine_options(url, echo))
+        # the pragmas are applied by the synchronous engine which is proxied by the AsyncEngine
+        register_sqlite_pragmas(self._engine.sync_engine, url, self._engine_config)
+        self._auto_commit = auto_commit
+
+        # there is no thread-scope for asyncio, every managed_session gets its own AsyncSession.
+        # expire_on_commit is disabled, because loading expired attributes would need an await
+        self._session_factory = async_sessionmaker(
+            bind=self._engine,
+            autoflush=False,
+            expire_on_commit=False,
+        )
+
+    @property
+    def engine(self) -> AsyncEngine:
+        return self._engine
+
+    async def create_database(self) -> None:
+        async with self._engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def drop_database(self) -> None:
+        async with self._engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+
+    async def dispose(self) -> None:
+        await self._engine.dispose()
+
+    @asynccontextmanager
+    async def managed_session(self) -> AsyncIterator[AsyncSession]:
+        """
+        provides a function to acquire a new AsyncSession to work with
+        """
+        session: AsyncSession = self._session_factory()
+        try:
+            if self._auto_commit:
+                await session.begin()
+
+            yield session
+
+            if self._auto_commit:
+                await session.commit()
+        except Exception:
+            LOG.exception("Session rollback because of exception")
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
@@ -0,0 +1,54 @@
+from contextlib import AbstractAsyncContextManager
+from typing import Callable, Dict, Iterable, List, Self, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..base_repository import DEFAULT_BATCH_SIZE, batched
+from ..entities import MenuEntity
+from ..menu_repository import existing_menus_statement, merge_menus
+from .base_repository import AsyncBaseRepository
+
+
+class AsyncMenuRepository(AsyncBaseRepository):
+
+    def __init__(
+        self, session_factory: Callable[..., AbstractAsyncContextManager[AsyncSession]], session: AsyncSession = None
+    ):
+        super().__init__(session_factory=session_factory, session=session)
+
+    def new_session(self, session: AsyncSession) -> Self:
+        return AsyncMenuRepository(session_factory=None, session=session)
+
+    async def save(self, menu: MenuEntity) -> MenuEntity:
+        saved = await self.save_many([menu])
+        return saved[0]
+
+    async def save_many(self, menus: Iterable[MenuEntity], batch_size: int = DEFAULT_BATCH_SIZE) -> List[MenuEntity]:
+        """@see MenuRepository.save_many"""
+        saved: List[MenuEntity] = []
+        by_key: Dict[Tuple[str, str], MenuEntity] = {}
+        async with self.get_session() as session:
+            for batch in batched(menus, batch_size):
+                existing = (await session.execute(existing_menus_statement(batch))).scalars()
+                merged = merge_menus(batch, existing, by_key)
+                session.add_all(merged)
+                saved.extend(merged)
+            await session.flush()
+        return saved
+
+    async def get_menu_by_name(self, name: str, res_id: int) -> MenuEntity:
+        async with self.get_session() as session:
+            result = await session.execute(
+                select(MenuEntity).where(MenuEntity.name == name).where(MenuEntity.restaurant_id == res_id).limit(1)
+            )
+            return result.scalars().first()
+
+    async def get_menu_list(self, res_id: int) -> List[MenuEntity]:
+        async with self.get_session() as session:
+            result = await session.execute(
+                select(MenuEntity)
+                .where(MenuEntity.restaurant_id == res_id)
+                .order_by(MenuEntity.category, MenuEntity.name)
+            )
+            return list(result.scalars().all())
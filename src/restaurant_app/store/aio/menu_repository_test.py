@@ -0,0 +1,36 @@
+import asyncio
+
+from ..entities import MenuEntity
+from ..repository_test_helpers import create_restaurant_data
+from .menu_repository import AsyncMenuRepository
+from .repository_test_helpers import get_async_database
+from .restaurant_repository import AsyncRestaurantRepository
+
+
+def test_async_menu_repository_crud():
+
+    async def run():
+        db = await get_async_database()
+        repo = AsyncMenuRepository(db.managed_session)
+        repo_restaurant = AsyncRestaurantRepository(db.managed_session)
+
+        async def action(session):
+            res = await repo_restaurant.new_session(session).save(create_restaurant_data())
+            menu_repo = repo.new_session(session)
+            await menu_repo.save(MenuEntity(name="MenuEntry1", category="Category1", price=14.50, restaurant=res))
+            await menu_repo.save_many(
+                [
+                    MenuEntity(name="MenuEntry1", category="Category1", price=15.50, restaurant=res),
+                    MenuEntity(name="MenuEntry2", category="Category1", price=9.90, restaurant=res),
+                ]
+            )
+            return [res.id]
+
+        restaurant_id = (await repo.unit_of_work(action))[0]
+        menus = await repo.get_menu_list(restaurant_id)
+        assert [m.name for m in menus] == ["MenuEntry1", "MenuEntry2"]
+        menu = await repo.get_menu_by_name("MenuEntry1", restaurant_id)
+        assert menu.price == 15.50
+        await db.dispose()
+
+    asyncio.run(run())
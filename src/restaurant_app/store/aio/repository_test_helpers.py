@@ -0,0 +1,7 @@
+from .database import AsyncSqlAlchemyDatabase
+
+
+async def get_async_database(auto_commit=False) -> AsyncSqlAlchemyDatabase:
+    db = AsyncSqlAlchemyDatabase("sqlite+aiosqlite://", auto_commit=auto_commit)
+    await db.create_database()
+    return db
@@ -0,0 +1,96 @@
+import datetime
+from contextlib import AbstractAsyncContextManager
+from typing import Callable, Dict, Iterable, List, Self
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from ..availability import day_range
+from ..base_repository import DEFAULT_BATCH_SIZE, batched
+from ..entities import ReservationEntity, TableEntity, relation_table_reservation
+from ..reservation_repo import existing_reservations_statement, merge_reservations, reservation_number_in_use_statement
+from .base_repository import AsyncBaseRepository
+
+
+class AsyncReservationRepository(AsyncBaseRepository):
+
+    def __init__(
+        self, session_factory: Callable[..., AbstractAsyncContextManager[AsyncSession]], session: AsyncSession = None
+    ):
+        super().__init__(session_factory=session_factory, session=session)
+
+    def new_session(self, session: AsyncSession) -> Self:
+        return AsyncReservationRepository(session_factory=None, session=session)
+
+    async def save(self, reservation: ReservationEntity) -> ReservationEntity:
+        saved = await self.save_many([reservation])
+        return saved[0]
+
+    async def save_many(
+        self, reservations: Iterable[ReservationEntity], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[ReservationEntity]:
+        """@see ReservationRepository.save_many"""
+        saved: List[ReservationEntity] = []
+        by_number: Dict[str, ReservationEntity] = {}
+        async with self.get_session() as session:
+            for batch in batched(reservations, batch_size):
+                existing = (await session.execute(existing_reservations_statement(batch))).unique().scalars()
+                merged = merge_reservations(batch, existing, by_number)
+                session.add_all(merged)
+                saved.extend(merged)
+            await session.flush()
+        return saved
+
+    async def delete(self, reservation_id: int):
+        async with self.get_session() as session:
+            reservation = await session.get(ReservationEntity, reservation_id)
+            if reservation is not None:
+                await session.delete(reservation)
+
+    async def get_reservation_by_id(self, id: int) -> ReservationEntity:
+        async with self.get_session() as session:
+            return await session.get(ReservationEntity, id)
+
+    async def get_reservation_for_restaurant(self, restaurant_id: int) -> List[ReservationEntity]:
+        async with self.get_session() as session:
+            result = await session.execute(
+                select(ReservationEntity)
+                .join(TableEntity, ReservationEntity.tables)
+                .where(TableEntity.restaurant_id == restaurant_id)
+                .order_by(ReservationEntity.reservation_date.asc())
+                .order_by(ReservationEntity.time_from.asc())
+                .order_by(TableEntity.table_number)
+            )
+            return list(result.unique().scalars().all())
+
+    async def get_reservation_by_number(self, number: str) -> ReservationEntity:
+        async with self.get_session() as session:
+            result = await session.execute(
+                select(ReservationEntity).where(ReservationEntity.reservation_number == number).limit(1)
+            )
+            return result.unique().scalars().first()
+
+    async def is_reservation_number_in_use(self, number: str) -> bool:
+        """@see ReservationRepository.is_reservation_number_in_use"""
+        async with self.get_session() as session:
+            return (await session.execute(reservation_number_in_use_statement(number))).scalar()
+
+    async def get_table_reservations_for_date(self, date: datetime.date, table_id: int) -> List[ReservationEntity]:
+        """@see ReservationRepository.get_table_reservations_for_date"""
+        day_start, day_end = day_range(date)
+        async with self.get_session() as session:
+            reserved_table = (
+                select(relation_table_reservation.c.reservation_id)
+                .where(relation_table_reservation.c.reservation_id == ReservationEntity.id)
+                .where(relation_table_reservation.c.table_id == table_id)
+            )
+            result = await session.execute(
+                select(ReservationEntity)
+                .options(selectinload(ReservationEntity.tables))
+                .where(ReservationEntity.reservation_date >= day_start)
+                .where(ReservationEntity.reservation_date < day_end)
+                .where(reserved_table.exists())
+                .order_by(ReservationEntity.time_from.asc())
+            )
+            return list(result.scalars().all())
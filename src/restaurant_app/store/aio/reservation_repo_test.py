@@ -0,0 +1,54 @@
+import asyncio
+import datetime
+
+from ..entities import ReservationEntity, TableEntity
+from ..repository_test_helpers import create_restaurant_data
+from .repository_test_helpers import get_async_database
+from .reservation_repo import AsyncReservationRepository
+
+
+def test_async_reservation_repository_crud():
+
+    async def run():
+        db = await get_async_database()
+        repo = AsyncReservationRepository(db.managed_session)
+        date = datetime.date(2024, 9, 10)
+
+        async def action(session):
+            table = TableEntity(table_number="Table1", seats=4, restaurant=create_restaurant_data())
+            session.add(table)
+            await session.flush()
+
+            reservation = ReservationEntity(
+                reservation_date=date,
+                time_from=datetime.time(20, 0, 0),
+                time_until=datetime.time(22, 0, 0),
+                people=4,
+                reservation_name="Test",
+                reservation_number="1234",
+            )
+            reservation.tables.append(table)
+            reservation = await repo.new_session(session).save(reservation)
+            return [reservation.id, table.id, table.restaurant_id]
+
+        reservation_id, table_id, restaurant_id = await repo.unit_of_work(action)
+
+        find = await repo.get_reservation_by_id(reservation_id)
+        assert find.reservation_name == "Test"
+        assert (await repo.get_reservation_by_number("1234")).id == reservation_id
+        assert await repo.is_reservation_number_in_use("1234")
+        assert not await repo.is_reservation_number_in_use("2345")
+        assert len(await repo.get_reservation_for_restaurant(restaurant_id)) == 1
+
+        reservations = await repo.get_table_reservations_for_date(date, table_id)
+        assert len(reservations) == 1 and reservations[0].tables[0].id == table_id
+        assert len(await repo.get_table_reservations_for_date(date + datetime.timedelta(days=1), table_id)) == 0
+
+        async def delete(session):
+            await repo.new_session(session).delete(reservation_id)
+
+        await repo.unit_of_work(delete)
+        assert await repo.get_reservation_by_id(reservation_id) is None
+        await db.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,89 @@
+from contextlib import AbstractAsyncContextManager
+from typing import Callable, Iterable, List, Self
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..base_repository import DEFAULT_BATCH_SIZE, batched
+from ..entities import AddressEntity, RestaurantEntity
+from ..restaurant_repository import (
+    RestaurantLoad,
+    existing_restaurants_statements,
+    merge_restaurants,
+    restaurant_load_options,
+    restaurant_summaries_statement,
+)
+from ..views import RestaurantSummary
+from .base_repository import AsyncBaseRepository
+
+
+class AsyncRestaurantRepository(AsyncBaseRepository):
+
+    def __init__(
+        self, session_factory: Callable[..., AbstractAsyncContextManager[AsyncSession]], session: AsyncSession = None
+    ):
+        super().__init__(session_factory=session_factory, session=session)
+
+    def new_session(self, session: AsyncSession) -> Self:
+        return AsyncRestaurantRepository(session_factory=None, session=session)
+
+    async def get_restaurant_by_id(self, id: int, load: RestaurantLoad = RestaurantLoad.SELECTIN) -> RestaurantEntity:
+        async with self.get_session() as session:
+            return await session.get(RestaurantEntity, id, options=restaurant_load_options(load))
+
+    async def find_restaurants_by_name_and_address(self, name: str, addr: AddressEntity) -> RestaurantEntity:
+        addr_lookup = await self.find_address(addr)
+        if addr_lookup is None:
+            return None
+        async with self.get_session() as session:
+            result = await session.execute(
+                select(RestaurantEntity)
+                .where(RestaurantEntity.name == name)
+                .where(RestaurantEntity.address_id == addr_lookup.id)
+                .limit(1)
+            )
+            return result.unique().scalars().first()
+
+    async def get_all_restaurants(self, load: RestaurantLoad = RestaurantLoad.SELECTIN) -> List[RestaurantEntity]:
+        async with self.get_session() as session:
+            result = await session.execute(select(RestaurantEntity).options(*restaurant_load_options(load)))
+            return list(result.unique().scalars().all())
+
+    async def get_restaurant_summaries(self) -> List[RestaurantSummary]:
+        """@see RestaurantRepository.get_restaurant_summaries"""
+        async with self.get_session() as session:
+            result = await session.execute(restaurant_summaries_statement())
+            return [RestaurantSummary(*row) for row in result]
+
+    async def find_address(self, address: AddressEntity) -> AddressEntity:
+        """use the fields in the supplied model to lookup the address"""
+        async with self.get_session() as session:
+            result = await session.execute(
+                select(AddressEntity)
+                .where(AddressEntity.street == address.street)
+                .where(AddressEntity.city == address.city)
+                .where(AddressEntity.zip == address.zip)
+                .where(AddressEntity.country == address.country)
+                .limit(1)
+            )
+            return result.scalars().first()
+
+    async def save(self, restaurant: RestaurantEntity) -> RestaurantEntity:
+        saved = await self.save_many([restaurant])
+        return saved[0]
+
+    async def save_many(
+        self, restaurants: Iterable[RestaurantEntity], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[RestaurantEntity]:
+        """@see RestaurantRepository.save_many"""
+        saved: List[RestaurantEntity] = []
+        async with self.get_session() as session:
+            for batch in batched(restaurants, batch_size):
+                restaurant_statement, address_statement = existing_restaurants_statements(batch)
+                existing = (await session.execute(restaurant_statement)).unique().scalars()
+                existing_addresses = (await session.execute(address_statement)).scalars()
+                merged = merge_restaurants(batch, existing, existing_addresses)
+                session.add_all(merged)
+                saved.extend(merged)
+            await session.flush()
+        return saved
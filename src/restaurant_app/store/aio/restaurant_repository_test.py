@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from ..repository_test_helpers import create_restaurant_data
+from .repository_test_helpers import get_async_database
+from .restaurant_repository import AsyncRestaurantRepository
+
+
+def test_async_restaurant_repository_crud_unit_of_work():
+
+    async def run():
+        db = await get_async_database()
+        restaurant_repo = AsyncRestaurantRepository(db.managed_session)
+
+        async def work_in_transaction(session):
+            repo = restaurant_repo.new_session(session)
+            res = create_restaurant_data()
+            addr = res.address
+            saved = await repo.save(res)
+            await repo.sync()
+
+            find_restaurant = await repo.get_restaurant_by_id(saved.id)
+            assert find_restaurant.name == res.name
+            assert find_restaurant.address.city == "Salzburg"
+
+            find_restaurant.name += " updated"
+            await repo.save(find_restaurant)
+            await repo.sync()
+
+            addr_lookup = await repo.find_address(addr)
+            assert addr_lookup is not None and addr_lookup.street == addr.street
+            found = await repo.find_restaurants_by_name_and_address("Test-Restaurant updated", addr)
+            assert found is not None and found.id == saved.id
+
+        await restaurant_repo.unit_of_work(work_in_transaction)
+        all_restaurants = await restaurant_repo.get_all_restaurants()
+        assert len(all_restaurants) == 1
+        assert all_restaurants[0].name == "Test-Restaurant updated"
+
+        async def work_with_error(session):
+            await restaurant_repo.new_session(session).save(create_restaurant_data())
+            raise ValueError("rollback")
+
+        with pytest.raises(ValueError):
+            await restaurant_repo.unit_of_work(work_with_error)
+        assert len(await restaurant_repo.get_all_restaurants()) == 1
+        await db.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,77 @@
+import datetime
+from contextlib import AbstractAsyncContextManager
+from typing import Callable, Dict, Iterable, List, Self, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..availability import TableAvailability
+from ..base_repository import DEFAULT_BATCH_SIZE, batched
+from ..entities import TableEntity
+from ..table_repository import collect_free_tables, existing_tables_statement, free_tables_statement, merge_tables
+from .base_repository import AsyncBaseRepository
+
+
+class AsyncTableRepository(AsyncBaseRepository):
+
+    def __init__(
+        self, session_factory: Callable[..., AbstractAsyncContextManager[AsyncSession]], session: AsyncSession = None
+    ):
+        super().__init__(session_factory=session_factory, session=session)
+
+    def new_session(self, session: AsyncSession) -> Self:
+        return AsyncTableRepository(session_factory=None, session=session)
+
+    async def get_table_by_id(self, id: int) -> TableEntity:
+        async with self.get_session() as session:
+            return await session.get(TableEntity, id)
+
+    async def get_tables_for_restaurant(self, restaurant_id: int) -> List[TableEntity]:
+        async with self.get_session() as session:
+            result = await session.execute(select(TableEntity).where(TableEntity.restaurant_id == restaurant_id))
+            return list(result.scalars().all())
+
+    async def get_tables_with_capacity(self, capacity: int, restaurant_id: int) -> List[TableEntity]:
+        if capacity <= 0:
+            return []
+        async with self.get_session() as session:
+            result = await session.execute(
+                select(TableEntity)
+                .where(TableEntity.restaurant_id == restaurant_id)
+                .where(TableEntity.seats >= capacity)
+            )
+            return list(result.scalars().all())
+
+    async def get_free_tables(
+        self,
+        restaurant_id: int,
+        date: datetime.date,
+        time_from: datetime.time,
+        time_until: datetime.time,
+        people: int,
+    ) -> List[TableAvailability]:
+        """@see TableRepository.get_free_tables"""
+        if people <= 0 or time_from >= time_until:
+            return []
+        async with self.get_session() as session:
+            rows = (await session.execute(free_tables_statement(restaurant_id, date, people))).all()
+        return collect_free_tables(rows, time_from, time_until)
+
+    async def save(self, table: TableEntity) -> TableEntity:
+        saved = await self.save_many([table])
+        return saved[0]
+
+    async def save_many(
+        self, tables: Iterable[TableEntity], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[TableEntity]:
+        """@see TableRepository.save_many"""
+        saved: List[TableEntity] = []
+        by_key: Dict[Tuple[int, str], TableEntity] = {}
+        async with self.get_session() as session:
+            for batch in batched(tables, batch_size):
+                existing = (await session.execute(existing_tables_statement(batch))).scalars()
+                merged = merge_tables(batch, existing, by_key)
+                session.add_all(merged)
+                saved.extend(merged)
+            await session.flush()
+        return saved
@@ -0,0 +1,67 @@
+import asyncio
+import datetime
+
+from ..entities import TableEntity
+from ..repository_test_helpers import create_restaurant_data
+from .repository_test_helpers import get_async_database
+from .restaurant_repository import AsyncRestaurantRepository
+from .table_repository import AsyncTableRepository
+
+
+def test_async_table_repository_crud():
+
+    async def run():
+        db = await get_async_database()
+        repo = AsyncTableRepository(db.managed_session)
+        repo_restaurant = AsyncRestaurantRepository(db.managed_session)
+
+        async def action(session):
+            res = await repo_restaurant.new_session(session).save(create_restaurant_data())
+            await repo.new_session(session).save_many(
+                [
+                    TableEntity(table_number="Table1", seats=4, restaurant=res),
+                    TableEntity(table_number="Table2", seats=6, restaurant=res),
+                ]
+            )
+            return [res.id]
+
+        restaurant_id = (await repo.unit_of_work(action))[0]
+        tables = await repo.get_tables_for_restaurant(restaurant_id)
+        assert len(tables) == 2
+        assert (await repo.get_table_by_id(tables[0].id)).table_number == "Table1"
+        assert len(await repo.get_tables_with_capacity(5, restaurant_id)) == 1
+
+        free = await repo.get_free_tables(
+            restaurant_id, datetime.date(2024, 9, 10), datetime.time(18, 0, 0), datetime.time(20, 0, 0), 4
+        )
+        assert [f.table.table_number for f in free] == ["Table1", "Table2"]
+        await db.dispose()
+
+    asyncio.run(run())
+
+
+def test_async_table_repository_update_existing_table():
+
+    async def run():
+        db = await get_async_database()
+        repo = AsyncTableRepository(db.managed_session)
+        repo_restaurant = AsyncRestaurantRepository(db.managed_session)
+
+        async def create(session):
+            res = await repo_restaurant.new_session(session).save(create_restaurant_data())
+            await repo.new_session(session).save(TableEntity(table_number="T1", seats=4, restaurant=res))
+            return [res.id]
+
+        restaurant_id = (await repo.unit_of_work(create))[0]
+
+        async def update(session):
+            res = await repo_restaurant.new_session(session).get_restaurant_by_id(restaurant_id)
+            # the table is found by its natural key (restaurant, table_number) and updated
+            return [await repo.new_session(session).save(TableEntity(table_number="T1", seats=8, restaurant=res))]
+
+        updated = (await repo.unit_of_work(update))[0]
+        tables = await repo.get_tables_for_restaurant(restaurant_id)
+        assert [(t.id, t.table_number, t.seats) for t in tables] == [(updated.id, "T1", 8)]
+        await db.dispose()
+
+    asyncio.run(run())
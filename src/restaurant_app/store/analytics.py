@@ -0,0 +1,319 @@
+"""
+Analytics of the reservations and orders of a restaurant with NumPy
+
+The columns needed by a metric are fetched with one column-level query and converted into NumPy arrays,
+the metrics are computed with vectorized operations instead of loops over entities:
+  - seat utilization per weekday and time bucket (heatmap)
+  - peak-hour curve: the average number of guests present and the arrivals per time bucket
+  - occupied tables per day and time bucket
+  - revenue and orders per table and per day
+
+The time of the reservations is handled in minutes of the day: a reservation occupies [time_from, time_until),
+the number of guests present per minute is the cumulative sum of +people at the start and -people at the end.
+
+NumPy is an optional dependency (pip install restaurant-app[analytics]).
+"""
+
+import datetime
+from contextlib import AbstractContextManager
+from dataclasses import dataclass
+from typing import Callable, Self
+
+import numpy as np
+from sqlalchemy import Select, func, select
+from sqlalchemy.orm import Session
+
+from .availability import day_range
+from .base_repository import BaseRepository
+from .entities import OrderEntity, ReservationEntity, TableEntity, relation_table_reservation
+
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_BUCKET_MINUTES = 60
+# 1970-01-01, day 0 of datetime64[D], was a thursday
+_EPOCH_WEEKDAY = 3
+
+
+@dataclass(frozen=True)
+class ReservationColumns:
+    """
+    the reservations of a restaurant as arrays, one entry per reservation. the reserved tables are stored
+    as (index of the reservation, table_id) pairs, a reservation can have several tables
+    """
+
+    day: np.ndarray  # datetime64[D]
+    start: np.ndarray  # minute of the day
+    end: np.ndarray  # minute of the day, exclusive
+    people: np.ndarray
+    table_reservation: np.ndarray
+    table_id: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+
+@dataclass(frozen=True)
+class OrderColumns:
+    table_id: np.ndarray
+    day: np.ndarray  # datetime64[D]
+    total: np.ndarray
+
+
+@dataclass(frozen=True)
+class UtilizationHeatmap:
+    """the reserved share of the seats per weekday (0 = monday) and time bucket of the day"""
+
+    bucket_minutes: int
+    utilization: np.ndarray  # [7, buckets]
+
+    def bucket_start(self, bucket: int) -> datetime.time:
+        return _bucket_time(bucket, self.bucket_minutes)
+
+
+@dataclass(frozen=True)
+class PeakHours:
+    """the average number of guests present and the number of arrivals per time bucket of the day"""
+
+    bucket_minutes: int
+    guests: np.ndarray
+    arrivals: np.ndarray
+
+    @property
+    def peak(self) -> datetime.time:
+        return _bucket_time(int(np.argmax(self.guests)), self.bucket_minutes)
+
+
+@dataclass(frozen=True)
+class TableOccupancy:
+    """the average number of occupied tables per day and time bucket"""
+
+    days: np.ndarray  # datetime64[D]
+    bucket_minutes: int
+    occupied_tables: np.ndarray  # [days, buckets]
+
+
+@dataclass(frozen=True)
+class TableRevenue:
+    table_id: np.ndarray
+    orders: np.ndarray
+    revenue: np.ndarray
+
+
+class AnalyticsRepository(BaseRepository):
+
+    def __init__(self, session_factory: Callable[..., AbstractContextManager[Session]], session: Session = None):
+        super().__init__(session_factory=session_factory, session=session)
+
+    def new_session(self, session: Session) -> Self:
+        return AnalyticsRepository(session_factory=None, session=session)
+
+    def get_reservation_columns(
+        self, restaurant_id: int, date_from: datetime.date, date_until: datetime.date
+    ) -> ReservationColumns:
+        start, end = day_range(date_from)[0], day_range(date_until)[1]
+        with self.get_session() as session:
+            reservations = session.execute(reservation_columns_statement(restaurant_id, start, end)).all()
+            pairs = session.execute(reservation_tables_statement(restaurant_id, start, end)).all()
+        index = {row[0]: i for i, row in enumerate(reservations)}
+        return ReservationColumns(
+            day=np.array([row[1].date() for row in reservations], dtype="datetime64[D]"),
+            start=np.fromiter((_minute(row[2]) for row in reservations), np.int32, len(reservations)),
+            end=np.fromiter((_end_minute(row[2], row[3]) for row in reservations), np.int32, len(reservations)),
+            people=np.fromiter((row[4] for row in reservations), np.int32, len(reservations)),
+            table_reservation=np.fromiter((index[row[0]] for row in pairs), np.int64, len(pairs)),
+            table_id=np.fromiter((row[1] for row in pairs), np.int64, len(pairs)),
+        )
+
+    def get_order_columns(
+        self, restaurant_id: int, date_from: datetime.date, date_until: datetime.date
+    ) -> OrderColumns:
+        start, end = day_range(date_from)[0], day_range(date_until)[1]
+        with self.get_session() as session:
+            orders = session.execute(order_columns_statement(restaurant_id, start, end)).all()
+        return OrderColumns(
+            table_id=np.fromiter((row[0] for row in orders), np.int64, len(orders)),
+            day=np.array([row[1].date() for row in orders], dtype="datetime64[D]"),
+            total=np.fromiter((row[2] for row in orders), np.float64, len(orders)),
+        )
+
+    def get_capacity(self, restaurant_id: int) -> int:
+        with self.get_session() as session:
+            return session.scalar(
+                select(func.coalesce(func.sum(TableEntity.seats), 0)).where(TableEntity.restaurant_id == restaurant_id)
+            )
+
+    def get_utilization_heatmap(
+        self,
+        restaurant_id: int,
+        date_from: datetime.date,
+        date_until: datetime.date,
+        bucket_minutes: int = DEFAULT_BUCKET_MINUTES,
+    ) -> UtilizationHeatmap:
+        columns = self.get_reservation_columns(restaurant_id, date_from, date_until)
+        return utilization_heatmap(columns, self.get_capacity(restaurant_id), date_from, date_until, bucket_minutes)
+
+    def get_peak_hours(
+        self,
+        restaurant_id: int,
+        date_from: datetime.date,
+        date_until: datetime.date,
+        bucket_minutes: int = DEFAULT_BUCKET_MINUTES,
+    ) -> PeakHours:
+        columns = self.get_reservation_columns(restaurant_id, date_from, date_until)
+        return peak_hours(columns, date_from, date_until, bucket_minutes)
+
+    def get_table_occupancy(
+        self,
+        restaurant_id: int,
+        date_from: datetime.date,
+        date_until: datetime.date,
+        bucket_minutes: int = DEFAULT_BUCKET_MINUTES,
+    ) -> TableOccupancy:
+        columns = self.get_reservation_columns(restaurant_id, date_from, date_until)
+        return table_occupancy(columns, date_from, date_until, bucket_minutes)
+
+    def get_revenue_per_table(
+        self, restaurant_id: int, date_from: datetime.date, date_until: datetime.date
+    ) -> TableRevenue:
+        return revenue_per_table(self.get_order_columns(restaurant_id, date_from, date_until))
+
+
+def reservation_columns_statement(restaurant_id: int, start: datetime.datetime, end: datetime.datetime) -> Select:
+    """(id, reservation_date, time_from, time_until, people) of the reservations of the restaurant"""
+    return (
+        select(
+            ReservationEntity.id,
+            ReservationEntity.reservation_date,
+            ReservationEntity.time_from,
+            ReservationEntity.time_until,
+            ReservationEntity.people,
+        )
+        .where(ReservationEntity.tables.any(TableEntity.restaurant_id == restaurant_id))
+        .where(ReservationEntity.reservation_date >= start)
+        .where(ReservationEntity.reservation_date < end)
+    )
+
+
+def reservation_tables_statement(restaurant_id: int, start: datetime.datetime, end: datetime.datetime) -> Select:
+    """the (reservation_id, table_id) pairs of the tables of the restaurant"""
+    return (
+        select(relation_table_reservation.c.reservation_id, relation_table_reservation.c.table_id)
+        .join(TableEntity, TableEntity.id == relation_table_reservation.c.table_id)
+        .join(ReservationEntity, ReservationEntity.id == relation_table_reservation.c.reservation_id)
+        .where(TableEntity.restaurant_id == restaurant_id)
+        .where(ReservationEntity.reservation_date >= start)
+        .where(ReservationEntity.reservation_date < end)
+    )
+
+
+def order_columns_statement(restaurant_id: int, start: datetime.datetime, end: datetime.datetime) -> Select:
+    """(table_id, created, total) of the orders at the tables of the restaurant"""
+    return (
+        select(OrderEntity.table_id, OrderEntity.created, OrderEntity.total)
+        .join(TableEntity, TableEntity.id == OrderEntity.table_id)
+        .where(TableEntity.restaurant_id == restaurant_id)
+        .where(OrderEntity.created >= start)
+        .where(OrderEntity.created < end)
+    )
+
+
+def present_per_minute(rows: np.ndarray, start: np.ndarray, end: np.ndarray, weights: np.ndarray, count: int):
+    """
+    the sum of the weights present per row (e.g. weekday or day) and minute of the day: +weight at the start,
+    -weight at the end of every interval, the cumulative sum over the minutes is the presence
+    """
+    delta = np.zeros((count, MINUTES_PER_DAY + 1), dtype=np.int64)
+    np.add.at(delta, (rows, start), weights)
+    np.add.at(delta, (rows, end), -weights)
+    return np.cumsum(delta[:, :MINUTES_PER_DAY], axis=1)
+
+
+def per_bucket(per_minute: np.ndarray, bucket_minutes: int) -> np.ndarray:
+    """the sum of the minutes of every bucket (the buckets need to divide the day)"""
+    if MINUTES_PER_DAY % bucket_minutes != 0:
+        raise ValueError("bucket_minutes needs to divide a day, got %d" % bucket_minutes)
+    return per_minute.reshape(per_minute.shape[0], -1, bucket_minutes).sum(axis=2)
+
+
+def utilization_heatmap(
+    columns: ReservationColumns,
+    capacity: int,
+    date_from: datetime.date,
+    date_until: datetime.date,
+    bucket_minutes: int = DEFAULT_BUCKET_MINUTES,
+) -> UtilizationHeatmap:
+    weekday = _weekday(columns.day)
+    seat_minutes = per_bucket(
+        present_per_minute(weekday, columns.start, columns.end, columns.people, 7), bucket_minutes
+    )
+    # the capacity of a bucket: seats x minutes x the number of days with this weekday in the range
+    days = np.bincount(_weekday(_days(date_from, date_until)), minlength=7)
+    available = (capacity * bucket_minutes * days)[:, np.newaxis]
+    utilization = np.divide(seat_minutes, available, out=np.zeros(seat_minutes.shape), where=available > 0)
+    return UtilizationHeatmap(bucket_minutes, utilization)
+
+
+def peak_hours(
+    columns: ReservationColumns,
+    date_from: datetime.date,
+    date_until: datetime.date,
+    bucket_minutes: int = DEFAULT_BUCKET_MINUTES,
+) -> PeakHours:
+    rows = np.zeros(len(columns), dtype=np.int64)
+    guest_minutes = per_bucket(present_per_minute(rows, columns.start, columns.end, columns.people, 1), bucket_minutes)
+    days = len(_days(date_from, date_until))
+    arrivals = np.bincount(columns.start // bucket_minutes, minlength=MINUTES_PER_DAY // bucket_minutes)
+    return PeakHours(bucket_minutes, guest_minutes[0] / (bucket_minutes * days), arrivals)
+
+
+def table_occupancy(
+    columns: ReservationColumns,
+    date_from: datetime.date,
+    date_until: datetime.date,
+    bucket_minutes: int = DEFAULT_BUCKET_MINUTES,
+) -> TableOccupancy:
+    days = _days(date_from, date_until)
+    reservation = columns.table_reservation
+    day = (columns.day[reservation] - days[0]).astype(np.int64)
+    ones = np.ones(len(reservation), dtype=np.int64)
+    table_minutes = per_bucket(
+        present_per_minute(day, columns.start[reservation], columns.end[reservation], ones, len(days)), bucket_minutes
+    )
+    return TableOccupancy(days, bucket_minutes, table_minutes / bucket_minutes)
+
+
+def revenue_per_table(orders: OrderColumns) -> TableRevenue:
+    table_id, index = np.unique(orders.table_id, return_inverse=True)
+    return TableRevenue(
+        table_id=table_id,
+        orders=np.bincount(index, minlength=len(table_id)),
+        revenue=np.bincount(index, weights=orders.total, minlength=len(table_id)),
+    )
+
+
+def revenue_per_day(orders: OrderColumns, date_from: datetime.date, date_until: datetime.date) -> np.ndarray:
+    """the revenue of every day of the range"""
+    days = _days(date_from, date_until)
+    return np.bincount((orders.day - days[0]).astype(np.int64), weights=orders.total, minlength=len(days))
+
+
+def _days(date_from: datetime.date, date_until: datetime.date) -> np.ndarray:
+    return np.arange(np.datetime64(date_from, "D"), np.datetime64(date_until, "D") + 1)
+
+
+def _weekday(days: np.ndarray) -> np.ndarray:
+    return (days.astype(np.int64) + _EPOCH_WEEKDAY) % 7
+
+
+def _minute(time: datetime.time) -> int:
+    return time.hour * 60 + time.minute
+
+
+def _end_minute(time_from: datetime.time, time_until: datetime.time) -> int:
+    """a reservation past midnight is cut at the end of the day"""
+    end = _minute(time_until)
+    return end if end >= _minute(time_from) else MINUTES_PER_DAY
+
+
+def _bucket_time(bucket: int, bucket_minutes: int) -> datetime.time:
+    minute = bucket * bucket_minutes
+    return datetime.time(minute // 60, minute % 60)
@@ -0,0 +1,75 @@
+import datetime
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from .analytics import AnalyticsRepository, revenue_per_day  # noqa: E402
+from .entities import OrderEntity, ReservationEntity, TableEntity  # noqa: E402
+from .repository_test_helpers import create_restaurant_data, get_database  # noqa: E402
+
+DAY = datetime.date(2024, 9, 9)  # a monday
+
+
+def create_data(managed_session) -> int:
+    with managed_session() as session:
+        restaurant = create_restaurant_data()
+        tables = [TableEntity(table_number="T%d" % i, seats=4, restaurant=restaurant) for i in range(2)]
+        session.add(restaurant)
+        session.add_all(tables)
+        for number, (time_from, time_until, people, reserved) in enumerate(
+            [((18, 0), (20, 0), 4, tables), ((19, 0), (19, 30), 2, tables[:1])]
+        ):
+            reservation = ReservationEntity(
+                reservation_date=datetime.datetime.combine(DAY, datetime.time.min),
+                time_from=datetime.time(*time_from),
+                time_until=datetime.time(*time_until),
+                people=people,
+                reservation_name="Guest",
+                reservation_number="%d" % number,
+            )
+            reservation.tables.extend(reserved)
+            session.add(reservation)
+        for total, table, day in [(30.0, tables[0], DAY), (20.0, tables[0], DAY), (15.0, tables[1], DAY)]:
+            order = OrderEntity(total=total, waiter="Anna", table=table)
+            order.created = datetime.datetime.combine(day, datetime.time(20, 0))
+            session.add(order)
+        session.commit()
+        return restaurant.id
+
+
+def test_reservation_metrics():
+    managed_session = get_database().managed_session
+    restaurant_id = create_data(managed_session)
+    repo = AnalyticsRepository(managed_session)
+
+    heatmap = repo.get_utilization_heatmap(restaurant_id, DAY, DAY)
+    assert heatmap.utilization.shape == (7, 24)
+    # 8 seats: 4 guests for the full hour 18:00, 4 guests + 2 guests for half an hour at 19:00
+    assert heatmap.utilization[0, 18] == 0.5 and heatmap.utilization[0, 19] == 0.625
+    assert heatmap.utilization.sum() == 1.125
+    assert heatmap.bucket_start(19) == datetime.time(19, 0)
+
+    peak = repo.get_peak_hours(restaurant_id, DAY, DAY + datetime.timedelta(days=1), bucket_minutes=30)
+    assert peak.peak == datetime.time(19, 0)
+    # averaged over the two days of the range
+    assert peak.guests[36:40].tolist() == [2.0, 2.0, 3.0, 2.0]
+    assert peak.arrivals[36:40].tolist() == [1, 0, 1, 0]
+
+    occupancy = repo.get_table_occupancy(restaurant_id, DAY, DAY)
+    assert occupancy.days.tolist() == [DAY]
+    assert occupancy.occupied_tables[0, 17:21].tolist() == [0.0, 2.0, 2.5, 0.0]
+
+
+def test_revenue_per_table():
+    managed_session = get_database().managed_session
+    restaurant_id = create_data(managed_session)
+    repo = AnalyticsRepository(managed_session)
+
+    revenue = repo.get_revenue_per_table(restaurant_id, DAY, DAY)
+    assert revenue.orders.tolist() == [2, 1]
+    assert revenue.revenue.tolist() == [50.0, 15.0]
+    assert repo.get_revenue_per_table(restaurant_id, DAY + datetime.timedelta(days=1), DAY).table_id.size == 0
+
+    orders = repo.get_order_columns(restaurant_id, DAY - datetime.timedelta(days=1), DAY)
+    assert revenue_per_day(orders, DAY - datetime.timedelta(days=1), DAY).tolist() == [0.0, 65.0]
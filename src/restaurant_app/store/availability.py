@@ -0,0 +1,50 @@
+import datetime
+from dataclasses import dataclass, field
+from typing import Iterable, List, Tuple
+
+from .entities import TableEntity
+
+TimeWindow = Tuple[datetime.time, datetime.time]
+
+
+@dataclass
+class TableAvailability:
+    """a table which is free for a requested slot, including all free windows of the day"""
+
+    table: TableEntity
+    free_windows: List[TimeWindow] = field(default_factory=list)
+
+
+def day_range(date: datetime.date) -> Tuple[datetime.datetime, datetime.datetime]:
+    """return the half-open range [start, end) of datetimes covering the given day"""
+    if isinstance(date, datetime.datetime):
+        date = date.date()
+    day_start = datetime.datetime.combine(date, datetime.time.min)
+    return day_start, day_start + datetime.timedelta(days=1)
+
+
+def compute_free_windows(
+    open_from: datetime.time, open_until: datetime.time, reserved: Iterable[TimeWindow]
+) -> List[TimeWindow]:
+    """
+    compute the free windows within the opening hours in one pass over the reserved windows.
+    the reserved windows need to be sorted by their start; overlapping windows are allowed
+    """
+    windows: List[TimeWindow] = []
+    current = open_from
+    for reserved_from, reserved_until in reserved:
+        if reserved_until <= current:
+            continue
+        if reserved_from >= open_until:
+            break
+        if reserved_from > current:
+            windows.append((current, reserved_from))
+        current = max(current, reserved_until)
+    if current < open_until:
+        windows.append((current, open_until))
+    return windows
+
+
+def is_slot_free(windows: List[TimeWindow], time_from: datetime.time, time_until: datetime.time) -> bool:
+    """the slot is free if it fits completely into one of the free windows"""
+    return any(start <= time_from and time_until <= end for start, end in windows)
@@ -0,0 +1,27 @@
+import datetime
+
+from .availability import compute_free_windows, day_range, is_slot_free
+
+
+def t(hour: int, minute: int = 0) -> datetime.time:
+    return datetime.time(hour, minute, 0)
+
+
+def test_compute_free_windows():
+    # no reservations, the whole opening hours are free
+    assert compute_free_windows(t(10), t(22), []) == [(t(10), t(22))]
+
+    # overlapping and adjacent reservations are merged
+    reserved = [(t(9), t(11)), (t(12), t(14)), (t(13), t(15)), (t(15), t(16)), (t(21), t(23))]
+    windows = compute_free_windows(t(10), t(22), reserved)
+    assert windows == [(t(11), t(12)), (t(16), t(21))]
+
+    assert is_slot_free(windows, t(17), t(21))
+    assert not is_slot_free(windows, t(15, 30), t(17))
+    assert not is_slot_free(windows, t(20), t(22))
+
+
+def test_day_range():
+    start, end = day_range(datetime.datetime(2024, 9, 10, 18, 30, 0))
+    assert start == datetime.datetime(2024, 9, 10, 0, 0, 0)
+    assert end == datetime.datetime(2024, 9, 11, 0, 0, 0)
@@ -1,10 +1,57 @@
 from abc import ABC, abstractmethod
 from contextlib import AbstractContextManager
-from typing import Any, Callable, List, Self
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Self, TypeVar
 
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
 
+from ..infrastructure.cache import CacheBackend, CacheStats
 from ..infrastructure.logger import LOG
+from .batch import BatchConfig, BatchReport, BatchStats, run_batched
+from .session_events import after_commit
+
+T = TypeVar("T")
+
+# number of entities resolved with one IN-query by the save_many methods of the repositories
+DEFAULT_BATCH_SIZE = 500
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """split the items into lists of the given size (the last list can be smaller)"""
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def detached_copy(value: T, copies: Dict[int, Any] = None) -> T:
+    """
+    copy the entity (or a list of entities) with the loaded attributes and relationships into new detached
+    instances. the copies keep the identity of the entities, a copy added to a session is an update and not
+    an insert. attributes which were not loaded are expired on the copy
+    """
+    copies = {} if copies is None else copies
+    if isinstance(value, list):
+        return [detached_copy(item, copies) for item in value]
+    if value is None or id(value) in copies:
+        return copies.get(id(value))
+    state = inspect(value)
+    mapper = state.mapper
+    copy = mapper.class_manager.new_instance()
+    copies[id(value)] = copy
+    for attribute in mapper.column_attrs:
+        if attribute.key in state.dict:
+            set_committed_value(copy, attribute.key, state.dict[attribute.key])
+    if state.key is not None:
+        make_transient_to_detached(copy)
+    for relationship in mapper.relationships:
+        if relationship.key in state.dict:
+            related = state.dict[relationship.key]
+            set_committed_value(
+                copy, relationship.key, detached_copy(list(related) if relationship.uselist else related, copies)
+            )
+    return copy
 
 
 # https://docs.python.org/3/reference/datamodel.html#context-managers
@@ -30,12 +77,20 @@ def __exit__(self, exc_type, exc_val, exc_tb):
 
 class BaseRepository(ABC):
 
-    def __init__(self, session_factory: Callable[..., AbstractContextManager[Session]], session: Session = None):
+    def __init__(
+        self,
+        session_factory: Callable[..., AbstractContextManager[Session]],
+        session: Session = None,
+        cache: CacheBackend = None,
+    ):
         """
-        provide a factory to create sessions or pass in an existing session
+        provide a factory to create sessions or pass in an existing session.
+        the optional cache is used for read-through lookups of data which rarely changes
         """
         self._session_factory = session_factory
         self._session = None
+        self._bound_session = session
+        self._cache = cache
         # a provided session is used if we run in a transaction
         # we still need to do some work to make it behave in a correct way
         if session is not None:
@@ -53,6 +108,16 @@ def get_session(self) -> AbstractContextManager[Session]:
             return self._session
         return self._session_factory()
 
+    def with_session(self, work: Callable[[Session], T]) -> T:
+        """
+        execute the work with the session of the repository. the fast path of a repository bound to a
+        provided session: the work gets the session directly, without entering the SessionContextManager
+        """
+        if self._bound_session is not None:
+            return work(self._bound_session)
+        with self._session_factory() as session:
+            return work(session)
+
     def unit_of_work(self, action: Callable[[Session], List[Any]]) -> List[Any]:
         result = None
         with self._session_factory() as session:
@@ -60,9 +125,56 @@ def unit_of_work(self, action: Callable[[Session], List[Any]]) -> List[Any]:
             session.commit()
         return result
 
+    def unit_of_work_batched(
+        self,
+        items: Iterable[T],
+        action: Callable[[Session, T], Any],
+        config: BatchConfig = None,
+        on_batch: Callable[[BatchStats], None] = None,
+    ) -> BatchReport[T]:
+        """
+        execute the action for every item, the work is committed in batches with a savepoint per item
+        and retried on transient errors, @see batch.run_batched
+        """
+        return run_batched(self._session_factory, items, action, config, on_batch)
+
+    def cache_stats(self) -> CacheStats:
+        """hit/miss metrics of the cache, empty stats if the repository has no cache"""
+        if self._cache is None:
+            return CacheStats()
+        return self._cache.stats()
+
+    def _cached(self, key: str, loader: Callable[[], T]) -> T:
+        """
+        return the cached value of the key or load and cache it. a repository working with a provided
+        session bypasses the cache, it could read changes of its transaction which are not yet committed.
+        the cache holds a detached snapshot of the loaded entities which is never handed out, every caller
+        gets its own copy; a copy attached to (and expired by) another session does not change the cache
+        """
+        if self._cache is None or self._session is not None:
+            return loader()
+        value = self._cache.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self._cache.set(key, detached_copy(value))
+            return value
+        return detached_copy(value)
+
+    def _invalidate(self, session: Session, keys: Iterable[str]) -> None:
+        """
+        remove the keys from the cache right away and again after the commit of the session,
+        so a value read by another session before the commit is not kept in the cache
+        """
+        if self._cache is None:
+            return
+        cache = self._cache
+        keys = list(keys)
+        cache.invalidate(keys)
+        after_commit(session, lambda: cache.invalidate(keys))
+
     def sync(self):
-        with self.get_session() as session:
-            session.flush()
+        self.with_session(Session.flush)
 
     @abstractmethod
     def new_session(self, session: Session) -> Self:
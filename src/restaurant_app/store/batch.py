@@ -0,0 +1,178 @@
+import time
+from contextlib import AbstractContextManager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Generic, Iterable, List, Optional, TypeVar
+
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from ..infrastructure.logger import LOG
+
+T = TypeVar("T")
+
+# messages/codes of errors which are resolved by running the transaction again
+# SQLite: the database is locked by another connection; PostgreSQL: serialization failure and deadlock
+_TRANSIENT_MESSAGES = ("database is locked", "database is busy", "database table is locked")
+_TRANSIENT_CODES = ("40001", "40P01")
+# marks the end of the items
+_END = object()
+
+
+@dataclass
+class BatchConfig:
+    # commit after this many items ...
+    batch_size: int = 500
+    # ... or after the transaction was open for this many milliseconds (None: only by batch_size)
+    max_batch_ms: Optional[float] = 1000.0
+    # retries of a batch which failed with a transient error, the delay doubles with every retry
+    max_retries: int = 5
+    backoff_ms: float = 10.0
+    max_backoff_ms: float = 1000.0
+
+    def backoff(self, retry: int) -> float:
+        """the delay in seconds before the given retry (1, 2, ...)"""
+        return min(self.backoff_ms * 2 ** (retry - 1), self.max_backoff_ms) / 1000.0
+
+
+@dataclass
+class BatchStats:
+    batch: int
+    items: int
+    succeeded: int
+    failed: int
+    retries: int
+    duration_ms: float
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / (self.duration_ms / 1000.0) if self.duration_ms > 0 else 0.0
+
+
+@dataclass
+class ItemFailure(Generic[T]):
+    item: T
+    error: Exception
+
+
+@dataclass
+class BatchReport(Generic[T]):
+    results: List[Any] = field(default_factory=list)
+    failures: List[ItemFailure[T]] = field(default_factory=list)
+    batches: List[BatchStats] = field(default_factory=list)
+
+    @property
+    def items(self) -> int:
+        return sum(stats.items for stats in self.batches)
+
+    @property
+    def items_per_second(self) -> float:
+        duration_ms = sum(stats.duration_ms for stats in self.batches)
+        return self.items / (duration_ms / 1000.0) if duration_ms > 0 else 0.0
+
+
+def is_transient_error(error: Exception) -> bool:
+    """True if the error is resolved by running the transaction again (locks, serialization failures)"""
+    if not isinstance(error, DBAPIError):
+        return False
+    if error.connection_invalidated:
+        return True
+    if getattr(error.orig, "pgcode", None) in _TRANSIENT_CODES:
+        return True
+    message = str(error.orig).lower()
+    return any(transient in message for transient in _TRANSIENT_MESSAGES)
+
+
+def run_batched(
+    session_factory: Callable[..., AbstractContextManager[Session]],
+    items: Iterable[T],
+    action: Callable[[Session, T], Any],
+    config: BatchConfig = None,
+    on_batch: Callable[[BatchStats], None] = None,
+) -> BatchReport[T]:
+    """
+    execute the action for every item and commit the work in batches (every batch_size items or max_batch_ms).
+    every item runs in a savepoint, an item which fails is rolled back and recorded as failure while the
+    other items of the batch are committed. a batch which fails with a transient error is rolled back and
+    executed again after a backoff, other errors are raised.
+    the items are consumed lazily, so the iterable can be a stream (e.g. a generator reading a file)
+    """
+    config = config or BatchConfig()
+    report: BatchReport[T] = BatchReport()
+    iterator = iter(items)
+    exhausted = False
+    while not exhausted:
+        batch: List[T] = []
+        retries = 0
+        started = time.perf_counter()
+        while True:
+            try:
+                results: List[Any] = []
+                failures: List[ItemFailure[T]] = []
+                with session_factory() as session:
+                    # the connection is acquired before the items, a database which is not available
+                    # fails the batch instead of every single item. max_batch_ms starts afterwards,
+                    # waiting for a lock (busy_timeout) does not use up the time of the batch
+                    session.connection()
+                    start = time.perf_counter()
+                    # a retry replays the items of the batch taken so far, a batch which failed before
+                    # the first item takes its items now
+                    for item in batch:
+                        _execute_item(session, action, item, results, failures)
+                    if retries == 0 or not batch:
+                        # every batch takes at least one item, only the end of the items ends the run
+                        while not batch or (len(batch) < config.batch_size and not _expired(start, config)):
+                            item = next(iterator, _END)
+                            if item is _END:
+                                exhausted = True
+                                break
+                            batch.append(item)
+                            _execute_item(session, action, item, results, failures)
+                    session.commit()
+                break
+            except Exception as error:
+                if not is_transient_error(error) or retries >= config.max_retries:
+                    raise
+                retries += 1
+                LOG.warning("transient error, retry %d of batch %d: %s", retries, len(report.batches) + 1, error)
+                time.sleep(config.backoff(retries))
+
+        if not batch:
+            # the items are exhausted
+            break
+        stats = BatchStats(
+            batch=len(report.batches) + 1,
+            items=len(batch),
+            succeeded=len(results),
+            failed=len(failures),
+            retries=retries,
+            duration_ms=(time.perf_counter() - started) * 1000.0,
+        )
+        report.results.extend(results)
+        report.failures.extend(failures)
+        report.batches.append(stats)
+        if on_batch is not None:
+            on_batch(stats)
+    return report
+
+
+def _expired(start: float, config: BatchConfig) -> bool:
+    return config.max_batch_ms is not None and (time.perf_counter() - start) * 1000.0 >= config.max_batch_ms
+
+
+def _execute_item(
+    session: Session,
+    action: Callable[[Session, T], Any],
+    item: T,
+    results: List[Any],
+    failures: List[ItemFailure[T]],
+) -> None:
+    try:
+        # the savepoint is released with a flush, errors of the item are raised here
+        with session.begin_nested():
+            result = action(session, item)
+        results.append(result)
+    except Exception as error:
+        if is_transient_error(error):
+            # the whole batch is retried
+            raise
+        failures.append(ItemFailure(item, error))
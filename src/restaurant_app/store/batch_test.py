@@ -0,0 +1,112 @@
+import datetime
+import sqlite3
+from contextlib import contextmanager
+from typing import List
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from .batch import BatchConfig, BatchStats, is_transient_error, run_batched
+from .entities import ReservationEntity
+from .repository_test_helpers import get_database
+from .reservation_repo import ReservationRepository
+
+
+def reservation(number: str) -> ReservationEntity:
+    return ReservationEntity(
+        reservation_date=datetime.datetime(2024, 9, 10),
+        time_from=datetime.time(18, 0, 0),
+        time_until=datetime.time(20, 0, 0),
+        people=2,
+        reservation_name="Test",
+        reservation_number=number,
+    )
+
+
+def locked_error() -> OperationalError:
+    return OperationalError("INSERT", {}, sqlite3.OperationalError("database is locked"))
+
+
+def test_is_transient_error():
+    assert is_transient_error(locked_error())
+    assert not is_transient_error(IntegrityError("INSERT", {}, sqlite3.IntegrityError("UNIQUE constraint failed")))
+    assert not is_transient_error(ValueError("database is locked"))
+
+
+def test_batched_unit_of_work_isolates_failing_items():
+    repo = ReservationRepository(get_database().managed_session)
+    batches: List[BatchStats] = []
+
+    def save(session, number: str):
+        # the numbers are inserted directly, a duplicate number violates the unique constraint
+        session.add(reservation(number))
+        return number
+
+    numbers = ["%d" % i for i in range(10)] + ["3", "10"]
+    report = repo.unit_of_work_batched(numbers, save, BatchConfig(batch_size=5), on_batch=batches.append)
+
+    assert [stats.items for stats in report.batches] == [5, 5, 2]
+    assert batches == report.batches
+    assert report.items == 12
+    assert report.results == ["%d" % i for i in range(10)] + ["10"]
+    assert [failure.item for failure in report.failures] == ["3"]
+    assert isinstance(report.failures[0].error, IntegrityError)
+    assert report.batches[2].failed == 1
+    assert report.items_per_second > 0
+    with repo.get_session() as session:
+        assert session.query(ReservationEntity).count() == 11
+
+
+def test_batched_unit_of_work_retries_transient_errors():
+    repo = ReservationRepository(get_database().managed_session)
+    attempts = {"5": 0}
+
+    def save(session, number: str):
+        if number in attempts:
+            attempts[number] += 1
+            if attempts[number] < 3:
+                raise locked_error()
+        repo.new_session(session).save(reservation(number))
+
+    config = BatchConfig(batch_size=4, backoff_ms=1)
+    report = repo.unit_of_work_batched(("%d" % i for i in range(10)), save, config)
+    assert [stats.retries for stats in report.batches] == [0, 2, 0]
+    assert report.failures == []
+    with repo.get_session() as session:
+        assert session.query(ReservationEntity).count() == 10
+
+    attempts["5"] = -10
+    with pytest.raises(OperationalError):
+        repo.unit_of_work_batched(["5"], save, BatchConfig(max_retries=2, backoff_ms=1))
+
+
+def test_batched_unit_of_work_retry_before_the_first_item():
+    db = get_database()
+    repo = ReservationRepository(db.managed_session)
+    connections = {"count": 0}
+
+    @contextmanager
+    def locked_once():
+        # the connection of the first batch fails with a lock, no item was taken yet
+        with db.managed_session() as session:
+            connections["count"] += 1
+            if connections["count"] == 1:
+                with patch.object(session, "connection", side_effect=locked_error()):
+                    yield session
+            else:
+                yield session
+
+    numbers = ["%d" % i for i in range(10)]
+    report = run_batched(locked_once, iter(numbers), lambda session, number: number, BatchConfig(backoff_ms=1))
+    assert report.results == numbers
+    assert [(stats.items, stats.retries) for stats in report.batches] == [(10, 1)]
+    assert repo.unit_of_work_batched(iter(()), lambda session, number: number).batches == []
+
+
+def test_batched_unit_of_work_takes_an_item_after_max_batch_ms():
+    repo = ReservationRepository(get_database().managed_session)
+    numbers = ["%d" % i for i in range(10)]
+    report = repo.unit_of_work_batched(iter(numbers), lambda session, number: number, BatchConfig(max_batch_ms=0.0))
+    assert report.results == numbers
+    assert [stats.items for stats in report.batches] == [1] * 10
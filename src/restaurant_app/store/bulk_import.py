@@ -0,0 +1,422 @@
+"""
+Streaming import of restaurants, menus and tables
+
+The input is a CSV or JSON-lines file with one record per row, the column 'kind' defines the type:
+  restaurant: restaurant, street, city, zip, country, open_from, open_until, open_days
+  menu:       restaurant, street, city, zip, country, name, category, price
+  table:      restaurant, street, city, zip, country, table_number, seats
+a restaurant is identified by its name and address; a restaurant needs to be part of the same or an earlier
+chunk as its menus and tables (or exist in the database). Existing entries are updated by their natural key:
+the address by all its fields, the restaurant by name and address, a menu by (restaurant, name, category)
+and a table by (restaurant, table_number).
+
+  python -m restaurant_app.store.bulk_import --db sqlite:///restaurant.db restaurants.csv
+"""
+
+import argparse
+import csv
+import datetime
+import json
+import time
+from contextlib import AbstractContextManager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Tuple, Union
+
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from ..infrastructure.cache import CacheBackend
+from ..infrastructure.logger import LOG
+from .base_repository import batched
+from .database import SqlAlchemyDatabase
+from .entities import AddressEntity, MenuEntity, RestaurantEntity, TableEntity
+from .menu_repository import menus_cache_key
+from .occupancy import OccupancyAggregate
+from .restaurant_repository import restaurant_cache_keys
+from .table_repository import tables_cache_key
+
+KINDS = ("restaurant", "menu", "table")
+
+# zip, street, city, country: the column order of IX_ADDRESS_NATURAL_KEY
+AddressKey = Tuple[str, str, str, str]
+RestaurantKey = Tuple[str, AddressKey]
+
+
+@dataclass
+class ImportConfig:
+    # rows per transaction, the memory of the import is bounded by the size of a chunk
+    chunk_size: int = 1000
+    # the number of errors kept in the report, all errors are counted
+    max_errors: int = 100
+
+
+@dataclass
+class RowError:
+    row: int
+    message: str
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    failed: int = 0
+    chunks: int = 0
+    inserted: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(KINDS, 0))
+    updated: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(KINDS, 0))
+    errors: List[RowError] = field(default_factory=list)
+    duration_s: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.duration_s if self.duration_s > 0 else 0.0
+
+
+@dataclass
+class RestaurantRecord:
+    row: int
+    name: str
+    address: AddressKey
+    open_from: datetime.time
+    open_until: datetime.time
+    open_days: str
+
+    @property
+    def key(self) -> RestaurantKey:
+        return self.name, self.address
+
+
+@dataclass
+class MenuRecord:
+    row: int
+    restaurant: RestaurantKey
+    name: str
+    category: str
+    price: float
+
+
+@dataclass
+class TableRecord:
+    row: int
+    restaurant: RestaurantKey
+    table_number: str
+    seats: int
+
+
+ImportRecord = Union[RestaurantRecord, MenuRecord, TableRecord]
+
+
+def read_csv(path: str) -> Iterator[Dict[str, str]]:
+    """yield the rows of the CSV file (with a header line) one at a time"""
+    with open(path, newline="", encoding="utf-8") as file:
+        yield from csv.DictReader(file)
+
+
+def read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """yield the JSON objects of the file, one object per line"""
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_rows(path: str) -> Iterator[Mapping[str, Any]]:
+    """read a .csv file or a JSON-lines file (.jsonl/.json)"""
+    if path.lower().endswith(".csv"):
+        return read_csv(path)
+    return read_jsonl(path)
+
+
+def parse_record(row: int, values: Mapping[str, Any]) -> ImportRecord:
+    """convert the values of a row into a record, raises ValueError for missing/invalid values"""
+    kind = _text(values, "kind").lower()
+    restaurant = _text(values, "restaurant")
+    address = (_text(values, "zip"), _text(values, "street"), _text(values, "city"), _text(values, "country"))
+    if kind == "restaurant":
+        return RestaurantRecord(
+            row=row,
+            name=restaurant,
+            address=address,
+            open_from=datetime.time.fromisoformat(_text(values, "open_from")),
+            open_until=datetime.time.fromisoformat(_text(values, "open_until")),
+            open_days=_text(values, "open_days"),
+        )
+    if kind == "menu":
+        return MenuRecord(
+            row=row,
+            restaurant=(restaurant, address),
+            name=_text(values, "name"),
+            category=_text(values, "category"),
+            price=float(_text(values, "price")),
+        )
+    if kind == "table":
+        return TableRecord(
+            row=row,
+            restaurant=(restaurant, address),
+            table_number=_text(values, "table_number"),
+            seats=int(_text(values, "seats")),
+        )
+    raise ValueError("unknown kind '%s'" % kind)
+
+
+def _text(values: Mapping[str, Any], column: str) -> str:
+    value = values.get(column)
+    if value is None or str(value).strip() == "":
+        raise ValueError("%s is required" % column)
+    return str(value).strip()
+
+
+class BulkImporter:
+    """
+    imports the rows chunk by chunk: the natural keys of a chunk are resolved with one query per entity type,
+    new entries are written with bulk INSERTs and existing ones with bulk UPDATEs by primary key.
+    the ids of the addresses and restaurants are kept in a map for the rest of the import, the menus and
+    tables are resolved per chunk. every chunk is committed in its own transaction
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[..., AbstractContextManager[Session]],
+        config: ImportConfig = None,
+        cache: CacheBackend = None,
+        occupancy: OccupancyAggregate = None,
+    ):
+        """the optional cache of the repositories is invalidated and the capacity of the occupancy updated"""
+        self._session_factory = session_factory
+        self._config = config or ImportConfig()
+        self._cache = cache
+        self._occupancy = occupancy
+
+    def import_file(self, path: str, on_chunk: Callable[[ImportReport], None] = None) -> ImportReport:
+        return self.run(read_rows(path), on_chunk)
+
+    def run(self, rows: Iterable[Mapping[str, Any]], on_chunk: Callable[[ImportReport], None] = None) -> ImportReport:
+        report = ImportReport()
+        addresses: Dict[AddressKey, int] = {}
+        restaurants: Dict[RestaurantKey, int] = {}
+        start = time.perf_counter()
+        for chunk in batched(enumerate(rows, start=1), self._config.chunk_size):
+            records: List[ImportRecord] = []
+            for row, values in chunk:
+                try:
+                    records.append(parse_record(row, values))
+                except (ValueError, TypeError) as error:
+                    self._fail(report, row, str(error))
+            with self._session_factory() as session:
+                touched = self._import_chunk(session, records, addresses, restaurants, report)
+                session.commit()
+            if self._cache is not None:
+                self._cache.invalidate(
+                    [menus_cache_key(id) for id in touched]
+                    + [tables_cache_key(id) for id in touched]
+                    + restaurant_cache_keys(touched)
+                )
+            report.rows += len(chunk)
+            report.chunks += 1
+            report.duration_s = time.perf_counter() - start
+            if on_chunk is not None:
+                on_chunk(report)
+        LOG.info(
+            "import: %d rows (%d failed) in %.1f s, %.0f rows/s",
+            report.rows,
+            report.failed,
+            report.duration_s,
+            report.rows_per_second,
+        )
+        return report
+
+    def _import_chunk(
+        self,
+        session: Session,
+        records: List[ImportRecord],
+        addresses: Dict[AddressKey, int],
+        restaurants: Dict[RestaurantKey, int],
+        report: ImportReport,
+    ) -> List[int]:
+        """write the records of the chunk, returns the ids of the restaurants which were changed"""
+        restaurant_records = [r for r in records if isinstance(r, RestaurantRecord)]
+        resolve_addresses(session, {r.address for r in restaurant_records}, addresses)
+        touched = set(save_restaurants(session, restaurant_records, addresses, restaurants, report))
+
+        children = [r for r in records if not isinstance(r, RestaurantRecord)]
+        resolve_restaurants(session, {r.restaurant for r in children if r.restaurant not in restaurants}, restaurants)
+        menus: List[MenuRecord] = []
+        tables: List[TableRecord] = []
+        for record in children:
+            if record.restaurant not in restaurants:
+                self._fail(report, record.row, "unknown restaurant '%s'" % record.restaurant[0])
+            elif isinstance(record, MenuRecord):
+                menus.append(record)
+            else:
+                tables.append(record)
+        touched.update(save_menus(session, menus, restaurants, report))
+        table_restaurants = save_tables(session, tables, restaurants, report)
+        touched.update(table_restaurants)
+        if self._occupancy is not None:
+            for restaurant_id in sorted(table_restaurants):
+                self._occupancy.refresh_capacity(session, restaurant_id)
+        return sorted(touched)
+
+    def _fail(self, report: ImportReport, row: int, message: str) -> None:
+        report.failed += 1
+        if len(report.errors) < self._config.max_errors:
+            report.errors.append(RowError(row, message))
+
+
+def resolve_addresses(session: Session, keys: Iterable[AddressKey], addresses: Dict[AddressKey, int]) -> None:
+    """add the ids of the addresses to the map, missing addresses are inserted"""
+    missing = [key for key in keys if key not in addresses]
+    if not missing:
+        return
+    columns = (AddressEntity.zip, AddressEntity.street, AddressEntity.city, AddressEntity.country)
+    for row in session.execute(select(AddressEntity.id, *columns).where(tuple_(*columns).in_(missing))):
+        addresses[tuple(row[1:])] = row[0]
+    new = [key for key in missing if key not in addresses]
+    if new:
+        ids = _insert(
+            session,
+            AddressEntity,
+            [{"zip": zip, "street": street, "city": city, "country": country} for zip, street, city, country in new],
+        )
+        addresses.update(zip(new, ids))
+
+
+def save_restaurants(
+    session: Session,
+    records: List[RestaurantRecord],
+    addresses: Dict[AddressKey, int],
+    restaurants: Dict[RestaurantKey, int],
+    report: ImportReport,
+) -> List[int]:
+    # the last row of a restaurant within the chunk wins
+    by_key = {record.key: record for record in records}
+    missing = [key for key in by_key if key not in restaurants]
+    if missing:
+        statement = select(RestaurantEntity.id, RestaurantEntity.name, RestaurantEntity.address_id).where(
+            tuple_(RestaurantEntity.address_id, RestaurantEntity.name).in_(
+                [(addresses[address], name) for name, address in missing]
+            )
+        )
+        address_keys = {addresses[address]: address for _, address in missing}
+        for id, name, address_id in session.execute(statement):
+            restaurants[(name, address_keys[address_id])] = id
+
+    updates, inserts, new = [], [], []
+    for key, record in by_key.items():
+        values = {"open_from": record.open_from, "open_until": record.open_until, "open_days": record.open_days}
+        if key in restaurants:
+            updates.append({"id": restaurants[key], **values})
+        else:
+            inserts.append({"name": record.name, "address_id": addresses[record.address], **values})
+            new.append(key)
+    if updates:
+        session.execute(update(RestaurantEntity), updates)
+    if inserts:
+        restaurants.update(zip(new, _insert(session, RestaurantEntity, inserts)))
+    report.updated["restaurant"] += len(records) - len(inserts)
+    report.inserted["restaurant"] += len(inserts)
+    return [restaurants[key] for key in by_key]
+
+
+def resolve_restaurants(
+    session: Session, keys: Iterable[RestaurantKey], restaurants: Dict[RestaurantKey, int]
+) -> None:
+    """add the ids of existing restaurants which are referenced by menus/tables but not part of the import"""
+    keys = list(keys)
+    if not keys:
+        return
+    columns = (AddressEntity.zip, AddressEntity.street, AddressEntity.city, AddressEntity.country)
+    statement = (
+        select(RestaurantEntity.id, RestaurantEntity.name, *columns)
+        .join(AddressEntity, AddressEntity.id == RestaurantEntity.address_id)
+        .where(tuple_(RestaurantEntity.name, *columns).in_([(name, *address) for name, address in keys]))
+    )
+    for row in session.execute(statement):
+        restaurants[(row[1], tuple(row[2:]))] = row[0]
+
+
+def save_menus(
+    session: Session, records: List[MenuRecord], restaurants: Dict[RestaurantKey, int], report: ImportReport
+) -> List[int]:
+    by_key = {(restaurants[r.restaurant], r.name, r.category): r for r in records}
+    if not by_key:
+        return []
+    existing = dict(
+        (tuple(row[1:]), row[0])
+        for row in session.execute(
+            select(MenuEntity.id, MenuEntity.restaurant_id, MenuEntity.name, MenuEntity.category).where(
+                tuple_(MenuEntity.restaurant_id, MenuEntity.name, MenuEntity.category).in_(list(by_key))
+            )
+        )
+    )
+    updates = [{"id": existing[key], "price": record.price} for key, record in by_key.items() if key in existing]
+    inserts = [
+        {"restaurant_id": key[0], "name": record.name, "category": record.category, "price": record.price}
+        for key, record in by_key.items()
+        if key not in existing
+    ]
+    _write(session, MenuEntity, updates, inserts)
+    report.updated["menu"] += len(records) - len(inserts)
+    report.inserted["menu"] += len(inserts)
+    return sorted({key[0] for key in by_key})
+
+
+def save_tables(
+    session: Session, records: List[TableRecord], restaurants: Dict[RestaurantKey, int], report: ImportReport
+) -> List[int]:
+    by_key = {(restaurants[r.restaurant], r.table_number): r for r in records}
+    if not by_key:
+        return []
+    existing = dict(
+        (tuple(row[1:]), row[0])
+        for row in session.execute(
+            select(TableEntity.id, TableEntity.restaurant_id, TableEntity.table_number).where(
+                tuple_(TableEntity.restaurant_id, TableEntity.table_number).in_(list(by_key))
+            )
+        )
+    )
+    updates = [{"id": existing[key], "seats": record.seats} for key, record in by_key.items() if key in existing]
+    inserts = [
+        {"restaurant_id": key[0], "table_number": record.table_number, "seats": record.seats}
+        for key, record in by_key.items()
+        if key not in existing
+    ]
+    _write(session, TableEntity, updates, inserts)
+    report.updated["table"] += len(records) - len(inserts)
+    report.inserted["table"] += len(inserts)
+    return sorted({key[0] for key in by_key})
+
+
+def _write(session: Session, entity: type, updates: List[dict], inserts: List[dict]) -> None:
+    """bulk UPDATE by primary key and bulk INSERT (executemany)"""
+    if updates:
+        session.execute(update(entity), updates)
+    if inserts:
+        session.execute(insert(entity), inserts)
+
+
+def _insert(session: Session, entity: Any, rows: List[dict]) -> List[int]:
+    """bulk INSERT returning the ids in the order of the rows"""
+    return list(session.scalars(insert(entity).returning(entity.id, sort_by_parameter_order=True), rows))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="the SQLAlchemy url of the database")
+    parser.add_argument("--chunk-size", type=int, default=ImportConfig.chunk_size)
+    parser.add_argument("file", help="a .csv or a JSON-lines file")
+    args = parser.parse_args()
+
+    db = SqlAlchemyDatabase(args.db)
+    db.create_database()
+    importer = BulkImporter(db.managed_session, ImportConfig(chunk_size=args.chunk_size))
+    report = importer.import_file(args.file)
+    print(
+        "%d rows in %.1f s (%.0f rows/s), inserted: %s, updated: %s, failed: %d"
+        % (report.rows, report.duration_s, report.rows_per_second, report.inserted, report.updated, report.failed)
+    )
+    for error in report.errors:
+        print("row %d: %s" % (error.row, error.message))
+
+
+if __name__ == "__main__":
+    main()
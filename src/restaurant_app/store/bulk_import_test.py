@@ -0,0 +1,89 @@
+import datetime
+import json
+
+from .bulk_import import BulkImporter, ImportConfig, RowError
+from .entities import AddressEntity
+from .menu_repository import MenuRepository
+from .occupancy import OccupancyAggregate
+from .repository_test_helpers import get_database
+from .restaurant_repository import RestaurantRepository
+from .table_repository import TableRepository
+
+ADDRESS = {"street": "Hauptstraße 1", "city": "Salzburg", "zip": "5020", "country": "AT"}
+HOURS = {"open_from": "10:00", "open_until": "22:00", "open_days": "MONDAY;TUESDAY"}
+
+
+def rows(price: float = 10.0, seats: int = 4):
+    return [
+        {"kind": "restaurant", "restaurant": "Test-Restaurant", **ADDRESS, **HOURS},
+        {"kind": "restaurant", "restaurant": "Second", **ADDRESS, **HOURS},
+        {
+            "kind": "menu",
+            "restaurant": "Test-Restaurant",
+            **ADDRESS,
+            "name": "Pizza",
+            "category": "Main",
+            "price": price,
+        },
+        {
+            "kind": "menu",
+            "restaurant": "Test-Restaurant",
+            **ADDRESS,
+            "name": "Soup",
+            "category": "Starter",
+            "price": 5,
+        },
+        {"kind": "table", "restaurant": "Test-Restaurant", **ADDRESS, "table_number": "T1", "seats": seats},
+        {"kind": "table", "restaurant": "Second", **ADDRESS, "table_number": "T1", "seats": 2},
+    ]
+
+
+def test_import_jsonl_and_update(tmp_path):
+    db = get_database()
+    path = tmp_path / "import.jsonl"
+    path.write_text("\n".join(json.dumps(row) for row in rows()), encoding="utf-8")
+    # a chunk size of 2: the menus and tables reference restaurants of an earlier chunk
+    importer = BulkImporter(db.managed_session, ImportConfig(chunk_size=2), occupancy=OccupancyAggregate())
+
+    report = importer.import_file(str(path))
+    assert (report.rows, report.chunks, report.failed) == (6, 3, 0)
+    assert report.inserted == {"restaurant": 2, "menu": 2, "table": 2}
+
+    restaurants = RestaurantRepository(db.managed_session)
+    restaurant = restaurants.find_restaurants_by_name_and_address("Test-Restaurant", AddressEntity(**ADDRESS))
+    assert restaurant.open_from == datetime.time(10, 0)
+    # both restaurants share the address
+    second = restaurants.find_restaurants_by_name_and_address("Second", AddressEntity(**ADDRESS))
+    assert second.address_id == restaurant.address_id
+
+    # the second import updates the entries by their natural keys
+    report = BulkImporter(db.managed_session).run(rows(price=12.5, seats=6))
+    assert report.inserted == {"restaurant": 0, "menu": 0, "table": 0}
+    assert report.updated == {"restaurant": 2, "menu": 2, "table": 2}
+    assert MenuRepository(db.managed_session).get_menu_by_name("Pizza", restaurant.id).price == 12.5
+    assert [t.seats for t in TableRepository(db.managed_session).get_tables_for_restaurant(restaurant.id)] == [6]
+
+
+def test_import_csv_with_errors(tmp_path):
+    db = get_database()
+    path = tmp_path / "import.csv"
+    columns = ["kind", "restaurant", "street", "city", "zip", "country", "open_from", "open_until", "open_days"]
+    columns += ["name", "category", "price", "table_number", "seats"]
+    lines = [
+        ",".join(columns),
+        "restaurant,Test-Restaurant,Hauptstraße 1,Salzburg,5020,AT,10:00,22:00,MONDAY,,,,,",
+        "menu,Test-Restaurant,Hauptstraße 1,Salzburg,5020,AT,,,,Pizza,Main,9.5,,",
+        "menu,Test-Restaurant,Hauptstraße 1,Salzburg,5020,AT,,,,Pasta,Main,cheap,,",
+        "table,Unknown,Hauptstraße 1,Salzburg,5020,AT,,,,,,,T1,4",
+        "chair,Test-Restaurant,Hauptstraße 1,Salzburg,5020,AT,,,,,,,,",
+        "table,Test-Restaurant,Hauptstraße 1,Salzburg,5020,AT,,,,,,,T1,",
+    ]
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+    report = BulkImporter(db.managed_session, ImportConfig(max_errors=2)).import_file(str(path))
+    assert (report.rows, report.failed) == (6, 4)
+    assert report.inserted == {"restaurant": 1, "menu": 1, "table": 0}
+    assert report.errors == [
+        RowError(3, "could not convert string to float: 'cheap'"),
+        RowError(5, "unknown kind 'chair'"),
+    ]
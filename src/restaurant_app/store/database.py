@@ -1,23 +1,112 @@
-from contextlib import AbstractContextManager, contextmanager
-from typing import Callable
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
 
-from sqlalchemy import create_engine, orm
+from sqlalchemy import Column, Engine, Index, create_engine, event, inspect, make_url, orm
+from sqlalchemy.engine import URL
 from sqlalchemy.orm import Session, registry
+from sqlalchemy.schema import CreateColumn
 
 from ..infrastructure.logger import LOG
 
+if TYPE_CHECKING:
+    from .instrumentation import Instrumentation
+
 mapper_registry = registry()
 Base = mapper_registry.generate_base()
 
 
+@dataclass
+class EngineConfig:
+    """
+    settings of the engine and its connection-pool
+    https://docs.sqlalchemy.org/en/20/core/pooling.html
+    """
+
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    # recycle connections after the given seconds, -1 disables recycling
+    pool_recycle: int = -1
+    # test connections for liveness when they are checked out of the pool
+    pool_pre_ping: bool = False
+
+    # pragmas applied to every new SQLite connection, None keeps the SQLite default
+    # https://www.sqlite.org/pragma.html
+    sqlite_journal_mode: Optional[str] = "WAL"
+    sqlite_synchronous: Optional[str] = "NORMAL"
+    sqlite_mmap_size: Optional[int] = 256 * 1024 * 1024
+    # a negative value defines the cache size in KiB
+    sqlite_cache_size: Optional[int] = -64 * 1024
+    sqlite_busy_timeout: Optional[int] = 5000
+
+    def sqlite_pragmas(self) -> Dict[str, Any]:
+        pragmas = {
+            "journal_mode": self.sqlite_journal_mode,
+            "synchronous": self.sqlite_synchronous,
+            "mmap_size": self.sqlite_mmap_size,
+            "cache_size": self.sqlite_cache_size,
+            "busy_timeout": self.sqlite_busy_timeout,
+        }
+        return {name: value for name, value in pragmas.items() if value is not None}
+
+    def engine_options(self, url: URL, echo: bool) -> Dict[str, Any]:
+        """the keyword arguments for create_engine/create_async_engine"""
+        options: Dict[str, Any] = {
+            "echo": echo,
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": self.pool_pre_ping,
+        }
+        # an in-memory SQLite database lives in a single connection (SingletonThreadPool/StaticPool),
+        # the sizing of the pool only applies to the QueuePool used by all other databases
+        if not is_sqlite_memory(url):
+            options["pool_size"] = self.pool_size
+            options["max_overflow"] = self.max_overflow
+            options["pool_timeout"] = self.pool_timeout
+        return options
+
+
+def register_sqlite_pragmas(engine: Engine, url: URL, config: EngineConfig) -> None:
+    """apply the configured pragmas to every new connection of a SQLite engine"""
+    if url.get_backend_name() != "sqlite":
+        return
+    pragmas = config.sqlite_pragmas()
+
+    # https://docs.sqlalchemy.org/en/20/dialects/sqlite.html#foreign-key-support
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute("PRAGMA %s = %s" % (name, value))
+        cursor.close()
+
+
+def is_sqlite_memory(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+
 class SqlAlchemyDatabase:
     """
     Setup SQLAlchemy with scoped sessions usable for a web-application context
     https://www.sqlalchemy.org/
     """
 
-    def __init__(self, db_url: str, echo: bool = False, auto_commit: bool = False) -> None:
-        self._engine = create_engine(db_url, echo=echo)
+    def __init__(
+        self,
+        db_url: str,
+        echo: bool = False,
+        auto_commit: bool = False,
+        engine_config: EngineConfig = None,
+        instrumentation: "Instrumentation" = None,
+    ) -> None:
+        self._engine_config = engine_config or EngineConfig()
+        self._engine = self._create_engine(make_url(db_url), echo)
+        # opt-in metrics of the statements, every managed_session is a scope of the N+1 detection
+        self._instrumentation = instrumentation
+        if instrumentation is not None:
+            instrumentation.attach(self._engine)
         # if auto_commit is set to True, every session invocation of
         # managed_session will start and complete a transaction automatically
         # without the need to explicitly start one.
@@ -37,12 +126,103 @@ def __init__(self, db_url: str, echo: bool = False, auto_commit: bool = False) -
             ),
         )
 
+    def _create_engine(self, url: URL, echo: bool) -> Engine:
+        engine = create_engine(url, **self._engine_config.engine_options(url, echo))
+        register_sqlite_pragmas(engine, url, self._engine_config)
+        return engine
+
+    @property
+    def engine(self) -> Engine:
+        return self._engine
+
+    @property
+    def engine_config(self) -> EngineConfig:
+        return self._engine_config
+
+    @property
+    def instrumentation(self) -> Optional["Instrumentation"]:
+        return self._instrumentation
+
     def create_database(self) -> None:
         Base.metadata.create_all(self._engine)
 
     def drop_database(self) -> None:
         Base.metadata.drop_all(self._engine)
 
+    def missing_indexes(self) -> List[Index]:
+        """the declared indexes of the existing tables which are not part of the database"""
+        inspector = inspect(self._engine)
+        missing: List[Index] = []
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            missing.extend(
+                index for index in sorted(table.indexes, key=lambda i: i.name) if index.name not in existing
+            )
+        return missing
+
+    def missing_columns(self) -> List[Column]:
+        """the declared columns of the existing tables which are not part of the database"""
+        inspector = inspect(self._engine)
+        missing: List[Column] = []
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            missing.extend(column for column in table.columns if column.name not in existing)
+        return missing
+
+    def missing_autoincrement(self) -> List[str]:
+        """
+        the existing SQLite tables which are declared with sqlite_autoincrement but were created without
+        AUTOINCREMENT, SQLite re-uses the ids of their deleted rows
+        """
+        if self._engine.dialect.name != "sqlite":
+            return []
+        missing: List[str] = []
+        with self._engine.connect() as connection:
+            for table in Base.metadata.sorted_tables:
+                if not table.dialect_options["sqlite"]["autoincrement"]:
+                    continue
+                sql = connection.exec_driver_sql(
+                    "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+                ).scalar()
+                if sql is not None and "AUTOINCREMENT" not in sql.upper():
+                    missing.append(table.name)
+        return missing
+
+    def migrate(self) -> List[str]:
+        """
+        bring an existing database to the declared schema: missing tables are created, missing columns
+        (which need a server default if they are NOT NULL) and missing indexes are added, existing columns
+        are not changed. an added column is filled with the statement of its info["backfill"].
+        the statistics of the query planner are updated when indexes were added.
+        returns the names of the created indexes.
+        the full-text index of the menus is created by MenuRepository.rebuild_search_index.
+        existing tables are not rebuilt, a table created without the declared AUTOINCREMENT (RESERVATION
+        before the archive) is only logged (@see missing_autoincrement) and needs to be rebuilt by hand
+        """
+        Base.metadata.create_all(self._engine)
+        for name in self.missing_autoincrement():
+            LOG.warning("table %s has no AUTOINCREMENT, the ids of deleted rows are used again", name)
+        columns = self.missing_columns()
+        missing = self.missing_indexes()
+        with self._engine.begin() as connection:
+            for column in columns:
+                LOG.info("add column %s to %s", column.name, column.table.name)
+                definition = CreateColumn(column).compile(dialect=self._engine.dialect)
+                connection.exec_driver_sql("ALTER TABLE %s ADD COLUMN %s" % (column.table.name, definition))
+                if "backfill" in column.info:
+                    # the server default is only a placeholder, the values are derived from other columns
+                    connection.exec_driver_sql(column.info["backfill"])
+            for index in missing:
+                LOG.info("create index %s on %s", index.name, index.table.name)
+                index.create(connection)
+            if missing and self._engine.dialect.name in ("sqlite", "postgresql"):
+                connection.exec_driver_sql("ANALYZE")
+        return [index.name for index in missing]
+
     # provide a function to access a session via the session_factory
     # https://docs.python.org/3/library/contextlib.html#contextlib.contextmanager
     @contextmanager
@@ -51,20 +231,22 @@ def managed_session(self) -> Callable[..., AbstractContextManager[Session]]:  #
         provides a function to acquire a new Session to work with
         """
         session: Session = self._session_factory()
-        try:
-            if self._auto_commit:
-                session.begin()
-                session.expire_on_commit = False
-
-            # yield returns a generator function which can be executed
-            # yield: https://sentry.io/answers/python-yield-keyword/
-            yield session
-
-            if self._auto_commit:
-                session.commit()
-        except Exception:
-            LOG.exception("Session rollback because of exception")
-            session.rollback()
-            raise
-        finally:
-            session.close()
+        scope = self._instrumentation.session_scope() if self._instrumentation is not None else nullcontext()
+        with scope:
+            try:
+                if self._auto_commit:
+                    session.begin()
+                    session.expire_on_commit = False
+
+                # yield returns a generator function which can be executed
+                # yield: https://sentry.io/answers/python-yield-keyword/
+                yield session
+
+                if self._auto_commit:
+                    session.commit()
+            except Exception:
+                LOG.exception("Session rollback because of exception")
+                session.rollback()
+                raise
+            finally:
+                session.close()
@@ -0,0 +1,91 @@
+import os
+
+from sqlalchemy import inspect, text
+
+from .database import EngineConfig, SqlAlchemyDatabase
+from .entities import MenuEntity, OccupancyEntity, TableEntity
+from .order_repository import OrderLine, OrderRepository
+from .repository_test_helpers import create_restaurant_data
+
+
+def test_sqlite_pragmas_and_pool_configuration(tmp_path):
+    db_file = os.path.join(tmp_path, "test.db")
+    config = EngineConfig(pool_size=3, max_overflow=2, pool_pre_ping=True, sqlite_cache_size=-2048)
+    db = SqlAlchemyDatabase("sqlite:///%s" % db_file, engine_config=config)
+    db.create_database()
+
+    assert db.engine.pool.size() == 3
+    with db.managed_session() as session:
+        assert session.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        # NORMAL == 1
+        assert session.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert session.execute(text("PRAGMA cache_size")).scalar() == -2048
+        assert session.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+
+def test_sqlite_pragmas_can_be_disabled(tmp_path):
+    db_file = os.path.join(tmp_path, "test.db")
+    config = EngineConfig(sqlite_journal_mode=None, sqlite_synchronous=None)
+    db = SqlAlchemyDatabase("sqlite:///%s" % db_file, engine_config=config)
+
+    with db.managed_session() as session:
+        assert session.execute(text("PRAGMA journal_mode")).scalar() == "delete"
+        # FULL == 2
+        assert session.execute(text("PRAGMA synchronous")).scalar() == 2
+
+
+def test_in_memory_database_ignores_pool_sizing():
+    db = SqlAlchemyDatabase("sqlite://", engine_config=EngineConfig(pool_size=1, max_overflow=0))
+    db.create_database()
+    with db.managed_session() as session:
+        assert session.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_migrate_adds_missing_indexes(tmp_path):
+    db = SqlAlchemyDatabase("sqlite:///%s" % os.path.join(tmp_path, "test.db"))
+    db.create_database()
+    assert db.missing_indexes() == []
+    with db.managed_session() as session:
+        restaurant = create_restaurant_data()
+        menu = MenuEntity(name="Steak", category="Main", price=20.0, restaurant=restaurant)
+        table = TableEntity(table_number="T1", seats=4, restaurant=restaurant)
+        session.add_all([restaurant, menu, table])
+        session.flush()
+        order_id = OrderRepository(None).new_session(session).create_order(table.id, "Anna", [OrderLine(menu.id, 2)])
+        session.commit()
+
+    # a database created before the indexes were declared
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX IX_ADDRESS_NATURAL_KEY")
+        connection.exec_driver_sql("DROP INDEX IX_GUEST_TABLE_RESTAURANT_NUMBER")
+        connection.exec_driver_sql("DROP TABLE RESTAURANT_OCCUPANCY")
+        connection.exec_driver_sql("ALTER TABLE REL_MENU_ORDER DROP COLUMN unit_price")
+    assert [index.name for index in db.missing_indexes()] == [
+        "IX_ADDRESS_NATURAL_KEY",
+        "IX_GUEST_TABLE_RESTAURANT_NUMBER",
+    ]
+
+    assert [column.name for column in db.missing_columns()] == ["unit_price"]
+
+    assert db.migrate() == ["IX_ADDRESS_NATURAL_KEY", "IX_GUEST_TABLE_RESTAURANT_NUMBER"]
+    assert db.missing_indexes() == []
+    assert db.missing_columns() == []
+    assert inspect(db.engine).has_table(OccupancyEntity.__tablename__)
+    # the price of the existing order lines is taken from the menus
+    orders = OrderRepository(db.managed_session)
+    assert [line.unit_price for line in orders.get_order(order_id).lines] == [20.0]
+    orders.unit_of_work(lambda session: orders.new_session(session).update_totals([order_id]))
+    assert orders.get_order(order_id).total == 40.0
+    assert db.migrate() == []
+
+
+def test_missing_autoincrement(tmp_path):
+    db = SqlAlchemyDatabase("sqlite:///%s" % os.path.join(tmp_path, "test.db"))
+    db.create_database()
+    assert db.missing_autoincrement() == []
+
+    # a RESERVATION table created before AUTOINCREMENT was declared
+    old = SqlAlchemyDatabase("sqlite:///%s" % os.path.join(tmp_path, "old.db"))
+    with old.engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE RESERVATION (id INTEGER NOT NULL PRIMARY KEY)")
+    assert old.missing_autoincrement() == ["RESERVATION"]
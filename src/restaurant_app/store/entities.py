@@ -2,7 +2,7 @@
 from dataclasses import dataclass
 from typing import List
 
-from sqlalchemy import Column, ForeignKey, String, Table
+from sqlalchemy import DDL, Column, DateTime, Float, ForeignKey, Index, Integer, String, Table, Time, event
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .database import Base
@@ -12,6 +12,24 @@
     Base.metadata,
     Column("menu_id", ForeignKey("MENU.id"), primary_key=True),
     Column("order_id", ForeignKey("TABLE_ORDER.id"), primary_key=True),
+    # the order line: the quantity and the price of the menu at the time of the order (@see OrderRepository),
+    # the total of the order does not depend on later changes of the menu price.
+    # the server defaults allow to add the columns to an existing table (@see SqlAlchemyDatabase.migrate)
+    Column("quantity", Integer, nullable=False, default=1, server_default="1"),
+    Column(
+        "unit_price",
+        Float,
+        nullable=False,
+        default=0.0,
+        server_default="0",
+        # the lines of an existing database get the current price of their menu when the column is added
+        info={
+            "backfill": "UPDATE REL_MENU_ORDER SET unit_price = "
+            "(SELECT MENU.price FROM MENU WHERE MENU.id = REL_MENU_ORDER.menu_id)"
+        },
+    ),
+    # the primary-key serves lookups starting from a menu, the reverse index the ones from an order
+    Index("IX_REL_MENU_ORDER_ORDER", "order_id", "menu_id"),
 )
 
 relation_table_reservation = Table(
@@ -19,6 +37,40 @@
     Base.metadata,
     Column("table_id", ForeignKey("GUEST_TABLE.id"), primary_key=True),
     Column("reservation_id", ForeignKey("RESERVATION.id"), primary_key=True),
+    # the primary-key (table_id, reservation_id) serves lookups starting from a table
+    # the reverse index serves lookups starting from a (date-filtered) reservation
+    Index("IX_REL_TABLE_RESERVATION_RESERVATION", "reservation_id", "table_id"),
+)
+
+# reservations older than the archive horizon are moved out of RESERVATION/REL_TABLE_RESERVATION,
+# the archive keeps the id of the reservation and is partitioned by the month of the reservation
+# @see reservation_archive.ReservationArchiveRepository
+reservation_archive = Table(
+    "RESERVATION_ARCHIVE",
+    Base.metadata,
+    Column("id", Integer, primary_key=True, autoincrement=False),
+    Column("created", DateTime, nullable=False),
+    Column("modified", DateTime, nullable=True),
+    Column("reservation_date", DateTime, nullable=False),
+    Column("time_from", Time, nullable=False),
+    Column("time_until", Time, nullable=False),
+    Column("people", Integer, nullable=False),
+    Column("reservation_name", String(255)),
+    Column("reservation_number", String(10)),
+    # the partition key (YYYY-MM), a partition is purged as a whole
+    Column("archive_month", String(7), nullable=False),
+    Column("archived", DateTime, nullable=False),
+    Index("IX_RESERVATION_ARCHIVE_MONTH", "archive_month"),
+    Index("IX_RESERVATION_ARCHIVE_DATE_TIME", "reservation_date", "time_from"),
+    Index("IX_RESERVATION_ARCHIVE_NUMBER", "reservation_number"),
+)
+
+relation_table_reservation_archive = Table(
+    "REL_TABLE_RESERVATION_ARCHIVE",
+    Base.metadata,
+    Column("table_id", ForeignKey("GUEST_TABLE.id"), primary_key=True),
+    Column("reservation_id", ForeignKey("RESERVATION_ARCHIVE.id"), primary_key=True),
+    Index("IX_REL_TABLE_RESERVATION_ARCHIVE_RESERVATION", "reservation_id", "table_id"),
 )
 
 
@@ -42,6 +94,8 @@ class BaseEntity(Base):
 @dataclass
 class RestaurantEntity(BaseEntity):
     __tablename__ = "RESTAURANT"
+    # the lookup by name and address (find_restaurants_by_name_and_address) and the foreign key of the address
+    __table_args__ = (Index("IX_RESTAURANT_ADDRESS_NAME", "address_id", "name"),)
 
     name: Mapped[str] = mapped_column("name", String(255))
     open_from: Mapped[datetime.time] = mapped_column("open_from")
@@ -54,19 +108,24 @@ class RestaurantEntity(BaseEntity):
     # they are fetched as well when a restaurant is queried
     # if the option for lazy is not defined, SqlAlchemy can raise an error if
     # objects are accessed outside of a SqlAlchemy Session
+    # the collections are loaded with an additional IN-query (selectin) instead of a join,
+    # joining both collections would return a row for every restaurant x menu x table
+    # the strategy can be changed per query, @see RestaurantRepository / RestaurantLoad
     # @see https://docs.sqlalchemy.org/en/20/orm/queryguide/relationships.html
     address: Mapped["AddressEntity"] = relationship(back_populates="restaurants", lazy="joined")
     menus: Mapped[List["MenuEntity"]] = relationship(
-        back_populates="restaurant", lazy="joined", cascade="all, delete-orphan"
+        back_populates="restaurant", lazy="selectin", cascade="all, delete-orphan"
     )
     tables: Mapped[List["TableEntity"]] = relationship(
-        back_populates="restaurant", lazy="joined", cascade="all, delete-orphan"
+        back_populates="restaurant", lazy="selectin", cascade="all, delete-orphan"
     )
 
 
 @dataclass
 class AddressEntity(BaseEntity):
     __tablename__ = "ADDRESS"
+    # the natural key used by RestaurantRepository.find_address, the zip is the most selective column
+    __table_args__ = (Index("IX_ADDRESS_NATURAL_KEY", "zip", "street", "city", "country"),)
 
     street: Mapped[str] = mapped_column("street", String(255))
     city: Mapped[str] = mapped_column("city", String(255))
@@ -79,6 +138,13 @@ class AddressEntity(BaseEntity):
 @dataclass
 class MenuEntity(BaseEntity):
     __tablename__ = "MENU"
+    # the upsert of MenuRepository.save looks up (name, category), get_menu_by_name (restaurant_id, name);
+    # the menu list of a restaurant is read in the order of (category, name)
+    __table_args__ = (
+        Index("IX_MENU_NAME_CATEGORY", "name", "category"),
+        Index("IX_MENU_RESTAURANT_NAME", "restaurant_id", "name"),
+        Index("IX_MENU_RESTAURANT_CATEGORY", "restaurant_id", "category", "name"),
+    )
 
     name: Mapped[str] = mapped_column("name", String(255))
     price: Mapped[float] = mapped_column("price")
@@ -87,12 +153,51 @@ class MenuEntity(BaseEntity):
     restaurant_id: Mapped[int] = mapped_column(ForeignKey("RESTAURANT.id"))
     restaurant: Mapped["RestaurantEntity"] = relationship()
 
-    orders: Mapped[List["OrderEntity"]] = relationship(secondary=relation_menu_order, back_populates="menus")
+    # read-only, the order lines are written by the OrderRepository
+    orders: Mapped[List["OrderEntity"]] = relationship(
+        secondary=relation_menu_order, back_populates="menus", viewonly=True
+    )
+
+
+# full-text index over the name and category of the menus (SQLite FTS5, @see menu_search)
+# the index is an external-content table which stores only the tokens, the triggers keep it in sync
+# with every insert/update/delete of MENU, including bulk statements. restaurant_id is indexed as a
+# token, so the filter by restaurant is part of the full-text query
+MENU_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS MENU_SEARCH USING fts5(name, category, restaurant_id, content='MENU', "
+    "content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS MENU_SEARCH_INSERT AFTER INSERT ON MENU BEGIN "
+    "INSERT INTO MENU_SEARCH(rowid, name, category, restaurant_id) "
+    "VALUES (new.id, new.name, new.category, new.restaurant_id); END",
+    "CREATE TRIGGER IF NOT EXISTS MENU_SEARCH_DELETE AFTER DELETE ON MENU BEGIN "
+    "INSERT INTO MENU_SEARCH(MENU_SEARCH, rowid, name, category, restaurant_id) "
+    "VALUES ('delete', old.id, old.name, old.category, old.restaurant_id); END",
+    # a change of the price does not touch the index
+    "CREATE TRIGGER IF NOT EXISTS MENU_SEARCH_UPDATE AFTER UPDATE OF name, category, restaurant_id ON MENU BEGIN "
+    "INSERT INTO MENU_SEARCH(MENU_SEARCH, rowid, name, category, restaurant_id) "
+    "VALUES ('delete', old.id, old.name, old.category, old.restaurant_id); "
+    "INSERT INTO MENU_SEARCH(rowid, name, category, restaurant_id) "
+    "VALUES (new.id, new.name, new.category, new.restaurant_id); END",
+]
+
+
+def fts5_available(ddl, target, bind, **kw) -> bool:
+    """the full-text index is created for SQLite builds with FTS5"""
+    return bind.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar() == 1
+
+
+for statement in MENU_SEARCH_DDL:
+    event.listen(
+        MenuEntity.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite", callable_=fts5_available)
+    )
+event.listen(MenuEntity.__table__, "before_drop", DDL("DROP TABLE IF EXISTS MENU_SEARCH").execute_if(dialect="sqlite"))
 
 
 @dataclass
 class TableEntity(BaseEntity):
     __tablename__ = "GUEST_TABLE"
+    # the tables of a restaurant and the lookup by table_number (TableRepository.save)
+    __table_args__ = (Index("IX_GUEST_TABLE_RESTAURANT_NUMBER", "restaurant_id", "table_number"),)
 
     table_number: Mapped[str] = mapped_column("table_number", String(255))
     seats: Mapped[int] = mapped_column("seats")
@@ -110,6 +215,13 @@ class TableEntity(BaseEntity):
 @dataclass
 class ReservationEntity(BaseEntity):
     __tablename__ = "RESERVATION"
+    # availability checks query a half-open date range ordered by time_from
+    # AUTOINCREMENT: SQLite would re-use the ids of archived reservations (@see reservation_archive),
+    # a RESERVATION table created before is not changed by migrate (@see missing_autoincrement)
+    __table_args__ = (
+        Index("IX_RESERVATION_DATE_TIME", "reservation_date", "time_from"),
+        {"sqlite_autoincrement": True},
+    )
 
     reservation_date: Mapped[datetime.datetime] = mapped_column("reservation_date")
     time_from: Mapped[datetime.time] = mapped_column("time_from")
@@ -118,14 +230,48 @@ class ReservationEntity(BaseEntity):
     reservation_name: Mapped[str] = mapped_column("reservation_name", String(255))
     reservation_number: Mapped[str] = mapped_column("reservation_number", String(10), unique=True)
 
+    # the tables are loaded with an IN-query by reservation_id (IX_REL_TABLE_RESERVATION_RESERVATION),
+    # a joined-load nests the association table into an outer join which SQLite resolves with a scan
     tables: Mapped[List["TableEntity"]] = relationship(
-        secondary=relation_table_reservation, back_populates="reservations", lazy="joined"
+        secondary=relation_table_reservation, back_populates="reservations", lazy="selectin"
     )
 
 
+@dataclass
+class OccupancyEntity(BaseEntity):
+    """
+    precomputed occupancy of a restaurant per day and time bucket, the rows are maintained by the
+    repositories within the transaction of the change (@see occupancy.OccupancyAggregate)
+    """
+
+    __tablename__ = "RESTAURANT_OCCUPANCY"
+    # the buckets of a restaurant and day are read with one range-scan of the index
+    __table_args__ = (Index("IX_RESTAURANT_OCCUPANCY_DAY", "restaurant_id", "day", "bucket_start", unique=True),)
+
+    restaurant_id: Mapped[int] = mapped_column(ForeignKey("RESTAURANT.id"))
+    day: Mapped[datetime.date] = mapped_column("day")
+    bucket_start: Mapped[datetime.time] = mapped_column("bucket_start")
+    reserved_seats: Mapped[int] = mapped_column("reserved_seats")
+    reserved_tables: Mapped[int] = mapped_column("reserved_tables")
+    # the seats of all tables of the restaurant
+    capacity: Mapped[int] = mapped_column("capacity")
+
+
+@dataclass
+class NumberSequenceEntity(BaseEntity):
+    """named counters, the allocators reserve blocks of numbers by incrementing next_value"""
+
+    __tablename__ = "NUMBER_SEQUENCE"
+
+    name: Mapped[str] = mapped_column("name", String(50), unique=True)
+    next_value: Mapped[int] = mapped_column("next_value")
+
+
 @dataclass
 class OrderEntity(BaseEntity):
     __tablename__ = "TABLE_ORDER"
+    # the orders of a table within a time range (revenue per table/waiter/day, @see OrderRepository)
+    __table_args__ = (Index("IX_TABLE_ORDER_TABLE_CREATED", "table_id", "created"),)
 
     total: Mapped[float] = mapped_column("total")
     waiter: Mapped[str] = mapped_column("waiter", String(255))
@@ -133,4 +279,8 @@ class OrderEntity(BaseEntity):
     table_id: Mapped[int] = mapped_column(ForeignKey("GUEST_TABLE.id"))
     table: Mapped["TableEntity"] = relationship(back_populates="orders")
 
-    menus: Mapped[List["MenuEntity"]] = relationship(secondary=relation_menu_order, back_populates="orders")
+    # read-only, a line written through the relationship would miss its quantity and unit_price;
+    # the lines are written by OrderRepository.create_orders/add_lines/remove_lines
+    menus: Mapped[List["MenuEntity"]] = relationship(
+        secondary=relation_menu_order, back_populates="orders", viewonly=True
+    )
@@ -0,0 +1,193 @@
+"""
+Export of reservations and menus to CSV, JSON-lines or the columnar format (see export_formats)
+
+The rows are streamed from column-level queries and written chunk by chunk, the memory of an export does
+not depend on the number of exported rows. The format is defined by the extension of the file.
+
+  python -m restaurant_app.store.export --db sqlite:///restaurant.db reservations reservations.csv \
+      --restaurant 1 [--from 2024-01-01] [--until 2024-12-31]
+  python -m restaurant_app.store.export --db sqlite:///restaurant.db menus menus.rcol [--restaurant 1]
+"""
+
+import argparse
+import datetime
+import os
+import time
+from contextlib import AbstractContextManager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Self
+
+from sqlalchemy import Select, select, union_all
+from sqlalchemy.orm import Session
+
+from ..infrastructure.logger import LOG
+from .base_repository import BaseRepository
+from .database import SqlAlchemyDatabase
+from .entities import MenuEntity, TableEntity, relation_table_reservation, relation_table_reservation_archive
+from .export_formats import DATETIME, FLOAT, INT, STR, TIME, ExportColumn, ExportWriter, Row, open_writer
+from .reservation_archive import history_views_statement
+
+# rows fetched from the database and written to the file at once
+DEFAULT_EXPORT_CHUNK_SIZE = 5000
+
+RESERVATION_COLUMNS = (
+    ExportColumn("id", INT),
+    ExportColumn("reservation_number", STR),
+    ExportColumn("reservation_date", DATETIME),
+    ExportColumn("time_from", TIME),
+    ExportColumn("time_until", TIME),
+    ExportColumn("people", INT),
+    ExportColumn("reservation_name", STR),
+    # the numbers of the reserved tables separated by ';'
+    ExportColumn("tables", STR),
+)
+MENU_COLUMNS = (
+    ExportColumn("id", INT),
+    ExportColumn("restaurant_id", INT),
+    ExportColumn("category", STR),
+    ExportColumn("name", STR),
+    ExportColumn("price", FLOAT),
+)
+
+
+@dataclass
+class ExportReport:
+    rows: int = 0
+    chunks: int = 0
+    bytes: int = 0
+    duration_s: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.duration_s if self.duration_s > 0 else 0.0
+
+
+class ExportRepository(BaseRepository):
+
+    def __init__(
+        self,
+        session_factory: Callable[..., AbstractContextManager[Session]],
+        session: Session = None,
+        chunk_size: int = DEFAULT_EXPORT_CHUNK_SIZE,
+    ):
+        super().__init__(session_factory=session_factory, session=session)
+        self._chunk_size = chunk_size
+
+    def new_session(self, session: Session) -> Self:
+        return ExportRepository(session_factory=None, session=session, chunk_size=self._chunk_size)
+
+    def stream_reservation_rows(
+        self, restaurant_id: int, date_from: datetime.date = None, date_until: datetime.date = None
+    ) -> Iterator[List[Row]]:
+        """
+        the live and archived reservations of the restaurant in chunks, ordered by date and time.
+        the table numbers are fetched per chunk with one IN-query
+        """
+        with self.get_session() as session:
+            result = session.execute(
+                history_views_statement(restaurant_id, date_from, date_until).execution_options(
+                    yield_per=self._chunk_size
+                )
+            )
+            try:
+                for chunk in result.partitions():
+                    table_numbers: Dict[int, List[str]] = {}
+                    for reservation_id, table_number in session.execute(
+                        reservation_table_numbers_statement([row[0] for row in chunk])
+                    ):
+                        table_numbers.setdefault(reservation_id, []).append(table_number)
+                    yield [(*row, ";".join(table_numbers.get(row[0], ()))) for row in chunk]
+            finally:
+                result.close()
+
+    def stream_menu_rows(self, restaurant_id: Optional[int] = None) -> Iterator[List[Row]]:
+        """the menus (of one or all restaurants) in chunks ordered by restaurant, category and name"""
+        with self.get_session() as session:
+            result = session.execute(
+                menu_export_statement(restaurant_id).execution_options(yield_per=self._chunk_size)
+            )
+            try:
+                yield from result.partitions()
+            finally:
+                result.close()
+
+    def export_reservations(
+        self,
+        path: str,
+        restaurant_id: int,
+        date_from: datetime.date = None,
+        date_until: datetime.date = None,
+        format: str = None,
+    ) -> ExportReport:
+        with open_writer(path, RESERVATION_COLUMNS, format) as writer:
+            return self._export(writer, self.stream_reservation_rows(restaurant_id, date_from, date_until), path)
+
+    def export_menus(self, path: str, restaurant_id: Optional[int] = None, format: str = None) -> ExportReport:
+        with open_writer(path, MENU_COLUMNS, format) as writer:
+            return self._export(writer, self.stream_menu_rows(restaurant_id), path)
+
+    def _export(self, writer: ExportWriter, chunks: Iterator[List[Row]], path: str) -> ExportReport:
+        report = ExportReport()
+        start = time.perf_counter()
+        for chunk in chunks:
+            writer.write_chunk(chunk)
+            report.rows += len(chunk)
+            report.chunks += 1
+        writer.close()
+        report.bytes = os.path.getsize(path)
+        report.duration_s = time.perf_counter() - start
+        LOG.info("export %s: %d rows, %d bytes in %.2f s", path, report.rows, report.bytes, report.duration_s)
+        return report
+
+
+def reservation_table_numbers_statement(reservation_ids: List[int]) -> Select:
+    """the (reservation_id, table_number) pairs of the live and archived reservations"""
+    live, archived = relation_table_reservation, relation_table_reservation_archive
+    tables = union_all(
+        select(live.c.reservation_id, TableEntity.table_number)
+        .join(TableEntity, TableEntity.id == live.c.table_id)
+        .where(live.c.reservation_id.in_(reservation_ids)),
+        select(archived.c.reservation_id, TableEntity.table_number)
+        .join(TableEntity, TableEntity.id == archived.c.table_id)
+        .where(archived.c.reservation_id.in_(reservation_ids)),
+    ).subquery()
+    return select(tables).order_by(tables.c.reservation_id, tables.c.table_number)
+
+
+def menu_export_statement(restaurant_id: Optional[int] = None) -> Select:
+    """the columns of MENU_COLUMNS, ordered along IX_MENU_RESTAURANT_CATEGORY"""
+    statement = select(
+        MenuEntity.id, MenuEntity.restaurant_id, MenuEntity.category, MenuEntity.name, MenuEntity.price
+    ).order_by(MenuEntity.restaurant_id, MenuEntity.category, MenuEntity.name)
+    if restaurant_id is not None:
+        statement = statement.where(MenuEntity.restaurant_id == restaurant_id)
+    return statement
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="the SQLAlchemy url of the database")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_EXPORT_CHUNK_SIZE)
+    parser.add_argument("--restaurant", type=int, help="the id of the restaurant (required for reservations)")
+    parser.add_argument("--from", dest="date_from", type=datetime.date.fromisoformat)
+    parser.add_argument("--until", dest="date_until", type=datetime.date.fromisoformat)
+    parser.add_argument("data", choices=["reservations", "menus"])
+    parser.add_argument("file", help="a .csv, .jsonl or .rcol file")
+    args = parser.parse_args()
+
+    db = SqlAlchemyDatabase(args.db)
+    repo = ExportRepository(db.managed_session, chunk_size=args.chunk_size)
+    if args.data == "reservations":
+        if args.restaurant is None:
+            parser.error("--restaurant is required to export reservations")
+        report = repo.export_reservations(args.file, args.restaurant, args.date_from, args.date_until)
+    else:
+        report = repo.export_menus(args.file, args.restaurant)
+    print(
+        "%d rows, %d bytes in %.2f s (%.0f rows/s)"
+        % (report.rows, report.bytes, report.duration_s, report.rows_per_second)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+File formats of the export: CSV, JSON-lines and a compact columnar binary format
+
+The writers get the rows chunk by chunk and write every chunk at once, only one chunk is held in memory.
+The columnar format (.rcol) stores a chunk as a row group, within a row group the values of a column are
+stored together as a zlib-compressed block:
+
+  file      := b"RCOL" version:u8 columns:u16 (kind:u8 name_length:u16 name:utf-8)* row_group*
+  row_group := rows:u32 (block_length:u32 block)*          one block per column
+  block     := int/float/datetime/time: rows x i64/f64     datetime/time as microseconds
+               str: rows x u32 (length of the utf-8 value) followed by the utf-8 values
+
+all numbers are little-endian, the values must not be NULL.
+"""
+
+import csv
+import datetime
+import json
+import struct
+import sys
+import zlib
+from abc import ABC, abstractmethod
+from array import array
+from dataclasses import dataclass
+from typing import IO, Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+INT, FLOAT, STR, DATETIME, TIME = "int", "float", "str", "datetime", "time"
+FORMATS = ("csv", "jsonl", "rcol")
+
+MAGIC = b"RCOL"
+VERSION = 1
+_KIND_CODES = {INT: 1, FLOAT: 2, STR: 3, DATETIME: 4, TIME: 5}
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+Row = Sequence[Any]
+
+
+@dataclass(frozen=True, slots=True)
+class ExportColumn:
+    name: str
+    kind: str
+
+
+def format_of(path: str) -> str:
+    """the format defined by the extension of the file"""
+    extension = path.rsplit(".", 1)[-1].lower()
+    if extension == "json":
+        return "jsonl"
+    if extension not in FORMATS:
+        raise ValueError("unknown export format '%s', supported are %s" % (extension, ", ".join(FORMATS)))
+    return extension
+
+
+class ExportWriter(ABC):
+    """writes the rows of an export to a file, use as context-manager"""
+
+    def __init__(self, path: str, columns: Sequence[ExportColumn], binary: bool = False):
+        self.columns = list(columns)
+        self.rows = 0
+        if binary:
+            self._file: IO = open(path, "wb")
+        else:
+            self._file = open(path, "w", newline="", encoding="utf-8")
+
+    def write_chunk(self, rows: List[Row]) -> None:
+        self._write(rows)
+        self.rows += len(rows)
+
+    @abstractmethod
+    def _write(self, rows: List[Row]) -> None:
+        """write the rows of one chunk in the format of the writer"""
+        pass
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class CsvWriter(ExportWriter):
+    def __init__(self, path: str, columns: Sequence[ExportColumn]):
+        super().__init__(path, columns)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([column.name for column in self.columns])
+        self._text = _text_converters(self.columns)
+
+    def _write(self, rows: List[Row]) -> None:
+        text = self._text
+        self._writer.writerows([[convert(value) for convert, value in zip(text, row)] for row in rows])
+
+
+class JsonLinesWriter(ExportWriter):
+    def __init__(self, path: str, columns: Sequence[ExportColumn]):
+        super().__init__(path, columns)
+        self._names = [column.name for column in self.columns]
+        self._text = _text_converters(self.columns, keep_numbers=True)
+
+    def _write(self, rows: List[Row]) -> None:
+        names, text = self._names, self._text
+        self._file.write(
+            "".join(
+                json.dumps(dict(zip(names, [convert(value) for convert, value in zip(text, row)])), ensure_ascii=False)
+                + "\n"
+                for row in rows
+            )
+        )
+
+
+class ColumnarWriter(ExportWriter):
+    def __init__(self, path: str, columns: Sequence[ExportColumn], level: int = 6):
+        super().__init__(path, columns, binary=True)
+        self._level = level
+        header = [MAGIC, struct.pack("<BH", VERSION, len(self.columns))]
+        for column in self.columns:
+            name = column.name.encode("utf-8")
+            header.append(struct.pack("<BH", _KIND_CODES[column.kind], len(name)) + name)
+        self._file.write(b"".join(header))
+
+    def _write(self, rows: List[Row]) -> None:
+        if not rows:
+            return
+        parts = [struct.pack("<I", len(rows))]
+        for index, column in enumerate(self.columns):
+            block = zlib.compress(encode_column(column.kind, [row[index] for row in rows]), self._level)
+            parts.append(struct.pack("<I", len(block)))
+            parts.append(block)
+        self._file.write(b"".join(parts))
+
+
+def open_writer(path: str, columns: Sequence[ExportColumn], format: str = None) -> ExportWriter:
+    """the writer of the format, without a format it is defined by the extension of the file"""
+    writers = {"csv": CsvWriter, "jsonl": JsonLinesWriter, "rcol": ColumnarWriter}
+    return writers[format or format_of(path)](path, columns)
+
+
+def encode_column(kind: str, values: List[Any]) -> bytes:
+    if kind == STR:
+        encoded = [value.encode("utf-8") for value in values]
+        return _packed("I", [len(value) for value in encoded]) + b"".join(encoded)
+    if kind == FLOAT:
+        return _packed("d", values)
+    if kind == DATETIME:
+        return _packed("q", [(value - _EPOCH) // _MICROSECOND for value in values])
+    if kind == TIME:
+        return _packed("q", [_time_micros(value) for value in values])
+    return _packed("q", values)
+
+
+def decode_column(kind: str, data: bytes, rows: int) -> List[Any]:
+    if kind == STR:
+        lengths = _unpacked("I", data[: 4 * rows])
+        values, offset = [], 4 * rows
+        for length in lengths:
+            values.append(data[offset : offset + length].decode("utf-8"))
+            offset += length
+        return values
+    if kind == FLOAT:
+        return list(_unpacked("d", data))
+    numbers = _unpacked("q", data)
+    if kind == DATETIME:
+        return [_EPOCH + value * _MICROSECOND for value in numbers]
+    if kind == TIME:
+        return [(datetime.datetime.min + value * _MICROSECOND).time() for value in numbers]
+    return list(numbers)
+
+
+class ColumnarReader:
+    """reads a .rcol file row group by row group"""
+
+    def __init__(self, path: str):
+        self._path = path
+        with open(path, "rb") as file:
+            self.columns, self._data_offset = _read_header(file)
+
+    def row_groups(self) -> Iterator[List[List[Any]]]:
+        """the columns (a list of values per column) of every row group"""
+        with open(self._path, "rb") as file:
+            file.seek(self._data_offset)
+            while header := file.read(4):
+                (rows,) = struct.unpack("<I", header)
+                group = []
+                for column in self.columns:
+                    (length,) = struct.unpack("<I", file.read(4))
+                    group.append(decode_column(column.kind, zlib.decompress(file.read(length)), rows))
+                yield group
+
+    def rows(self) -> Iterator[Tuple[Any, ...]]:
+        for group in self.row_groups():
+            yield from zip(*group)
+
+
+def _read_header(file: IO) -> Tuple[List[ExportColumn], int]:
+    if file.read(4) != MAGIC:
+        raise ValueError("not a columnar export file")
+    version, count = struct.unpack("<BH", file.read(3))
+    if version != VERSION:
+        raise ValueError("unsupported version %d of the columnar export file" % version)
+    kinds = {code: kind for kind, code in _KIND_CODES.items()}
+    columns = []
+    for _ in range(count):
+        code, length = struct.unpack("<BH", file.read(3))
+        columns.append(ExportColumn(file.read(length).decode("utf-8"), kinds[code]))
+    return columns, file.tell()
+
+
+def _text_converters(columns: Sequence[ExportColumn], keep_numbers: bool = False) -> List[Callable[[Any], Any]]:
+    """the conversion of the values for the text formats: dates/times as ISO-8601"""
+    converters: Dict[str, Callable[[Any], Any]] = {
+        DATETIME: datetime.datetime.isoformat,
+        TIME: datetime.time.isoformat,
+        STR: _identity,
+        INT: _identity if keep_numbers else str,
+        FLOAT: _identity if keep_numbers else repr,
+    }
+    return [converters[column.kind] for column in columns]
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _time_micros(value: datetime.time) -> int:
+    return ((value.hour * 60 + value.minute) * 60 + value.second) * 1_000_000 + value.microsecond
+
+
+def _packed(typecode: str, values: List[Any]) -> bytes:
+    values = array(typecode, values)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpacked(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
@@ -0,0 +1,91 @@
+import csv
+import datetime
+import json
+
+from .entities import MenuEntity, ReservationEntity, TableEntity
+from .export import RESERVATION_COLUMNS, ExportRepository
+from .export_formats import ColumnarReader
+from .repository_test_helpers import create_restaurant_data, get_database
+from .reservation_archive import ReservationArchiveRepository
+from .reservation_repo import ReservationRepository
+from .restaurant_repository import RestaurantRepository
+
+
+def create_data(managed_session) -> int:
+    restaurants = RestaurantRepository(managed_session)
+
+    def action(session):
+        restaurant = restaurants.new_session(session).save(create_restaurant_data())
+        tables = [TableEntity(table_number="T%d" % i, seats=4, restaurant=restaurant) for i in range(2)]
+        session.add_all(tables)
+        session.add_all(
+            MenuEntity(name="Menu %d" % i, category="Main", price=10.0 + i, restaurant=restaurant) for i in range(3)
+        )
+        reservations = []
+        for i in range(5):
+            reservation = ReservationEntity(
+                reservation_date=datetime.datetime(2024, 7, 1 + i),
+                time_from=datetime.time(18, 30),
+                time_until=datetime.time(20, 0),
+                people=2,
+                reservation_name="Gäst %d" % i,
+                reservation_number="%d" % i,
+            )
+            reservation.tables.extend(tables[: 1 + i % 2])
+            reservations.append(reservation)
+        ReservationRepository(managed_session).new_session(session).save_many(reservations)
+        return [restaurant.id]
+
+    return restaurants.unit_of_work(action)[0]
+
+
+def test_export_reservations(tmp_path):
+    managed_session = get_database().managed_session
+    restaurant_id = create_data(managed_session)
+    # the first two reservations are archived, the export contains live and archived reservations
+    ReservationArchiveRepository(managed_session).archive(datetime.datetime(2024, 7, 3))
+    repo = ExportRepository(managed_session, chunk_size=2)
+
+    report = repo.export_reservations(str(tmp_path / "r.csv"), restaurant_id)
+    assert (report.rows, report.chunks) == (5, 3)
+    with open(tmp_path / "r.csv", newline="", encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))
+    assert [row["tables"] for row in rows] == ["T0", "T0;T1", "T0", "T0;T1", "T0"]
+    assert rows[1]["reservation_date"] == "2024-07-02T00:00:00" and rows[1]["time_from"] == "18:30:00"
+
+    repo.export_reservations(
+        str(tmp_path / "r.jsonl"), restaurant_id, datetime.date(2024, 7, 2), datetime.date(2024, 7, 3)
+    )
+    with open(tmp_path / "r.jsonl", encoding="utf-8") as file:
+        lines = [json.loads(line) for line in file]
+    assert [(line["reservation_number"], line["people"], line["reservation_name"]) for line in lines] == [
+        ("1", 2, "Gäst 1"),
+        ("2", 2, "Gäst 2"),
+    ]
+
+    repo.export_reservations(str(tmp_path / "r.rcol"), restaurant_id)
+    reader = ColumnarReader(str(tmp_path / "r.rcol"))
+    assert reader.columns == list(RESERVATION_COLUMNS)
+    assert len(list(reader.row_groups())) == 3
+    rows = list(reader.rows())
+    assert rows[4] == (
+        5,
+        "4",
+        datetime.datetime(2024, 7, 5),
+        datetime.time(18, 30),
+        datetime.time(20),
+        2,
+        "Gäst 4",
+        "T0",
+    )
+
+
+def test_export_menus(tmp_path):
+    managed_session = get_database().managed_session
+    restaurant_id = create_data(managed_session)
+    repo = ExportRepository(managed_session)
+
+    assert repo.export_menus(str(tmp_path / "m.rcol"), restaurant_id).rows == 3
+    rows = list(ColumnarReader(str(tmp_path / "m.rcol")).rows())
+    assert [(row[3], row[4]) for row in rows] == [("Menu 0", 10.0), ("Menu 1", 11.0), ("Menu 2", 12.0)]
+    assert repo.export_menus(str(tmp_path / "m.csv"), restaurant_id + 1).rows == 0
@@ -0,0 +1,416 @@
+import bisect
+import contextvars
+import functools
+import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Engine, event
+from sqlalchemy.orm import Mapper
+
+from ..infrastructure.logger import LOG
+from .base_repository import BaseRepository
+
+# upper bounds of the latency buckets in milliseconds, the last bucket takes everything above
+DEFAULT_BUCKETS_MS: Tuple[float, ...] = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+# a SELECT repeated this many times within one managed_session is reported as N+1 pattern
+DEFAULT_N_PLUS_ONE_THRESHOLD = 5
+
+
+class Histogram:
+    """latency histogram with fixed buckets, percentiles are approximated by the upper bound of the bucket"""
+
+    def __init__(self, buckets_ms: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self._bounds = tuple(buckets_ms)
+        self._counts = [0] * (len(self._bounds) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, duration_ms: float) -> None:
+        self._counts[bisect.bisect_left(self._bounds, duration_ms)] += 1
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+
+    def percentile(self, p: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank and count > 0:
+                return self._bounds[index] if index < len(self._bounds) else self.max_ms
+        return self.max_ms
+
+    def buckets(self) -> Dict[str, int]:
+        labels = ["<=%g" % bound for bound in self._bounds] + [">%g" % self._bounds[-1]]
+        return dict(zip(labels, self._counts))
+
+
+@dataclass
+class MethodStats:
+    """the metrics of one repository method (outermost call only)"""
+
+    name: str
+    calls: int = 0
+    errors: int = 0
+    statements: int = 0
+    sql_ms: float = 0.0
+    rows_affected: int = 0
+    entities_loaded: int = 0
+    mean_ms: float = 0.0
+    p50_ms: float = 0.0
+    p95_ms: float = 0.0
+    p99_ms: float = 0.0
+    max_ms: float = 0.0
+    histogram: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class NPlusOne:
+    """a SELECT with the same shape which was repeated within one managed_session"""
+
+    method: Optional[str]
+    statement: str
+    repetitions: int
+
+
+@dataclass
+class InstrumentationSnapshot:
+    statements: int
+    sql_ms: float
+    methods: Dict[str, MethodStats]
+    n_plus_one: List[NPlusOne]
+    # statements which raised an error, they are not part of statements and sql_ms
+    statement_errors: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """a json-serializable representation of the snapshot"""
+        return asdict(self)
+
+
+class _MethodScope:
+    def __init__(self, name: str):
+        self.name = name
+        self.statements = 0
+        self.sql_ms = 0.0
+        self.rows_affected = 0
+        self.entities_loaded = 0
+
+
+class _SessionScope:
+    def __init__(self):
+        self.shapes: Dict[str, NPlusOne] = {}
+        self.counts: Dict[str, int] = {}
+
+
+_method_scope: contextvars.ContextVar[Optional[_MethodScope]] = contextvars.ContextVar("method_scope", default=None)
+_session_scope: contextvars.ContextVar[Optional[_SessionScope]] = contextvars.ContextVar("session_scope", default=None)
+
+
+class Instrumentation:
+    """
+    opt-in metrics of the database access, collected with engine events:
+    the SQL statements and their duration, the latency of repository methods (see instrument)
+    and repeated SELECTs of the same shape within one managed_session (N+1 pattern)
+    """
+
+    def __init__(
+        self,
+        n_plus_one_threshold: int = DEFAULT_N_PLUS_ONE_THRESHOLD,
+        buckets_ms: Sequence[float] = DEFAULT_BUCKETS_MS,
+        logger: logging.Logger = LOG,
+    ):
+        self._n_plus_one_threshold = n_plus_one_threshold
+        self._buckets_ms = buckets_ms
+        self._logger = logger
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._statements = 0
+            self._statement_errors = 0
+            self._sql_ms = 0.0
+            self._methods: Dict[str, Tuple[MethodStats, Histogram]] = {}
+            self._n_plus_one: List[NPlusOne] = []
+
+    def attach(self, engine: Engine) -> None:
+        """register the event listeners on the engine"""
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+        _listen_entity_loads()
+
+    def detach(self, engine: Engine) -> None:
+        event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+        event.remove(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.remove(engine, "handle_error", self._handle_error)
+
+    @contextmanager
+    def session_scope(self) -> Iterator[None]:
+        """the scope of the N+1 detection, used by SqlAlchemyDatabase.managed_session"""
+        if _session_scope.get() is not None:
+            # nested sessions (e.g. the scoped session of a unit_of_work) belong to the outer scope
+            yield
+            return
+        token = _session_scope.set(_SessionScope())
+        try:
+            yield
+        finally:
+            _session_scope.reset(token)
+
+    def instrument(self, repository: BaseRepository) -> "InstrumentedRepository":
+        return InstrumentedRepository(repository, self)
+
+    def snapshot(self) -> InstrumentationSnapshot:
+        with self._lock:
+            methods = {}
+            for name, (stats, histogram) in self._methods.items():
+                methods[name] = MethodStats(
+                    name=name,
+                    calls=stats.calls,
+                    errors=stats.errors,
+                    statements=stats.statements,
+                    sql_ms=stats.sql_ms,
+                    rows_affected=stats.rows_affected,
+                    entities_loaded=stats.entities_loaded,
+                    mean_ms=histogram.total_ms / histogram.count if histogram.count else 0.0,
+                    p50_ms=histogram.percentile(50),
+                    p95_ms=histogram.percentile(95),
+                    p99_ms=histogram.percentile(99),
+                    max_ms=histogram.max_ms,
+                    histogram=histogram.buckets(),
+                )
+            n_plus_one = [NPlusOne(n.method, n.statement, n.repetitions) for n in self._n_plus_one]
+            return InstrumentationSnapshot(
+                self._statements, self._sql_ms, methods, n_plus_one, statement_errors=self._statement_errors
+            )
+
+    def log_snapshot(self, level: int = logging.INFO) -> None:
+        """logging sink, writes one line per repository method to the application logger"""
+        snapshot = self.snapshot()
+        self._logger.log(
+            level,
+            "sql: %d statements, %.1f ms, %d errors",
+            snapshot.statements,
+            snapshot.sql_ms,
+            snapshot.statement_errors,
+        )
+        for stats in sorted(snapshot.methods.values(), key=lambda s: s.name):
+            self._logger.log(
+                level,
+                "%s: %d calls, %d errors, p50 %.1f ms, p95 %.1f ms, max %.1f ms, %d statements, "
+                "%d rows affected, %d entities loaded",
+                stats.name,
+                stats.calls,
+                stats.errors,
+                stats.p50_ms,
+                stats.p95_ms,
+                stats.max_ms,
+                stats.statements,
+                stats.rows_affected,
+                stats.entities_loaded,
+            )
+        for n_plus_one in snapshot.n_plus_one:
+            self._logger.log(
+                level, "N+1: %s repeated %d times: %s", n_plus_one.method, n_plus_one.repetitions, n_plus_one.statement
+            )
+
+    @contextmanager
+    def method_scope(self, name: str) -> Iterator[None]:
+        """measure the statements and the latency of a repository method, nested calls count for the outer one"""
+        if _method_scope.get() is not None:
+            yield
+            return
+        scope = _MethodScope(name)
+        token = _method_scope.set(scope)
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            _method_scope.reset(token)
+            self._record_method(scope, (time.perf_counter() - start) * 1000.0, failed)
+
+    def measure_call(self, name: str, method: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        measure a call of a repository method with a method scope. a returned generator (of a generator
+        function or of a method which checks its arguments and returns the generator) is measured until
+        it is exhausted instead, @see measure_generator
+        """
+        if _method_scope.get() is not None:
+            result = method(*args, **kwargs)
+            return self.measure_generator(name, result) if inspect.isgenerator(result) else result
+        scope = _MethodScope(name)
+        token = _method_scope.set(scope)
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except BaseException:
+            self._record_method(scope, (time.perf_counter() - start) * 1000.0, True)
+            raise
+        finally:
+            _method_scope.reset(token)
+        if inspect.isgenerator(result):
+            return self.measure_generator(name, result)
+        self._record_method(scope, (time.perf_counter() - start) * 1000.0, False)
+        return result
+
+    def measure_generator(self, name: str, generator: Iterator[Any]) -> Iterator[Any]:
+        """
+        measure a generator until it is exhausted or closed. the scope is only active while the generator
+        produces the next item, the code of the consumer between the items is not attributed to the method
+        """
+        if _method_scope.get() is not None:
+            yield from generator
+            return
+        scope = _MethodScope(name)
+        start = time.perf_counter()
+        failed = False
+        try:
+            while True:
+                token = _method_scope.set(scope)
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    return
+                finally:
+                    _method_scope.reset(token)
+                yield item
+        except GeneratorExit:
+            raise
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            close = getattr(generator, "close", None)
+            if close is not None:
+                close()
+            self._record_method(scope, (time.perf_counter() - start) * 1000.0, failed)
+
+    def _record_method(self, scope: _MethodScope, duration_ms: float, failed: bool) -> None:
+        with self._lock:
+            if scope.name not in self._methods:
+                self._methods[scope.name] = (MethodStats(scope.name), Histogram(self._buckets_ms))
+            stats, histogram = self._methods[scope.name]
+            stats.calls += 1
+            stats.errors += 1 if failed else 0
+            stats.statements += scope.statements
+            stats.sql_ms += scope.sql_ms
+            stats.rows_affected += scope.rows_affected
+            stats.entities_loaded += scope.entities_loaded
+            histogram.record(duration_ms)
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        duration_ms = (time.perf_counter() - conn.info["instrumentation_start"].pop()[1]) * 1000.0
+        is_select = statement.lstrip()[:6].upper() == "SELECT"
+        with self._lock:
+            self._statements += 1
+            self._sql_ms += duration_ms
+
+        method = _method_scope.get()
+        if method is not None:
+            method.statements += 1
+            method.sql_ms += duration_ms
+            if not is_select and cursor.rowcount > 0:
+                method.rows_affected += cursor.rowcount
+
+        session = _session_scope.get()
+        if session is not None and is_select:
+            count = session.counts.get(statement, 0) + 1
+            session.counts[statement] = count
+            if count == self._n_plus_one_threshold:
+                n_plus_one = NPlusOne(method.name if method else None, statement, count)
+                session.shapes[statement] = n_plus_one
+                with self._lock:
+                    self._n_plus_one.append(n_plus_one)
+                self._logger.warning("N+1: %s repeats the statement: %s", n_plus_one.method, statement)
+            elif count > self._n_plus_one_threshold:
+                session.shapes[statement].repetitions = count
+
+    def _handle_error(self, exception_context) -> None:
+        """
+        a failed statement does not reach after_cursor_execute, its start is removed from the stack of the
+        (pooled) connection. the entry is found by the execution context, an error raised after the statement
+        (e.g. while fetching the rows) has no entry left
+        """
+        connection = exception_context.connection
+        stack = connection.info.get("instrumentation_start") if connection is not None else None
+        if not stack:
+            return
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index][0] is exception_context.execution_context:
+                del stack[index]
+                with self._lock:
+                    self._statement_errors += 1
+                return
+
+
+# the transaction and session handling of BaseRepository, the repository methods called within are measured
+_NOT_MEASURED = frozenset(["unit_of_work", "get_session", "with_session", "sync", "cache_stats"])
+
+
+class InstrumentedRepository:
+    """
+    proxy of a repository which measures every public method with Instrumentation.measure_call.
+    the returned generators (e.g. of the stream methods) are measured until they are exhausted
+    """
+
+    def __init__(self, repository: BaseRepository, instrumentation: Instrumentation):
+        self._repository = repository
+        self._instrumentation = instrumentation
+        self._prefix = type(repository).__name__
+
+    @property
+    def repository(self) -> BaseRepository:
+        return self._repository
+
+    def new_session(self, session) -> "InstrumentedRepository":
+        return InstrumentedRepository(self._repository.new_session(session), self._instrumentation)
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._repository, name)
+        if name.startswith("_") or name in _NOT_MEASURED or not callable(attribute):
+            return attribute
+        scope_name = "%s.%s" % (self._prefix, name)
+        instrumentation = self._instrumentation
+
+        @functools.wraps(attribute)
+        def measure(*args, **kwargs):
+            return instrumentation.measure_call(scope_name, attribute, *args, **kwargs)
+
+        return measure
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    # a stack, the listener can be re-entered by statements executed within other statements
+    conn.info.setdefault("instrumentation_start", []).append((context, time.perf_counter()))
+
+
+_entity_loads_lock = threading.Lock()
+_entity_loads_registered = False
+
+
+def _listen_entity_loads() -> None:
+    """count the entities loaded from result rows, registered once for all mapped entities"""
+    global _entity_loads_registered
+    with _entity_loads_lock:
+        if not _entity_loads_registered:
+            event.listen(Mapper, "load", _entity_loaded)
+            _entity_loads_registered = True
+
+
+def _entity_loaded(target, context) -> None:
+    method = _method_scope.get()
+    if method is not None:
+        method.entities_loaded += 1
@@ -0,0 +1,120 @@
+import json
+import logging
+from typing import Any, List
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from .database import SqlAlchemyDatabase
+from .entities import MenuEntity
+from .instrumentation import Histogram, Instrumentation
+from .menu_repository import MenuRepository
+from .repository_test_helpers import create_restaurant_data
+from .restaurant_repository import RestaurantLoad, RestaurantRepository
+
+
+def get_instrumented_database(instrumentation: Instrumentation) -> SqlAlchemyDatabase:
+    db = SqlAlchemyDatabase("sqlite://", auto_commit=True, instrumentation=instrumentation)
+    db.create_database()
+    return db
+
+
+def test_histogram_percentiles():
+    histogram = Histogram(buckets_ms=(1, 10, 100))
+    for duration in (0.5, 0.7, 5, 50, 500):
+        histogram.record(duration)
+    assert histogram.percentile(40) == 1
+    assert histogram.percentile(60) == 10
+    assert histogram.percentile(100) == 500
+    assert histogram.buckets() == {"<=1": 2, "<=10": 1, "<=100": 1, ">100": 1}
+
+
+def test_repository_methods_are_measured():
+    instrumentation = Instrumentation()
+    db = get_instrumented_database(instrumentation)
+    repo = instrumentation.instrument(RestaurantRepository(db.managed_session))
+    instrumentation.reset()
+
+    restaurant = create_restaurant_data()
+    restaurant.menus = [MenuEntity(name="Menu%d" % i, category="Main", price=10.0) for i in range(3)]
+    restaurant = repo.save(restaurant)
+    for _ in range(3):
+        assert len(repo.get_restaurant_by_id(restaurant.id).menus) == 3
+    assert len(list(repo.stream_restaurants())) == 1
+
+    snapshot = instrumentation.snapshot()
+    save = snapshot.methods["RestaurantRepository.save"]
+    assert save.calls == 1
+    assert save.statements > 0
+    assert save.rows_affected > 0
+    lookup = snapshot.methods["RestaurantRepository.get_restaurant_by_id"]
+    assert lookup.calls == 3
+    # the restaurant (with its address), its menus and its tables are loaded with three statements
+    assert lookup.statements == 3 * 3
+    assert lookup.entities_loaded == 3 * 5
+    assert sum(lookup.histogram.values()) == 3
+    assert snapshot.methods["RestaurantRepository.stream_restaurants"].calls == 1
+    # the generator returned by stream_restaurants is measured until it is exhausted
+    assert snapshot.methods["RestaurantRepository.stream_restaurants"].statements > 0
+    assert snapshot.statements >= save.statements + lookup.statements
+    assert snapshot.n_plus_one == []
+    json.dumps(snapshot.to_dict())
+
+
+def test_n_plus_one_is_detected_within_a_session(caplog):
+    instrumentation = Instrumentation(n_plus_one_threshold=3)
+    db = get_instrumented_database(instrumentation)
+    restaurant = RestaurantRepository(db.managed_session).save(create_restaurant_data())
+    repo = instrumentation.instrument(MenuRepository(db.managed_session))
+
+    # separate sessions do not count as N+1
+    for i in range(5):
+        repo.get_menu_by_name("Menu%d" % i, restaurant.id)
+    assert instrumentation.snapshot().n_plus_one == []
+
+    def action(session) -> List[Any]:
+        menus = repo.new_session(session)
+        return [menus.get_menu_by_name("Menu%d" % i, restaurant.id) for i in range(5)]
+
+    with caplog.at_level(logging.WARNING, logger="App"):
+        repo.unit_of_work(action)
+    n_plus_one = instrumentation.snapshot().n_plus_one
+    assert len(n_plus_one) == 1
+    assert n_plus_one[0].method == "MenuRepository.get_menu_by_name"
+    assert n_plus_one[0].repetitions == 5
+    assert "N+1" in caplog.text
+
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger="App"):
+        instrumentation.log_snapshot()
+    assert "MenuRepository.get_menu_by_name: 10 calls" in caplog.text
+
+
+def test_failed_statements_are_counted():
+    instrumentation = Instrumentation()
+    db = get_instrumented_database(instrumentation)
+    instrumentation.reset()
+
+    with db.engine.connect() as connection:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.exec_driver_sql("SELECT * FROM MISSING_TABLE")
+        # the start times of the failed statements are not left on the connection
+        assert connection.info["instrumentation_start"] == []
+        connection.exec_driver_sql("SELECT 1")
+
+    snapshot = instrumentation.snapshot()
+    assert snapshot.statements == 1
+    assert snapshot.statement_errors == 3
+
+
+def test_stream_with_invalid_argument_fails_on_call():
+    instrumentation = Instrumentation()
+    db = get_instrumented_database(instrumentation)
+    repo = instrumentation.instrument(RestaurantRepository(db.managed_session))
+    instrumentation.reset()
+
+    with pytest.raises(ValueError):
+        repo.stream_restaurants(load=RestaurantLoad.JOINED)
+    stats = instrumentation.snapshot().methods["RestaurantRepository.stream_restaurants"]
+    assert (stats.calls, stats.errors) == (1, 1)
@@ -1,19 +1,41 @@
 from contextlib import AbstractContextManager
-from typing import Callable, List, Self
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Self, Tuple
 
+from sqlalchemy import Select, or_, select, text, tuple_
 from sqlalchemy.orm import Session
 
-from .base_repository import BaseRepository
-from .entities import MenuEntity
+from ..infrastructure.cache import CacheBackend
+from .base_repository import DEFAULT_BATCH_SIZE, BaseRepository, batched
+from .entities import MENU_SEARCH_DDL, MenuEntity, fts5_available
+from .menu_search import (
+    DEFAULT_SEARCH_LIMIT,
+    match_expression,
+    menu_like_statement,
+    menu_search_statement,
+    rebuild_statement,
+    reset_search_index_available,
+    search_index_available,
+    search_tokens,
+)
+from .pagination import DEFAULT_PAGE_SIZE, DEFAULT_STREAM_BATCH_SIZE, Page, keyset_page, stream
+from .restaurant_repository import restaurant_cache_keys
+from .views import MenuItemView, MenuSearchHit
+
+MenuCursor = Tuple[str, str, int]
 
 
 class MenuRepository(BaseRepository):
 
-    def __init__(self, session_factory: Callable[..., AbstractContextManager[Session]], session: Session = None):
-        super().__init__(session_factory=session_factory, session=session)
+    def __init__(
+        self,
+        session_factory: Callable[..., AbstractContextManager[Session]],
+        session: Session = None,
+        cache: CacheBackend = None,
+    ):
+        super().__init__(session_factory=session_factory, session=session, cache=cache)
 
     def new_session(self, session: Session) -> Self:
-        return MenuRepository(session_factory=None, session=session)
+        return MenuRepository(session_factory=None, session=session, cache=self._cache)
 
     def save(self, menu: MenuEntity) -> MenuEntity:
         menu_to_save = None
@@ -21,7 +43,7 @@ def save(self, menu: MenuEntity) -> MenuEntity:
             menu_id = menu.id or 0
             menu_to_save = MenuEntity()
             if menu_id > 0:
-                menu_to_save = session.get(MenuEntity, id)
+                menu_to_save = session.get(MenuEntity, menu.id)
                 if menu_to_save is None:
                     menu_to_save = MenuEntity()
             else:
@@ -41,26 +63,146 @@ def save(self, menu: MenuEntity) -> MenuEntity:
             menu_to_save.restaurant = menu.restaurant
             session.add(menu_to_save)
             session.flush()
+            self._invalidate(session, menu_cache_keys([menu_to_save]))
         return menu_to_save
 
+    def save_many(self, menus: Iterable[MenuEntity], batch_size: int = DEFAULT_BATCH_SIZE) -> List[MenuEntity]:
+        """
+        save the menus with the same upsert semantics as save (by id or by name and category).
+        existing entries are resolved with one query per batch, all changes are written with a single flush
+        """
+        saved: List[MenuEntity] = []
+        # the natural key of the entries saved so far, includes the new (not yet flushed) entries
+        by_key: Dict[Tuple[str, str], MenuEntity] = {}
+        with self.get_session() as session:
+            for batch in batched(menus, batch_size):
+                existing = session.execute(existing_menus_statement(batch)).scalars()
+                merged = merge_menus(batch, existing, by_key)
+                session.add_all(merged)
+                saved.extend(merged)
+            session.flush()
+            self._invalidate(session, menu_cache_keys(saved))
+        return saved
+
     def get_menu_by_name(self, name: str, res_id: int) -> MenuEntity:
-        menu = None
+        statement = select(MenuEntity).where(MenuEntity.name == name).where(MenuEntity.restaurant_id == res_id)
+        return self.with_session(lambda session: session.scalars(statement.limit(1)).first())
+
+    def search_menus(
+        self, query: str, restaurant_id: Optional[int] = None, limit: int = DEFAULT_SEARCH_LIMIT, prefix: bool = True
+    ) -> List[MenuSearchHit]:
+        """
+        full-text search over the name and category of the menus (of all restaurants or the given one),
+        every word of the query needs to match; the best matches first. SQLite uses the FTS5 index
+        MENU_SEARCH, without the index (other databases, SQLite without FTS5 or before rebuild_search_index)
+        a substring match without ranking is used
+        """
+        tokens = search_tokens(query)
+        if not tokens or limit <= 0:
+            return []
         with self.get_session() as session:
-            menu = (
-                session.query(MenuEntity)
-                .filter(MenuEntity.name == name)
-                .filter(MenuEntity.restaurant_id == res_id)
-                .first()
-            )
-        return menu
+            if search_index_available(session):
+                statement = menu_search_statement(match_expression(tokens, restaurant_id, prefix), limit)
+            else:
+                statement = menu_like_statement(tokens, restaurant_id, limit)
+            return [MenuSearchHit(*row) for row in session.execute(statement)]
+
+    def rebuild_search_index(self) -> None:
+        """create the full-text index if it is missing and fill it from the menus (SQLite with FTS5 only)"""
+        with self.get_session() as session:
+            if session.get_bind().dialect.name != "sqlite" or not fts5_available(None, None, session.connection()):
+                return
+            for statement in MENU_SEARCH_DDL:
+                session.execute(text(statement))
+            session.execute(rebuild_statement())
+            reset_search_index_available(session)
 
     def get_menu_list(self, res_id: int) -> List[MenuEntity]:
-        menus: List[MenuEntity] = []
+        return self._cached(menus_cache_key(res_id), lambda: self._get_menu_list(res_id))
+
+    def _get_menu_list(self, res_id: int) -> List[MenuEntity]:
+        statement = (
+            select(MenuEntity).where(MenuEntity.restaurant_id == res_id).order_by(MenuEntity.category, MenuEntity.name)
+        )
+        return self.with_session(lambda session: list(session.scalars(statement)))
+
+    def get_menu_views(self, res_id: int) -> List[MenuItemView]:
+        """the menu of the restaurant as read-only views, in the same order as get_menu_list"""
         with self.get_session() as session:
-            menus = (
-                session.query(MenuEntity)
-                .filter(MenuEntity.restaurant_id == res_id)
-                .order_by(MenuEntity.category, MenuEntity.name)
-                .all()
+            return [MenuItemView(*row) for row in session.execute(menu_views_statement(res_id))]
+
+    def get_menu_page(
+        self, res_id: int, after: Optional[MenuCursor] = None, limit: int = DEFAULT_PAGE_SIZE
+    ) -> Page[MenuEntity]:
+        """the menu list in the order of get_menu_list, the cursor is the (category, name, id) of the last entry"""
+        with self.get_session() as session:
+            return keyset_page(
+                session,
+                select(MenuEntity).where(MenuEntity.restaurant_id == res_id),
+                [MenuEntity.category, MenuEntity.name, MenuEntity.id],
+                after,
+                limit,
+                lambda m: (m.category, m.name, m.id),
             )
-        return menus
+
+    def stream_menu_list(self, res_id: int, batch_size: int = DEFAULT_STREAM_BATCH_SIZE) -> Iterator[MenuEntity]:
+        """yield the menu list in the order of get_menu_list without loading the whole list"""
+        with self.get_session() as session:
+            statement = (
+                select(MenuEntity)
+                .where(MenuEntity.restaurant_id == res_id)
+                .order_by(MenuEntity.category, MenuEntity.name, MenuEntity.id)
+            )
+            yield from stream(session, statement, batch_size)
+
+
+def existing_menus_statement(batch: List[MenuEntity]) -> Select:
+    """one query for all entries of the batch which already exist, either by id or by name and category"""
+    ids = [menu.id for menu in batch if (menu.id or 0) > 0]
+    keys = [(menu.name, menu.category) for menu in batch if (menu.id or 0) <= 0]
+    return select(MenuEntity).where(
+        or_(MenuEntity.id.in_(ids), tuple_(MenuEntity.name, MenuEntity.category).in_(keys))
+    )
+
+
+def merge_menus(
+    batch: List[MenuEntity], existing: Iterable[MenuEntity], by_key: Dict[Tuple[str, str], MenuEntity]
+) -> List[MenuEntity]:
+    """apply the values of the batch to the existing entries or new entities, same as MenuRepository.save"""
+    by_id: Dict[int, MenuEntity] = {}
+    for menu in existing:
+        by_id[menu.id] = menu
+        by_key.setdefault((menu.name, menu.category), menu)
+
+    merged: List[MenuEntity] = []
+    for menu in batch:
+        if (menu.id or 0) > 0:
+            menu_to_save = by_id.get(menu.id) or MenuEntity()
+        else:
+            menu_to_save = by_key.get((menu.name, menu.category)) or MenuEntity()
+        menu_to_save.name = menu.name
+        menu_to_save.category = menu.category
+        menu_to_save.price = menu.price
+        menu_to_save.restaurant = menu.restaurant
+        by_key[(menu_to_save.name, menu_to_save.category)] = menu_to_save
+        merged.append(menu_to_save)
+    return merged
+
+
+def menu_views_statement(res_id: int) -> Select:
+    """the columns of MenuItemView in the order of its fields"""
+    return (
+        select(MenuEntity.id, MenuEntity.restaurant_id, MenuEntity.name, MenuEntity.category, MenuEntity.price)
+        .where(MenuEntity.restaurant_id == res_id)
+        .order_by(MenuEntity.category, MenuEntity.name)
+    )
+
+
+def menus_cache_key(restaurant_id: int) -> str:
+    return f"menus:{restaurant_id}"
+
+
+def menu_cache_keys(menus: Iterable[MenuEntity]) -> List[str]:
+    """the menu lists and the restaurants (cached with their menus) affected by the saved menus"""
+    restaurant_ids = {menu.restaurant_id for menu in menus}
+    return [menus_cache_key(id) for id in restaurant_ids if id is not None] + restaurant_cache_keys(restaurant_ids)
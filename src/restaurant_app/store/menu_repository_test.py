@@ -1,8 +1,10 @@
 from typing import Any, List
 
+from sqlalchemy import text
+
 from .entities import MenuEntity
 from .menu_repository import MenuRepository
-from .repository_test_helpers import create_restaurant_data, get_database
+from .repository_test_helpers import capture_statements, create_restaurant_data, get_database
 from .restaurant_repository import RestaurantRepository
 
 
@@ -30,6 +32,13 @@ def action(session) -> List[Any]:
 
         menus = menu_repo.get_menu_list(res.id)
         assert len(menus) == 1
+
+        # save by id updates the entry (also a renamed one), like save_many
+        renamed = menu_repo.save(
+            MenuEntity(id=menu.id, name="MenuEntry2", category="Category1", price=15.0, restaurant=res)
+        )
+        assert renamed is menu and renamed.name == "MenuEntry2"
+        assert len(menu_repo.get_menu_list(res.id)) == 1
         result = []
         result.append(res.id)
         return result
@@ -37,3 +46,141 @@ def action(session) -> List[Any]:
     result = repo.unit_of_work(action)
     menus = repo.get_menu_list(result[0])
     assert len(menus) == 1
+
+
+def test_menu_repository_save_many():
+    db = get_database()
+    repo = MenuRepository(db.managed_session)
+    repo_restaurant = RestaurantRepository(db.managed_session)
+
+    def action(session) -> List[Any]:
+        res = repo_restaurant.new_session(session).save(create_restaurant_data())
+        menu_repo = repo.new_session(session)
+        menu_repo.save(MenuEntity(name="Menu0", category="Category", price=1.0, restaurant=res))
+        menu_repo.sync()
+
+        menus = [
+            MenuEntity(name="Menu%d" % i, category="Category", price=10.0 + i, restaurant=res) for i in range(250)
+        ]
+        # the same natural key within the input updates the entry saved before
+        menus.append(MenuEntity(name="Menu1", category="Category", price=99.0, restaurant=res))
+        with capture_statements(db) as statements:
+            saved = menu_repo.save_many(menus, batch_size=100)
+        # one lookup query per batch, no lookup per entry; the rest are the writes of the single flush
+        assert len([s for s in statements if s.startswith("SELECT")]) == 3
+        assert all(s.startswith(('INSERT INTO "MENU"', 'UPDATE "MENU"')) for s in statements[3:])
+        assert len(saved) == 251
+        assert saved[1] is saved[250]
+        return [res.id]
+
+    restaurant_id = repo.unit_of_work(action)[0]
+    menus = repo.get_menu_list(restaurant_id)
+    assert len(menus) == 250
+    assert repo.get_menu_by_name("Menu0", restaurant_id).price == 10.0
+    assert repo.get_menu_by_name("Menu1", restaurant_id).price == 99.0
+
+
+def test_menu_repository_pages_and_stream():
+    managed_session = get_database().managed_session
+    repo = MenuRepository(managed_session)
+    repo_restaurant = RestaurantRepository(managed_session)
+
+    def action(session) -> List[Any]:
+        res = repo_restaurant.new_session(session).save(create_restaurant_data())
+        repo.new_session(session).save_many(
+            [
+                MenuEntity(name="Menu%02d" % i, category="Category%d" % (i % 3), price=10.0, restaurant=res)
+                for i in range(25)
+            ]
+        )
+        return [res.id]
+
+    restaurant_id = repo.unit_of_work(action)[0]
+    expected = [(m.category, m.name) for m in repo.get_menu_list(restaurant_id)]
+
+    pages = []
+    page = repo.get_menu_page(restaurant_id, limit=10)
+    pages.append(page)
+    while page.next_cursor is not None:
+        page = repo.get_menu_page(restaurant_id, after=page.next_cursor, limit=10)
+        pages.append(page)
+    assert [len(p.items) for p in pages] == [10, 10, 5]
+    assert [(m.category, m.name) for p in pages for m in p.items] == expected
+
+    streamed = [(m.category, m.name) for m in repo.stream_menu_list(restaurant_id, batch_size=4)]
+    assert streamed == expected
+
+
+def test_menu_repository_search():
+    managed_session = get_database().managed_session
+    repo = MenuRepository(managed_session)
+    repo_restaurant = RestaurantRepository(managed_session)
+
+    def action(session) -> List[Any]:
+        restaurant_repo = repo_restaurant.new_session(session)
+        first = restaurant_repo.save(create_restaurant_data())
+        second = restaurant_repo.save(create_restaurant_data())
+        repo.new_session(session).save_many(
+            [
+                MenuEntity(name="Pizza Margherita", category="Pizza", price=9.0, restaurant=first),
+                MenuEntity(name="Pizza Funghi", category="Main", price=10.0, restaurant=second),
+                MenuEntity(name="Margarita", category="Drinks", price=7.0, restaurant=second),
+                MenuEntity(name="Crème brûlée", category="Dessert", price=6.0, restaurant=first),
+                MenuEntity(name="Calzone", category="Pizza", price=11.0, restaurant=first),
+            ]
+        )
+        return [first.id, second.id]
+
+    first_id, second_id = repo.unit_of_work(action)
+
+    # prefix search over all restaurants, a match of the name ranks higher than one of the category
+    assert [hit.name for hit in repo.search_menus("piz")] == ["Pizza Margherita", "Pizza Funghi", "Calzone"]
+    assert [hit.name for hit in repo.search_menus("piz mar")] == ["Pizza Margherita"]
+    assert [hit.name for hit in repo.search_menus("pizza", restaurant_id=second_id)] == ["Pizza Funghi"]
+    assert [hit.name for hit in repo.search_menus("piz", prefix=False)] == []
+    # diacritics and the syntax of the query are ignored
+    assert [hit.name for hit in repo.search_menus('"creme*')] == ["Crème brûlée"]
+    assert repo.search_menus(" ") == []
+
+    # the index follows the changes of the menus
+    def rename(session):
+        menu = repo.new_session(session).get_menu_by_name("Margarita", second_id)
+        menu.name = "Lemonade"
+
+    repo.unit_of_work(rename)
+    assert [hit.name for hit in repo.search_menus("mar")] == ["Pizza Margherita"]
+    assert [hit.name for hit in repo.search_menus("lemo", restaurant_id=second_id)] == ["Lemonade"]
+
+    repo.unit_of_work(lambda session: repo.new_session(session).rebuild_search_index())
+    assert len(repo.search_menus("piz")) == 3
+
+
+def test_menu_repository_search_without_index():
+    db = get_database()
+    repo = MenuRepository(db.managed_session)
+    repo_restaurant = RestaurantRepository(db.managed_session)
+    # an existing database which was created before the full-text index
+    with db.managed_session() as session:
+        for name in ("INSERT", "DELETE", "UPDATE"):
+            session.execute(text("DROP TRIGGER MENU_SEARCH_%s" % name))
+        session.execute(text("DROP TABLE MENU_SEARCH"))
+        session.commit()
+
+    def action(session) -> List[Any]:
+        restaurant = repo_restaurant.new_session(session).save(create_restaurant_data())
+        repo.new_session(session).save_many(
+            [
+                MenuEntity(name="Pizza Margherita", category="Pizza", price=9.0, restaurant=restaurant),
+                MenuEntity(name="Calzone", category="Pizza", price=11.0, restaurant=restaurant),
+            ]
+        )
+        return []
+
+    repo.unit_of_work(action)
+    # the substring match is used as fallback
+    assert sorted(hit.name for hit in repo.search_menus("piz")) == ["Calzone", "Pizza Margherita"]
+    assert [hit.name for hit in repo.search_menus("margh")] == ["Pizza Margherita"]
+
+    repo.unit_of_work(lambda session: repo.new_session(session).rebuild_search_index())
+    assert [hit.name for hit in repo.search_menus("piz mar")] == ["Pizza Margherita"]
+    assert [hit.name for hit in repo.search_menus("margh", prefix=False)] == []
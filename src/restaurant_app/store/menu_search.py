@@ -0,0 +1,92 @@
+import re
+import weakref
+from typing import List, Optional
+
+from sqlalchemy import Engine, Select, TextClause, and_, inspect, literal, or_, select, text
+from sqlalchemy.orm import Session
+
+from .entities import MenuEntity
+
+DEFAULT_SEARCH_LIMIT = 20
+# bm25 weights of the columns name, category, restaurant_id: a hit in the name ranks higher
+_WEIGHTS = "10.0, 2.0, 0.0"
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+# per engine: the full-text index MENU_SEARCH exists (SQLite with FTS5 after create_database/rebuild)
+_search_index: "weakref.WeakKeyDictionary[Engine, bool]" = weakref.WeakKeyDictionary()
+
+
+def search_tokens(query: str) -> List[str]:
+    """the words of the query, everything else (quotes, operators of the FTS5 syntax) is dropped"""
+    return [token.lower() for token in _TOKEN.findall(query or "")]
+
+
+def match_expression(tokens: List[str], restaurant_id: Optional[int] = None, prefix: bool = True) -> str:
+    """
+    the FTS5 query: every token needs to match the name or the category, with prefix=True
+    a token matches the beginning of a word ("piz" finds "Pizza")
+    """
+    phrases = " ".join('"%s"%s' % (token, "*" if prefix else "") for token in tokens)
+    expression = "{name category} : (%s)" % phrases
+    if restaurant_id is not None:
+        expression = 'restaurant_id : "%d" AND %s' % (restaurant_id, expression)
+    return expression
+
+
+def menu_search_statement(expression: str, limit: int) -> TextClause:
+    """the columns of MenuSearchHit, the best matches first (bm25 is smaller for better matches)"""
+    return text(
+        "SELECT MENU.id, MENU.restaurant_id, MENU.name, MENU.category, MENU.price, "
+        "bm25(MENU_SEARCH, %s) AS rank "
+        "FROM MENU_SEARCH JOIN MENU ON MENU.id = MENU_SEARCH.rowid "
+        "WHERE MENU_SEARCH MATCH :expression "
+        "ORDER BY rank, MENU.id "
+        "LIMIT :limit" % _WEIGHTS
+    ).bindparams(expression=expression, limit=limit)
+
+
+def menu_like_statement(tokens: List[str], restaurant_id: Optional[int], limit: int) -> Select:
+    """
+    the search without a full-text index (databases other than SQLite): every token needs to be
+    part of the name or the category, a full scan without ranking
+    """
+    conditions = [
+        or_(MenuEntity.name.ilike("%" + token + "%"), MenuEntity.category.ilike("%" + token + "%")) for token in tokens
+    ]
+    if restaurant_id is not None:
+        conditions.append(MenuEntity.restaurant_id == restaurant_id)
+    return (
+        select(
+            MenuEntity.id,
+            MenuEntity.restaurant_id,
+            MenuEntity.name,
+            MenuEntity.category,
+            MenuEntity.price,
+            literal(0.0).label("rank"),
+        )
+        .where(and_(*conditions))
+        .order_by(MenuEntity.name, MenuEntity.id)
+        .limit(limit)
+    )
+
+
+def rebuild_statement() -> TextClause:
+    """fill the full-text index from MENU again, e.g. for a database created before the index existed"""
+    return text("INSERT INTO MENU_SEARCH(MENU_SEARCH) VALUES ('rebuild')")
+
+
+def search_index_available(session: Session) -> bool:
+    """
+    True if the table MENU_SEARCH exists, the result is cached per engine. it is missing on other databases,
+    on SQLite builds without FTS5 and in existing databases before MenuRepository.rebuild_search_index
+    """
+    engine = session.get_bind().engine
+    available = _search_index.get(engine)
+    if available is None:
+        available = engine.dialect.name == "sqlite" and inspect(session.connection()).has_table("MENU_SEARCH")
+        _search_index[engine] = available
+    return available
+
+
+def reset_search_index_available(session: Session) -> None:
+    """the index was created or dropped, search_index_available checks the database again"""
+    _search_index.pop(session.get_bind().engine, None)
@@ -0,0 +1,227 @@
+import datetime
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Select, delete, func, inspect, insert, select, update
+from sqlalchemy.orm import Session
+
+from .availability import day_range
+from .entities import OccupancyEntity, ReservationEntity, TableEntity, relation_table_reservation
+from .session_events import before_commit
+
+OccupancyKey = Tuple[int, datetime.date]
+# reserved_seats, reserved_tables per bucket_start
+Buckets = Dict[datetime.time, List[int]]
+
+DEFAULT_BUCKET_MINUTES = 60
+
+
+@dataclass
+class _PendingOccupancy:
+    """the restaurant/days and restaurants (capacity) changed in the current transaction"""
+
+    days: Set[OccupancyKey] = field(default_factory=set)
+    restaurants: Set[int] = field(default_factory=set)
+
+
+class OccupancyAggregate:
+    """
+    maintains RESTAURANT_OCCUPANCY: the reserved seats, reserved tables and the capacity of a restaurant
+    per day and time bucket. the repositories mark the restaurant/days touched by a change, right before
+    the commit the buckets of these days are computed again from the reservations of the day
+    (@see session_events.before_commit). the aggregate is changed in the same transaction as the
+    reservations, a rolled back transaction leaves it unchanged.
+    buckets without a reservation are not stored
+    """
+
+    def __init__(self, bucket_minutes: int = DEFAULT_BUCKET_MINUTES):
+        if bucket_minutes <= 0 or 24 * 60 % bucket_minutes != 0:
+            raise ValueError("bucket_minutes needs to divide a day")
+        self._bucket_minutes = bucket_minutes
+        self._info_key = "occupancy.pending.%d" % id(self)
+
+    @property
+    def bucket_minutes(self) -> int:
+        return self._bucket_minutes
+
+    def track_reservation(self, session: Session, reservation: ReservationEntity) -> None:
+        """
+        mark the days of the reservation, before and after the change. the previous values are taken
+        from the attribute history, so track needs to be called before the change is flushed
+        """
+        state = inspect(reservation)
+        dates = set(state.attrs.reservation_date.history.deleted)
+        dates.add(reservation.reservation_date)
+        tables = list(state.attrs.tables.history.deleted) + list(reservation.tables)
+        restaurant_ids = {_restaurant_id(table) for table in tables}
+        pending = self._pending(session)
+        for restaurant_id in restaurant_ids:
+            for date in dates:
+                if restaurant_id is not None and date is not None:
+                    pending.days.add((restaurant_id, _day(date)))
+
+    def track_capacity(self, session: Session, tables: Iterable[TableEntity]) -> None:
+        """mark the restaurants of the changed tables, their capacity is updated before the commit"""
+        restaurant_ids = {_restaurant_id(table) for table in tables}
+        self._pending(session).restaurants.update(id for id in restaurant_ids if id is not None)
+
+    def refresh(self, session: Session, restaurant_id: int, date: datetime.date) -> int:
+        """compute the buckets of the restaurant/day from its reservations, returns the number of buckets"""
+        day = _day(date)
+        buckets = self.buckets(session.execute(day_reservations_statement(restaurant_id, day)))
+        session.execute(
+            delete(OccupancyEntity)
+            .where(OccupancyEntity.restaurant_id == restaurant_id)
+            .where(OccupancyEntity.day == day)
+            .execution_options(synchronize_session=False)
+        )
+        rows = _rows(restaurant_id, day, buckets, _capacity(session, restaurant_id))
+        if rows:
+            session.execute(insert(OccupancyEntity), rows)
+        return len(rows)
+
+    def refresh_capacity(self, session: Session, restaurant_id: int) -> None:
+        session.execute(
+            update(OccupancyEntity)
+            .where(OccupancyEntity.restaurant_id == restaurant_id)
+            .values(capacity=_capacity(session, restaurant_id))
+            .execution_options(synchronize_session=False)
+        )
+
+    def rebuild(self, session: Session, restaurant_id: Optional[int] = None) -> int:
+        """
+        compute the whole aggregate (or the one of a restaurant) from the reservations,
+        e.g. after a bulk import or a change of bucket_minutes. returns the number of buckets
+        """
+        statement = delete(OccupancyEntity).execution_options(synchronize_session=False)
+        if restaurant_id is not None:
+            statement = statement.where(OccupancyEntity.restaurant_id == restaurant_id)
+        session.execute(statement)
+
+        capacities = dict(session.execute(capacity_statement(restaurant_id)).all())
+        days: Dict[OccupancyKey, Buckets] = {}
+        for row in session.execute(reservations_statement(restaurant_id)):
+            key = (row.restaurant_id, _day(row.reservation_date))
+            self._add(days.setdefault(key, {}), row)
+        rows = []
+        for (restaurant, day), buckets in sorted(days.items()):
+            rows.extend(_rows(restaurant, day, buckets, capacities.get(restaurant, 0)))
+        if rows:
+            session.execute(insert(OccupancyEntity), rows)
+        return len(rows)
+
+    def buckets(self, rows: Iterable) -> Buckets:
+        """
+        the reserved seats and tables per bucket; every row is a reservation with time_from, time_until,
+        people and the number of reserved tables of the restaurant (@see day_reservations_statement)
+        """
+        buckets: Buckets = {}
+        for row in rows:
+            self._add(buckets, row)
+        return buckets
+
+    def _add(self, buckets: Buckets, row) -> None:
+        start, end = _minutes(row.time_from), _minutes(row.time_until)
+        if end <= start:
+            return
+        # a reservation is part of every bucket which overlaps the half-open range [time_from, time_until)
+        for bucket in range(start // self._bucket_minutes, (end - 1) // self._bucket_minutes + 1):
+            minutes = bucket * self._bucket_minutes
+            values = buckets.setdefault(datetime.time(minutes // 60, minutes % 60), [0, 0])
+            values[0] += row.people or 0
+            values[1] += row.tables
+
+    def _pending(self, session: Session) -> _PendingOccupancy:
+        pending = session.info.get(self._info_key)
+        if pending is None:
+            pending = session.info[self._info_key] = _PendingOccupancy()
+        # registered once per transaction; the pending changes of a rolled back transaction are kept,
+        # computing a day again from its reservations does no harm
+        before_commit(session, lambda: self._apply(session), key=self._info_key)
+        return pending
+
+    def _apply(self, session: Session) -> None:
+        pending = session.info.pop(self._info_key, None)
+        if pending is None:
+            return
+        session.flush()
+        for restaurant_id, day in sorted(pending.days):
+            self.refresh(session, restaurant_id, day)
+        for restaurant_id in sorted(pending.restaurants):
+            self.refresh_capacity(session, restaurant_id)
+
+
+def day_reservations_statement(restaurant_id: int, date: datetime.date) -> Select:
+    """the reservations of the restaurant on the day with the number of their tables of the restaurant"""
+    day_start, day_end = day_range(date)
+    return (
+        _reservation_columns()
+        .where(TableEntity.restaurant_id == restaurant_id)
+        .where(ReservationEntity.reservation_date >= day_start)
+        .where(ReservationEntity.reservation_date < day_end)
+        .group_by(ReservationEntity.id)
+    )
+
+
+def reservations_statement(restaurant_id: Optional[int] = None) -> Select:
+    """the reservations per restaurant with the number of their tables of the restaurant"""
+    statement = _reservation_columns().add_columns(TableEntity.restaurant_id, ReservationEntity.reservation_date)
+    if restaurant_id is not None:
+        statement = statement.where(TableEntity.restaurant_id == restaurant_id)
+    return statement.group_by(ReservationEntity.id, TableEntity.restaurant_id)
+
+
+def capacity_statement(restaurant_id: Optional[int] = None) -> Select:
+    """the seats of all tables per restaurant"""
+    statement = select(TableEntity.restaurant_id, func.sum(TableEntity.seats)).group_by(TableEntity.restaurant_id)
+    if restaurant_id is not None:
+        statement = statement.where(TableEntity.restaurant_id == restaurant_id)
+    return statement
+
+
+def _reservation_columns() -> Select:
+    return (
+        select(
+            ReservationEntity.time_from,
+            ReservationEntity.time_until,
+            ReservationEntity.people,
+            func.count(relation_table_reservation.c.table_id).label("tables"),
+        )
+        .join(relation_table_reservation, relation_table_reservation.c.reservation_id == ReservationEntity.id)
+        .join(TableEntity, TableEntity.id == relation_table_reservation.c.table_id)
+    )
+
+
+def _capacity(session: Session, restaurant_id: int) -> int:
+    seats = select(func.coalesce(func.sum(TableEntity.seats), 0)).where(TableEntity.restaurant_id == restaurant_id)
+    return session.scalar(seats)
+
+
+def _rows(restaurant_id: int, day: datetime.date, buckets: Buckets, capacity: int) -> List[dict]:
+    return [
+        {
+            "restaurant_id": restaurant_id,
+            "day": day,
+            "bucket_start": bucket_start,
+            "reserved_seats": seats,
+            "reserved_tables": tables,
+            "capacity": capacity,
+        }
+        for bucket_start, (seats, tables) in sorted(buckets.items())
+    ]
+
+
+def _minutes(value: datetime.time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def _day(date: datetime.date) -> datetime.date:
+    if isinstance(date, datetime.datetime):
+        return date.date()
+    return date
+
+
+def _restaurant_id(table: TableEntity) -> Optional[int]:
+    if table.restaurant is not None and table.restaurant.id is not None:
+        return table.restaurant.id
+    return table.restaurant_id
@@ -0,0 +1,104 @@
+"""
+Repository of the precomputed restaurant occupancy
+
+The occupancy is rebuilt from the reservations with:
+  python -m restaurant_app.store.occupancy_repository --db sqlite:///restaurant.db [--restaurant 1]
+"""
+
+import argparse
+import datetime
+from contextlib import AbstractContextManager
+from typing import Callable, List, Optional, Self
+
+from sqlalchemy import Select, select
+from sqlalchemy.orm import Session
+
+from .base_repository import BaseRepository
+from .database import SqlAlchemyDatabase
+from .entities import OccupancyEntity
+from .occupancy import DEFAULT_BUCKET_MINUTES, OccupancyAggregate
+from .views import OccupancyView
+
+
+class OccupancyRepository(BaseRepository):
+
+    def __init__(
+        self,
+        session_factory: Callable[..., AbstractContextManager[Session]],
+        session: Session = None,
+        aggregate: OccupancyAggregate = None,
+    ):
+        """
+        the occupancy is read from RESTAURANT_OCCUPANCY, which is maintained by the Reservation- and
+        TableRepository when they are configured with the same OccupancyAggregate
+        """
+        super().__init__(session_factory=session_factory, session=session)
+        self._aggregate = aggregate or OccupancyAggregate()
+
+    def new_session(self, session: Session) -> Self:
+        return OccupancyRepository(session_factory=None, session=session, aggregate=self._aggregate)
+
+    @property
+    def aggregate(self) -> OccupancyAggregate:
+        return self._aggregate
+
+    def get_occupancy(self, restaurant_id: int, date: datetime.date) -> List[OccupancyView]:
+        """the reserved buckets of the restaurant on the day ordered by time, one index range-scan"""
+        return self.get_occupancy_range(restaurant_id, date, date)
+
+    def get_occupancy_range(
+        self, restaurant_id: int, date_from: datetime.date, date_until: datetime.date
+    ) -> List[OccupancyView]:
+        """the reserved buckets of the restaurant for the days [date_from, date_until] ordered by day and time"""
+        with self.get_session() as session:
+            return [
+                OccupancyView(*row)
+                for row in session.execute(occupancy_views_statement(restaurant_id, date_from, date_until))
+            ]
+
+    def rebuild(self, restaurant_id: Optional[int] = None) -> int:
+        """compute the occupancy (of all restaurants or the given one) from the reservations again"""
+        with self.get_session() as session:
+            return self._aggregate.rebuild(session, restaurant_id)
+
+
+def occupancy_views_statement(restaurant_id: int, date_from: datetime.date, date_until: datetime.date) -> Select:
+    """the columns of OccupancyView in the order of its fields"""
+    return (
+        select(
+            OccupancyEntity.restaurant_id,
+            OccupancyEntity.day,
+            OccupancyEntity.bucket_start,
+            OccupancyEntity.reserved_seats,
+            OccupancyEntity.reserved_tables,
+            OccupancyEntity.capacity,
+        )
+        .where(OccupancyEntity.restaurant_id == restaurant_id)
+        .where(OccupancyEntity.day >= _date(date_from))
+        .where(OccupancyEntity.day <= _date(date_until))
+        .order_by(OccupancyEntity.day, OccupancyEntity.bucket_start)
+    )
+
+
+def _date(date: datetime.date) -> datetime.date:
+    if isinstance(date, datetime.datetime):
+        return date.date()
+    return date
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="the SQLAlchemy url of the database")
+    parser.add_argument("--restaurant", type=int, help="rebuild only the occupancy of this restaurant")
+    parser.add_argument("--bucket-minutes", type=int, default=DEFAULT_BUCKET_MINUTES)
+    args = parser.parse_args()
+
+    db = SqlAlchemyDatabase(args.db)
+    db.create_database()
+    repository = OccupancyRepository(db.managed_session, aggregate=OccupancyAggregate(args.bucket_minutes))
+    buckets = repository.unit_of_work(lambda session: repository.new_session(session).rebuild(args.restaurant))
+    print("%d occupancy buckets written" % buckets)
+
+
+if __name__ == "__main__":
+    main()
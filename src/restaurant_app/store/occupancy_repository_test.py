@@ -0,0 +1,101 @@
+import datetime
+
+import pytest
+
+from .entities import ReservationEntity, TableEntity
+from .occupancy import OccupancyAggregate
+from .repository_session import RepositoryRegistry
+from .repository_test_helpers import create_restaurant_data, get_database
+
+DAY = datetime.date(2024, 9, 10)
+
+
+def _reservation(number: str, time_from: int, time_until: int, people: int, *tables: TableEntity):
+    reservation = ReservationEntity(
+        reservation_date=datetime.datetime.combine(DAY, datetime.time.min),
+        time_from=datetime.time(time_from, 0),
+        time_until=datetime.time(time_until, 0),
+        people=people,
+        reservation_name="Test",
+        reservation_number=number,
+    )
+    reservation.tables.extend(tables)
+    return reservation
+
+
+def _occupancy(registry: RepositoryRegistry, restaurant_id: int, date: datetime.date = DAY):
+    return {
+        view.bucket_start.hour: (view.reserved_seats, view.reserved_tables, view.capacity)
+        for view in registry.occupancy.get_occupancy(restaurant_id, date)
+    }
+
+
+def _setup():
+    registry = RepositoryRegistry(get_database().managed_session, occupancy=OccupancyAggregate())
+    with registry.transaction() as repositories:
+        restaurant = repositories.restaurants.save(create_restaurant_data())
+        tables = [
+            repositories.tables.save(TableEntity(table_number="T%d" % i, seats=4, restaurant=restaurant))
+            for i in range(3)
+        ]
+        repositories.reservations.save(_reservation("1", 18, 20, 3, tables[0]))
+        repositories.reservations.save(_reservation("2", 19, 21, 6, tables[1], tables[2]))
+        ids = restaurant.id, [table.id for table in tables]
+    return registry, ids[0], ids[1]
+
+
+def test_occupancy_is_maintained_by_save_and_delete():
+    registry, restaurant_id, table_ids = _setup()
+    assert _occupancy(registry, restaurant_id) == {18: (3, 1, 12), 19: (9, 3, 12), 20: (6, 2, 12)}
+
+    # move the first reservation to the next day
+    with registry.transaction() as repositories:
+        reservation = repositories.reservations.get_reservation_by_number("1")
+        reservation.reservation_date = datetime.datetime.combine(DAY + datetime.timedelta(days=1), datetime.time.min)
+        repositories.reservations.save(reservation)
+    assert _occupancy(registry, restaurant_id) == {19: (6, 2, 12), 20: (6, 2, 12)}
+    assert _occupancy(registry, restaurant_id, DAY + datetime.timedelta(days=1)) == {18: (3, 1, 12), 19: (3, 1, 12)}
+
+    with registry.transaction() as repositories:
+        repositories.reservations.delete(repositories.reservations.get_reservation_by_number("2").id)
+    assert _occupancy(registry, restaurant_id) == {}
+
+
+def test_occupancy_capacity_follows_the_tables():
+    registry, restaurant_id, table_ids = _setup()
+
+    with registry.transaction() as repositories:
+        restaurant = repositories.restaurants.get_restaurant_by_id(restaurant_id)
+        repositories.tables.save(TableEntity(table_number="T9", seats=8, restaurant=restaurant))
+    assert {capacity for _, _, capacity in _occupancy(registry, restaurant_id).values()} == {20}
+
+    # an existing table saved by id and by number changes the capacity
+    with registry.transaction() as repositories:
+        restaurant = repositories.restaurants.get_restaurant_by_id(restaurant_id)
+        repositories.tables.save(TableEntity(id=table_ids[0], table_number="T0", seats=6, restaurant=restaurant))
+        repositories.tables.save(TableEntity(table_number="T9", seats=2, restaurant=restaurant))
+    assert {capacity for _, _, capacity in _occupancy(registry, restaurant_id).values()} == {16}
+
+
+def test_occupancy_is_unchanged_by_a_rollback():
+    registry, restaurant_id, table_ids = _setup()
+
+    with pytest.raises(RuntimeError):
+        with registry.transaction() as repositories:
+            table = repositories.tables.get_table_by_id(table_ids[0])
+            repositories.reservations.save(_reservation("3", 12, 13, 2, table))
+            raise RuntimeError("rollback")
+    assert 12 not in _occupancy(registry, restaurant_id)
+
+
+def test_occupancy_rebuild_matches_the_maintained_buckets():
+    registry, restaurant_id, table_ids = _setup()
+    maintained = registry.occupancy.get_occupancy(restaurant_id, DAY)
+
+    repository = registry.occupancy
+    assert repository.unit_of_work(lambda session: repository.new_session(session).rebuild()) == 3
+    assert registry.occupancy.get_occupancy(restaurant_id, DAY) == maintained
+
+    # a finer bucket size splits the hours
+    fine = OccupancyAggregate(bucket_minutes=30)
+    assert repository.unit_of_work(lambda session: fine.rebuild(session, restaurant_id)) == 6
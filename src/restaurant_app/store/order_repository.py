@@ -0,0 +1,270 @@
+import datetime
+from contextlib import AbstractContextManager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Self, Sequence
+
+from sqlalchemy import Date, Select, bindparam, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from .availability import day_range
+from .base_repository import DEFAULT_BATCH_SIZE, BaseRepository, batched
+from .entities import MenuEntity, OrderEntity, TableEntity, current_datetime, relation_menu_order
+from .views import OrderLineView, OrderView, RevenueView
+
+
+@dataclass(frozen=True, slots=True)
+class OrderLine:
+    menu_id: int
+    quantity: int = 1
+
+
+@dataclass(frozen=True)
+class NewOrder:
+    table_id: int
+    waiter: str
+    lines: Sequence[OrderLine]
+    # the time of the order, default is now
+    created: Optional[datetime.datetime] = None
+
+
+class OrderRepository(BaseRepository):
+    """
+    the orders of the tables and their lines (menu, quantity and the price of the menu at the time of the order).
+    the lines of a batch of orders are written with one INSERT, the totals are computed by the database
+    from the lines. the write methods do not commit, @see unit_of_work
+    """
+
+    def __init__(self, session_factory: Callable[..., AbstractContextManager[Session]], session: Session = None):
+        super().__init__(session_factory=session_factory, session=session)
+
+    def new_session(self, session: Session) -> Self:
+        return OrderRepository(session_factory=None, session=session)
+
+    def create_order(
+        self, table_id: int, waiter: str, lines: Sequence[OrderLine], created: datetime.datetime = None
+    ) -> int:
+        return self.create_orders([NewOrder(table_id, waiter, lines, created)])[0]
+
+    def create_orders(self, orders: Iterable[NewOrder], batch_size: int = DEFAULT_BATCH_SIZE) -> List[int]:
+        """
+        create the orders with their lines, returns the ids in the order of the input. per batch one query
+        resolves the menus and one the tables, the orders and the lines are inserted with one statement each
+        """
+        ids: List[int] = []
+        with self.get_session() as session:
+            for batch in batched(orders, batch_size):
+                ids.extend(self._create_batch(session, batch))
+        return ids
+
+    def _create_batch(self, session: Session, batch: List[NewOrder]) -> List[int]:
+        lines = [merge_lines(order.lines) for order in batch]
+        tables = dict(
+            session.execute(
+                select(TableEntity.id, TableEntity.restaurant_id).where(
+                    TableEntity.id.in_({order.table_id for order in batch})
+                )
+            ).all()
+        )
+        prices = menu_prices(session, {menu_id for merged in lines for menu_id in merged})
+        for order, merged in zip(batch, lines):
+            if order.table_id not in tables:
+                raise ValueError("unknown table %d" % order.table_id)
+            check_menus(merged, prices, tables[order.table_id])
+
+        now = current_datetime()
+        ids = list(
+            session.scalars(
+                insert(OrderEntity).returning(OrderEntity.id, sort_by_parameter_order=True),
+                [
+                    {"table_id": order.table_id, "waiter": order.waiter, "total": 0.0, "created": order.created or now}
+                    for order in batch
+                ],
+            )
+        )
+        rows = [
+            {"order_id": order_id, "menu_id": menu_id, "quantity": quantity, "unit_price": prices[menu_id][0]}
+            for order_id, merged in zip(ids, lines)
+            for menu_id, quantity in merged.items()
+        ]
+        if rows:
+            session.execute(insert(relation_menu_order), rows)
+        self._update_totals(session, ids)
+        return ids
+
+    def add_lines(self, order_id: int, lines: Sequence[OrderLine]) -> None:
+        """add menus to the order, the quantity of a menu which is already ordered is increased"""
+        with self.get_session() as session:
+            order = session.get(OrderEntity, order_id)
+            if order is None:
+                raise ValueError("unknown order %d" % order_id)
+            merged = merge_lines(lines)
+            prices = menu_prices(session, set(merged))
+            check_menus(merged, prices, session.get(TableEntity, order.table_id).restaurant_id)
+            existing = dict(
+                session.execute(
+                    select(relation_menu_order.c.menu_id, relation_menu_order.c.quantity)
+                    .where(relation_menu_order.c.order_id == order_id)
+                    .where(relation_menu_order.c.menu_id.in_(list(merged)))
+                ).all()
+            )
+            increased = [
+                {"o_id": order_id, "m_id": menu_id, "new_quantity": existing[menu_id] + quantity}
+                for menu_id, quantity in merged.items()
+                if menu_id in existing
+            ]
+            added = [
+                {"order_id": order_id, "menu_id": menu_id, "quantity": quantity, "unit_price": prices[menu_id][0]}
+                for menu_id, quantity in merged.items()
+                if menu_id not in existing
+            ]
+            if increased:
+                session.execute(
+                    update(relation_menu_order)
+                    .where(relation_menu_order.c.order_id == bindparam("o_id"))
+                    .where(relation_menu_order.c.menu_id == bindparam("m_id"))
+                    .values(quantity=bindparam("new_quantity")),
+                    increased,
+                )
+            if added:
+                session.execute(insert(relation_menu_order), added)
+            self._update_totals(session, [order_id])
+
+    def remove_lines(self, order_id: int, menu_ids: Iterable[int]) -> None:
+        with self.get_session() as session:
+            session.execute(
+                delete(relation_menu_order)
+                .where(relation_menu_order.c.order_id == order_id)
+                .where(relation_menu_order.c.menu_id.in_(list(menu_ids)))
+            )
+            self._update_totals(session, [order_id])
+
+    def delete_order(self, order_id: int) -> None:
+        with self.get_session() as session:
+            session.execute(delete(relation_menu_order).where(relation_menu_order.c.order_id == order_id))
+            session.execute(delete(OrderEntity).where(OrderEntity.id == order_id))
+
+    def update_totals(self, order_ids: Iterable[int]) -> None:
+        """compute the totals again from the order lines, e.g. after the lines were changed by SQL statements"""
+        with self.get_session() as session:
+            for batch in batched(order_ids, DEFAULT_BATCH_SIZE):
+                self._update_totals(session, batch)
+
+    def _update_totals(self, session: Session, order_ids: List[int]) -> None:
+        session.execute(
+            update(OrderEntity)
+            .where(OrderEntity.id.in_(order_ids))
+            .values(total=order_total_statement().scalar_subquery())
+            .execution_options(synchronize_session="fetch")
+        )
+
+    def get_order(self, order_id: int) -> Optional[OrderView]:
+        with self.get_session() as session:
+            orders = order_views(session, select(*_order_columns()).where(OrderEntity.id == order_id))
+            return orders[0] if orders else None
+
+    def get_orders_for_table(self, table_id: int, date: datetime.date) -> List[OrderView]:
+        """the orders of the table on the given day ordered by the time of the order"""
+        day_start, day_end = day_range(date)
+        with self.get_session() as session:
+            statement = (
+                select(*_order_columns())
+                .where(OrderEntity.table_id == table_id)
+                .where(OrderEntity.created >= day_start)
+                .where(OrderEntity.created < day_end)
+                .order_by(OrderEntity.created, OrderEntity.id)
+            )
+            return order_views(session, statement)
+
+    def get_revenue_per_table(
+        self, restaurant_id: int, date_from: datetime.date, date_until: datetime.date
+    ) -> List[RevenueView]:
+        return self._revenue(OrderEntity.table_id, restaurant_id, date_from, date_until)
+
+    def get_revenue_per_waiter(
+        self, restaurant_id: int, date_from: datetime.date, date_until: datetime.date
+    ) -> List[RevenueView]:
+        return self._revenue(OrderEntity.waiter, restaurant_id, date_from, date_until)
+
+    def get_revenue_per_day(
+        self, restaurant_id: int, date_from: datetime.date, date_until: datetime.date
+    ) -> List[RevenueView]:
+        """the revenue per (UTC) day of the order"""
+        return self._revenue(func.date(OrderEntity.created, type_=Date), restaurant_id, date_from, date_until)
+
+    def _revenue(self, key, restaurant_id: int, date_from: datetime.date, date_until: datetime.date):
+        with self.get_session() as session:
+            return [
+                RevenueView(*row)
+                for row in session.execute(revenue_statement(key, restaurant_id, date_from, date_until))
+            ]
+
+
+def merge_lines(lines: Sequence[OrderLine]) -> Dict[int, int]:
+    """the quantity per menu, several lines of the same menu are added up"""
+    merged: Dict[int, int] = {}
+    for line in lines:
+        if line.quantity <= 0:
+            raise ValueError("the quantity of menu %d needs to be positive" % line.menu_id)
+        merged[line.menu_id] = merged.get(line.menu_id, 0) + line.quantity
+    return merged
+
+
+def menu_prices(session: Session, menu_ids: Iterable[int]) -> Dict[int, tuple]:
+    """the (price, restaurant_id) of the menus"""
+    return {
+        id: (price, restaurant_id)
+        for id, price, restaurant_id in session.execute(
+            select(MenuEntity.id, MenuEntity.price, MenuEntity.restaurant_id).where(MenuEntity.id.in_(list(menu_ids)))
+        )
+    }
+
+
+def check_menus(lines: Dict[int, int], prices: Dict[int, tuple], restaurant_id: int) -> None:
+    for menu_id in lines:
+        if menu_id not in prices or prices[menu_id][1] != restaurant_id:
+            raise ValueError("menu %d is not a menu of restaurant %d" % (menu_id, restaurant_id))
+
+
+def order_total_statement() -> Select:
+    """the sum of the lines of the order, correlated to the updated TABLE_ORDER row"""
+    return select(
+        func.coalesce(func.sum(relation_menu_order.c.quantity * relation_menu_order.c.unit_price), 0.0)
+    ).where(relation_menu_order.c.order_id == OrderEntity.id)
+
+
+def revenue_statement(key, restaurant_id: int, date_from: datetime.date, date_until: datetime.date) -> Select:
+    """(key, orders, revenue) of the orders at the tables of the restaurant, grouped by the key"""
+    return (
+        select(key, func.count(OrderEntity.id), func.coalesce(func.sum(OrderEntity.total), 0.0))
+        .join(TableEntity, TableEntity.id == OrderEntity.table_id)
+        .where(TableEntity.restaurant_id == restaurant_id)
+        .where(OrderEntity.created >= day_range(date_from)[0])
+        .where(OrderEntity.created < day_range(date_until)[1])
+        .group_by(key)
+        .order_by(key)
+    )
+
+
+def order_views(session: Session, statement: Select) -> List[OrderView]:
+    """the orders of the statement (columns of _order_columns) with their lines, loaded with one IN-query"""
+    orders = session.execute(statement).all()
+    lines: Dict[int, List[OrderLineView]] = {}
+    if orders:
+        for order_id, *line in session.execute(
+            select(
+                relation_menu_order.c.order_id,
+                relation_menu_order.c.menu_id,
+                MenuEntity.name,
+                relation_menu_order.c.quantity,
+                relation_menu_order.c.unit_price,
+            )
+            .join(MenuEntity, MenuEntity.id == relation_menu_order.c.menu_id)
+            .where(relation_menu_order.c.order_id.in_([order[0] for order in orders]))
+            .order_by(relation_menu_order.c.order_id, MenuEntity.name)
+        ):
+            lines.setdefault(order_id, []).append(OrderLineView(*line))
+    return [OrderView(*order, tuple(lines.get(order[0], ()))) for order in orders]
+
+
+def _order_columns():
+    return OrderEntity.id, OrderEntity.table_id, OrderEntity.waiter, OrderEntity.created, OrderEntity.total
@@ -0,0 +1,128 @@
+import datetime
+
+import pytest
+
+from .entities import MenuEntity, OrderEntity, TableEntity
+from .order_repository import NewOrder, OrderLine, OrderRepository
+from .repository_test_helpers import create_restaurant_data, get_database
+
+DAY = datetime.date(2024, 9, 9)
+
+
+def create_data(managed_session):
+    with managed_session() as session:
+        restaurant = create_restaurant_data()
+        other = create_restaurant_data()
+        other.name = "Other-Restaurant"
+        menus = [
+            MenuEntity(name="Soup", category="Starter", price=5.0, restaurant=restaurant),
+            MenuEntity(name="Steak", category="Main", price=20.0, restaurant=restaurant),
+            MenuEntity(name="Pizza", category="Main", price=12.0, restaurant=other),
+        ]
+        tables = [TableEntity(table_number="T%d" % i, seats=4, restaurant=restaurant) for i in range(2)]
+        session.add_all([restaurant, other, *menus, *tables])
+        session.commit()
+        return restaurant.id, [menu.id for menu in menus], [table.id for table in tables]
+
+
+def at(day: datetime.date, hour: int) -> datetime.datetime:
+    return datetime.datetime.combine(day, datetime.time(hour, 0))
+
+
+def test_create_orders():
+    managed_session = get_database().managed_session
+    _, (soup, steak, _), (table_1, table_2) = create_data(managed_session)
+    repo = OrderRepository(managed_session)
+
+    ids = repo.unit_of_work(
+        lambda session: repo.new_session(session).create_orders(
+            [
+                NewOrder(table_1, "Anna", [OrderLine(soup, 2), OrderLine(steak), OrderLine(soup)], at(DAY, 18)),
+                NewOrder(table_2, "Ben", [], at(DAY, 19)),
+                NewOrder(table_2, "Ben", [OrderLine(steak, 3)], at(DAY, 20)),
+            ],
+            batch_size=2,
+        )
+    )
+    assert len(ids) == 3
+
+    order = repo.get_order(ids[0])
+    assert (order.table_id, order.waiter, order.total) == (table_1, "Anna", 35.0)
+    # the lines of the same menu are merged
+    assert [(line.name, line.quantity, line.amount) for line in order.lines] == [("Soup", 3, 15.0), ("Steak", 1, 20.0)]
+    assert repo.get_order(ids[1]).total == 0.0
+    assert [o.total for o in repo.get_orders_for_table(table_2, DAY)] == [0.0, 60.0]
+    assert repo.get_order(-1) is None
+
+    # the lines can be read through the (read-only) relationship of the entity
+    with managed_session() as session:
+        assert sorted(menu.name for menu in session.get(OrderEntity, ids[0]).menus) == ["Soup", "Steak"]
+
+
+def test_order_lines():
+    managed_session = get_database().managed_session
+    _, (soup, steak, _), (table_1, _) = create_data(managed_session)
+    repo = OrderRepository(managed_session)
+    order_id = repo.unit_of_work(
+        lambda session: repo.new_session(session).create_order(table_1, "Anna", [OrderLine(soup)])
+    )
+
+    # the price of the order line is the price at the time of the order
+    with managed_session() as session:
+        session.get(MenuEntity, soup).price = 6.0
+        session.commit()
+    repo.unit_of_work(
+        lambda session: repo.new_session(session).add_lines(order_id, [OrderLine(soup), OrderLine(steak, 2)])
+    )
+    order = repo.get_order(order_id)
+    assert [(line.name, line.quantity, line.unit_price) for line in order.lines] == [
+        ("Soup", 2, 5.0),
+        ("Steak", 2, 20.0),
+    ]
+    assert order.total == 50.0
+
+    repo.unit_of_work(lambda session: repo.new_session(session).remove_lines(order_id, [steak]))
+    assert repo.get_order(order_id).total == 10.0
+
+    repo.unit_of_work(lambda session: repo.new_session(session).delete_order(order_id))
+    assert repo.get_order(order_id) is None
+
+
+def test_invalid_orders():
+    managed_session = get_database().managed_session
+    _, (soup, _, pizza), (table_1, _) = create_data(managed_session)
+    repo = OrderRepository(managed_session)
+
+    with pytest.raises(ValueError):
+        repo.create_order(table_1, "Anna", [OrderLine(pizza)])
+    with pytest.raises(ValueError):
+        repo.create_order(table_1, "Anna", [OrderLine(soup, 0)])
+    with pytest.raises(ValueError):
+        repo.create_order(-1, "Anna", [OrderLine(soup)])
+    assert repo.get_orders_for_table(table_1, datetime.date.today()) == []
+
+
+def test_revenue():
+    managed_session = get_database().managed_session
+    restaurant_id, (soup, steak, _), (table_1, table_2) = create_data(managed_session)
+    repo = OrderRepository(managed_session)
+    next_day = DAY + datetime.timedelta(days=1)
+    repo.unit_of_work(
+        lambda session: repo.new_session(session).create_orders(
+            [
+                NewOrder(table_1, "Anna", [OrderLine(soup, 2)], at(DAY, 18)),
+                NewOrder(table_1, "Ben", [OrderLine(steak)], at(DAY, 19)),
+                NewOrder(table_2, "Ben", [OrderLine(steak), OrderLine(soup)], at(next_day, 12)),
+                # outside of the range
+                NewOrder(table_2, "Anna", [OrderLine(steak)], at(next_day + datetime.timedelta(days=1), 12)),
+            ]
+        )
+    )
+
+    per_table = repo.get_revenue_per_table(restaurant_id, DAY, next_day)
+    assert [(r.key, r.orders, r.revenue) for r in per_table] == [(table_1, 2, 30.0), (table_2, 1, 25.0)]
+    per_waiter = repo.get_revenue_per_waiter(restaurant_id, DAY, next_day)
+    assert [(r.key, r.orders, r.revenue) for r in per_waiter] == [("Anna", 1, 10.0), ("Ben", 2, 45.0)]
+    per_day = repo.get_revenue_per_day(restaurant_id, DAY, next_day)
+    assert [(r.key, r.orders, r.revenue) for r in per_day] == [(DAY, 2, 30.0), (next_day, 1, 25.0)]
+    assert repo.get_revenue_per_table(restaurant_id + 1, DAY, next_day) == []
@@ -0,0 +1,60 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Generic, Iterator, List, Optional, Sequence, TypeVar
+
+from sqlalchemy import ColumnElement, Select, literal, tuple_
+from sqlalchemy.orm import Session
+
+T = TypeVar("T")
+
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_STREAM_BATCH_SIZE = 1000
+
+
+@dataclass
+class Page(Generic[T]):
+    """
+    one page of a keyset-paginated query. the next_cursor is passed as the 'after' parameter
+    to fetch the following page, it is None if there are no more items
+    """
+
+    items: List[T] = field(default_factory=list)
+    next_cursor: Optional[Any] = None
+
+
+def keyset_page(
+    session: Session,
+    statement: Select,
+    keys: Sequence[ColumnElement],
+    after: Optional[Any],
+    limit: int,
+    cursor_of: Callable[[T], Any],
+) -> Page[T]:
+    """
+    execute the statement ordered by the keys and starting after the given cursor.
+    the keys need to be unique (e.g. end with the id), a cursor of several keys is a tuple
+    """
+    if after is not None:
+        if len(keys) == 1:
+            statement = statement.where(keys[0] > after)
+        else:
+            values = [literal(value, key.type) for key, value in zip(keys, after)]
+            statement = statement.where(tuple_(*keys) > tuple_(*values))
+    # fetch one more item to know if there is a next page
+    items = list(session.execute(statement.order_by(*keys).limit(limit + 1)).unique().scalars())
+    if len(items) <= limit:
+        return Page(items=items, next_cursor=None)
+    items = items[:limit]
+    return Page(items=items, next_cursor=cursor_of(items[-1]))
+
+
+def stream(session: Session, statement: Select, batch_size: int) -> Iterator[T]:
+    """
+    yield the entities of the statement, the rows are fetched in batches of batch_size
+    (server-side cursor where the driver supports it) and are not kept in a list
+    https://docs.sqlalchemy.org/en/20/orm/queryguide/api.html#fetching-large-result-sets-with-yield-per
+    """
+    result = session.execute(statement.execution_options(yield_per=batch_size))
+    try:
+        yield from result.scalars()
+    finally:
+        result.close()
@@ -0,0 +1,121 @@
+import datetime
+import re
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+from sqlalchemy import event
+
+from .database import SqlAlchemyDatabase
+from .entities import MenuEntity, ReservationEntity, TableEntity
+from .occupancy import OccupancyAggregate
+from .order_repository import OrderLine
+from .repository_session import RepositoryRegistry
+from .repository_test_helpers import create_restaurant_data, get_database
+
+DAY = datetime.date(2024, 9, 10)
+# a full scan of a table (or a subquery), a scan of an index, a virtual table (FTS5) or the constant
+# row of a VALUES list (the row-value IN of the save_many lookups) is fine
+FULL_SCAN = re.compile(r"^SCAN (?!.*(USING (COVERING )?INDEX|VIRTUAL TABLE|CONSTANT ROW))")
+
+
+@contextmanager
+def capture_queries(db: SqlAlchemyDatabase) -> Iterator[List[Tuple[str, object]]]:
+    """collect the queries and their parameters sent to the database within the with-block"""
+    queries: List[Tuple[str, object]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            queries.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        yield queries
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+
+def full_scans(db: SqlAlchemyDatabase, queries: List[Tuple[str, object]]) -> List[str]:
+    """the steps of the query plans which read a whole table"""
+    scans = []
+    with db.engine.connect() as connection:
+        for statement, parameters in queries:
+            for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters):
+                if FULL_SCAN.match(row[3]):
+                    scans.append("%s: %s" % (row[3], " ".join(statement.split())))
+    return scans
+
+
+def test_repository_queries_use_indexes():
+    db = get_database()
+    registry = RepositoryRegistry(db.managed_session, occupancy=OccupancyAggregate())
+
+    def create(repositories):
+        restaurant = repositories.restaurants.save(create_restaurant_data())
+        repositories.menus.save(MenuEntity(name="Menu", category="Main", price=10.0, restaurant=restaurant))
+        table = repositories.tables.save(TableEntity(table_number="T1", seats=4, restaurant=restaurant))
+        reservation = ReservationEntity(
+            reservation_date=datetime.datetime.combine(DAY, datetime.time.min),
+            time_from=datetime.time(18, 0),
+            time_until=datetime.time(20, 0),
+            people=2,
+            reservation_name="Test",
+            reservation_number="1",
+        )
+        reservation.tables.append(table)
+        repositories.reservations.save(reservation)
+        return restaurant.id, table.id, reservation.id
+
+    restaurant_id, table_id, reservation_id = registry.unit_of_work(create)
+    menu_id = registry.menus.get_menu_by_name("Menu", restaurant_id).id
+
+    def update(repositories):
+        # the lookups by the natural keys of the save methods
+        address = create_restaurant_data().address
+        repositories.restaurants.find_restaurants_by_name_and_address("Test-Restaurant", address)
+        restaurant = repositories.restaurants.get_restaurant_by_id(restaurant_id)
+        repositories.menus.save(MenuEntity(name="Menu", category="Main", price=12.0, restaurant=restaurant))
+        repositories.tables.save(TableEntity(table_number="T2", seats=2, restaurant=restaurant))
+        reservation = repositories.reservations.get_reservation_by_number("1")
+        reservation.people = 3
+        repositories.reservations.save(reservation)
+        order_id = repositories.orders.create_order(table_id, "Anna", [OrderLine(menu_id, 2)])
+        repositories.orders.add_lines(order_id, [OrderLine(menu_id)])
+
+    restaurants, menus, tables, reservations = (
+        registry.restaurants,
+        registry.menus,
+        registry.tables,
+        registry.reservations,
+    )
+    with capture_queries(db) as queries:
+        registry.unit_of_work(update)
+        restaurants.get_restaurant_by_id(restaurant_id)
+        restaurants.get_restaurant_view(restaurant_id)
+        menus.get_menu_by_name("Menu", restaurant_id)
+        menus.get_menu_list(restaurant_id)
+        menus.get_menu_views(restaurant_id)
+        menus.get_menu_page(restaurant_id, after=("Main", "Menu", 0))
+        menus.search_menus("men", restaurant_id)
+        tables.get_table_by_id(table_id)
+        tables.get_tables_for_restaurant(restaurant_id)
+        tables.get_table_views(restaurant_id)
+        tables.get_tables_page(restaurant_id)
+        tables.get_tables_with_capacity(2, restaurant_id)
+        tables.get_free_tables(restaurant_id, DAY, datetime.time(12, 0), datetime.time(13, 0), 2)
+        reservations.get_reservation_by_id(reservation_id)
+        reservations.get_reservation_by_number("1")
+        reservations.is_reservation_number_in_use("1")
+        reservations.get_reservation_for_restaurant(restaurant_id)
+        reservations.get_reservation_page(restaurant_id)
+        reservations.get_reservation_views_for_restaurant(restaurant_id)
+        reservations.get_table_reservations_for_date(DAY, table_id)
+        registry.occupancy.get_occupancy(restaurant_id, DAY)
+        registry.archive.get_reservation_history(restaurant_id, DAY, DAY)
+        registry.archive.get_archived_reservation_by_number("1")
+        registry.orders.get_orders_for_table(table_id, DAY)
+        registry.orders.get_revenue_per_table(restaurant_id, DAY, DAY)
+        registry.orders.get_revenue_per_waiter(restaurant_id, DAY, DAY)
+        registry.orders.get_revenue_per_day(restaurant_id, DAY, DAY)
+
+    assert len(queries) > 25
+    assert full_scans(db, queries) == []
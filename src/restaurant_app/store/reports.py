@@ -0,0 +1,337 @@
+"""
+Statistics of the restaurants computed in parallel
+
+The restaurants are split into shards by their id, every shard is aggregated by a worker process of a
+process-pool. A worker opens its own SqlAlchemyDatabase (engines and sessions cannot be shared between
+processes), computes the statistics of its restaurants with GROUP BY queries and returns partial
+aggregates, which are merged into the report. The live reservations are used (not the archive).
+
+  python -m restaurant_app.store.reports --db sqlite:///restaurant.db --from 2024-01-01 --until 2024-01-31 \
+      [--workers 4]
+"""
+
+import argparse
+import datetime
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Select, case, func, make_url, select
+from sqlalchemy.orm import Session
+
+from ..infrastructure.logger import LOG
+from .availability import day_range
+from .database import EngineConfig, SqlAlchemyDatabase, is_sqlite_memory
+from .entities import MenuEntity, ReservationEntity, RestaurantEntity, TableEntity, relation_table_reservation
+
+WEEKDAYS = ("MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY")
+# upper bounds of the buckets of the menu price distribution, the last bucket has no upper bound
+PRICE_EDGES = (5.0, 10.0, 15.0, 20.0, 30.0, 50.0)
+# a worker gets several shards, so a shard with large restaurants does not keep the others waiting
+SHARDS_PER_WORKER = 4
+
+
+@dataclass
+class ReportAggregate:
+    """counters which are merged by adding them up, the ratios are derived from the merged counters"""
+
+    restaurants: int = 0
+    reservations: int = 0
+    people: int = 0
+    # people x duration of the reservations and seats x opening hours of the period
+    reserved_seat_minutes: int = 0
+    capacity_seat_minutes: int = 0
+    reservations_per_day: Counter = field(default_factory=Counter)
+    menus: int = 0
+    price_sum: float = 0.0
+    price_min: Optional[float] = None
+    price_max: Optional[float] = None
+    price_buckets: List[int] = field(default_factory=lambda: [0] * (len(PRICE_EDGES) + 1))
+
+    @property
+    def utilization(self) -> float:
+        return self.reserved_seat_minutes / self.capacity_seat_minutes if self.capacity_seat_minutes > 0 else 0.0
+
+    @property
+    def average_price(self) -> float:
+        return self.price_sum / self.menus if self.menus > 0 else 0.0
+
+    def merge(self, other: "ReportAggregate") -> "ReportAggregate":
+        self.restaurants += other.restaurants
+        self.reservations += other.reservations
+        self.people += other.people
+        self.reserved_seat_minutes += other.reserved_seat_minutes
+        self.capacity_seat_minutes += other.capacity_seat_minutes
+        self.reservations_per_day.update(other.reservations_per_day)
+        self.menus += other.menus
+        self.price_sum += other.price_sum
+        self.price_min = _bound(min, self.price_min, other.price_min)
+        self.price_max = _bound(max, self.price_max, other.price_max)
+        self.price_buckets = [a + b for a, b in zip(self.price_buckets, other.price_buckets)]
+        return self
+
+
+@dataclass
+class RestaurantReport:
+    restaurant_id: int
+    name: str
+    statistics: ReportAggregate
+
+
+@dataclass
+class Report:
+    date_from: datetime.date
+    date_until: datetime.date
+    restaurants: Dict[int, RestaurantReport] = field(default_factory=dict)
+    total: ReportAggregate = field(default_factory=ReportAggregate)
+    workers: int = 1
+    shards: int = 0
+    duration_s: float = 0.0
+
+    def add(self, reports: List[RestaurantReport]) -> None:
+        for report in reports:
+            self.restaurants[report.restaurant_id] = report
+            self.total.merge(report.statistics)
+
+
+def price_bucket_labels() -> List[str]:
+    lower = (0.0,) + PRICE_EDGES
+    return ["%g-%g" % (a, b) for a, b in zip(lower, PRICE_EDGES)] + [">=%g" % PRICE_EDGES[-1]]
+
+
+class ReportEngine:
+    """
+    computes the report of all restaurants with a pool of worker processes. with workers=1 the shards
+    are computed one after the other in the calling process (the reference without a pool).
+    the workers are started with 'spawn', a forked process would inherit the connections of the parent
+    """
+
+    def __init__(self, db_url: str, workers: int = None, engine_config: EngineConfig = None):
+        self._db_url = db_url
+        self._workers = workers or os.cpu_count() or 1
+        self._engine_config = engine_config
+        if is_sqlite_memory(make_url(db_url)):
+            raise ValueError("the report engine opens its own connections, an in-memory database is not visible")
+
+    @property
+    def workers(self) -> int:
+        return self._workers
+
+    def shards(self, restaurant_ids: Sequence[int]) -> List[List[int]]:
+        """the ids distributed round-robin, neighbouring ids (often of similar size) go to different shards"""
+        count = max(1, min(len(restaurant_ids), self._workers * SHARDS_PER_WORKER))
+        return [list(restaurant_ids[i::count]) for i in range(count)]
+
+    def run(self, date_from: datetime.date, date_until: datetime.date) -> Report:
+        start = time.perf_counter()
+        database = SqlAlchemyDatabase(self._db_url, engine_config=self._engine_config)
+        with database.managed_session() as session:
+            restaurant_ids = list(session.scalars(select(RestaurantEntity.id).order_by(RestaurantEntity.id)))
+            shards = self.shards(restaurant_ids)
+            report = Report(date_from=date_from, date_until=date_until, workers=self._workers, shards=len(shards))
+            if self._workers == 1:
+                for shard in shards:
+                    report.add(compute_reports(session, shard, date_from, date_until))
+        database.engine.dispose()
+
+        if self._workers > 1:
+            compute = partial(compute_shard, date_from=date_from, date_until=date_until)
+            with ProcessPoolExecutor(
+                max_workers=self._workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self._db_url, self._engine_config),
+            ) as executor:
+                for reports in executor.map(compute, shards):
+                    report.add(reports)
+        report.duration_s = time.perf_counter() - start
+        LOG.info(
+            "report of %d restaurants with %d workers (%d shards) in %.2f s",
+            len(report.restaurants),
+            self._workers,
+            len(shards),
+            report.duration_s,
+        )
+        return report
+
+
+# the database of the worker process, opened once by the initializer of the pool
+_database: Optional[SqlAlchemyDatabase] = None
+
+
+def _init_worker(db_url: str, engine_config: Optional[EngineConfig]) -> None:
+    global _database
+    _database = SqlAlchemyDatabase(db_url, engine_config=engine_config)
+
+
+def compute_shard(
+    restaurant_ids: List[int], date_from: datetime.date, date_until: datetime.date
+) -> List[RestaurantReport]:
+    """the statistics of the restaurants of one shard, executed in a worker process"""
+    with _database.managed_session() as session:
+        return compute_reports(session, restaurant_ids, date_from, date_until)
+
+
+def compute_reports(
+    session: Session, restaurant_ids: List[int], date_from: datetime.date, date_until: datetime.date
+) -> List[RestaurantReport]:
+    reports: Dict[int, RestaurantReport] = {}
+    open_minutes: Dict[int, int] = {}
+    for id, name, open_from, open_until, open_days in session.execute(restaurants_statement(restaurant_ids)):
+        days = open_days_in_range(open_days, date_from, date_until)
+        open_minutes[id] = _minutes(open_from, open_until) * days
+        reports[id] = RestaurantReport(id, name, ReportAggregate(restaurants=1))
+
+    for restaurant_id, seats in session.execute(capacity_statement(restaurant_ids)):
+        statistics = reports[restaurant_id].statistics
+        statistics.capacity_seat_minutes = (seats or 0) * open_minutes[restaurant_id]
+
+    start, end = day_range(date_from)[0], day_range(date_until)[1]
+    for restaurant_id, date, time_from, time_until, reservations, people in session.execute(
+        reservation_slots_statement(restaurant_ids, start, end)
+    ):
+        statistics = reports[restaurant_id].statistics
+        statistics.reservations += reservations
+        statistics.people += people
+        statistics.reserved_seat_minutes += people * _minutes(time_from, time_until)
+        statistics.reservations_per_day[date.date()] += reservations
+
+    for restaurant_id, bucket, menus, price_sum, price_min, price_max in session.execute(
+        menu_prices_statement(restaurant_ids)
+    ):
+        statistics = reports[restaurant_id].statistics
+        statistics.menus += menus
+        statistics.price_sum += price_sum
+        statistics.price_min = _bound(min, statistics.price_min, price_min)
+        statistics.price_max = _bound(max, statistics.price_max, price_max)
+        statistics.price_buckets[bucket] += menus
+    return list(reports.values())
+
+
+def restaurants_statement(restaurant_ids: List[int]) -> Select:
+    return select(
+        RestaurantEntity.id,
+        RestaurantEntity.name,
+        RestaurantEntity.open_from,
+        RestaurantEntity.open_until,
+        RestaurantEntity.open_days,
+    ).where(RestaurantEntity.id.in_(restaurant_ids))
+
+
+def capacity_statement(restaurant_ids: List[int]) -> Select:
+    """the seats of the tables per restaurant"""
+    return (
+        select(TableEntity.restaurant_id, func.sum(TableEntity.seats))
+        .where(TableEntity.restaurant_id.in_(restaurant_ids))
+        .group_by(TableEntity.restaurant_id)
+    )
+
+
+def reservation_slots_statement(restaurant_ids: List[int], start: datetime.datetime, end: datetime.datetime) -> Select:
+    """
+    (restaurant_id, reservation_date, time_from, time_until, reservations, people) of the reservations within
+    [start, end). a reservation with several tables of the restaurant is counted once
+    """
+    reserved = (
+        select(relation_table_reservation.c.reservation_id, TableEntity.restaurant_id)
+        .join(TableEntity, TableEntity.id == relation_table_reservation.c.table_id)
+        .where(TableEntity.restaurant_id.in_(restaurant_ids))
+        .distinct()
+        .subquery()
+    )
+    return (
+        select(
+            reserved.c.restaurant_id,
+            ReservationEntity.reservation_date,
+            ReservationEntity.time_from,
+            ReservationEntity.time_until,
+            func.count(),
+            func.sum(ReservationEntity.people),
+        )
+        .join(ReservationEntity, ReservationEntity.id == reserved.c.reservation_id)
+        .where(ReservationEntity.reservation_date >= start)
+        .where(ReservationEntity.reservation_date < end)
+        .group_by(
+            reserved.c.restaurant_id,
+            ReservationEntity.reservation_date,
+            ReservationEntity.time_from,
+            ReservationEntity.time_until,
+        )
+    )
+
+
+def menu_prices_statement(restaurant_ids: List[int]) -> Select:
+    """(restaurant_id, bucket, menus, sum, min, max) of the menu prices per bucket of PRICE_EDGES"""
+    bucket = case(
+        *[(MenuEntity.price < edge, index) for index, edge in enumerate(PRICE_EDGES)], else_=len(PRICE_EDGES)
+    ).label("bucket")
+    return (
+        select(
+            MenuEntity.restaurant_id,
+            bucket,
+            func.count(),
+            func.sum(MenuEntity.price),
+            func.min(MenuEntity.price),
+            func.max(MenuEntity.price),
+        )
+        .where(MenuEntity.restaurant_id.in_(restaurant_ids))
+        .group_by(MenuEntity.restaurant_id, bucket)
+    )
+
+
+def open_days_in_range(open_days: str, date_from: datetime.date, date_until: datetime.date) -> int:
+    """the number of days within [date_from, date_until] the restaurant is open"""
+    weekdays = {WEEKDAYS.index(day.strip().upper()) for day in (open_days or "").split(";") if day.strip()}
+    days = (date_until - date_from).days + 1
+    return sum(1 for offset in range(days) if (date_from + datetime.timedelta(days=offset)).weekday() in weekdays)
+
+
+def _minutes(time_from: datetime.time, time_until: datetime.time) -> int:
+    """the minutes between the times, a time_until before time_from is on the next day"""
+    minutes = (time_until.hour * 60 + time_until.minute) - (time_from.hour * 60 + time_from.minute)
+    return minutes if minutes >= 0 else minutes + 24 * 60
+
+
+def _bound(function, a: Optional[float], b: Optional[float]) -> Optional[float]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return function(a, b)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="the SQLAlchemy url of the database")
+    parser.add_argument("--from", dest="date_from", required=True, type=datetime.date.fromisoformat)
+    parser.add_argument("--until", dest="date_until", required=True, type=datetime.date.fromisoformat)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    report = ReportEngine(args.db, args.workers).run(args.date_from, args.date_until)
+    print("%-40s %8s %8s %6s %6s %8s" % ("restaurant", "reserv.", "people", "util.", "menus", "avg.price"))
+    rows: List[Tuple[str, ReportAggregate]] = [(r.name, r.statistics) for r in report.restaurants.values()]
+    rows.append(("total", report.total))
+    for name, statistics in rows:
+        print(
+            "%-40s %8d %8d %5.1f%% %6d %8.2f"
+            % (
+                name[:40],
+                statistics.reservations,
+                statistics.people,
+                statistics.utilization * 100,
+                statistics.menus,
+                statistics.average_price,
+            )
+        )
+    print("menu prices: %s" % dict(zip(price_bucket_labels(), report.total.price_buckets)))
+    print("%d workers, %d shards, %.2f s" % (report.workers, report.shards, report.duration_s))
+
+
+if __name__ == "__main__":
+    main()
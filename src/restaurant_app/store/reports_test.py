@@ -0,0 +1,77 @@
+import datetime
+
+import pytest
+
+from .database import SqlAlchemyDatabase
+from .entities import AddressEntity, MenuEntity, ReservationEntity, RestaurantEntity, TableEntity
+from .reports import ReportEngine, open_days_in_range
+
+DAY = datetime.date(2024, 9, 9)  # a monday
+
+
+def create_data(db_url: str) -> None:
+    db = SqlAlchemyDatabase(db_url)
+    db.create_database()
+    with db.managed_session() as session:
+        for r in range(5):
+            restaurant = RestaurantEntity(
+                name="Restaurant %d" % r,
+                open_from=datetime.time(10, 0),
+                open_until=datetime.time(20, 0),
+                open_days="MONDAY;TUESDAY",
+                address=AddressEntity(street="Street %d" % r, city="Salzburg", zip="5020", country="AT"),
+            )
+            tables = [TableEntity(table_number="T%d" % t, seats=4, restaurant=restaurant) for t in range(2)]
+            restaurant.menus = [
+                MenuEntity(name="Menu %d" % m, category="Main", price=4.0 + m * 5 + r, restaurant=restaurant)
+                for m in range(3)
+            ]
+            session.add(restaurant)
+            session.add_all(tables)
+            for d in range(r + 1):
+                reservation = ReservationEntity(
+                    reservation_date=datetime.datetime.combine(DAY + datetime.timedelta(days=d), datetime.time.min),
+                    time_from=datetime.time(18, 0),
+                    time_until=datetime.time(20, 0),
+                    people=3,
+                    reservation_name="Guest",
+                    reservation_number="%d-%d" % (r, d),
+                )
+                # a reservation with both tables is counted once
+                reservation.tables.extend(tables)
+                session.add(reservation)
+        session.commit()
+    db.engine.dispose()
+
+
+def test_open_days_in_range():
+    assert open_days_in_range("MONDAY;TUESDAY", DAY, DAY + datetime.timedelta(days=13)) == 4
+    assert open_days_in_range("", DAY, DAY) == 0
+
+
+def test_report_is_merged_from_the_workers(tmp_path):
+    db_url = "sqlite:///%s" % (tmp_path / "report.db")
+    create_data(db_url)
+    date_until = DAY + datetime.timedelta(days=2)
+
+    serial = ReportEngine(db_url, workers=1).run(DAY, date_until)
+    parallel = ReportEngine(db_url, workers=2).run(DAY, date_until)
+    assert parallel.shards == 5
+    assert parallel.restaurants == serial.restaurants
+    assert parallel.total == serial.total
+
+    total = parallel.total
+    # restaurant r has r + 1 reservations on consecutive days, the range covers three days
+    assert (total.restaurants, total.reservations, total.people) == (5, 1 + 2 + 3 + 3 + 3, 36)
+    assert total.reservations_per_day == {DAY: 5, DAY + datetime.timedelta(days=1): 4, DAY + datetime.timedelta(2): 3}
+    # 8 seats x 10 hours on monday and tuesday per restaurant, 3 people x 2 hours per reservation
+    assert total.capacity_seat_minutes == 5 * 8 * 600 * 2
+    assert total.utilization == pytest.approx(12 * 3 * 120 / (5 * 8 * 600 * 2))
+    assert (total.menus, total.price_min, total.price_max) == (15, 4.0, 18.0)
+    assert total.price_buckets == [1, 5, 5, 4, 0, 0, 0]
+    assert parallel.restaurants[1].statistics.reservations == 1
+
+
+def test_in_memory_database_is_rejected():
+    with pytest.raises(ValueError):
+        ReportEngine("sqlite://")
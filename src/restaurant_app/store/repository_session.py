@@ -0,0 +1,138 @@
+from contextlib import AbstractContextManager, contextmanager
+from typing import Callable, Iterator, TypeVar
+
+from sqlalchemy.orm import Session
+
+from ..infrastructure.cache import CacheBackend
+from .menu_repository import MenuRepository
+from .occupancy import OccupancyAggregate
+from .occupancy_repository import OccupancyRepository
+from .order_repository import OrderRepository
+from .reservation_archive import ReservationArchiveRepository
+from .reservation_numbers import ReservationNumberAllocator
+from .reservation_repo import ReservationRepository
+from .restaurant_repository import RestaurantRepository
+from .slot_index import SlotIndex
+from .table_repository import TableRepository
+
+T = TypeVar("T")
+
+
+class RepositorySession:
+    """
+    the repositories bound to one session. a repository is created with new_session on first use
+    and the same instance is re-used for the rest of the transaction
+    """
+
+    __slots__ = (
+        "_session",
+        "_registry",
+        "_restaurants",
+        "_menus",
+        "_tables",
+        "_reservations",
+        "_occupancy",
+        "_archive",
+        "_orders",
+    )
+
+    def __init__(self, session: Session, registry: "RepositoryRegistry"):
+        self._session = session
+        self._registry = registry
+        self._restaurants = None
+        self._menus = None
+        self._tables = None
+        self._reservations = None
+        self._occupancy = None
+        self._archive = None
+        self._orders = None
+
+    @property
+    def session(self) -> Session:
+        return self._session
+
+    @property
+    def restaurants(self) -> RestaurantRepository:
+        if self._restaurants is None:
+            self._restaurants = self._registry.restaurants.new_session(self._session)
+        return self._restaurants
+
+    @property
+    def menus(self) -> MenuRepository:
+        if self._menus is None:
+            self._menus = self._registry.menus.new_session(self._session)
+        return self._menus
+
+    @property
+    def tables(self) -> TableRepository:
+        if self._tables is None:
+            self._tables = self._registry.tables.new_session(self._session)
+        return self._tables
+
+    @property
+    def reservations(self) -> ReservationRepository:
+        if self._reservations is None:
+            self._reservations = self._registry.reservations.new_session(self._session)
+        return self._reservations
+
+    @property
+    def occupancy(self) -> OccupancyRepository:
+        if self._occupancy is None:
+            self._occupancy = self._registry.occupancy.new_session(self._session)
+        return self._occupancy
+
+    @property
+    def archive(self) -> ReservationArchiveRepository:
+        if self._archive is None:
+            self._archive = self._registry.archive.new_session(self._session)
+        return self._archive
+
+    @property
+    def orders(self) -> OrderRepository:
+        if self._orders is None:
+            self._orders = self._registry.orders.new_session(self._session)
+        return self._orders
+
+    def flush(self) -> None:
+        self._session.flush()
+
+
+class RepositoryRegistry:
+    """
+    holds the configured repositories (cache, slot-index, number allocator, occupancy) and binds them to a session.
+    a transaction works with one RepositorySession instead of calling new_session for every repository
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[..., AbstractContextManager[Session]],
+        cache: CacheBackend = None,
+        slot_index: SlotIndex = None,
+        number_allocator: ReservationNumberAllocator = None,
+        occupancy: OccupancyAggregate = None,
+    ):
+        self._session_factory = session_factory
+        self.restaurants = RestaurantRepository(session_factory, cache=cache)
+        self.menus = MenuRepository(session_factory, cache=cache)
+        self.tables = TableRepository(session_factory, cache=cache, occupancy=occupancy)
+        self.reservations = ReservationRepository(
+            session_factory, slot_index=slot_index, number_allocator=number_allocator, occupancy=occupancy
+        )
+        self.occupancy = OccupancyRepository(session_factory, aggregate=occupancy)
+        self.archive = ReservationArchiveRepository(session_factory)
+        self.orders = OrderRepository(session_factory)
+
+    def bind(self, session: Session) -> RepositorySession:
+        return RepositorySession(session, self)
+
+    @contextmanager
+    def transaction(self) -> Iterator[RepositorySession]:
+        """a session with the bound repositories, committed when the with-block completes"""
+        with self._session_factory() as session:
+            yield RepositorySession(session, self)
+            session.commit()
+
+    def unit_of_work(self, action: Callable[[RepositorySession], T]) -> T:
+        """same as BaseRepository.unit_of_work, the action gets the bound repositories"""
+        with self.transaction() as repositories:
+            return action(repositories)
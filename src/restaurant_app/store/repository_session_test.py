@@ -0,0 +1,39 @@
+import datetime
+
+from .entities import MenuEntity, ReservationEntity, TableEntity
+from .repository_session import RepositoryRegistry
+from .repository_test_helpers import create_restaurant_data, get_database
+
+
+def test_repository_session_binds_repositories_once():
+    registry = RepositoryRegistry(get_database().managed_session)
+
+    with registry.transaction() as repositories:
+        assert repositories.restaurants is repositories.restaurants
+        assert repositories.menus is repositories.menus
+        assert repositories.reservations.get_session() is repositories.reservations.get_session()
+        # the fast path hands the bound session to the work without a context-manager
+        assert repositories.tables.with_session(lambda session: session) is repositories.session
+
+        restaurant = repositories.restaurants.save(create_restaurant_data())
+        repositories.menus.save(MenuEntity(name="Menu", category="Main", price=10.0, restaurant=restaurant))
+        table = repositories.tables.save(TableEntity(table_number="T1", seats=4, restaurant=restaurant))
+        reservation = ReservationEntity(
+            reservation_date=datetime.datetime(2024, 9, 10),
+            time_from=datetime.time(18, 0, 0),
+            time_until=datetime.time(20, 0, 0),
+            people=2,
+            reservation_name="Test",
+            reservation_number="1",
+        )
+        reservation.tables.append(table)
+        repositories.reservations.save(reservation)
+        restaurant_id = restaurant.id
+
+    def read(repositories):
+        return (
+            len(repositories.menus.get_menu_list(restaurant_id)),
+            len(repositories.reservations.get_reservation_for_restaurant(restaurant_id)),
+        )
+
+    assert registry.unit_of_work(read) == (1, 1)
@@ -1,4 +1,8 @@
+from contextlib import contextmanager
 from datetime import time
+from typing import Iterator, List
+
+from sqlalchemy import event
 
 from .database import SqlAlchemyDatabase
 from .entities import AddressEntity, RestaurantEntity
@@ -20,3 +24,18 @@ def get_database(auto_commit=False):
     db = SqlAlchemyDatabase("sqlite://", auto_commit=auto_commit)
     db.create_database()
     return db
+
+
+@contextmanager
+def capture_statements(db: SqlAlchemyDatabase) -> Iterator[List[str]]:
+    """collect the SQL statements sent to the database within the with-block"""
+    statements: List[str] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
@@ -0,0 +1,289 @@
+"""
+Archival of past reservations
+
+Reservations older than the horizon are moved from RESERVATION/REL_TABLE_RESERVATION to
+RESERVATION_ARCHIVE/REL_TABLE_RESERVATION_ARCHIVE, so the queries of the ReservationRepository only
+work with the live reservations. The archive is partitioned by the month of the reservation.
+
+  python -m restaurant_app.store.reservation_archive --db sqlite:///restaurant.db [--horizon-days 365]
+"""
+
+import argparse
+import datetime
+from contextlib import AbstractContextManager
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Self
+
+from sqlalchemy import Select, delete, func, insert, select, union_all
+from sqlalchemy.orm import Session
+
+from .availability import day_range
+from .base_repository import BaseRepository
+from .database import SqlAlchemyDatabase
+from .entities import (
+    ReservationEntity,
+    TableEntity,
+    current_datetime,
+    relation_table_reservation,
+    relation_table_reservation_archive,
+    reservation_archive,
+)
+from .views import ReservationView
+
+DEFAULT_ARCHIVE_HORIZON = datetime.timedelta(days=365)
+# reservations moved per transaction
+DEFAULT_ARCHIVE_BATCH_SIZE = 1000
+
+
+@dataclass(frozen=True, slots=True)
+class ArchivePartition:
+    month: str
+    reservations: int
+
+
+def archive_month(date: datetime.date) -> str:
+    """the partition key of a reservation date"""
+    return "%04d-%02d" % (date.year, date.month)
+
+
+class ReservationArchiveRepository(BaseRepository):
+
+    def __init__(
+        self,
+        session_factory: Callable[..., AbstractContextManager[Session]],
+        session: Session = None,
+        horizon: datetime.timedelta = DEFAULT_ARCHIVE_HORIZON,
+    ):
+        """
+        reservations older than the horizon are archived. the rows are moved with bulk statements,
+        the in-process indexes and the occupancy aggregate are not changed (the occupancy of archived
+        days stays as history)
+        """
+        super().__init__(session_factory=session_factory, session=session)
+        self._horizon = horizon
+
+    def new_session(self, session: Session) -> Self:
+        return ReservationArchiveRepository(session_factory=None, session=session, horizon=self._horizon)
+
+    def cutoff(self, today: datetime.date = None) -> datetime.datetime:
+        """reservations before this point in time are archived"""
+        today = today or datetime.date.today()
+        return day_range(today - self._horizon)[0]
+
+    def archive(self, before: datetime.datetime = None, batch_size: int = DEFAULT_ARCHIVE_BATCH_SIZE) -> int:
+        """
+        move the reservations before the given point in time (default: the cutoff of the horizon) to the
+        archive, every batch is committed in its own transaction. returns the number of archived reservations
+        """
+        before = before or self.cutoff()
+        archived = 0
+        while True:
+            moved = self.unit_of_work(lambda session: self.new_session(session).archive_batch(before, batch_size))
+            archived += moved
+            if moved < batch_size:
+                return archived
+
+    def archive_batch(self, before: datetime.datetime, batch_size: int = DEFAULT_ARCHIVE_BATCH_SIZE) -> int:
+        """move the oldest reservations before the given point in time, returns the number of moved reservations"""
+        with self.get_session() as session:
+            rows = session.execute(archive_candidates_statement(before, batch_size)).all()
+            if not rows:
+                return 0
+            ids = [row.id for row in rows]
+            archived = current_datetime()
+            session.execute(
+                insert(reservation_archive),
+                [
+                    {**row._asdict(), "archive_month": archive_month(row.reservation_date), "archived": archived}
+                    for row in rows
+                ],
+            )
+            session.execute(
+                insert(relation_table_reservation_archive).from_select(
+                    ["table_id", "reservation_id"],
+                    select(relation_table_reservation.c.table_id, relation_table_reservation.c.reservation_id).where(
+                        relation_table_reservation.c.reservation_id.in_(ids)
+                    ),
+                )
+            )
+            session.execute(
+                delete(relation_table_reservation).where(relation_table_reservation.c.reservation_id.in_(ids))
+            )
+            session.execute(
+                delete(ReservationEntity)
+                .where(ReservationEntity.id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+            return len(rows)
+
+    def get_reservation_history(
+        self, restaurant_id: int, date_from: datetime.date = None, date_until: datetime.date = None
+    ) -> List[ReservationView]:
+        """
+        the live and the archived reservations of the restaurant for the days [date_from, date_until]
+        ordered by date and time. without a date range the whole history is returned
+        """
+        with self.get_session() as session:
+            table_ids: Dict[int, List[int]] = {}
+            for reservation_id, table_id in session.execute(
+                history_tables_statement(restaurant_id, date_from, date_until)
+            ):
+                table_ids.setdefault(reservation_id, []).append(table_id)
+            return [
+                ReservationView(*row, tuple(table_ids.get(row[0], ())))
+                for row in session.execute(history_views_statement(restaurant_id, date_from, date_until))
+            ]
+
+    def get_archived_reservation_by_number(self, number: str) -> Optional[ReservationView]:
+        """
+        the archived reservation with the number. the number of an archived reservation is not unique
+        (a reservation saved with an explicit number can re-use it), the latest archived one is returned
+        """
+        with self.get_session() as session:
+            row = session.execute(
+                _archive_columns()
+                .where(reservation_archive.c.reservation_number == number)
+                .order_by(reservation_archive.c.archived.desc(), reservation_archive.c.id.desc())
+                .limit(1)
+            ).first()
+            if row is None:
+                return None
+            table_ids = session.execute(
+                select(relation_table_reservation_archive.c.table_id)
+                .where(relation_table_reservation_archive.c.reservation_id == row.id)
+                .order_by(relation_table_reservation_archive.c.table_id)
+            ).scalars()
+            return ReservationView(*row, tuple(table_ids))
+
+    def get_partitions(self) -> List[ArchivePartition]:
+        """the months of the archive with their number of reservations"""
+        with self.get_session() as session:
+            statement = (
+                select(reservation_archive.c.archive_month, func.count())
+                .group_by(reservation_archive.c.archive_month)
+                .order_by(reservation_archive.c.archive_month)
+            )
+            return [ArchivePartition(*row) for row in session.execute(statement)]
+
+    def purge_partition(self, month: str) -> int:
+        """delete the archived reservations of a month (YYYY-MM), returns the number of deleted reservations"""
+        with self.get_session() as session:
+            ids = select(reservation_archive.c.id).where(reservation_archive.c.archive_month == month)
+            session.execute(
+                delete(relation_table_reservation_archive).where(
+                    relation_table_reservation_archive.c.reservation_id.in_(ids)
+                )
+            )
+            return session.execute(
+                delete(reservation_archive).where(reservation_archive.c.archive_month == month)
+            ).rowcount
+
+
+def archive_candidates_statement(before: datetime.datetime, batch_size: int) -> Select:
+    """the oldest live reservations before the given point in time, served by IX_RESERVATION_DATE_TIME"""
+    return (
+        select(
+            ReservationEntity.id,
+            ReservationEntity.created,
+            ReservationEntity.modified,
+            ReservationEntity.reservation_date,
+            ReservationEntity.time_from,
+            ReservationEntity.time_until,
+            ReservationEntity.people,
+            ReservationEntity.reservation_name,
+            ReservationEntity.reservation_number,
+        )
+        .where(ReservationEntity.reservation_date < before)
+        .order_by(ReservationEntity.reservation_date, ReservationEntity.id)
+        .limit(batch_size)
+    )
+
+
+def history_views_statement(
+    restaurant_id: int, date_from: datetime.date = None, date_until: datetime.date = None
+) -> Select:
+    """the columns of ReservationView (without the table ids) of the live and the archived reservations"""
+    live = select(
+        ReservationEntity.id,
+        ReservationEntity.reservation_number,
+        ReservationEntity.reservation_date,
+        ReservationEntity.time_from,
+        ReservationEntity.time_until,
+        ReservationEntity.people,
+        ReservationEntity.reservation_name,
+    ).where(ReservationEntity.tables.any(TableEntity.restaurant_id == restaurant_id))
+    archived_table = (
+        select(relation_table_reservation_archive.c.reservation_id)
+        .join(TableEntity, TableEntity.id == relation_table_reservation_archive.c.table_id)
+        .where(relation_table_reservation_archive.c.reservation_id == reservation_archive.c.id)
+        .where(TableEntity.restaurant_id == restaurant_id)
+    )
+    archived = _archive_columns().where(archived_table.exists())
+    history = union_all(
+        _date_range(live, ReservationEntity.reservation_date, date_from, date_until),
+        _date_range(archived, reservation_archive.c.reservation_date, date_from, date_until),
+    ).subquery()
+    return select(history).order_by(history.c.reservation_date, history.c.time_from, history.c.id)
+
+
+def history_tables_statement(
+    restaurant_id: int, date_from: datetime.date = None, date_until: datetime.date = None
+) -> Select:
+    """the (reservation_id, table_id) pairs of the tables of the restaurant, live and archived"""
+    live = (
+        select(relation_table_reservation.c.reservation_id, relation_table_reservation.c.table_id)
+        .join(TableEntity, TableEntity.id == relation_table_reservation.c.table_id)
+        .join(ReservationEntity, ReservationEntity.id == relation_table_reservation.c.reservation_id)
+        .where(TableEntity.restaurant_id == restaurant_id)
+    )
+    archived = (
+        select(relation_table_reservation_archive.c.reservation_id, relation_table_reservation_archive.c.table_id)
+        .join(TableEntity, TableEntity.id == relation_table_reservation_archive.c.table_id)
+        .join(reservation_archive, reservation_archive.c.id == relation_table_reservation_archive.c.reservation_id)
+        .where(TableEntity.restaurant_id == restaurant_id)
+    )
+    tables = union_all(
+        _date_range(live, ReservationEntity.reservation_date, date_from, date_until),
+        _date_range(archived, reservation_archive.c.reservation_date, date_from, date_until),
+    ).subquery()
+    return select(tables).order_by(tables.c.reservation_id, tables.c.table_id)
+
+
+def _archive_columns() -> Select:
+    """the columns of ReservationView (without the table ids) of the archive"""
+    return select(
+        reservation_archive.c.id,
+        reservation_archive.c.reservation_number,
+        reservation_archive.c.reservation_date,
+        reservation_archive.c.time_from,
+        reservation_archive.c.time_until,
+        reservation_archive.c.people,
+        reservation_archive.c.reservation_name,
+    )
+
+
+def _date_range(statement: Select, column, date_from: Optional[datetime.date], date_until: Optional[datetime.date]):
+    if date_from is not None:
+        statement = statement.where(column >= day_range(date_from)[0])
+    if date_until is not None:
+        statement = statement.where(column < day_range(date_until)[1])
+    return statement
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="the SQLAlchemy url of the database")
+    parser.add_argument("--horizon-days", type=int, default=DEFAULT_ARCHIVE_HORIZON.days)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    db = SqlAlchemyDatabase(args.db)
+    db.create_database()
+    repository = ReservationArchiveRepository(db.managed_session, horizon=datetime.timedelta(days=args.horizon_days))
+    before = repository.cutoff()
+    archived = repository.archive(before, args.batch_size)
+    print("%d reservations before %s archived" % (archived, before.date().isoformat()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import datetime
+from typing import Any, List
+
+from .entities import ReservationEntity, TableEntity
+from .repository_test_helpers import create_restaurant_data, get_database
+from .reservation_archive import ArchivePartition, ReservationArchiveRepository
+from .reservation_repo import ReservationRepository
+from .restaurant_repository import RestaurantRepository
+from .table_repository import TableRepository
+
+
+def test_archive_moves_past_reservations():
+    managed_session = get_database().managed_session
+    archive = ReservationArchiveRepository(managed_session, horizon=datetime.timedelta(days=30))
+    repo = ReservationRepository(managed_session)
+    repo_restaurant = RestaurantRepository(managed_session)
+    repo_table = TableRepository(managed_session)
+    dates = [datetime.datetime(2024, month, day) for month, day in [(7, 1), (7, 20), (8, 5), (9, 1), (9, 10)]]
+
+    def action(session) -> List[Any]:
+        restaurant = repo_restaurant.new_session(session).save(create_restaurant_data())
+        tables = repo_table.new_session(session).save_many(
+            [TableEntity(table_number="Table%d" % i, seats=4, restaurant=restaurant) for i in range(2)]
+        )
+        reservations = []
+        for i, date in enumerate(dates):
+            res = ReservationEntity(
+                reservation_date=date,
+                time_from=datetime.time(18, 0, 0),
+                time_until=datetime.time(20, 0, 0),
+                people=2,
+                reservation_name="Test%d" % i,
+                reservation_number="%d" % i,
+            )
+            res.tables.extend(tables[: 1 + i % 2])
+            reservations.append(res)
+        repo.new_session(session).save_many(reservations)
+        return [restaurant.id]
+
+    restaurant_id = repo.unit_of_work(action)[0]
+
+    before = archive.cutoff(datetime.date(2024, 9, 5))
+    assert before == datetime.datetime(2024, 8, 6)
+    # a batch of two reservations and the last batch with one
+    assert archive.archive(before, batch_size=2) == 3
+    assert archive.archive(before) == 0
+
+    # the live queries only see the reservations after the cutoff
+    assert [r.reservation_number for r in repo.get_reservation_for_restaurant(restaurant_id)] == ["3", "4"]
+    assert repo.get_reservation_by_number("0") is None
+    assert archive.get_partitions() == [ArchivePartition("2024-07", 2), ArchivePartition("2024-08", 1)]
+
+    history = archive.get_reservation_history(restaurant_id)
+    assert [view.reservation_number for view in history] == ["0", "1", "2", "3", "4"]
+    assert [len(view.table_ids) for view in history] == [1, 2, 1, 2, 1]
+    ranged = archive.get_reservation_history(restaurant_id, datetime.date(2024, 7, 20), datetime.date(2024, 9, 1))
+    assert [view.reservation_number for view in ranged] == ["1", "2", "3"]
+
+    archived = archive.get_archived_reservation_by_number("1")
+    assert archived.reservation_date == dates[1] and len(archived.table_ids) == 2
+
+    assert archive.unit_of_work(lambda session: archive.new_session(session).purge_partition("2024-07")) == 2
+    assert [view.reservation_number for view in archive.get_reservation_history(restaurant_id)] == ["2", "3", "4"]
+
+    # the number of an archived reservation is still in use
+    assert repo.is_reservation_number_in_use("2")
+    assert not repo.is_reservation_number_in_use("5")
+
+    # a reservation saved with the number of an archived one and archived as well, the latest is found
+    reused = ReservationEntity(
+        reservation_date=datetime.datetime(2024, 8, 1),
+        time_from=datetime.time(12, 0, 0),
+        time_until=datetime.time(14, 0, 0),
+        people=4,
+        reservation_name="Reused",
+        reservation_number="2",
+    )
+    repo.unit_of_work(lambda session: repo.new_session(session).save(reused))
+    assert archive.archive(before) == 1
+    assert archive.get_archived_reservation_by_number("2").reservation_name == "Reused"
@@ -0,0 +1,101 @@
+import string
+import threading
+from typing import Tuple
+
+from sqlalchemy import Engine, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from .entities import NumberSequenceEntity
+
+RESERVATION_NUMBER_SEQUENCE = "reservation_number"
+RESERVATION_NUMBER_PREFIX = "R"
+# "R" + 7 base36 digits fits into RESERVATION.reservation_number (String(10)), 36^7 ~ 78 billion numbers
+RESERVATION_NUMBER_WIDTH = 7
+
+_DIGITS = string.digits + string.ascii_uppercase
+
+
+def encode_reservation_number(value: int) -> str:
+    """encode the counter value as prefix + fixed-width base36, e.g. 46655 -> R0000ZZZ"""
+    if value < 0 or value >= 36**RESERVATION_NUMBER_WIDTH:
+        raise ValueError("the value %d cannot be encoded as reservation number" % value)
+    digits = []
+    while value > 0:
+        value, digit = divmod(value, 36)
+        digits.append(_DIGITS[digit])
+    return RESERVATION_NUMBER_PREFIX + "".join(reversed(digits)).rjust(RESERVATION_NUMBER_WIDTH, "0")
+
+
+def decode_reservation_number(number: str) -> int:
+    if not number.startswith(RESERVATION_NUMBER_PREFIX):
+        raise ValueError("%s is not an allocated reservation number" % number)
+    return int(number[len(RESERVATION_NUMBER_PREFIX) :], 36)
+
+
+class ReservationNumberAllocator:
+    """
+    hands out unique reservation numbers without looking up the number in the RESERVATION table.
+    the numbers are reserved in blocks from the NUMBER_SEQUENCE table with an atomic UPDATE in a separate,
+    short transaction; the numbers of a block are then handed out from memory. every process (and every
+    allocator) works on its own blocks, so the numbers are unique across threads and processes.
+
+    a block is committed independently of the booking, numbers of rolled back bookings or of a
+    block which is not used up before the process ends are skipped, the numbers are unique but not gap-free.
+    with SQLite a block should not be reserved while the same thread holds an open write-transaction on
+    another connection, the UPDATE would wait for the lock of that transaction
+    """
+
+    def __init__(self, engine: Engine, block_size: int = 100, sequence: str = RESERVATION_NUMBER_SEQUENCE):
+        if block_size <= 0:
+            raise ValueError("the block_size needs to be positive")
+        self._engine = engine
+        self._block_size = block_size
+        self._sequence = sequence
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+        self._blocks = 0
+
+    @property
+    def blocks_reserved(self) -> int:
+        """the number of blocks reserved from the database by this allocator"""
+        return self._blocks
+
+    def next_value(self) -> int:
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = self._reserve_block()
+                self._blocks += 1
+            value = self._next
+            self._next += 1
+            return value
+
+    def next_number(self) -> str:
+        return encode_reservation_number(self.next_value())
+
+    def _reserve_block(self) -> Tuple[int, int]:
+        """increment the sequence by the block size and return the reserved range [start, end)"""
+        while True:
+            with self._engine.begin() as connection:
+                # the UPDATE locks the row (the database in case of SQLite) until the commit,
+                # the value read afterwards can therefore not be changed by anybody else
+                updated = connection.execute(
+                    update(NumberSequenceEntity)
+                    .where(NumberSequenceEntity.name == self._sequence)
+                    .values(next_value=NumberSequenceEntity.next_value + self._block_size)
+                )
+                if updated.rowcount == 1:
+                    end = connection.execute(
+                        select(NumberSequenceEntity.next_value).where(NumberSequenceEntity.name == self._sequence)
+                    ).scalar_one()
+                    return end - self._block_size, end
+            try:
+                with self._engine.begin() as connection:
+                    # the first number is 1, the first block is [1, block_size + 1)
+                    connection.execute(
+                        insert(NumberSequenceEntity).values(name=self._sequence, next_value=1 + self._block_size)
+                    )
+                    return 1, 1 + self._block_size
+            except IntegrityError:
+                # the sequence was created by another process in the meantime, increment it
+                continue
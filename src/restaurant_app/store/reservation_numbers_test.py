@@ -0,0 +1,63 @@
+import datetime
+import threading
+
+import pytest
+
+from .database import SqlAlchemyDatabase
+from .entities import ReservationEntity
+from .repository_test_helpers import get_database
+from .reservation_numbers import ReservationNumberAllocator, decode_reservation_number, encode_reservation_number
+from .reservation_repo import ReservationRepository
+
+
+def test_encode_reservation_number():
+    assert encode_reservation_number(1) == "R0000001"
+    assert encode_reservation_number(46655) == "R0000ZZZ"
+    assert decode_reservation_number("R0000ZZZ") == 46655
+    assert len(encode_reservation_number(36**7 - 1)) <= 10
+    with pytest.raises(ValueError):
+        encode_reservation_number(36**7)
+
+
+def test_allocators_hand_out_unique_numbers(tmp_path):
+    db = SqlAlchemyDatabase("sqlite:///%s" % (tmp_path / "numbers.db"))
+    db.create_database()
+    # two allocators simulate two processes working on the same sequence
+    allocators = [ReservationNumberAllocator(db.engine, block_size=10) for _ in range(2)]
+    numbers = []
+    lock = threading.Lock()
+
+    def allocate(allocator: ReservationNumberAllocator) -> None:
+        allocated = [allocator.next_number() for _ in range(100)]
+        with lock:
+            numbers.extend(allocated)
+
+    threads = [threading.Thread(target=allocate, args=(allocators[i % 2],)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(numbers) == 800
+    assert len(set(numbers)) == 800
+    assert sum(allocator.blocks_reserved for allocator in allocators) == 80
+
+
+def test_reservation_repository_allocates_numbers():
+    db = get_database(auto_commit=True)
+    repo = ReservationRepository(db.managed_session, number_allocator=ReservationNumberAllocator(db.engine))
+
+    def reservation(number: str = None) -> ReservationEntity:
+        return ReservationEntity(
+            reservation_date=datetime.datetime(2024, 9, 10),
+            time_from=datetime.time(18, 0, 0),
+            time_until=datetime.time(20, 0, 0),
+            people=2,
+            reservation_name="Test",
+            reservation_number=number,
+        )
+
+    first = repo.save(reservation())
+    assert first.reservation_number == "R0000001"
+    saved = repo.save_many([reservation(), reservation("1234")])
+    assert [r.reservation_number for r in saved] == ["R0000002", "1234"]
+    assert repo.get_reservation_by_number("R0000002") is not None
@@ -1,66 +1,187 @@
 import datetime
 from contextlib import AbstractContextManager
-from typing import Callable, List, Self
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Self, Tuple
 
-from sqlalchemy import extract
-from sqlalchemy.orm import Session, aliased
+from sqlalchemy import Select, exists, or_, select
+from sqlalchemy.orm import Session, selectinload
 
-from .base_repository import BaseRepository
-from .entities import ReservationEntity, TableEntity
+from .availability import day_range
+from .base_repository import DEFAULT_BATCH_SIZE, BaseRepository, batched
+from .entities import ReservationEntity, TableEntity, relation_table_reservation, reservation_archive
+from .occupancy import OccupancyAggregate
+from .pagination import DEFAULT_PAGE_SIZE, DEFAULT_STREAM_BATCH_SIZE, Page, keyset_page, stream
+from .reservation_numbers import ReservationNumberAllocator
+from .session_events import after_commit
+from .slot_index import SlotIndex, TableDaySlots
+from .views import ReservationView
+
+ReservationCursor = Tuple[datetime.datetime, datetime.time, int]
 
 
 class ReservationRepository(BaseRepository):
 
-    def __init__(self, session_factory: Callable[..., AbstractContextManager[Session]], session: Session = None):
+    def __init__(
+        self,
+        session_factory: Callable[..., AbstractContextManager[Session]],
+        session: Session = None,
+        slot_index: SlotIndex = None,
+        number_allocator: ReservationNumberAllocator = None,
+        occupancy: OccupancyAggregate = None,
+    ):
+        """
+        an optional SlotIndex answers overlap/free-slot questions in memory,
+        the index is kept in sync by save and delete.
+        with an optional ReservationNumberAllocator new reservations without a reservation_number
+        get an allocated number, without the lookup of is_reservation_number_in_use.
+        an optional OccupancyAggregate is updated by save and delete in the same transaction
+        """
         super().__init__(session_factory=session_factory, session=session)
+        self._slot_index = slot_index
+        self._number_allocator = number_allocator
+        self._occupancy = occupancy
 
     def new_session(self, session: Session) -> Self:
-        return ReservationRepository(session_factory=None, session=session)
+        return ReservationRepository(
+            session_factory=None,
+            session=session,
+            slot_index=self._slot_index,
+            number_allocator=self._number_allocator,
+            occupancy=self._occupancy,
+        )
 
     def save(self, reservation: ReservationEntity) -> ReservationEntity:
         with self.get_session() as session:
-            reservation_id = reservation.id or 0
-            if reservation_id > 0:
-                existing = session.get(ReservationEntity, reservation_id)
-                if existing is not None:
-                    existing.reservation_name = reservation.reservation_name
-                    existing.reservation_number = reservation.reservation_number
-                    existing.reservation_date = reservation.reservation_date
-                    existing.people = reservation.people
-                    existing.time_from = reservation.time_from
-                    existing.time_until = reservation.time_until
-                    session.add(existing)
-                    return existing
-            else:
-                # lookup the reservation by its number
-                existing = (
-                    session.query(ReservationEntity)
-                    .filter(ReservationEntity.reservation_number == reservation.reservation_number)
-                    .first()
-                )
-                if existing is not None:
-                    existing.reservation_name = reservation.reservation_name
-                    existing.reservation_date = reservation.reservation_date
-                    existing.people = reservation.people
-                    existing.time_from = reservation.time_from
-                    existing.time_until = reservation.time_until
-                    session.add(existing)
-                    return existing
-
-            # new or not found
+            saved = self._save(session, reservation)
+            self._track_slots(session, saved)
+            self._track_occupancy(session, saved)
+        return saved
+
+    def _save(self, session: Session, reservation: ReservationEntity) -> ReservationEntity:
+        reservation_id = reservation.id or 0
+        if self.allocate_number(reservation):
+            # an allocated number is not used by any other reservation, no need to look it up
             session.add(reservation)
             session.flush()
+            return reservation
+        if reservation_id > 0:
+            existing = session.get(ReservationEntity, reservation_id)
+            if existing is not None:
+                existing.reservation_name = reservation.reservation_name
+                existing.reservation_number = reservation.reservation_number
+                existing.reservation_date = reservation.reservation_date
+                existing.people = reservation.people
+                existing.time_from = reservation.time_from
+                existing.time_until = reservation.time_until
+                session.add(existing)
+                return existing
+        else:
+            # lookup the reservation by its number
+            existing = (
+                session.query(ReservationEntity)
+                .filter(ReservationEntity.reservation_number == reservation.reservation_number)
+                .first()
+            )
+            if existing is not None:
+                existing.reservation_name = reservation.reservation_name
+                existing.reservation_date = reservation.reservation_date
+                existing.people = reservation.people
+                existing.time_from = reservation.time_from
+                existing.time_until = reservation.time_until
+                session.add(existing)
+                return existing
+
+        # new or not found
+        session.add(reservation)
+        session.flush()
         return reservation
 
+    def save_many(
+        self, reservations: Iterable[ReservationEntity], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[ReservationEntity]:
+        """
+        save the reservations with the same upsert semantics as save (by id or by reservation_number).
+        existing reservations are resolved with one query per batch, all changes are written with a single flush
+        """
+        saved: List[ReservationEntity] = []
+        by_number: Dict[str, ReservationEntity] = {}
+        with self.get_session() as session:
+            for batch in batched(reservations, batch_size):
+                for reservation in batch:
+                    self.allocate_number(reservation)
+                existing = session.execute(existing_reservations_statement(batch)).unique().scalars()
+                merged = merge_reservations(batch, existing, by_number)
+                session.add_all(merged)
+                saved.extend(merged)
+            # the previous values are part of the attribute history until the flush
+            for reservation in saved:
+                self._track_occupancy(session, reservation)
+            session.flush()
+            for reservation in saved:
+                self._track_slots(session, reservation)
+        return saved
+
     def delete(self, reservation_id: int):
         with self.get_session() as session:
             reservation = session.get(ReservationEntity, reservation_id)
             if reservation is not None:
+                self._track_occupancy(session, reservation)
                 session.delete(reservation)
+                if self._slot_index is not None:
+                    slot_index = self._slot_index
+                    after_commit(session, lambda: slot_index.remove(reservation_id))
+
+    def allocate_number(self, reservation: ReservationEntity) -> bool:
+        """assign an allocated number to a new reservation without a number, True if a number was assigned"""
+        if self._number_allocator is None or (reservation.id or 0) > 0 or reservation.reservation_number:
+            return False
+        reservation.reservation_number = self._number_allocator.next_number()
+        return True
+
+    def _track_slots(self, session: Session, reservation: ReservationEntity) -> None:
+        if self._slot_index is None:
+            return
+        # take a snapshot of the values, the entity could change until the commit
+        slot_index = self._slot_index
+        reservation_id = reservation.id
+        table_ids = [table.id for table in reservation.tables]
+        date, time_from, time_until = reservation.reservation_date, reservation.time_from, reservation.time_until
+        after_commit(session, lambda: slot_index.update(reservation_id, table_ids, date, time_from, time_until))
+
+    def _track_occupancy(self, session: Session, reservation: ReservationEntity) -> None:
+        if self._occupancy is not None:
+            self._occupancy.track_reservation(session, reservation)
+
+    def get_table_slots(self, table_id: int, date: datetime.date) -> TableDaySlots:
+        """the reserved slots of the table/day, served from the SlotIndex if available"""
+        if self._slot_index is None:
+            slots = TableDaySlots()
+            for reservation in self.get_table_reservations_for_date(date, table_id):
+                slots.add(reservation.id, reservation.time_from, reservation.time_until)
+            return slots
+        slots = self._slot_index.get(table_id, date)
+        if slots is None:
+            slots = self._slot_index.load(table_id, date, self.get_table_reservations_for_date(date, table_id))
+        return slots
+
+    def is_slot_reserved(
+        self, table_id: int, date: datetime.date, time_from: datetime.time, time_until: datetime.time
+    ) -> bool:
+        """true if the slot overlaps an existing reservation of the table"""
+        return self.get_table_slots(table_id, date).overlaps(time_from, time_until)
+
+    def next_free_slot(
+        self,
+        table_id: int,
+        date: datetime.date,
+        earliest: datetime.time,
+        duration: datetime.timedelta,
+        latest: datetime.time = None,
+    ) -> Optional[datetime.time]:
+        """the first start time >= earliest at which the table is free for the given duration"""
+        return self.get_table_slots(table_id, date).next_free_slot(earliest, duration, latest)
 
     def get_reservation_by_id(self, id: int) -> ReservationEntity:
-        with self.get_session() as session:
-            return session.get(ReservationEntity, id)
+        return self.with_session(lambda session: session.get(ReservationEntity, id))
 
     def get_reservation_for_restaurant(self, restaurant_id: int) -> ReservationEntity:
         with self.get_session() as session:
@@ -74,36 +195,163 @@ def get_reservation_for_restaurant(self, restaurant_id: int) -> ReservationEntit
                 .all()
             )
 
-    def get_reservation_by_number(self, number: int) -> ReservationEntity:
+    def get_reservation_page(
+        self, restaurant_id: int, after: Optional[ReservationCursor] = None, limit: int = DEFAULT_PAGE_SIZE
+    ) -> Page[ReservationEntity]:
+        """
+        the reservations of the restaurant ordered by date and time,
+        the cursor is the (reservation_date, time_from, id) of the last reservation
+        """
         with self.get_session() as session:
-            return session.query(ReservationEntity).filter(ReservationEntity.reservation_number == number).first()
+            return keyset_page(
+                session,
+                restaurant_reservations_statement(restaurant_id),
+                [ReservationEntity.reservation_date, ReservationEntity.time_from, ReservationEntity.id],
+                after,
+                limit,
+                lambda r: (r.reservation_date, r.time_from, r.id),
+            )
+
+    def stream_reservations_for_restaurant(
+        self, restaurant_id: int, batch_size: int = DEFAULT_STREAM_BATCH_SIZE
+    ) -> Iterator[ReservationEntity]:
+        """yield the reservations of the restaurant ordered by date and time without loading the whole history"""
+        with self.get_session() as session:
+            statement = restaurant_reservations_statement(restaurant_id).order_by(
+                ReservationEntity.reservation_date, ReservationEntity.time_from, ReservationEntity.id
+            )
+            yield from stream(session, statement, batch_size)
+
+    def get_reservation_views_for_restaurant(self, restaurant_id: int) -> List[ReservationView]:
+        """
+        the reservations of the restaurant as read-only views ordered by date and time.
+        the table ids are fetched with a second column-level query instead of loading the tables
+        """
+        with self.get_session() as session:
+            table_ids: Dict[int, List[int]] = {}
+            for reservation_id, table_id in session.execute(restaurant_reservation_tables_statement(restaurant_id)):
+                table_ids.setdefault(reservation_id, []).append(table_id)
+            return [
+                ReservationView(*row, tuple(table_ids.get(row[0], ())))
+                for row in session.execute(reservation_views_statement(restaurant_id))
+            ]
+
+    def get_reservation_by_number(self, number: int) -> ReservationEntity:
+        statement = select(ReservationEntity).where(ReservationEntity.reservation_number == number).limit(1)
+        return self.with_session(lambda session: session.scalars(statement).first())
 
     def is_reservation_number_in_use(self, number: str) -> bool:
+        """the number is used by a live or an archived reservation (@see reservation_archive)"""
         with self.get_session() as session:
-            if (
-                session.query(ReservationEntity.reservation_number)
-                .filter(ReservationEntity.reservation_number == number)
-                .scalar()
-                is None
-            ):
-                return False
-            return True
+            return session.execute(reservation_number_in_use_statement(number)).scalar()
 
     def get_table_reservations_for_date(self, date: datetime.date, table_id: int) -> List[ReservationEntity]:
         """determine if there is a reservation for the given date/time and the table"""
-        with self.get_session() as session:
-            table_alias = aliased(TableEntity)
+        # use a half-open range [date, date + 1 day) instead of extracting year/month/day
+        # of the column; this way the index IX_RESERVATION_DATE_TIME can be used
+        day_start, day_end = day_range(date)
+        # the table is checked with a correlated EXISTS, so the date-range drives the query
+        # and REL_TABLE_RESERVATION is probed by its (reservation_id, table_id) index.
+        # the tables are loaded with a separate IN-query instead of the default joined-load
+        # which would materialize the whole association table for the outer join
+        reserved_table = (
+            select(relation_table_reservation.c.reservation_id)
+            .where(relation_table_reservation.c.reservation_id == ReservationEntity.id)
+            .where(relation_table_reservation.c.table_id == table_id)
+        )
+        statement = (
+            select(ReservationEntity)
+            .options(selectinload(ReservationEntity.tables))
+            .where(ReservationEntity.reservation_date >= day_start)
+            .where(ReservationEntity.reservation_date < day_end)
+            .where(reserved_table.exists())
+            .order_by(ReservationEntity.time_from.asc(), ReservationEntity.reservation_date, ReservationEntity.id)
+        )
+        return self.with_session(lambda session: list(session.scalars(statement)))
 
-            reservations = (
-                session.query(ReservationEntity)
-                .join(table_alias, ReservationEntity.tables)
-                .where(table_alias.id == table_id)
-                .where(
-                    # https://github.com/sqlalchemy/sqlalchemy/discussions/8067
-                    (extract("year", ReservationEntity.reservation_date) == date.year)
-                    & (extract("month", ReservationEntity.reservation_date) == date.month)
-                    & (extract("day", ReservationEntity.reservation_date) == date.day)
-                )
-                .order_by(ReservationEntity.time_from.asc())
-            ).all()
-            return reservations
+
+def restaurant_reservations_statement(restaurant_id: int) -> Select:
+    """
+    the reservations with a table of the restaurant. the restaurant is checked with EXISTS, so a reservation
+    with several tables is returned once; the tables are loaded per batch with an IN-query
+    """
+    return (
+        select(ReservationEntity)
+        .options(selectinload(ReservationEntity.tables))
+        .where(ReservationEntity.tables.any(TableEntity.restaurant_id == restaurant_id))
+    )
+
+
+def reservation_views_statement(restaurant_id: int) -> Select:
+    """the columns of ReservationView (without the table ids) in the order of its fields"""
+    return (
+        select(
+            ReservationEntity.id,
+            ReservationEntity.reservation_number,
+            ReservationEntity.reservation_date,
+            ReservationEntity.time_from,
+            ReservationEntity.time_until,
+            ReservationEntity.people,
+            ReservationEntity.reservation_name,
+        )
+        .where(ReservationEntity.tables.any(TableEntity.restaurant_id == restaurant_id))
+        .order_by(ReservationEntity.reservation_date, ReservationEntity.time_from, ReservationEntity.id)
+    )
+
+
+def restaurant_reservation_tables_statement(restaurant_id: int) -> Select:
+    """the (reservation_id, table_id) pairs of the tables of the restaurant"""
+    return (
+        select(relation_table_reservation.c.reservation_id, relation_table_reservation.c.table_id)
+        .join(TableEntity, TableEntity.id == relation_table_reservation.c.table_id)
+        .where(TableEntity.restaurant_id == restaurant_id)
+        .order_by(relation_table_reservation.c.reservation_id, relation_table_reservation.c.table_id)
+    )
+
+
+def reservation_number_in_use_statement(number: str) -> Select:
+    """EXISTS of the number in RESERVATION or RESERVATION_ARCHIVE, both are looked up by an index"""
+    return select(
+        or_(
+            exists().where(ReservationEntity.reservation_number == number),
+            exists().where(reservation_archive.c.reservation_number == number),
+        )
+    )
+
+
+def existing_reservations_statement(batch: List[ReservationEntity]) -> Select:
+    """one query for all reservations of the batch which already exist, either by id or by reservation_number"""
+    ids = [r.id for r in batch if (r.id or 0) > 0]
+    numbers = [r.reservation_number for r in batch if (r.id or 0) <= 0]
+    return select(ReservationEntity).where(
+        or_(ReservationEntity.id.in_(ids), ReservationEntity.reservation_number.in_(numbers))
+    )
+
+
+def merge_reservations(
+    batch: List[ReservationEntity], existing: Iterable[ReservationEntity], by_number: Dict[str, ReservationEntity]
+) -> List[ReservationEntity]:
+    """apply the values of the batch to the existing reservations, new reservations are returned as they are"""
+    by_id: Dict[int, ReservationEntity] = {}
+    for reservation in existing:
+        by_id[reservation.id] = reservation
+        by_number.setdefault(reservation.reservation_number, reservation)
+
+    merged: List[ReservationEntity] = []
+    for reservation in batch:
+        if (reservation.id or 0) > 0:
+            existing_reservation = by_id.get(reservation.id)
+            if existing_reservation is not None:
+                existing_reservation.reservation_number = reservation.reservation_number
+        else:
+            existing_reservation = by_number.get(reservation.reservation_number)
+        if existing_reservation is not None:
+            existing_reservation.reservation_name = reservation.reservation_name
+            existing_reservation.reservation_date = reservation.reservation_date
+            existing_reservation.people = reservation.people
+            existing_reservation.time_from = reservation.time_from
+            existing_reservation.time_until = reservation.time_until
+            reservation = existing_reservation
+        by_number[reservation.reservation_number] = reservation
+        merged.append(reservation)
+    return merged
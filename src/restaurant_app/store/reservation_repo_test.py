@@ -1,10 +1,13 @@
 import datetime
 from typing import Any, List
 
+import pytest
+
 from .entities import ReservationEntity, TableEntity
 from .repository_test_helpers import create_restaurant_data, get_database
 from .reservation_repo import ReservationRepository
 from .restaurant_repository import RestaurantRepository
+from .slot_index import SlotIndex
 from .table_repository import TableRepository
 
 
@@ -143,3 +146,192 @@ def action(session) -> List[Any]:
     # undefined table results in no reservations
     reservations = repo.get_table_reservations_for_date(datetime.date(2024, 9, 10), -1)
     assert len(reservations) == 0
+
+
+def test_reservations_for_date_uses_half_open_range():
+    managed_session = get_database().managed_session
+    repo = ReservationRepository(managed_session)
+    repo_restaurant = RestaurantRepository(managed_session)
+    repo_table = TableRepository(managed_session)
+
+    def action(session) -> List[Any]:
+        reservation_repo = repo.new_session(session)
+        res_repo = repo_restaurant.new_session(session)
+        table_repo = repo_table.new_session(session)
+
+        restaurant = res_repo.save(create_restaurant_data())
+        table = table_repo.save(TableEntity(table_number="Table1", seats=4, restaurant=restaurant))
+        table_repo.sync()
+
+        # reservations at the very start, within and at the end of the day and on the next day
+        dates = [
+            datetime.datetime(2024, 9, 10, 0, 0, 0),
+            datetime.datetime(2024, 9, 10, 19, 30, 0),
+            datetime.datetime(2024, 9, 10, 23, 59, 59),
+            datetime.datetime(2024, 9, 11, 0, 0, 0),
+        ]
+        for i, date in enumerate(dates):
+            res = ReservationEntity(
+                reservation_date=date,
+                time_from=datetime.time(18, 0, 0),
+                time_until=datetime.time(19, 0, 0),
+                people=2,
+                reservation_name="Test%d" % i,
+                reservation_number="R%d" % i,
+            )
+            res.tables.append(table)
+            reservation_repo.save(res)
+        reservation_repo.sync()
+        return [table.id]
+
+    table_id = repo.unit_of_work(action)[0]
+
+    reservations = repo.get_table_reservations_for_date(datetime.date(2024, 9, 10), table_id)
+    # same time_from, the order is decided by the date and the id
+    assert [r.reservation_name for r in reservations] == ["Test0", "Test1", "Test2"]
+    # the tables of the reservations are available outside of the session
+    assert reservations[0].tables[0].id == table_id
+
+    # a datetime is reduced to its date
+    reservations = repo.get_table_reservations_for_date(datetime.datetime(2024, 9, 11, 12, 0, 0), table_id)
+    assert len(reservations) == 1
+    assert reservations[0].reservation_name == "Test3"
+
+
+def test_slot_index_is_kept_in_sync():
+    managed_session = get_database().managed_session
+    slot_index = SlotIndex()
+    repo = ReservationRepository(managed_session, slot_index=slot_index)
+    repo_restaurant = RestaurantRepository(managed_session)
+    repo_table = TableRepository(managed_session)
+    date = datetime.date(2024, 9, 10)
+
+    def create_table(session) -> List[Any]:
+        restaurant = repo_restaurant.new_session(session).save(create_restaurant_data())
+        table = repo_table.new_session(session).save(
+            TableEntity(table_number="Table1", seats=4, restaurant=restaurant)
+        )
+        return [table.id]
+
+    table_id = repo.unit_of_work(create_table)[0]
+
+    # the slots are loaded from the database on first use
+    assert not repo.is_slot_reserved(table_id, date, datetime.time(18, 0, 0), datetime.time(20, 0, 0))
+    assert slot_index.get(table_id, date) is not None
+
+    def book(session) -> List[Any]:
+        reservation_repo = repo.new_session(session)
+        res = ReservationEntity(
+            reservation_date=date,
+            time_from=datetime.time(18, 0, 0),
+            time_until=datetime.time(20, 0, 0),
+            people=4,
+            reservation_name="Test",
+            reservation_number="1234",
+        )
+        res.tables.append(session.get(TableEntity, table_id))
+        res = reservation_repo.save(res)
+        # not committed yet, the index is unchanged
+        assert not repo.is_slot_reserved(table_id, date, datetime.time(19, 0, 0), datetime.time(21, 0, 0))
+        return [res.id]
+
+    reservation_id = repo.unit_of_work(book)[0]
+    assert repo.is_slot_reserved(table_id, date, datetime.time(19, 0, 0), datetime.time(21, 0, 0))
+    assert repo.next_free_slot(table_id, date, datetime.time(17, 0, 0), datetime.timedelta(hours=2)) == datetime.time(
+        20, 0, 0
+    )
+
+    # a failing transaction does not change the index
+    def delete_with_error(session):
+        repo.new_session(session).delete(reservation_id)
+        raise ValueError("rollback")
+
+    with pytest.raises(ValueError):
+        repo.unit_of_work(delete_with_error)
+    assert repo.is_slot_reserved(table_id, date, datetime.time(19, 0, 0), datetime.time(21, 0, 0))
+
+    repo.unit_of_work(lambda session: repo.new_session(session).delete(reservation_id))
+    assert not repo.is_slot_reserved(table_id, date, datetime.time(19, 0, 0), datetime.time(21, 0, 0))
+
+
+def test_reservation_repository_save_many():
+    repo = ReservationRepository(get_database().managed_session)
+
+    def create_reservation(number: str, people: int) -> ReservationEntity:
+        return ReservationEntity(
+            reservation_date=datetime.datetime(2024, 9, 10),
+            time_from=datetime.time(18, 0, 0),
+            time_until=datetime.time(20, 0, 0),
+            people=people,
+            reservation_name="Test%s" % number,
+            reservation_number=number,
+        )
+
+    def action(session) -> List[Any]:
+        reservation_repo = repo.new_session(session)
+        first = reservation_repo.save_many([create_reservation(str(i), 2) for i in range(10)])
+        reservation_repo.sync()
+        assert all(r.id > 0 for r in first)
+
+        # update by reservation_number and by id
+        by_id = create_reservation("X", 6)
+        by_id.id = first[1].id
+        second = reservation_repo.save_many([create_reservation("0", 4), by_id, create_reservation("10", 2)])
+        assert second[0] is first[0] and second[1] is first[1]
+        return [first[1].id]
+
+    reservation_id = repo.unit_of_work(action)[0]
+    assert repo.get_reservation_by_number("0").people == 4
+    assert repo.get_reservation_by_id(reservation_id).reservation_number == "X"
+    assert repo.get_reservation_by_number("10") is not None
+    assert repo.get_reservation_by_number("1") is None
+
+
+def test_reservation_pages_and_stream():
+    managed_session = get_database().managed_session
+    repo = ReservationRepository(managed_session)
+    repo_restaurant = RestaurantRepository(managed_session)
+    repo_table = TableRepository(managed_session)
+
+    def action(session) -> List[Any]:
+        restaurant = repo_restaurant.new_session(session).save(create_restaurant_data())
+        tables = repo_table.new_session(session).save_many(
+            [TableEntity(table_number="Table%d" % i, seats=4, restaurant=restaurant) for i in range(2)]
+        )
+        reservations = []
+        for i in range(7):
+            res = ReservationEntity(
+                reservation_date=datetime.datetime(2024, 9, 10 + i % 3),
+                time_from=datetime.time(12 + i, 0, 0),
+                time_until=datetime.time(13 + i, 0, 0),
+                people=2,
+                reservation_name="Test%d" % i,
+                reservation_number="%d" % i,
+            )
+            # every reservation uses both tables, it is still returned once
+            res.tables.extend(tables)
+            reservations.append(res)
+        repo.new_session(session).save_many(reservations)
+        return [restaurant.id]
+
+    restaurant_id = repo.unit_of_work(action)[0]
+    expected = [r.reservation_number for r in repo.get_reservation_for_restaurant(restaurant_id)]
+    assert len(expected) == 7
+
+    numbers = []
+    page = repo.get_reservation_page(restaurant_id, limit=3)
+    numbers.extend(r.reservation_number for r in page.items)
+    while page.next_cursor is not None:
+        page = repo.get_reservation_page(restaurant_id, after=page.next_cursor, limit=3)
+        numbers.extend(r.reservation_number for r in page.items)
+    assert numbers == expected
+
+    streamed = list(repo.stream_reservations_for_restaurant(restaurant_id, batch_size=2))
+    assert [r.reservation_number for r in streamed] == expected
+    assert all(len(r.tables) == 2 for r in streamed)
+
+    views = repo.get_reservation_views_for_restaurant(restaurant_id)
+    assert [v.reservation_number for v in views] == expected
+    assert all(v.table_ids == tuple(sorted(t.id for t in streamed[0].tables)) for v in views)
+    with pytest.raises(AttributeError):
+        views[0].people = 3
@@ -1,23 +1,66 @@
 from contextlib import AbstractContextManager
-from typing import Callable, List, Self
+from enum import Enum
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Self, Tuple
 
-from sqlalchemy.orm import Session
+from sqlalchemy import Select, func, select
+from sqlalchemy.orm import Session, joinedload, raiseload, selectinload
+from sqlalchemy.orm.interfaces import ORMOption
 
-from .base_repository import BaseRepository
-from .entities import AddressEntity, RestaurantEntity
+from ..infrastructure.cache import CacheBackend
+from .base_repository import DEFAULT_BATCH_SIZE, BaseRepository, batched
+from .entities import AddressEntity, MenuEntity, RestaurantEntity, TableEntity
+from .pagination import DEFAULT_PAGE_SIZE, DEFAULT_STREAM_BATCH_SIZE, Page, keyset_page, stream
+from .views import RestaurantSummary, RestaurantView
+
+
+class RestaurantLoad(Enum):
+    """how the menus and tables of a restaurant are loaded"""
+
+    # menus and tables with one additional IN-query each (the default of the entity)
+    SELECTIN = "selectin"
+    # menus and tables joined into the restaurant query, returns restaurants x menus x tables rows
+    JOINED = "joined"
+    # only the restaurant and its address, accessing menus or tables raises an error
+    RESTAURANT_ONLY = "restaurant_only"
+
+
+def restaurant_load_options(load: RestaurantLoad) -> List[ORMOption]:
+    if load == RestaurantLoad.JOINED:
+        return [joinedload(RestaurantEntity.menus), joinedload(RestaurantEntity.tables)]
+    if load == RestaurantLoad.RESTAURANT_ONLY:
+        return [raiseload(RestaurantEntity.menus), raiseload(RestaurantEntity.tables)]
+    return [selectinload(RestaurantEntity.menus), selectinload(RestaurantEntity.tables)]
+
+
+def restaurant_cache_key(restaurant_id: int, load: RestaurantLoad) -> str:
+    return f"restaurant:{restaurant_id}:{load.value}"
+
+
+def restaurant_cache_keys(restaurant_ids: Iterable[int]) -> List[str]:
+    """the cache keys of the restaurants for all load strategies"""
+    return [restaurant_cache_key(id, load) for id in restaurant_ids if id is not None for load in RestaurantLoad]
 
 
 class RestaurantRepository(BaseRepository):
 
-    def __init__(self, session_factory: Callable[..., AbstractContextManager[Session]], session: Session = None):
-        super().__init__(session_factory=session_factory, session=session)
+    def __init__(
+        self,
+        session_factory: Callable[..., AbstractContextManager[Session]],
+        session: Session = None,
+        cache: CacheBackend = None,
+    ):
+        super().__init__(session_factory=session_factory, session=session, cache=cache)
 
     def new_session(self, session: Session) -> Self:
-        return RestaurantRepository(session_factory=None, session=session)
+        return RestaurantRepository(session_factory=None, session=session, cache=self._cache)
 
-    def get_restaurant_by_id(self, id: int) -> RestaurantEntity:
-        with self.get_session() as session:
-            return session.get(RestaurantEntity, id)
+    def get_restaurant_by_id(self, id: int, load: RestaurantLoad = RestaurantLoad.SELECTIN) -> RestaurantEntity:
+        return self._cached(restaurant_cache_key(id, load), lambda: self._get_restaurant_by_id(id, load))
+
+    def _get_restaurant_by_id(self, id: int, load: RestaurantLoad) -> RestaurantEntity:
+        return self.with_session(
+            lambda session: session.get(RestaurantEntity, id, options=restaurant_load_options(load))
+        )
 
     def find_restaurants_by_name_and_address(self, name: str, addr: AddressEntity) -> RestaurantEntity:
         res_lookup = None
@@ -33,12 +76,56 @@ def find_restaurants_by_name_and_address(self, name: str, addr: AddressEntity) -
             )
         return res_lookup
 
-    def get_all_restaurants(self) -> List[RestaurantEntity]:
+    def get_all_restaurants(self, load: RestaurantLoad = RestaurantLoad.SELECTIN) -> List[RestaurantEntity]:
         restaurants: List[RestaurantEntity] = []
         with self.get_session() as session:
-            restaurants = session.query(RestaurantEntity).all()
+            restaurants = session.query(RestaurantEntity).options(*restaurant_load_options(load)).all()
         return restaurants
 
+    def get_restaurants_page(
+        self,
+        after: Optional[int] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        load: RestaurantLoad = RestaurantLoad.SELECTIN,
+    ) -> Page[RestaurantEntity]:
+        """the restaurants ordered by id, starting after the cursor (the id) of the previous page"""
+        with self.get_session() as session:
+            statement = select(RestaurantEntity).options(*restaurant_load_options(load))
+            return keyset_page(session, statement, [RestaurantEntity.id], after, limit, lambda r: r.id)
+
+    def stream_restaurants(
+        self, batch_size: int = DEFAULT_STREAM_BATCH_SIZE, load: RestaurantLoad = RestaurantLoad.SELECTIN
+    ) -> Iterator[RestaurantEntity]:
+        """
+        yield all restaurants ordered by id, loading batch_size restaurants (and their collections) at a time.
+        the session stays open until the iteration is finished. the collections can not be joined into the
+        streamed query (yield_per does not support joined eager loading), RestaurantLoad.JOINED is rejected
+        """
+        if load == RestaurantLoad.JOINED:
+            raise ValueError("the restaurants can not be streamed with RestaurantLoad.JOINED, use SELECTIN")
+        # the load is checked when the method is called, the generator only runs on the first item
+        return self._stream_restaurants(batch_size, load)
+
+    def _stream_restaurants(self, batch_size: int, load: RestaurantLoad) -> Iterator[RestaurantEntity]:
+        with self.get_session() as session:
+            statement = select(RestaurantEntity).options(*restaurant_load_options(load)).order_by(RestaurantEntity.id)
+            yield from stream(session, statement, batch_size)
+
+    def get_restaurant_summaries(self) -> List[RestaurantSummary]:
+        """a listing of all restaurants with the number of menus and tables, counted by the database"""
+        with self.get_session() as session:
+            return [RestaurantSummary(*row) for row in session.execute(restaurant_summaries_statement())]
+
+    def get_restaurant_view(self, id: int) -> Optional[RestaurantView]:
+        with self.get_session() as session:
+            row = session.execute(restaurant_views_statement().where(RestaurantEntity.id == id)).first()
+            return RestaurantView(*row) if row is not None else None
+
+    def get_restaurant_views(self) -> List[RestaurantView]:
+        """all restaurants with their address as read-only views, ordered by name"""
+        with self.get_session() as session:
+            return [RestaurantView(*row) for row in session.execute(restaurant_views_statement())]
+
     def find_address(self, address: AddressEntity) -> AddressEntity:
         """use the fields in the supplied model to lookup the address"""
         found_address = None
@@ -66,6 +153,7 @@ def save(self, restaurant: RestaurantEntity) -> RestaurantEntity:
                     # existing.modified = datetime.datetime.now(datetime.UTC)
                     existing.address = self._handle_address(restaurant.address, session)
                     session.add(existing)
+                    self._invalidate(session, restaurant_cache_keys([existing.id]))
                     return existing
 
             # new or not found
@@ -74,6 +162,29 @@ def save(self, restaurant: RestaurantEntity) -> RestaurantEntity:
             session.flush()
         return restaurant
 
+    def save_many(
+        self, restaurants: Iterable[RestaurantEntity], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> List[RestaurantEntity]:
+        """
+        save the restaurants with the same semantics as save (update by id, otherwise insert).
+        the existing restaurants and addresses of a batch are loaded with one IN-query each,
+        all changes are written with a single flush
+        """
+        saved: List[RestaurantEntity] = []
+        with self.get_session() as session:
+            for batch in batched(restaurants, batch_size):
+                restaurant_statement, address_statement = existing_restaurants_statements(batch)
+                merged = merge_restaurants(
+                    batch,
+                    session.execute(restaurant_statement).unique().scalars(),
+                    session.execute(address_statement).scalars(),
+                )
+                session.add_all(merged)
+                saved.extend(merged)
+            session.flush()
+            self._invalidate(session, restaurant_cache_keys(restaurant.id for restaurant in saved))
+        return saved
+
     def _handle_address(self, address: AddressEntity, session: Session) -> AddressEntity:
         addr = address
         # an id was supplied, load the object from the db
@@ -97,3 +208,94 @@ def _handle_address(self, address: AddressEntity, session: Session) -> AddressEn
             addr.id = None  # overwrite the id
         session.add(addr)
         return addr
+
+
+def existing_restaurants_statements(batch: List[RestaurantEntity]) -> Tuple[Select, Select]:
+    """the queries for the existing restaurants and addresses of the batch, by their ids"""
+    ids = [r.id for r in batch if (r.id or 0) > 0]
+    address_ids = [r.address.id for r in batch if r.address is not None and r.address.id is not None]
+    return (
+        select(RestaurantEntity).where(RestaurantEntity.id.in_(ids)),
+        select(AddressEntity).where(AddressEntity.id.in_(address_ids)),
+    )
+
+
+def merge_restaurants(
+    batch: List[RestaurantEntity], existing: Iterable[RestaurantEntity], existing_addresses: Iterable[AddressEntity]
+) -> List[RestaurantEntity]:
+    """apply the values of the batch to the existing restaurants/addresses, same as RestaurantRepository.save"""
+    by_id = {restaurant.id: restaurant for restaurant in existing}
+    addresses = {address.id: address for address in existing_addresses}
+
+    merged: List[RestaurantEntity] = []
+    for restaurant in batch:
+        existing_restaurant = by_id.get(restaurant.id) if (restaurant.id or 0) > 0 else None
+        address = merge_address(restaurant.address, addresses)
+        if existing_restaurant is not None:
+            existing_restaurant.name = restaurant.name
+            existing_restaurant.open_from = restaurant.open_from
+            existing_restaurant.open_until = restaurant.open_until
+            existing_restaurant.open_days = restaurant.open_days
+            restaurant = existing_restaurant
+        restaurant.address = address
+        merged.append(restaurant)
+    return merged
+
+
+def merge_address(address: AddressEntity, existing: Dict[int, AddressEntity]) -> AddressEntity:
+    """same as RestaurantRepository._handle_address with the existing addresses already loaded"""
+    found_address = existing.get(address.id) if address.id is not None else None
+    if found_address is None:
+        address.id = None
+        return address
+    found_address.street = address.street
+    found_address.city = address.city
+    found_address.country = address.country
+    found_address.zip = address.zip
+    return found_address
+
+
+def restaurant_summaries_statement() -> Select:
+    # the counts are grouped once per table and joined, instead of a correlated count per restaurant
+    menu_count = (
+        select(MenuEntity.restaurant_id, func.count(MenuEntity.id).label("menu_count"))
+        .group_by(MenuEntity.restaurant_id)
+        .subquery()
+    )
+    table_count = (
+        select(TableEntity.restaurant_id, func.count(TableEntity.id).label("table_count"))
+        .group_by(TableEntity.restaurant_id)
+        .subquery()
+    )
+    return (
+        select(
+            RestaurantEntity.id,
+            RestaurantEntity.name,
+            AddressEntity.city,
+            func.coalesce(menu_count.c.menu_count, 0),
+            func.coalesce(table_count.c.table_count, 0),
+        )
+        .join(AddressEntity, AddressEntity.id == RestaurantEntity.address_id)
+        .outerjoin(menu_count, menu_count.c.restaurant_id == RestaurantEntity.id)
+        .outerjoin(table_count, table_count.c.restaurant_id == RestaurantEntity.id)
+        .order_by(RestaurantEntity.name, RestaurantEntity.id)
+    )
+
+
+def restaurant_views_statement() -> Select:
+    """the columns of RestaurantView in the order of its fields"""
+    return (
+        select(
+            RestaurantEntity.id,
+            RestaurantEntity.name,
+            RestaurantEntity.open_from,
+            RestaurantEntity.open_until,
+            RestaurantEntity.open_days,
+            AddressEntity.street,
+            AddressEntity.city,
+            AddressEntity.zip,
+            AddressEntity.country,
+        )
+        .join(AddressEntity, AddressEntity.id == RestaurantEntity.address_id)
+        .order_by(RestaurantEntity.name, RestaurantEntity.id)
+    )
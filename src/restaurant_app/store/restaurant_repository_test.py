@@ -1,7 +1,16 @@
+import datetime
+from typing import Any, List
+
 import pytest
+from sqlalchemy.exc import InvalidRequestError
 
-from .repository_test_helpers import create_restaurant_data, get_database
-from .restaurant_repository import RestaurantRepository
+from ..infrastructure.cache import LruTtlCache
+from .entities import MenuEntity, ReservationEntity, TableEntity
+from .menu_repository import MenuRepository
+from .repository_test_helpers import capture_statements, create_restaurant_data, get_database
+from .reservation_repo import ReservationRepository
+from .restaurant_repository import RestaurantLoad, RestaurantRepository
+from .table_repository import TableRepository
 
 
 # this example uses the unit_of_work pattern where all
@@ -139,3 +148,184 @@ def test_restaurant_repository_crud_auto_commit():
 
     all_restaurants = repo.get_all_restaurants()
     assert len(all_restaurants) == 1
+
+
+def test_restaurant_repository_save_many():
+    managed_session = get_database().managed_session
+    restaurant_repo = RestaurantRepository(managed_session)
+
+    def action(session):
+        repo = restaurant_repo.new_session(session)
+        saved = repo.save_many([create_restaurant_data() for _ in range(3)])
+        repo.sync()
+        assert all(r.id > 0 and r.address.id > 0 for r in saved)
+
+        for restaurant in saved:
+            restaurant.name += " updated"
+        repo.save_many(saved)
+
+    restaurant_repo.unit_of_work(action)
+    restaurants = restaurant_repo.get_all_restaurants()
+    assert len(restaurants) == 3
+    assert all(r.name == "Test-Restaurant updated" for r in restaurants)
+
+
+def test_restaurant_load_strategies():
+    db = get_database()
+    restaurant_repo = RestaurantRepository(db.managed_session)
+
+    def action(session):
+        res = create_restaurant_data()
+        res.menus = [MenuEntity(name="Menu%d" % i, category="Category", price=10.0) for i in range(3)]
+        res.tables = [TableEntity(table_number="Table%d" % i, seats=4) for i in range(2)]
+        restaurant_repo.new_session(session).save(res)
+        restaurant_repo.new_session(session).save(create_restaurant_data())
+
+    restaurant_repo.unit_of_work(action)
+
+    # the collections are loaded with one IN-query each, instead of joining restaurants x menus x tables
+    with capture_statements(db) as statements:
+        restaurants = restaurant_repo.get_all_restaurants()
+    assert len(statements) == 3
+    assert sorted((len(r.menus), len(r.tables)) for r in restaurants) == [(0, 0), (3, 2)]
+
+    restaurants = restaurant_repo.get_all_restaurants(RestaurantLoad.JOINED)
+    assert sorted((len(r.menus), len(r.tables)) for r in restaurants) == [(0, 0), (3, 2)]
+
+    with capture_statements(db) as statements:
+        restaurants = restaurant_repo.get_all_restaurants(RestaurantLoad.RESTAURANT_ONLY)
+    assert len(statements) == 1
+    assert restaurants[0].address.city == "Salzburg"
+    with pytest.raises(InvalidRequestError):
+        restaurants[0].menus
+
+    summaries = restaurant_repo.get_restaurant_summaries()
+    assert [(s.name, s.city) for s in summaries] == [("Test-Restaurant", "Salzburg")] * 2
+    assert sorted((s.menu_count, s.table_count) for s in summaries) == [(0, 0), (3, 2)]
+
+
+def test_restaurant_pages_and_stream():
+    managed_session = get_database().managed_session
+    restaurant_repo = RestaurantRepository(managed_session)
+    restaurant_repo.unit_of_work(
+        lambda session: restaurant_repo.new_session(session).save_many([create_restaurant_data() for _ in range(5)])
+    )
+
+    first = restaurant_repo.get_restaurants_page(limit=3)
+    second = restaurant_repo.get_restaurants_page(after=first.next_cursor, limit=3)
+    assert len(first.items) == 3 and len(second.items) == 2
+    assert second.next_cursor is None
+    ids = [r.id for r in first.items + second.items]
+    assert ids == sorted(ids) and len(set(ids)) == 5
+
+    assert [r.id for r in restaurant_repo.stream_restaurants(batch_size=2)] == ids
+    load = RestaurantLoad.RESTAURANT_ONLY
+    assert [r.id for r in restaurant_repo.stream_restaurants(batch_size=2, load=load)] == ids
+    with pytest.raises(ValueError):
+        restaurant_repo.stream_restaurants(load=RestaurantLoad.JOINED)
+
+
+def test_restaurant_repository_cache():
+    db = get_database(auto_commit=True)
+    cache = LruTtlCache()
+    repo = RestaurantRepository(db.managed_session, cache=cache)
+    menu_repo = MenuRepository(db.managed_session, cache=cache)
+    table_repo = TableRepository(db.managed_session, cache=cache)
+    res = repo.save(create_restaurant_data())
+
+    with capture_statements(db) as statements:
+        first = repo.get_restaurant_by_id(res.id)
+        assert len(statements) > 0
+        statements.clear()
+        second = repo.get_restaurant_by_id(res.id)
+        # every hit returns a detached copy of the cached restaurant
+        assert second is not first and second.id == first.id
+        assert menu_repo.get_menu_list(res.id) == []
+        statements.clear()
+        assert menu_repo.get_menu_list(res.id) == []
+        assert len(statements) == 0
+    assert repo.cache_stats().hits == 2
+    assert repo.cache_stats().misses == 2
+
+    # saving a menu invalidates the menu list and the restaurant (cached with its menus)
+    menu_repo.save(MenuEntity(name="Menu", category="Category", price=9.5, restaurant=res))
+    assert len(menu_repo.get_menu_list(res.id)) == 1
+    assert len(repo.get_restaurant_by_id(res.id).menus) == 1
+
+    table_repo.get_tables_for_restaurant(res.id)
+    table_repo.save(TableEntity(table_number="T1", seats=4, restaurant=res))
+    assert len(table_repo.get_tables_for_restaurant(res.id)) == 1
+
+    res.name = "Renamed"
+    repo.save(res)
+    assert repo.get_restaurant_by_id(res.id).name == "Renamed"
+
+    # a repository working with a provided session does not use the cache
+    def action(session) -> List[Any]:
+        res_repo = repo.new_session(session)
+        hits = res_repo.cache_stats().hits
+        res_repo.get_restaurant_by_id(res.id)
+        assert res_repo.cache_stats().hits == hits
+        return []
+
+    repo.unit_of_work(action)
+
+
+def test_restaurant_repository_cache_is_not_changed_by_other_sessions():
+    db = get_database()
+    cache = LruTtlCache()
+    repo = RestaurantRepository(db.managed_session, cache=cache)
+    reservation_repo = ReservationRepository(db.managed_session)
+    res = create_restaurant_data()
+    res.tables = [TableEntity(table_number="T1", seats=4)]
+    restaurant_id = repo.unit_of_work(lambda session: repo.new_session(session).save(res).id)
+
+    cached = repo.get_restaurant_by_id(restaurant_id)
+
+    # a second transaction attaches the table of the returned restaurant and expires it on commit
+    def reserve(session):
+        reservation = ReservationEntity(
+            reservation_date=datetime.datetime(2024, 9, 10),
+            time_from=datetime.time(18, 0),
+            time_until=datetime.time(20, 0),
+            people=2,
+            reservation_name="Test",
+            reservation_number="R1",
+        )
+        reservation.tables.append(cached.tables[0])
+        reservation_repo.new_session(session).save(reservation)
+
+    repo.unit_of_work(reserve)
+
+    hit = repo.get_restaurant_by_id(restaurant_id)
+    assert repo.cache_stats().hits == 1
+    assert hit.tables[0].seats == 4
+    assert hit.address.city == "Salzburg"
+    # the cached restaurant can be used in another transaction
+    hit.name = "Renamed"
+    repo.unit_of_work(lambda session: repo.new_session(session).save(hit))
+    assert repo.get_restaurant_by_id(restaurant_id).name == "Renamed"
+
+
+def test_restaurant_menu_and_table_views():
+    db = get_database(auto_commit=True)
+    repo = RestaurantRepository(db.managed_session)
+    res = create_restaurant_data()
+    res.menus = [MenuEntity(name="B", category="Main", price=12.5), MenuEntity(name="A", category="Main", price=9.0)]
+    res.tables = [TableEntity(table_number="T2", seats=2), TableEntity(table_number="T1", seats=4)]
+    res = repo.save(res)
+
+    view = repo.get_restaurant_view(res.id)
+    assert view.name == "Test-Restaurant"
+    assert view.city == "Salzburg"
+    assert repo.get_restaurant_view(-1) is None
+    assert repo.get_restaurant_views() == [view]
+
+    menus = MenuRepository(db.managed_session).get_menu_views(res.id)
+    assert [(m.name, m.price, m.restaurant_id) for m in menus] == [("A", 9.0, res.id), ("B", 12.5, res.id)]
+    tables = TableRepository(db.managed_session).get_table_views(res.id)
+    assert [(t.table_number, t.seats) for t in tables] == [("T1", 4), ("T2", 2)]
+    # the views are immutable and do not carry a __dict__
+    with pytest.raises(AttributeError):
+        tables[0].seats = 8
+    assert not hasattr(tables[0], "__dict__")
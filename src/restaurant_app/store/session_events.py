@@ -0,0 +1,60 @@
+from typing import Callable, Hashable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, SessionTransaction
+
+# keys used in Session.info to collect the actions of a transaction
+_PENDING_ACTIONS = "session_events.pending_actions"
+_PENDING_BEFORE_COMMIT = "session_events.pending_before_commit"
+_LISTENING = "session_events.listening"
+
+
+def after_commit(session: Session, action: Callable[[], None]) -> None:
+    """
+    execute the action once the transaction of the session is committed, e.g. to update in-process
+    indexes or caches. if the transaction is rolled back (or the session is closed without a commit)
+    the action is dropped
+    """
+    session.info.setdefault(_PENDING_ACTIONS, []).append(action)
+    _listen(session)
+
+
+def before_commit(session: Session, action: Callable[[], None], key: Hashable = None) -> None:
+    """
+    execute the action right before the transaction of the session is committed, the action runs within
+    the transaction (e.g. to maintain aggregates of the changed rows). an action with a key is registered
+    once per transaction. if the transaction is rolled back the action is dropped
+    """
+    pending = session.info.setdefault(_PENDING_BEFORE_COMMIT, {})
+    pending.setdefault(key if key is not None else object(), action)
+    _listen(session)
+
+
+def _listen(session: Session) -> None:
+    if not session.info.get(_LISTENING):
+        # the listeners are registered once per session, the scoped sessions are re-used per thread
+        session.info[_LISTENING] = True
+        event.listen(session, "before_commit", _execute_before_commit_actions)
+        event.listen(session, "after_commit", _execute_pending_actions)
+        event.listen(session, "after_transaction_end", _drop_pending_actions)
+
+
+def _execute_before_commit_actions(session: Session) -> None:
+    # the commit events are also sent for a savepoint (begin_nested), the actions wait for the outer commit
+    if session.in_nested_transaction():
+        return
+    for action in session.info.pop(_PENDING_BEFORE_COMMIT, {}).values():
+        action()
+
+
+def _execute_pending_actions(session: Session) -> None:
+    if session.in_nested_transaction():
+        return
+    for action in session.info.pop(_PENDING_ACTIONS, []):
+        action()
+
+
+def _drop_pending_actions(session: Session, transaction: SessionTransaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(_PENDING_ACTIONS, None)
+        session.info.pop(_PENDING_BEFORE_COMMIT, None)
@@ -0,0 +1,155 @@
+import datetime
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .availability import TimeWindow
+from .entities import ReservationEntity
+
+SlotKey = Tuple[int, datetime.date]
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def _seconds(value: datetime.time) -> int:
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def _time(seconds: int) -> datetime.time:
+    return datetime.time(seconds // 3600, (seconds // 60) % 60, seconds % 60)
+
+
+class TableDaySlots:
+    """
+    the reserved intervals (time_from, time_until) of one table on one day.
+    besides the intervals per reservation, the merged (non-overlapping) busy blocks are kept
+    as two sorted lists of starts and ends, so an overlap check is a binary search
+    """
+
+    def __init__(self) -> None:
+        self._intervals: Dict[int, Tuple[int, int]] = {}
+        # starts and ends are replaced together, so a reader never sees a partial update
+        self._blocks: Tuple[List[int], List[int]] = ([], [])
+
+    def __len__(self) -> int:
+        return len(self._intervals)
+
+    def add(self, reservation_id: int, time_from: datetime.time, time_until: datetime.time) -> None:
+        self._intervals[reservation_id] = (_seconds(time_from), _seconds(time_until))
+        self._merge()
+
+    def remove(self, reservation_id: int) -> None:
+        if self._intervals.pop(reservation_id, None) is not None:
+            self._merge()
+
+    def _merge(self) -> None:
+        starts: List[int] = []
+        ends: List[int] = []
+        for start, end in sorted(self._intervals.values()):
+            if ends and start <= ends[-1]:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        self._blocks = (starts, ends)
+
+    def overlaps(self, time_from: datetime.time, time_until: datetime.time) -> bool:
+        """true if the half-open slot [time_from, time_until) overlaps a reservation, O(log n)"""
+        starts, ends = self._blocks
+        start, end = _seconds(time_from), _seconds(time_until)
+        # the last busy block starting before the end of the slot is the only candidate,
+        # because the merged blocks are sorted and do not overlap each other
+        index = bisect_left(starts, end) - 1
+        return index >= 0 and ends[index] > start
+
+    def next_free_slot(
+        self, earliest: datetime.time, duration: datetime.timedelta, latest: datetime.time = None
+    ) -> Optional[datetime.time]:
+        """
+        return the first start time >= earliest where a slot of the given duration is free
+        and ends not after latest. the starting block is found with a binary search, from there
+        on the gaps between the busy blocks are checked
+        """
+        starts, ends = self._blocks
+        start = _seconds(earliest)
+        length = int(duration.total_seconds())
+        limit = _seconds(latest) if latest is not None else SECONDS_PER_DAY - 1
+        index = bisect_right(starts, start) - 1
+        if index >= 0 and ends[index] > start:
+            start = ends[index]
+        index += 1
+        while start + length <= limit:
+            if index >= len(starts) or starts[index] >= start + length:
+                return _time(start)
+            start = ends[index]
+            index += 1
+        return None
+
+    def busy_windows(self) -> List[TimeWindow]:
+        starts, ends = self._blocks
+        return [(_time(start), _time(end)) for start, end in zip(starts, ends)]
+
+
+class SlotIndex:
+    """
+    in-process index of the reservation intervals per table and day.
+    the index is filled with the results of the ReservationRepository and kept in sync by
+    ReservationRepository.save/delete once the changes are committed (@see session_events.after_commit)
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._slots: Dict[SlotKey, TableDaySlots] = {}
+        # the keys a reservation is part of, used to remove/move a reservation
+        self._reservation_keys: Dict[int, Set[SlotKey]] = {}
+
+    def get(self, table_id: int, date: datetime.date) -> Optional[TableDaySlots]:
+        with self._lock:
+            return self._slots.get((table_id, _day(date)))
+
+    def load(self, table_id: int, date: datetime.date, reservations: Iterable[ReservationEntity]) -> TableDaySlots:
+        """create the slots of the table/day from the reservations provided by the repository"""
+        key = (table_id, _day(date))
+        slots = TableDaySlots()
+        with self._lock:
+            for reservation in reservations:
+                slots.add(reservation.id, reservation.time_from, reservation.time_until)
+                self._reservation_keys.setdefault(reservation.id, set()).add(key)
+            self._slots[key] = slots
+        return slots
+
+    def update(
+        self,
+        reservation_id: int,
+        table_ids: Iterable[int],
+        date: datetime.date,
+        time_from: datetime.time,
+        time_until: datetime.time,
+    ) -> None:
+        """(re)place a reservation; only table/days already loaded are changed"""
+        with self._lock:
+            self.remove(reservation_id)
+            for table_id in table_ids:
+                key = (table_id, _day(date))
+                slots = self._slots.get(key)
+                if slots is not None:
+                    slots.add(reservation_id, time_from, time_until)
+                    self._reservation_keys.setdefault(reservation_id, set()).add(key)
+
+    def remove(self, reservation_id: int) -> None:
+        with self._lock:
+            for key in self._reservation_keys.pop(reservation_id, set()):
+                slots = self._slots.get(key)
+                if slots is not None:
+                    slots.remove(reservation_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._slots.clear()
+            self._reservation_keys.clear()
+
+
+def _day(date: datetime.date) -> datetime.date:
+    if isinstance(date, datetime.datetime):
+        return date.date()
+    return date
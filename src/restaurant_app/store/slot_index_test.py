@@ -0,0 +1,52 @@
+import datetime
+
+from .slot_index import SlotIndex, TableDaySlots
+
+
+def t(hour: int, minute: int = 0) -> datetime.time:
+    return datetime.time(hour, minute, 0)
+
+
+def test_table_day_slots_overlap_and_next_free_slot():
+    slots = TableDaySlots()
+    slots.add(1, t(12), t(14))
+    slots.add(2, t(13), t(15))
+    slots.add(3, t(18), t(20))
+    assert slots.busy_windows() == [(t(12), t(15)), (t(18), t(20))]
+
+    assert slots.overlaps(t(11), t(12, 30))
+    assert slots.overlaps(t(19), t(19, 30))
+    # the intervals are half-open, back-to-back slots do not overlap
+    assert not slots.overlaps(t(15), t(18))
+    assert not slots.overlaps(t(10), t(12))
+
+    two_hours = datetime.timedelta(hours=2)
+    assert slots.next_free_slot(t(10), two_hours) == t(10)
+    assert slots.next_free_slot(t(11), two_hours) == t(15)
+    assert slots.next_free_slot(t(16, 30), two_hours) == t(20)
+    assert slots.next_free_slot(t(16, 30), two_hours, latest=t(21)) is None
+
+    slots.remove(2)
+    assert slots.busy_windows() == [(t(12), t(14)), (t(18), t(20))]
+    assert not slots.overlaps(t(14), t(15))
+
+
+def test_slot_index_update_and_remove():
+    index = SlotIndex()
+    date = datetime.date(2024, 9, 10)
+    assert index.get(1, date) is None
+
+    index.load(1, date, [])
+    # only loaded tables/days are updated, the others are read from the database on demand
+    index.update(10, [1, 2], datetime.datetime(2024, 9, 10, 0, 0), t(18), t(20))
+    assert index.get(1, date).overlaps(t(19), t(21))
+    assert index.get(2, date) is None
+
+    # moving the reservation to another day removes it from the former day
+    index.update(10, [1], datetime.date(2024, 9, 11), t(18), t(20))
+    assert not index.get(1, date).overlaps(t(19), t(21))
+
+    index.load(1, datetime.date(2024, 9, 11), [])
+    index.update(10, [1], datetime.date(2024, 9, 11), t(18), t(20))
+    index.remove(10)
+    assert len(index.get(1, datetime.date(2024, 9, 11))) == 0
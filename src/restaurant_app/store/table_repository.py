@@ -1,27 +1,65 @@
+import datetime
 from contextlib import AbstractContextManager
-from typing import Callable, List, Self
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Self, Sequence, Tuple
 
+from sqlalchemy import Row, Select, false, or_, select, tuple_
 from sqlalchemy.orm import Session
 
-from .base_repository import BaseRepository
-from .entities import TableEntity
+from ..infrastructure.cache import CacheBackend
+from .availability import TableAvailability, compute_free_windows, day_range, is_slot_free
+from .base_repository import DEFAULT_BATCH_SIZE, BaseRepository, batched
+from .entities import ReservationEntity, RestaurantEntity, TableEntity, relation_table_reservation
+from .occupancy import OccupancyAggregate
+from .pagination import DEFAULT_PAGE_SIZE, DEFAULT_STREAM_BATCH_SIZE, Page, keyset_page, stream
+from .restaurant_repository import restaurant_cache_keys
+from .views import TableView
 
 
 class TableRepository(BaseRepository):
 
-    def __init__(self, session_factory: Callable[..., AbstractContextManager[Session]], session: Session = None):
-        super().__init__(session_factory=session_factory, session=session)
+    def __init__(
+        self,
+        session_factory: Callable[..., AbstractContextManager[Session]],
+        session: Session = None,
+        cache: CacheBackend = None,
+        occupancy: OccupancyAggregate = None,
+    ):
+        """the capacity of an optional OccupancyAggregate is updated when tables are saved"""
+        super().__init__(session_factory=session_factory, session=session, cache=cache)
+        self._occupancy = occupancy
 
     def new_session(self, session: Session) -> Self:
-        return TableRepository(session_factory=None, session=session)
+        return TableRepository(session_factory=None, session=session, cache=self._cache, occupancy=self._occupancy)
 
     def get_table_by_id(self, id: int) -> TableEntity:
-        with self.get_session() as session:
-            return session.get(TableEntity, id)
+        return self.with_session(lambda session: session.get(TableEntity, id))
 
     def get_tables_for_restaurant(self, restaurant_id: int) -> List[TableEntity]:
+        return self._cached(tables_cache_key(restaurant_id), lambda: self._get_tables_for_restaurant(restaurant_id))
+
+    def _get_tables_for_restaurant(self, restaurant_id: int) -> List[TableEntity]:
+        statement = select(TableEntity).where(TableEntity.restaurant_id == restaurant_id)
+        return self.with_session(lambda session: list(session.scalars(statement)))
+
+    def get_table_views(self, restaurant_id: int) -> List[TableView]:
+        """the tables of the restaurant as read-only views, ordered by table_number"""
+        with self.get_session() as session:
+            return [TableView(*row) for row in session.execute(table_views_statement(restaurant_id))]
+
+    def get_tables_page(
+        self, restaurant_id: int, after: Optional[int] = None, limit: int = DEFAULT_PAGE_SIZE
+    ) -> Page[TableEntity]:
+        """the tables of the restaurant ordered by id, starting after the cursor (the id) of the previous page"""
+        with self.get_session() as session:
+            statement = select(TableEntity).where(TableEntity.restaurant_id == restaurant_id)
+            return keyset_page(session, statement, [TableEntity.id], after, limit, lambda t: t.id)
+
+    def stream_tables_for_restaurant(
+        self, restaurant_id: int, batch_size: int = DEFAULT_STREAM_BATCH_SIZE
+    ) -> Iterator[TableEntity]:
         with self.get_session() as session:
-            return session.query(TableEntity).filter(TableEntity.restaurant_id == restaurant_id).all()
+            statement = select(TableEntity).where(TableEntity.restaurant_id == restaurant_id).order_by(TableEntity.id)
+            yield from stream(session, statement, batch_size)
 
     def get_tables_with_capacity(self, capacity: int, restaurant_id: int) -> List[TableEntity]:
         if capacity <= 0:
@@ -37,30 +75,189 @@ def get_tables_with_capacity(self, capacity: int, restaurant_id: int) -> List[Ta
                 tables = []
             return tables
 
+    def get_free_tables(
+        self,
+        restaurant_id: int,
+        date: datetime.date,
+        time_from: datetime.time,
+        time_until: datetime.time,
+        people: int,
+    ) -> List[TableAvailability]:
+        """
+        find all tables of the restaurant with enough seats which are free for the given slot.
+        the tables, the opening hours and the reservations of the day are fetched in a single query,
+        the free windows of each table are computed in one pass over the ordered result
+        """
+        if people <= 0 or time_from >= time_until:
+            return []
+        with self.get_session() as session:
+            rows = session.execute(free_tables_statement(restaurant_id, date, people)).all()
+        return collect_free_tables(rows, time_from, time_until)
+
     def save(self, table: TableEntity) -> TableEntity:
+        """save the table by id or by table_number and restaurant, @see save_many"""
+        return self.save_many([table])[0]
+
+    def save_many(self, tables: Iterable[TableEntity], batch_size: int = DEFAULT_BATCH_SIZE) -> List[TableEntity]:
+        """
+        save the tables with the same upsert semantics as save (by id or by table_number and restaurant).
+        existing tables are resolved with one query per batch, all changes are written with a single flush
+        """
+        saved: List[TableEntity] = []
+        by_key: Dict[Tuple[int, str], TableEntity] = {}
         with self.get_session() as session:
-            table_id = table.id or 0
-            if table_id > 0:
-                existing = session.get(TableEntity, table_id)
-                if existing is not None:
-                    existing.table_number = table.table_number
-                    existing.retaurant = table.restaurant
-                    session.add(existing)
-                    return existing
-            else:
-                # lookup the table by its number
-                existing = (
-                    session.query(TableEntity)
-                    .filter(TableEntity.table_number == table.table_number)
-                    .filter(TableEntity.restaurant_id == table.restaurant.id)
-                    .first()
-                )
-                if existing is not None:
-                    existing.table_number = table.table_number
-                    session.add(existing)
-                    return existing
-
-            # new or not found
-            session.add(table)
+            for batch in batched(tables, batch_size):
+                existing = session.execute(existing_tables_statement(batch)).scalars()
+                merged = merge_tables(batch, existing, by_key)
+                session.add_all(merged)
+                saved.extend(merged)
             session.flush()
-        return table
+            self._invalidate(session, table_cache_keys(saved))
+            self._track_capacity(session, saved)
+        return saved
+
+    def _track_capacity(self, session: Session, tables: List[TableEntity]) -> None:
+        if self._occupancy is not None:
+            self._occupancy.track_capacity(session, tables)
+
+
+def table_views_statement(restaurant_id: int) -> Select:
+    """the columns of TableView in the order of its fields"""
+    return (
+        select(TableEntity.id, TableEntity.restaurant_id, TableEntity.table_number, TableEntity.seats)
+        .where(TableEntity.restaurant_id == restaurant_id)
+        .order_by(TableEntity.table_number, TableEntity.id)
+    )
+
+
+def tables_cache_key(restaurant_id: int) -> str:
+    return f"tables:{restaurant_id}"
+
+
+def table_cache_keys(tables: Iterable[TableEntity]) -> List[str]:
+    """the table lists and the restaurants (cached with their tables) affected by the saved tables"""
+    restaurant_ids = {_restaurant_id(table) for table in tables}
+    return [tables_cache_key(id) for id in restaurant_ids if id is not None] + restaurant_cache_keys(restaurant_ids)
+
+
+def free_tables_statement(restaurant_id: int, date: datetime.date, people: int) -> Select:
+    """
+    the tables of the restaurant with enough seats, the opening hours of the restaurant and
+    the reservations of the tables on the given day (outer join), ordered by table and time_from
+    """
+    day_start, day_end = day_range(date)
+    booked = (
+        select(
+            relation_table_reservation.c.table_id,
+            ReservationEntity.time_from,
+            ReservationEntity.time_until,
+        )
+        .join(ReservationEntity, ReservationEntity.id == relation_table_reservation.c.reservation_id)
+        .where(ReservationEntity.reservation_date >= day_start)
+        .where(ReservationEntity.reservation_date < day_end)
+        .subquery()
+    )
+    return (
+        select(
+            TableEntity,
+            RestaurantEntity.open_from,
+            RestaurantEntity.open_until,
+            booked.c.time_from,
+            booked.c.time_until,
+        )
+        .join(RestaurantEntity, RestaurantEntity.id == TableEntity.restaurant_id)
+        .outerjoin(booked, booked.c.table_id == TableEntity.id)
+        .where(TableEntity.restaurant_id == restaurant_id)
+        .where(TableEntity.seats >= people)
+        # the smallest table which fits is the first one
+        .order_by(TableEntity.seats, TableEntity.table_number, TableEntity.id, booked.c.time_from)
+    )
+
+
+def collect_free_tables(
+    rows: Sequence[Row], time_from: datetime.time, time_until: datetime.time
+) -> List[TableAvailability]:
+    """compute the free windows per table in one pass over the rows of free_tables_statement"""
+    free_tables: List[TableAvailability] = []
+    index = 0
+    while index < len(rows):
+        table, open_from, open_until = rows[index][0], rows[index][1], rows[index][2]
+        reserved = []
+        # the rows of a table are adjacent because of the ordering
+        while index < len(rows) and rows[index][0] is table:
+            if rows[index][3] is not None:
+                reserved.append((rows[index][3], rows[index][4]))
+            index += 1
+        windows = compute_free_windows(open_from, open_until, reserved)
+        if is_slot_free(windows, time_from, time_until):
+            free_tables.append(TableAvailability(table=table, free_windows=windows))
+    return free_tables
+
+
+def existing_tables_statement(batch: List[TableEntity]) -> Select:
+    """one query for all tables of the batch which already exist, either by id or by restaurant and table_number"""
+    ids = [table.id for table in batch if (table.id or 0) > 0]
+    keys = [
+        (_restaurant_id(table), table.table_number)
+        for table in batch
+        if (table.id or 0) <= 0 and _restaurant_id(table) is not None
+    ]
+    # only the lookups with values, an empty IN is a subquery of its own
+    lookups = []
+    if ids:
+        lookups.append(TableEntity.id.in_(ids))
+    if keys:
+        lookups.append(tuple_(TableEntity.restaurant_id, TableEntity.table_number).in_(keys))
+    return select(TableEntity).where(or_(false(), *lookups))
+
+
+def merge_tables(
+    batch: List[TableEntity], existing: Iterable[TableEntity], by_key: Dict[Tuple[int, str], TableEntity]
+) -> List[TableEntity]:
+    """apply the values of the batch to the existing tables, new tables are returned as they are"""
+    by_id: Dict[int, TableEntity] = {}
+    for table in existing:
+        by_id[table.id] = table
+        by_key.setdefault((table.restaurant_id, table.table_number), table)
+
+    merged: List[TableEntity] = []
+    for table in batch:
+        if (table.id or 0) > 0:
+            existing_table = by_id.get(table.id)
+        else:
+            existing_table = by_key.get((_restaurant_id(table), table.table_number))
+        if existing_table is not None:
+            existing_table.table_number = table.table_number
+            existing_table.seats = table.seats
+            # the given table was added to the collection of the restaurant by the back-reference
+            # it is replaced by the existing table and must not be flushed
+            _remove_from_restaurant(table)
+            table = existing_table
+        elif _restaurant_id(table) is not None:
+            by_key[(_restaurant_id(table), table.table_number)] = table
+        merged.append(table)
+    return merged
+
+
+def _remove_from_restaurant(table: TableEntity) -> None:
+    """
+    remove the table from the collection of its restaurant without loading it. in a loaded collection the table
+    is found by identity, the dataclass __eq__ compares all fields and would lazy-load the reservations (which
+    fails on an AsyncSession). for an unloaded collection the pending append of the back-reference is reverted
+    """
+    if table.restaurant is None:
+        return
+    if "tables" not in table.restaurant.__dict__:
+        table.restaurant = None
+        return
+    tables = table.restaurant.tables
+    for index, other in enumerate(tables):
+        if other is table:
+            del tables[index]
+            return
+
+
+def _restaurant_id(table: TableEntity) -> int:
+    if table.restaurant is not None and table.restaurant.id is not None:
+        return table.restaurant.id
+    return table.restaurant_id
@@ -1,6 +1,7 @@
+import datetime
 from typing import Any, List
 
-from .entities import TableEntity
+from .entities import ReservationEntity, TableEntity
 from .repository_test_helpers import create_restaurant_data, get_database
 from .restaurant_repository import RestaurantRepository
 from .table_repository import TableRepository
@@ -50,3 +51,105 @@ def action(session) -> List[Any]:
 
     tables_with_capacity = repo.get_tables_with_capacity(7, restaurant_id)
     assert len(tables_with_capacity) == 0
+
+    # save updates an existing table by id or by number, like save_many
+    def update(session) -> List[int]:
+        table_repo = repo.new_session(session)
+        restaurant = restaurant_repo.new_session(session).get_restaurant_by_id(restaurant_id)
+        return [
+            table_repo.save(TableEntity(id=tables[0].id, table_number="Table1", seats=8, restaurant=restaurant)).id,
+            table_repo.save(TableEntity(table_number="Table2", seats=2, restaurant=restaurant)).id,
+        ]
+
+    assert repo.unit_of_work(update) == [tables[0].id, tables[1].id]
+    assert [(t.table_number, t.seats) for t in repo.get_tables_for_restaurant(restaurant_id)] == [
+        ("Table1", 8),
+        ("Table2", 2),
+    ]
+
+
+def test_free_tables_for_date_and_slot():
+    managed_session = get_database().managed_session
+    repo = TableRepository(managed_session)
+    restaurant_repo = RestaurantRepository(managed_session)
+    date = datetime.date(2024, 9, 10)
+
+    def action(session) -> List[Any]:
+        res_repo = restaurant_repo.new_session(session)
+        table_repo = repo.new_session(session)
+
+        res = res_repo.save(create_restaurant_data())
+        res_repo.sync()
+
+        table_repo.save(TableEntity(table_number="Table1", seats=2, restaurant=res))
+        table2 = table_repo.save(TableEntity(table_number="Table2", seats=4, restaurant=res))
+        table3 = table_repo.save(TableEntity(table_number="Table3", seats=6, restaurant=res))
+
+        booking = ReservationEntity(
+            reservation_date=date,
+            time_from=datetime.time(18, 0, 0),
+            time_until=datetime.time(20, 0, 0),
+            people=4,
+            reservation_name="Booked",
+            reservation_number="1234",
+        )
+        booking.tables.append(table2)
+        other_day = ReservationEntity(
+            reservation_date=date + datetime.timedelta(days=1),
+            time_from=datetime.time(18, 0, 0),
+            time_until=datetime.time(20, 0, 0),
+            people=6,
+            reservation_name="OtherDay",
+            reservation_number="5678",
+        )
+        other_day.tables.append(table3)
+        session.add_all([booking, other_day])
+        return [res.id]
+
+    restaurant_id = repo.unit_of_work(action)[0]
+
+    # the slot overlaps the reservation of Table2
+    free = repo.get_free_tables(restaurant_id, date, datetime.time(19, 0, 0), datetime.time(21, 0, 0), 4)
+    assert [f.table.table_number for f in free] == ["Table3"]
+    assert free[0].free_windows == [(datetime.time(10, 0, 0), datetime.time(22, 0, 0))]
+
+    # directly after the reservation both tables are free, the smaller table first
+    free = repo.get_free_tables(restaurant_id, date, datetime.time(20, 0, 0), datetime.time(22, 0, 0), 3)
+    assert [f.table.table_number for f in free] == ["Table2", "Table3"]
+    assert free[0].free_windows == [
+        (datetime.time(10, 0, 0), datetime.time(18, 0, 0)),
+        (datetime.time(20, 0, 0), datetime.time(22, 0, 0)),
+    ]
+
+    # outside of the opening hours or without enough seats no table is free
+    assert repo.get_free_tables(restaurant_id, date, datetime.time(21, 0, 0), datetime.time(23, 0, 0), 2) == []
+    assert repo.get_free_tables(restaurant_id, date, datetime.time(12, 0, 0), datetime.time(13, 0, 0), 7) == []
+
+
+def test_table_repository_save_many():
+    managed_session = get_database().managed_session
+    repo = TableRepository(managed_session)
+    restaurant_repo = RestaurantRepository(managed_session)
+
+    def action(session) -> List[Any]:
+        res = restaurant_repo.new_session(session).save(create_restaurant_data())
+        table_repo = repo.new_session(session)
+        table_repo.save(TableEntity(table_number="Table1", seats=2, restaurant=res))
+        table_repo.sync()
+
+        saved = table_repo.save_many(
+            [TableEntity(table_number="Table%d" % i, seats=4, restaurant=res) for i in range(1, 6)], batch_size=2
+        )
+        assert [t.id for t in saved] == sorted(t.id for t in saved)
+        return [res.id]
+
+    restaurant_id = repo.unit_of_work(action)[0]
+    tables = repo.get_tables_for_restaurant(restaurant_id)
+    assert len(tables) == 5
+    assert all(table.seats == 4 for table in tables)
+
+    page = repo.get_tables_page(restaurant_id, limit=3)
+    assert [t.id for t in page.items] == sorted(t.id for t in tables)[:3]
+    page = repo.get_tables_page(restaurant_id, after=page.next_cursor, limit=3)
+    assert len(page.items) == 2 and page.next_cursor is None
+    assert len(list(repo.stream_tables_for_restaurant(restaurant_id, batch_size=2))) == 5
@@ -0,0 +1,125 @@
+import datetime
+from dataclasses import dataclass
+from typing import Tuple
+
+# read-only projections built from column-level queries. they are not tracked by a session,
+# which saves the identity-map and state bookkeeping of entities on read paths which only render data
+
+
+@dataclass(frozen=True, slots=True)
+class RestaurantSummary:
+    """read-only projection of a restaurant for listings, without menus and tables"""
+
+    id: int
+    name: str
+    city: str
+    menu_count: int
+    table_count: int
+
+
+@dataclass(frozen=True, slots=True)
+class RestaurantView:
+    """read-only projection of a restaurant and its address"""
+
+    id: int
+    name: str
+    open_from: datetime.time
+    open_until: datetime.time
+    open_days: str
+    street: str
+    city: str
+    zip: str
+    country: str
+
+
+@dataclass(frozen=True, slots=True)
+class MenuItemView:
+    id: int
+    restaurant_id: int
+    name: str
+    category: str
+    price: float
+
+
+@dataclass(frozen=True, slots=True)
+class TableView:
+    id: int
+    restaurant_id: int
+    table_number: str
+    seats: int
+
+
+@dataclass(frozen=True, slots=True)
+class ReservationView:
+    """read-only projection of a reservation, the tables are referenced by their ids"""
+
+    id: int
+    reservation_number: str
+    reservation_date: datetime.datetime
+    time_from: datetime.time
+    time_until: datetime.time
+    people: int
+    reservation_name: str
+    table_ids: Tuple[int, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class OccupancyView:
+    """the reserved seats/tables of one time bucket of a restaurant and day"""
+
+    restaurant_id: int
+    day: datetime.date
+    bucket_start: datetime.time
+    reserved_seats: int
+    reserved_tables: int
+    capacity: int
+
+    @property
+    def utilization(self) -> float:
+        """the share of the capacity which is reserved (0.0 - 1.0+)"""
+        return self.reserved_seats / self.capacity if self.capacity > 0 else 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class MenuSearchHit:
+    """a menu found by MenuRepository.search_menus, a smaller rank is a better match"""
+
+    id: int
+    restaurant_id: int
+    name: str
+    category: str
+    price: float
+    rank: float
+
+
+@dataclass(frozen=True, slots=True)
+class OrderLineView:
+    """a menu of an order with the price at the time of the order"""
+
+    menu_id: int
+    name: str
+    quantity: int
+    unit_price: float
+
+    @property
+    def amount(self) -> float:
+        return self.quantity * self.unit_price
+
+
+@dataclass(frozen=True, slots=True)
+class OrderView:
+    id: int
+    table_id: int
+    waiter: str
+    created: datetime.datetime
+    total: float
+    lines: Tuple[OrderLineView, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class RevenueView:
+    """the revenue of a group of orders, the key is the table_id, the waiter or the day"""
+
+    key: object
+    orders: int
+    revenue: float
@@ -0,0 +1,365 @@
+import atexit
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..infrastructure.logger import LOG
+from .batch import BatchConfig, ItemFailure
+from .entities import ReservationEntity, TableEntity
+from .reservation_repo import ReservationRepository
+
+
+class WriteBehindFullError(Exception):
+    """the queue is full and the reservation was not accepted within the timeout (back-pressure)"""
+
+
+class WriteBehindClosedError(Exception):
+    """the write-behind queue was closed and accepts no more reservations"""
+
+
+class WriteBehindFailedError(Exception):
+    """a batch could not be written after the retries, the write-behind stopped writing (@see WriteBehindConfig)"""
+
+
+@dataclass
+class WriteBehindConfig:
+    # the number of acknowledged reservations which are not yet written, submit blocks if the limit is reached
+    max_queue: int = 10_000
+    # how long submit waits for space in the queue, None waits forever
+    submit_timeout: Optional[float] = 1.0
+    # the worker writes up to batch_size reservations per transaction and waits at most max_wait_ms
+    # for more reservations before it writes a smaller batch
+    batch_size: int = 500
+    max_wait_ms: float = 20.0
+    # append every acknowledged reservation to this file before submit returns; the pending reservations
+    # of the journal are written again when the queue is started after a crash
+    journal_path: Optional[str] = None
+    fsync: bool = True
+    # a batch which fails with a transient error (e.g. a locked database) is tried again max_retries times,
+    # the delay starts with backoff_ms and doubles with every retry. afterwards, or after any other error of
+    # the database, the write-behind stops writing; the reservations which are not written stay in the journal
+    # and are written when it is started again
+    max_retries: int = 5
+    backoff_ms: float = 100.0
+
+
+@dataclass
+class PendingReservation:
+    """the data of an acknowledged reservation, the entities are created by the worker in its own session"""
+
+    sequence: int
+    reservation_number: str
+    reservation_date: str
+    time_from: str
+    time_until: str
+    people: int
+    reservation_name: str
+    table_ids: List[int]
+
+    @staticmethod
+    def of(sequence: int, reservation: ReservationEntity) -> "PendingReservation":
+        return PendingReservation(
+            sequence=sequence,
+            reservation_number=reservation.reservation_number,
+            reservation_date=reservation.reservation_date.isoformat(),
+            time_from=reservation.time_from.isoformat(),
+            time_until=reservation.time_until.isoformat(),
+            people=reservation.people,
+            reservation_name=reservation.reservation_name,
+            table_ids=[table.id for table in reservation.tables],
+        )
+
+    def to_entity(self, session: Session) -> ReservationEntity:
+        reservation = ReservationEntity(
+            reservation_number=self.reservation_number,
+            reservation_date=datetime.datetime.fromisoformat(self.reservation_date),
+            time_from=datetime.time.fromisoformat(self.time_from),
+            time_until=datetime.time.fromisoformat(self.time_until),
+            people=self.people,
+            reservation_name=self.reservation_name,
+        )
+        for table_id in self.table_ids:
+            reservation.tables.append(session.get(TableEntity, table_id))
+        return reservation
+
+
+def validate_reservation(reservation: ReservationEntity) -> None:
+    """the checks done before a reservation is acknowledged, raises ValueError"""
+    if not reservation.reservation_number:
+        raise ValueError("a reservation_number is required")
+    if reservation.reservation_date is None or reservation.time_from is None or reservation.time_until is None:
+        raise ValueError("the date and time of the reservation are required")
+    if reservation.time_from >= reservation.time_until:
+        raise ValueError("time_from needs to be before time_until")
+    if (reservation.people or 0) <= 0:
+        raise ValueError("the number of people needs to be positive")
+    if any(table.id is None for table in reservation.tables):
+        raise ValueError("the tables of the reservation need to be saved")
+
+
+class ReservationJournal:
+    """
+    append-only file of the acknowledged reservations (one json object per line). after a batch is committed
+    a marker with the highest written sequence is appended; the file is truncated when nothing is pending
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self._path = path
+        self._fsync = fsync
+        self._file = open(path, "a", encoding="utf-8")
+
+    def pending(self) -> List[PendingReservation]:
+        """the reservations of the journal which were not written before"""
+        entries: List[PendingReservation] = []
+        written = 0
+        with open(self._path, encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError:
+                    # the last line of a crashed process can be incomplete, it was never acknowledged
+                    continue
+                if "written" in data:
+                    written = max(written, data["written"])
+                else:
+                    entries.append(PendingReservation(**data))
+        return [entry for entry in entries if entry.sequence > written]
+
+    def append(self, entry: PendingReservation) -> None:
+        self._write(json.dumps(asdict(entry)))
+
+    def mark_written(self, sequence: int) -> None:
+        self._write(json.dumps({"written": sequence}))
+
+    def truncate(self) -> None:
+        self._file.truncate(0)
+        self._sync()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def _write(self, line: str) -> None:
+        self._file.write(line + "\n")
+        self._sync()
+
+    def _sync(self) -> None:
+        self._file.flush()
+        if self._fsync:
+            os.fsync(self._file.fileno())
+
+
+_STOP = object()
+
+
+class ReservationWriteBehind:
+    """
+    write-behind mode of the ReservationRepository: submit validates a reservation, appends it to the optional
+    journal and puts it on a bounded queue; a background thread writes the queued reservations in batched
+    transactions (@see BaseRepository.unit_of_work_batched). the reservations are saved by their number,
+    writing a reservation of the journal a second time updates the same row.
+
+    the worker uses its own session, with SQLite the database needs to be a file (an in-memory database
+    is not shared between the threads)
+    """
+
+    def __init__(
+        self,
+        repository: ReservationRepository,
+        config: WriteBehindConfig = None,
+        on_failure: Callable[[ItemFailure[PendingReservation]], None] = None,
+    ):
+        self._repository = repository
+        self._config = config or WriteBehindConfig()
+        self._on_failure = on_failure
+        self._queue: queue.Queue = queue.Queue()
+        # a slot is taken by submit and released when the reservation is written (back-pressure)
+        self._capacity = threading.BoundedSemaphore(self._config.max_queue)
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._closed = False
+        self._error: Optional[WriteBehindFailedError] = None
+        self._journal = None
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+        recovered: List[PendingReservation] = []
+        if self._config.journal_path is not None:
+            self._journal = ReservationJournal(self._config.journal_path, self._config.fsync)
+            recovered = self._journal.pending()
+        if recovered:
+            LOG.info("write-behind: %d reservations of the journal are written again", len(recovered))
+            try:
+                self._write(recovered)
+            except WriteBehindFailedError:
+                # the reservations stay in the journal
+                self._journal.close()
+                raise
+            self._sequence = max(entry.sequence for entry in recovered)
+            self._journal.mark_written(self._sequence)
+        if self._journal is not None:
+            self._journal.truncate()
+
+        self._worker = threading.Thread(target=self._run, name="reservation-write-behind", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def submit(self, reservation: ReservationEntity) -> str:
+        """
+        validate and acknowledge the reservation, returns its reservation_number. a new reservation without
+        a number gets one of the number allocator of the repository
+        """
+        if not reservation.reservation_number:
+            self._repository.allocate_number(reservation)
+        validate_reservation(reservation)
+        if not self._capacity.acquire(timeout=self._config.submit_timeout):
+            raise WriteBehindFullError("the write-behind queue is full")
+        try:
+            with self._lock:
+                if self._closed:
+                    raise WriteBehindClosedError("the write-behind queue is closed")
+                if self._error is not None:
+                    raise WriteBehindFailedError("the write-behind stopped, the reservations are not written")
+                self._sequence += 1
+                entry = PendingReservation.of(self._sequence, reservation)
+                # journal and queue are filled under the lock, so both have the same order
+                if self._journal is not None:
+                    self._journal.append(entry)
+                self._queue.put(entry)
+        except BaseException:
+            self._capacity.release()
+            raise
+        return entry.reservation_number
+
+    def flush(self) -> None:
+        """wait until all acknowledged reservations are written"""
+        self._queue.join()
+
+    def close(self) -> None:
+        """stop accepting reservations, write the queued ones and stop the worker"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        atexit.unregister(self.close)
+        self._queue.put(_STOP)
+        self._worker.join()
+        if self._journal is not None:
+            self._journal.close()
+
+    def __enter__(self) -> "ReservationWriteBehind":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            try:
+                if batch:
+                    self._process(batch)
+            except Exception:
+                LOG.exception("write-behind: the batch of %d reservations failed", len(batch))
+            finally:
+                # released in any case, otherwise submit and flush would wait forever
+                for _ in batch:
+                    self._capacity.release()
+                for _ in range(len(batch) + (1 if stop else 0)):
+                    self._queue.task_done()
+
+    def _process(self, batch: List[PendingReservation]) -> None:
+        if self._error is None:
+            try:
+                self._write(batch)
+                self._mark_written(batch[-1].sequence)
+                return
+            except WriteBehindFailedError as error:
+                LOG.error(
+                    "write-behind: stopped writing, the reservations stay in the journal: %s", error.__cause__ or error
+                )
+                with self._lock:
+                    self._error = error
+        # the write-behind stopped, the batch is not written
+        self.failed += len(batch)
+        for entry in batch:
+            self._notify(ItemFailure(entry, self._error))
+
+    def _next_batch(self) -> Tuple[List[PendingReservation], bool]:
+        """wait for the first reservation, then collect more until batch_size or max_wait_ms"""
+        batch: List[PendingReservation] = []
+        item = self._queue.get()
+        deadline = time.monotonic() + self._config.max_wait_ms / 1000.0
+        while item is not _STOP:
+            batch.append(item)
+            if len(batch) >= self._config.batch_size:
+                return batch, False
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                return batch, False
+        return batch, True
+
+    def _write(self, batch: List[PendingReservation]) -> None:
+        def save(session: Session, entry: PendingReservation) -> ReservationEntity:
+            reservation = entry.to_entity(session)
+            saved = self._repository.new_session(session).save(reservation)
+            if saved is not reservation:
+                # the reservation was written before (a reservation of the journal), the new entity
+                # was added to the tables by the back-reference and must not be flushed
+                reservation.tables.clear()
+            return saved
+
+        config = BatchConfig(
+            batch_size=len(batch),
+            max_batch_ms=None,
+            max_retries=self._config.max_retries,
+            backoff_ms=self._config.backoff_ms,
+        )
+        try:
+            # transient errors are retried by unit_of_work_batched
+            report = self._repository.unit_of_work_batched(batch, save, config)
+        except Exception as error:
+            raise WriteBehindFailedError("the batch of %d reservations could not be written" % len(batch)) from error
+        if len(report.results) + len(report.failures) != len(batch):
+            # the journal keeps the reservations, they must not be marked written
+            raise WriteBehindFailedError(
+                "%d of %d reservations were processed" % (len(report.results) + len(report.failures), len(batch))
+            )
+        self.batches += 1
+        self.written += len(report.results)
+        self.failed += len(report.failures)
+        for failure in report.failures:
+            LOG.error(
+                "write-behind: reservation %s was not written: %s", failure.item.reservation_number, failure.error
+            )
+            self._notify(failure)
+
+    def _notify(self, failure: ItemFailure[PendingReservation]) -> None:
+        if self._on_failure is None:
+            return
+        try:
+            self._on_failure(failure)
+        except Exception:
+            LOG.exception("write-behind: on_failure raised for reservation %s", failure.item.reservation_number)
+
+    def _mark_written(self, sequence: int) -> None:
+        if self._journal is None:
+            return
+        with self._lock:
+            if sequence == self._sequence:
+                # nothing is pending, the journal starts over
+                self._journal.truncate()
+            else:
+                self._journal.mark_written(sequence)
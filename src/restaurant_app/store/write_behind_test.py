@@ -0,0 +1,201 @@
+import datetime
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Tuple
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from .batch import BatchReport
+from .database import SqlAlchemyDatabase
+from .entities import ReservationEntity, TableEntity
+from .repository_test_helpers import create_restaurant_data
+from .reservation_repo import ReservationRepository
+from .write_behind import (
+    PendingReservation,
+    ReservationWriteBehind,
+    WriteBehindClosedError,
+    WriteBehindConfig,
+    WriteBehindFailedError,
+    WriteBehindFullError,
+)
+
+
+def setup_database(tmp_path) -> Tuple[ReservationRepository, TableEntity]:
+    # the worker thread needs a database which is shared between connections
+    db = SqlAlchemyDatabase("sqlite:///%s" % (tmp_path / "write_behind.db"), auto_commit=True)
+    db.create_database()
+    with db.managed_session() as session:
+        table = TableEntity(table_number="T1", seats=4, restaurant=create_restaurant_data())
+        session.add(table)
+    return ReservationRepository(db.managed_session), table
+
+
+def reservation(number: str, table: TableEntity) -> ReservationEntity:
+    reservation = ReservationEntity(
+        reservation_date=datetime.datetime(2024, 9, 10),
+        time_from=datetime.time(18, 0, 0),
+        time_until=datetime.time(20, 0, 0),
+        people=2,
+        reservation_name="Test",
+        reservation_number=number,
+    )
+    reservation.tables.append(table)
+    return reservation
+
+
+def count_reservations(repo: ReservationRepository) -> int:
+    with repo.get_session() as session:
+        return session.query(ReservationEntity).count()
+
+
+class GatedWriteBehind(ReservationWriteBehind):
+    """the worker waits for the gate before it writes a batch"""
+
+    def __init__(self, *args, **kwargs):
+        self.gate = threading.Event()
+        super().__init__(*args, **kwargs)
+
+    def _write(self, batch):
+        self.gate.wait()
+        super()._write(batch)
+
+
+def test_write_behind_writes_batches(tmp_path):
+    repo, table = setup_database(tmp_path)
+    with ReservationWriteBehind(repo, WriteBehindConfig(batch_size=20)) as write_behind:
+        numbers = [write_behind.submit(reservation("N%d" % i, table)) for i in range(50)]
+        write_behind.flush()
+        assert count_reservations(repo) == 50
+        assert write_behind.written == 50
+        assert write_behind.batches >= 3
+        with pytest.raises(ValueError):
+            write_behind.submit(reservation("", table))
+    assert numbers[0] == "N0"
+    assert repo.get_reservation_by_number("N49").tables[0].id == table.id
+    with pytest.raises(WriteBehindClosedError):
+        write_behind.submit(reservation("N50", table))
+
+
+def test_write_behind_back_pressure(tmp_path):
+    repo, table = setup_database(tmp_path)
+    write_behind = GatedWriteBehind(repo, WriteBehindConfig(max_queue=2, submit_timeout=0.05))
+    write_behind.submit(reservation("N1", table))
+    write_behind.submit(reservation("N2", table))
+    with pytest.raises(WriteBehindFullError):
+        write_behind.submit(reservation("N3", table))
+    write_behind.gate.set()
+    write_behind.flush()
+    write_behind.submit(reservation("N3", table))
+    write_behind.close()
+    assert count_reservations(repo) == 3
+
+
+def test_write_behind_journal_recovery(tmp_path):
+    repo, table = setup_database(tmp_path)
+    journal = tmp_path / "reservations.journal"
+    config = WriteBehindConfig(journal_path=str(journal))
+
+    # the process crashes before the worker writes the acknowledged reservations
+    crashed = GatedWriteBehind(repo, config)
+    crashed.submit(reservation("N1", table))
+    crashed.submit(reservation("N2", table))
+    lines = journal.read_text().splitlines()
+    assert [json.loads(line)["reservation_number"] for line in lines] == ["N1", "N2"]
+    assert count_reservations(repo) == 0
+    # an incomplete last line is ignored
+    with open(journal, "a") as file:
+        file.write('{"sequence": 3, "reserv')
+
+    with ReservationWriteBehind(repo, config) as restarted:
+        assert count_reservations(repo) == 2
+        assert journal.read_text() == ""
+        restarted.submit(reservation("N3", table))
+    assert count_reservations(repo) == 3
+    assert journal.read_text() == ""
+
+    # writing the reservations of the journal a second time updates the same rows
+    crashed.gate.set()
+    crashed.close()
+    assert count_reservations(repo) == 3
+
+
+def test_write_behind_database_unavailable(tmp_path):
+    # the directory of the database does not exist, every connection fails
+    db = SqlAlchemyDatabase("sqlite:///%s" % (tmp_path / "missing" / "write_behind.db"))
+    journal = tmp_path / "reservations.journal"
+    config = WriteBehindConfig(journal_path=str(journal), fsync=False, max_retries=2, backoff_ms=1.0)
+    table = TableEntity(table_number="T1", seats=4)
+    table.id = 1
+    failures = []
+
+    def on_failure(failure):
+        failures.append(failure.item.reservation_number)
+        raise RuntimeError("the failure handler fails as well")
+
+    write_behind = ReservationWriteBehind(ReservationRepository(db.managed_session), config, on_failure)
+    write_behind.submit(reservation("N1", table))
+    # flush returns, the worker stops writing after the retries
+    write_behind.flush()
+    assert (write_behind.written, write_behind.failed) == (0, 1)
+    assert failures == ["N1"]
+    with pytest.raises(WriteBehindFailedError):
+        write_behind.submit(reservation("N2", table))
+    write_behind.close()
+
+    # the reservation stays in the journal, a restart fails again without losing it
+    assert [json.loads(line)["reservation_number"] for line in journal.read_text().splitlines()] == ["N1"]
+    with pytest.raises(WriteBehindFailedError):
+        ReservationWriteBehind(ReservationRepository(db.managed_session), config)
+    assert [json.loads(line)["reservation_number"] for line in journal.read_text().splitlines()] == ["N1"]
+
+
+def test_write_behind_keeps_the_journal_of_unprocessed_reservations(tmp_path):
+    repo, table = setup_database(tmp_path)
+    journal = tmp_path / "reservations.journal"
+    config = WriteBehindConfig(journal_path=str(journal), fsync=False)
+    write_behind = ReservationWriteBehind(repo, config)
+    # the batch returns without processing the reservations, they are neither written nor failed
+    with patch.object(repo, "unit_of_work_batched", return_value=BatchReport()):
+        write_behind.submit(reservation("N1", table))
+        write_behind.flush()
+    assert write_behind.written == 0
+    with pytest.raises(WriteBehindFailedError):
+        write_behind.submit(reservation("N2", table))
+    write_behind.close()
+    assert [json.loads(line)["reservation_number"] for line in journal.read_text().splitlines()] == ["N1"]
+
+    with ReservationWriteBehind(repo, config):
+        assert count_reservations(repo) == 1
+
+
+def test_write_behind_retries_transient_errors_once_per_retry(tmp_path):
+    repo, table = setup_database(tmp_path)
+    attempts = []
+
+    @contextmanager
+    def locked():
+        attempts.append(1)
+        raise OperationalError("BEGIN", {}, sqlite3.OperationalError("database is locked"))
+        yield
+
+    locked_repo = ReservationRepository(locked)
+    write_behind = ReservationWriteBehind(locked_repo, WriteBehindConfig(max_retries=2, backoff_ms=1.0))
+    write_behind.submit(reservation("N1", table))
+    write_behind.flush()
+    write_behind.close()
+    assert (len(attempts), write_behind.failed) == (3, 1)
+
+
+def test_pending_reservation_round_trip(tmp_path):
+    repo, table = setup_database(tmp_path)
+    entry = PendingReservation.of(1, reservation("N1", table))
+    with repo.get_session() as session:
+        entity = entry.to_entity(session)
+        assert entity.reservation_date == datetime.datetime(2024, 9, 10)
+        assert entity.time_until == datetime.time(20, 0, 0)
+        assert [t.id for t in entity.tables] == [table.id]
+        entity.tables.clear()